@@ -7,7 +7,7 @@ import subprocess
 import sys
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable
 
 from airflow import DAG
 from airflow.exceptions import AirflowFailException
@@ -19,16 +19,26 @@ SCRIPTS_DIR = ROOT_DIR / "scripts"
 if str(SCRIPTS_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPTS_DIR))
 
-from eval_summary_contract import validate_eval_summary
+# The scheduler re-parses this file constantly: repo modules are imported by the tasks that
+# use them, so parsing costs only Airflow and the stdlib.
+if TYPE_CHECKING:
+    from step_cache import StepCache
 
 RUNS_DIR = ROOT_DIR / "runs"
 DEFAULT_DAG_ID = os.getenv("AIRFLOW_DAG_ID", "rwkv_train_lifecycle")
 GPU_POOL_NAME = os.getenv("AIRFLOW_GPU_POOL_NAME", "rwkv_gpu_pool")
+# Eval fan-out is part of the DAG structure, so the shard count is fixed at parse time.
+EVAL_POOL_NAME = os.getenv("AIRFLOW_EVAL_POOL_NAME", GPU_POOL_NAME)
+EVAL_SHARDS = max(1, int(os.getenv("AIRFLOW_EVAL_SHARDS", "1")))
+EVAL_SUITES = ("domain_eval", "retention_eval")
 AUDIT_DIR = Path(os.getenv("AIRFLOW_AUDIT_DIR", str(ROOT_DIR / "orchestration/airflow/runtime/audit")))
 DEFAULT_INPUT_JSONL = str(ROOT_DIR / "data" / "raw" / "identity_hotfix_v3.jsonl")
 DEFAULT_DATASET_MANIFEST = str(ROOT_DIR / "data" / "raw" / "identity_hotfix_v3.manifest.json")
 DEFAULT_LOAD_MODEL = str(ROOT_DIR / "models" / "base" / "rwkv7-g1d-7.2b-20260131-ctx8192.pth")
 DEFAULT_TRAIN_WRAPPER = str(SCRIPTS_DIR / "train_qlora_nf4_identity_safe.sh")
+WORKSPACE_ENV = ROOT_DIR / "configs" / "workspace.env"
+# Environment train.sh reads on top of the wrapper and its config files; part of the train fingerprint.
+TRAIN_ENV_KNOBS = ("RWKV_PEFT_DIR", "VENV_DIR", "USE_WORKSPACE_ENV", "FUSED_KERNEL", "TRAIN_TYPE", "CHUNK_CTX")
 
 DEFAULT_RETRIES = int(os.getenv("AIRFLOW_TASK_RETRIES", "2"))
 DEFAULT_RETRY_DELAY_SECONDS = int(os.getenv("AIRFLOW_RETRY_DELAY_SECONDS", "60"))
@@ -63,6 +73,8 @@ def _conf_or_env(conf: dict[str, Any], key: str, default: str = "") -> str:
 
 
 def _dag_conf(context: dict[str, Any]) -> dict[str, Any]:
+    from step_cache import DEFAULT_CACHE_DIR as DEFAULT_STEP_CACHE_DIR  # pylint: disable=import-outside-toplevel
+
     dag_run = context.get("dag_run")
     conf = dict(dag_run.conf or {})
     ts_nodash = _context_value(context, "ts_nodash", datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"))
@@ -93,6 +105,10 @@ def _dag_conf(context: dict[str, Any]) -> dict[str, Any]:
         "data_prefix": data_prefix,
         "load_model": _conf_or_env(conf, "load_model", DEFAULT_LOAD_MODEL),
         "devices": _conf_or_env(conf, "devices", "1"),
+        "gpu_memory_gb": _conf_or_env(conf, "gpu_memory_gb", ""),
+        "step_cache": _conf_or_env(conf, "step_cache", "1"),
+        "step_cache_dir": _conf_or_env(conf, "step_cache_dir", str(DEFAULT_STEP_CACHE_DIR)),
+        "force_rebuild": _conf_or_env(conf, "force_rebuild", "0").lower() in {"1", "true", "yes"},
         "wandb_project": _conf_or_env(conf, "wandb_project", ""),
         "train_wrapper": train_wrapper,
         "dataset_manifest": _conf_or_env(conf, "dataset_manifest", DEFAULT_DATASET_MANIFEST),
@@ -104,6 +120,7 @@ def _dag_conf(context: dict[str, Any]) -> dict[str, Any]:
         "retention_eval_jsonl": retention_eval_jsonl,
         "eval_inference_script": _conf_or_env(conf, "eval_inference_script", str(SCRIPTS_DIR / "infer_albatross.py")),
         "eval_tokens": _conf_or_env(conf, "eval_tokens", "128"),
+        "eval_backend": _conf_or_env(conf, "eval_backend", "subprocess"),
         "domain_categories_path": domain_categories_path,
         "retention_categories_path": retention_categories_path,
         "hard_cases_path": hard_cases_path,
@@ -132,20 +149,31 @@ def _audit_path(context: dict[str, Any], task_id: str) -> Path:
 
 def _write_audit(context: dict[str, Any], task_id: str, status: str, details: dict[str, Any]) -> None:
     ti = context.get("ti")
+    start_date = getattr(ti, "start_date", None)
     payload = {
         "task_id": task_id,
         "status": status,
         "attempt": int(getattr(ti, "try_number", 1)),
         "dag_run_id": _context_run_id(context),
+        "run_name": _dag_conf(context)["run_name"],
+        "started_at": start_date.astimezone(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+        if start_date
+        else None,
         "timestamp": _now_iso(),
         "details": details,
     }
     _write_json(_audit_path(context, task_id), payload)
 
 
-def _run_shell(context: dict[str, Any], task_id: str, command: list[str]) -> None:
+def _run_shell(
+    context: dict[str, Any],
+    task_id: str,
+    command: list[str],
+    extra_env: dict[str, str] | None = None,
+) -> None:
     env = dict(os.environ)
     env["ORCHESTRATION_PROFILE"] = "airflow"
+    env.update(extra_env or {})
     command_str = " ".join(command)
     try:
         subprocess.run(command, cwd=ROOT_DIR, check=True, env=env)
@@ -160,6 +188,66 @@ def _run_shell(context: dict[str, Any], task_id: str, command: list[str]) -> Non
         raise AirflowFailException(f"{task_id} failed with exit code {exc.returncode}") from exc
 
 
+def _rwkv_peft_dir() -> Path:
+    return Path(os.getenv("RWKV_PEFT_DIR", str(ROOT_DIR / "third_party" / "RWKV-PEFT")))
+
+
+def _step_cache(conf: dict[str, Any]) -> StepCache | None:
+    from step_cache import StepCache  # pylint: disable=import-outside-toplevel
+
+    if conf["step_cache"].lower() in {"0", "false", "no"}:
+        return None
+    return StepCache(Path(conf["step_cache_dir"]))
+
+
+def _reuse_cached_step(
+    context: dict[str, Any],
+    conf: dict[str, Any],
+    cache: StepCache | None,
+    task_id: str,
+    step: dict[str, Any] | None,
+    destination: Callable[[str], Path],
+) -> bool:
+    """Restore a previous successful output set for the same input fingerprint."""
+    if cache is None or step is None or conf["force_rebuild"]:
+        return False
+    entry = cache.lookup(task_id, step["fingerprint"])
+    if entry is None:
+        return False
+    restored = cache.restore(entry, destination)
+    _write_audit(
+        context,
+        task_id,
+        "cache_hit",
+        {
+            "fingerprint": step["fingerprint"],
+            "source_run_name": entry["run_name"],
+            "cached_at": entry["created_at"],
+            "restored": {key: str(destination(key)) for key in restored},
+        },
+    )
+    return True
+
+
+def _store_cached_step(
+    cache: StepCache | None,
+    task_id: str,
+    step: dict[str, Any] | None,
+    files: dict[str, Path],
+    run_name: str,
+) -> dict[str, Any] | None:
+    if cache is None or step is None:
+        return None
+    entry = cache.store(task_id, step, files, run_name=run_name)
+    return {"fingerprint": step["fingerprint"], "stored": sorted(entry["files"])}
+
+
+def _run_dir_snapshot(run_dir: Path) -> dict[str, int]:
+    if not run_dir.is_dir():
+        return {}
+    return {str(path.relative_to(run_dir)): path.stat().st_mtime_ns for path in run_dir.rglob("*") if path.is_file()}
+
+
 def _sha256_file(path: Path) -> str:
     digest = hashlib.sha256()
     with path.open("rb") as handle:
@@ -182,8 +270,41 @@ def _write_gate_result(run_name: str, gate: str, verdict: str, reason: str) -> N
 
 
 def prepare_dataset(**context: Any) -> None:
+    from inspect_binidx import inspect_binidx  # pylint: disable=import-outside-toplevel
+    from profile_env import DEFAULT_MODEL_CONFIG, wrapper_configs  # pylint: disable=import-outside-toplevel
+    from step_cache import detach_links, module_files, source_revision  # pylint: disable=import-outside-toplevel
+
     conf = _dag_conf(context)
     _require_fields(conf, ["input_jsonl", "output_prefix"], "prepare_dataset")
+    data_prefix = conf["data_prefix"]
+    expected_bin = Path(f"{data_prefix}.bin")
+    expected_idx = Path(f"{data_prefix}.idx")
+    outputs = {"bin": expected_bin, "idx": expected_idx, "manifest.json": Path(f"{data_prefix}.manifest.json")}
+
+    cache = _step_cache(conf)
+    step = None
+    if cache is not None:
+        backend = os.getenv("BINIDX_BACKEND", "json2binidx")
+        rwkv_peft_dir = _rwkv_peft_dir()
+        json2binidx = backend == "json2binidx"
+        step = cache.fingerprint(
+            "prepare_dataset",
+            {"backend": backend, **({"rwkv_peft_revision": source_revision(rwkv_peft_dir)} if json2binidx else {})},
+            {
+                "input_jsonl": conf["input_jsonl"],
+                "prepare_binidx.sh": SCRIPTS_DIR / "prepare_binidx.sh",
+                "tokenizer_vocab": rwkv_peft_dir / "json2binidx_tool" / "rwkv_vocab_v20230424.txt",
+                **(
+                    {"preprocess_data.py": rwkv_peft_dir / "json2binidx_tool" / "tools" / "preprocess_data.py"}
+                    if json2binidx
+                    else module_files(SCRIPTS_DIR / "build_binidx.py")
+                ),
+            },
+        )
+    if _reuse_cached_step(context, conf, cache, "prepare_dataset", step, outputs.__getitem__):
+        return
+    detach_links(outputs.values())
+
     command = [
         str(SCRIPTS_DIR / "prepare_binidx.sh"),
         conf["input_jsonl"],
@@ -191,20 +312,44 @@ def prepare_dataset(**context: Any) -> None:
     ]
     _run_shell(context, "prepare_dataset", command)
 
-    data_prefix = conf["data_prefix"]
-    expected_bin = Path(f"{data_prefix}.bin")
-    expected_idx = Path(f"{data_prefix}.idx")
     if not expected_bin.is_file() or not expected_idx.is_file():
         reason = f"Expected binidx files not found for prefix: {data_prefix}"
         _write_audit(context, "prepare_dataset", "failed_artifact_validation", {"reason": reason})
         raise AirflowFailException(reason)
 
-    _write_audit(
-        context,
-        "prepare_dataset",
-        "validated",
-        {"data_prefix": data_prefix, "bin": str(expected_bin), "idx": str(expected_idx)},
-    )
+    details: dict[str, Any] = {"data_prefix": data_prefix, "bin": str(expected_bin), "idx": str(expected_idx)}
+    # Written by the native backend (BINIDX_BACKEND=native) only.
+    binidx_manifest = Path(f"{data_prefix}.manifest.json")
+    if binidx_manifest.is_file() and binidx_manifest.stat().st_mtime_ns >= expected_bin.stat().st_mtime_ns:
+        manifest = json.loads(binidx_manifest.read_text(encoding="utf-8"))
+        details["binidx_manifest"] = str(binidx_manifest)
+        details["bin_sha256"] = manifest.get("bin", {}).get("sha256")
+        details["token_cache"] = manifest.get("token_cache")
+
+    train_wrapper = Path(conf["train_wrapper"])
+    model_config, profile_config = wrapper_configs(train_wrapper) if train_wrapper.is_file() else (None, None)
+    try:
+        inspection = inspect_binidx(
+            Path(data_prefix),
+            [profile_config] if profile_config else [],
+            model_config or DEFAULT_MODEL_CONFIG,
+            devices=int(conf["devices"]),
+        )
+    except ValueError as exc:
+        inspection = {"status": "FAIL", "issues": [str(exc)]}
+    details["binidx_inspection"] = inspection
+    if inspection["status"] != "PASS":
+        reason = f"binidx inspection failed for prefix {data_prefix}: {', '.join(inspection['issues'])}"
+        details["reason"] = reason
+        _write_audit(context, "prepare_dataset", "failed_artifact_validation", details)
+        raise AirflowFailException(reason)
+    # Only a manifest from this build belongs to the entry (see the mtime check above).
+    cached_outputs = {"bin": expected_bin, "idx": expected_idx}
+    if "binidx_manifest" in details:
+        cached_outputs["manifest.json"] = binidx_manifest
+    details["step_cache"] = _store_cached_step(cache, "prepare_dataset", step, cached_outputs, conf["run_name"])
+    details["force_rebuild"] = conf["force_rebuild"]
+    _write_audit(context, "prepare_dataset", "validated", details)
 
 
 def check_dataset_quality(**context: Any) -> None:
@@ -282,12 +427,68 @@ def check_dataset_quality(**context: Any) -> None:
 
 
 def train_adapter(**context: Any) -> None:
+    from estimate_train_resources import estimate as estimate_train_resources  # pylint: disable=import-outside-toplevel
+    from profile_env import DEFAULT_MODEL_CONFIG, wrapper_configs  # pylint: disable=import-outside-toplevel
+    from step_cache import detach_links, source_revision  # pylint: disable=import-outside-toplevel
+
     conf = _dag_conf(context)
     _require_fields(conf, ["train_wrapper", "load_model", "data_prefix", "run_name"], "train_adapter")
     wrapper = Path(conf["train_wrapper"])
     if not wrapper.is_file():
         raise AirflowFailException(f"train_wrapper not found: {wrapper}")
 
+    run_dir = RUNS_DIR / conf["run_name"]
+    cache = _step_cache(conf)
+    step = None
+    if cache is not None:
+        model_config, profile_config = wrapper_configs(wrapper)
+        rwkv_peft_dir = _rwkv_peft_dir()
+        step = cache.fingerprint(
+            "train_adapter",
+            {
+                "devices": conf["devices"],
+                "rwkv_peft_revision": source_revision(rwkv_peft_dir),
+                "env": {name: os.getenv(name) for name in TRAIN_ENV_KNOBS},
+            },
+            {
+                "train_wrapper": wrapper,
+                "train.sh": SCRIPTS_DIR / "train.sh",
+                "workspace.env": WORKSPACE_ENV,
+                "rwkv_peft_train.py": rwkv_peft_dir / "train.py",
+                "model_config": model_config,
+                "profile_config": profile_config,
+                "load_model": conf["load_model"],
+                "data_bin": f"{conf['data_prefix']}.bin",
+                "data_idx": f"{conf['data_prefix']}.idx",
+            },
+        )
+    if _reuse_cached_step(context, conf, cache, "train_adapter", step, lambda key: run_dir / key):
+        return
+
+    extra_env = {}
+    resources: dict[str, Any] | None = None
+    if conf["gpu_memory_gb"]:
+        model_config, profile_config = wrapper_configs(wrapper)
+        if profile_config is None:
+            raise AirflowFailException(f"train_adapter: no --profile found in {wrapper}")
+        try:
+            resources = estimate_train_resources(
+                model_config or DEFAULT_MODEL_CONFIG,
+                profile_config,
+                devices=int(conf["devices"]),
+                gpu_memory_gb=float(conf["gpu_memory_gb"]),
+            )
+        except ValueError as exc:
+            raise AirflowFailException(f"train_adapter: resource estimate failed: {exc}") from exc
+        if resources["verdict"] != "fits":
+            reason = (
+                f"resource_preflight_refused: ~{resources['peak_memory_gb']} GB > budget "
+                f"{resources['budget_gb']} GB; suggested overrides: {resources['suggested_overrides']}"
+            )
+            _write_audit(context, "train_adapter", "refused_resource_preflight", {"reason": reason, "resources": resources})
+            raise AirflowFailException(reason)
+        extra_env["GPU_MEMORY_GB"] = conf["gpu_memory_gb"]
+
     command = [
         str(wrapper),
         "--load-model",
@@ -302,41 +503,74 @@ def train_adapter(**context: Any) -> None:
     if conf["wandb_project"]:
         command.extend(["--wandb", conf["wandb_project"]])
 
-    _run_shell(context, "train_adapter", command)
+    before = _run_dir_snapshot(run_dir)
+    detach_links(run_dir / name for name in before)
+    _run_shell(context, "train_adapter", command, extra_env)
 
-    run_dir = RUNS_DIR / conf["run_name"]
     if not run_dir.is_dir():
         reason = f"Expected run directory not found: {run_dir}"
         _write_audit(context, "train_adapter", "failed_artifact_validation", {"reason": reason})
         raise AirflowFailException(reason)
 
-    _write_audit(context, "train_adapter", "validated", {"run_dir": str(run_dir)})
+    details: dict[str, Any] = {"run_dir": str(run_dir), "resources": resources}
+    # Written by scripts/collect_train_telemetry.py, which train.sh wraps around train.py.
+    telemetry_summary = run_dir / "telemetry" / "summary.json"
+    if telemetry_summary.is_file():
+        details["telemetry"] = json.loads(telemetry_summary.read_text(encoding="utf-8"))
+    # Cache what this training run wrote, not gates or files left by earlier tasks.
+    produced = {name: run_dir / name for name, mtime_ns in _run_dir_snapshot(run_dir).items() if before.get(name) != mtime_ns}
+    details["step_cache"] = _store_cached_step(cache, "train_adapter", step, produced, conf["run_name"])
+    details["force_rebuild"] = conf["force_rebuild"]
+    _write_audit(context, "train_adapter", "validated", details)
 
 
-def produce_eval_artifacts(**context: Any) -> None:
+def _eval_shard_task_id(suite: str, shard_index: int) -> str:
+    return f"eval_{suite.split('_')[0]}_shard_{shard_index}"
+
+
+def _eval_partial_path(run_dir: Path, suite: str, shard_index: int, shard_count: int) -> Path:
+    return run_dir / "eval_shards" / f"{suite}-{shard_index}-of-{shard_count}.json"
+
+
+def evaluate_eval_shard(suite: str, shard_index: int, shard_count: int, **context: Any) -> None:
+    from step_cache import detach_links, module_files  # pylint: disable=import-outside-toplevel
+
+    task_id = _eval_shard_task_id(suite, shard_index)
+    jsonl_field = f"{suite}_jsonl"
     conf = _dag_conf(context)
-    _require_fields(
-        conf,
-        [
-            "run_name",
-            "eval_model_path",
-            "domain_eval_jsonl",
-            "retention_eval_jsonl",
-            "eval_inference_script",
-            "domain_categories_path",
-            "retention_categories_path",
-            "hard_cases_path",
-        ],
-        "produce_eval_artifacts",
-    )
+    _require_fields(conf, ["run_name", "eval_model_path", jsonl_field, "eval_inference_script"], task_id)
     run_dir = RUNS_DIR / conf["run_name"]
     if not run_dir.is_dir():
         raise AirflowFailException(f"run_dir not found before eval artifact production: {run_dir}")
 
-    for field in ("eval_model_path", "domain_eval_jsonl", "retention_eval_jsonl", "eval_inference_script"):
+    for field in ("eval_model_path", jsonl_field, "eval_inference_script"):
         path = Path(conf[field])
         if not path.is_file():
-            raise AirflowFailException(f"produce_eval_artifacts: missing required file for {field}: {path}")
+            raise AirflowFailException(f"{task_id}: missing required file for {field}: {path}")
+
+    partial_path = _eval_partial_path(run_dir, suite, shard_index, shard_count)
+    cache = _step_cache(conf)
+    step = None
+    if cache is not None:
+        step = cache.fingerprint(
+            task_id,
+            {
+                "suite": suite,
+                "shard_index": shard_index,
+                "shard_count": shard_count,
+                "eval_tokens": conf["eval_tokens"],
+                "eval_backend": conf["eval_backend"],
+            },
+            {
+                "eval_model_path": conf["eval_model_path"],
+                jsonl_field: conf[jsonl_field],
+                "eval_inference_script": conf["eval_inference_script"],
+                **module_files(SCRIPTS_DIR / "produce_eval_artifacts.py", conf["eval_inference_script"]),
+            },
+        )
+    if _reuse_cached_step(context, conf, cache, task_id, step, lambda key: partial_path):
+        return
+    detach_links([partial_path])
 
     command = [
         sys.executable,
@@ -347,40 +581,95 @@ def produce_eval_artifacts(**context: Any) -> None:
         str(run_dir),
         "--model",
         conf["eval_model_path"],
-        "--domain-eval-jsonl",
-        conf["domain_eval_jsonl"],
-        "--retention-eval-jsonl",
-        conf["retention_eval_jsonl"],
-        "--domain-output",
-        conf["domain_categories_path"],
-        "--retention-output",
-        conf["retention_categories_path"],
-        "--hard-cases-output",
-        conf["hard_cases_path"],
+        "--suite",
+        suite,
+        "--eval-jsonl",
+        conf[jsonl_field],
+        "--shard-index",
+        str(shard_index),
+        "--shard-count",
+        str(shard_count),
+        "--partial-output",
+        str(partial_path),
         "--inference-script",
         conf["eval_inference_script"],
         "--tokens",
         conf["eval_tokens"],
+        "--backend",
+        conf["eval_backend"],
     ]
-    _run_shell(context, "produce_eval_artifacts", command)
+    if step is not None and step["inputs"]["files"]["eval_model_path"]:
+        # Already hashed (and memoised) for the fingerprint; spares each shard a multi-GB re-hash.
+        command += ["--model-sha256", step["inputs"]["files"]["eval_model_path"]]
+    _run_shell(context, task_id, command)
+
+    if not partial_path.is_file():
+        reason = f"Expected eval partial not found: {partial_path}"
+        _write_audit(context, task_id, "failed_artifact_validation", {"reason": reason})
+        raise AirflowFailException(reason)
+
+    details: dict[str, Any] = {"suite": suite, "shard": f"{shard_index}/{shard_count}", "partial_path": str(partial_path)}
+    details["step_cache"] = _store_cached_step(cache, task_id, step, {partial_path.name: partial_path}, conf["run_name"])
+    details["force_rebuild"] = conf["force_rebuild"]
+    _write_audit(context, task_id, "validated", details)
+
+
+def produce_eval_artifacts(**context: Any) -> None:
+    """Merge the per-suite shard partials into the category and hard-case artifacts."""
+    from step_cache import detach_links  # pylint: disable=import-outside-toplevel
+
+    conf = _dag_conf(context)
+    _require_fields(
+        conf,
+        ["run_name", "domain_categories_path", "retention_categories_path", "hard_cases_path"],
+        "produce_eval_artifacts",
+    )
+    run_dir = RUNS_DIR / conf["run_name"]
+    if not run_dir.is_dir():
+        raise AirflowFailException(f"run_dir not found before eval artifact production: {run_dir}")
+
+    partials = [
+        _eval_partial_path(run_dir, suite, shard_index, EVAL_SHARDS)
+        for suite in EVAL_SUITES
+        for shard_index in range(EVAL_SHARDS)
+    ]
+    missing_partials = [str(path) for path in partials if not path.is_file()]
+    if missing_partials:
+        reason = f"Expected eval partials not found: {', '.join(missing_partials)}"
+        _write_audit(context, "produce_eval_artifacts", "failed_artifact_validation", {"reason": reason})
+        raise AirflowFailException(reason)
 
     artifacts = {
         "domain_categories_path": Path(conf["domain_categories_path"]),
         "retention_categories_path": Path(conf["retention_categories_path"]),
         "hard_cases_path": Path(conf["hard_cases_path"]),
     }
+    detach_links(artifacts.values())
+    command = [
+        sys.executable,
+        str(SCRIPTS_DIR / "produce_eval_artifacts.py"),
+        "--run-name",
+        conf["run_name"],
+        "--merge-partials",
+        *[str(path) for path in partials],
+        "--domain-output",
+        conf["domain_categories_path"],
+        "--retention-output",
+        conf["retention_categories_path"],
+        "--hard-cases-output",
+        conf["hard_cases_path"],
+    ]
+    _run_shell(context, "produce_eval_artifacts", command)
+
     missing = [name for name, path in artifacts.items() if not path.is_file()]
     if missing:
         reason = f"Expected eval artifacts not found: {', '.join(missing)}"
         _write_audit(context, "produce_eval_artifacts", "failed_artifact_validation", {"reason": reason})
         raise AirflowFailException(reason)
 
-    _write_audit(
-        context,
-        "produce_eval_artifacts",
-        "validated",
-        {name: str(path) for name, path in artifacts.items()},
-    )
+    details: dict[str, Any] = {name: str(path) for name, path in artifacts.items()}
+    details["partials"] = [str(path) for path in partials]
+    _write_audit(context, "produce_eval_artifacts", "validated", details)
 
 
 def evaluate_adapter(**context: Any) -> None:
@@ -425,6 +714,8 @@ def evaluate_adapter(**context: Any) -> None:
 
 
 def check_eval_gates(**context: Any) -> None:
+    from eval_summary_contract import validate_eval_summary  # pylint: disable=import-outside-toplevel
+
     conf = _dag_conf(context)
     summary_path = Path(conf["eval_summary_path"])
     if not summary_path.is_file():
@@ -504,7 +795,7 @@ with DAG(
     tags=["rwkv", "airflow", "training"],
     description=(
         "RWKV training lifecycle DAG: prepare_dataset -> train_adapter -> "
-        "produce_eval_artifacts -> evaluate_adapter -> release_adapter"
+        "eval shards -> produce_eval_artifacts -> evaluate_adapter -> release_adapter"
     ),
 ) as dag:
     prepare_dataset_task = PythonOperator(
@@ -523,10 +814,20 @@ with DAG(
         pool=GPU_POOL_NAME,
     )
 
+    eval_shard_tasks = [
+        PythonOperator(
+            task_id=_eval_shard_task_id(suite, shard_index),
+            python_callable=evaluate_eval_shard,
+            op_kwargs={"suite": suite, "shard_index": shard_index, "shard_count": EVAL_SHARDS},
+            pool=EVAL_POOL_NAME,
+        )
+        for suite in EVAL_SUITES
+        for shard_index in range(EVAL_SHARDS)
+    ]
+
     produce_eval_artifacts_task = PythonOperator(
         task_id="produce_eval_artifacts",
         python_callable=produce_eval_artifacts,
-        pool=GPU_POOL_NAME,
     )
 
     evaluate_adapter_task = PythonOperator(
@@ -546,5 +847,7 @@ with DAG(
     )
 
     prepare_dataset_task >> check_dataset_quality_task >> train_adapter_task
-    train_adapter_task >> produce_eval_artifacts_task >> evaluate_adapter_task
+    for eval_shard_task in eval_shard_tasks:
+        train_adapter_task >> eval_shard_task >> produce_eval_artifacts_task
+    produce_eval_artifacts_task >> evaluate_adapter_task
     evaluate_adapter_task >> check_eval_gates_task >> release_adapter_task
@@ -64,6 +64,13 @@ else
 fi
 
 airflow pools set "$AIRFLOW_GPU_POOL_NAME" "$AIRFLOW_GPU_POOL_SLOTS" "Serialize GPU-bound train/eval tasks"
+if [ "$AIRFLOW_EVAL_POOL_NAME" != "$AIRFLOW_GPU_POOL_NAME" ]; then
+  if [ -z "$AIRFLOW_EVAL_POOL_SLOTS" ]; then
+    echo "AIRFLOW_EVAL_POOL_SLOTS must be set for the dedicated eval pool $AIRFLOW_EVAL_POOL_NAME" >&2
+    exit 1
+  fi
+  airflow pools set "$AIRFLOW_EVAL_POOL_NAME" "$AIRFLOW_EVAL_POOL_SLOTS" "Parallel eval shard tasks"
+fi
 
 if [ "${AIRFLOW_CREATE_ADMIN:-1}" = "1" ] && [ "$SKIP_ADMIN_USER" = "0" ]; then
   AIRFLOW_ADMIN_USERNAME="${AIRFLOW_ADMIN_USERNAME:-airflow_admin}"
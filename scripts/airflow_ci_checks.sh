@@ -21,7 +21,17 @@ python -m py_compile \
   orchestration/airflow/dags/rwkv_train_lifecycle.py \
   scripts/produce_eval_artifacts.py \
   scripts/infer_albatross.py \
-  scripts/eval_summary_contract.py
+  scripts/eval_summary_contract.py \
+  scripts/estimate_train_resources.py \
+  scripts/inspect_binidx.py \
+  scripts/profile_env.py \
+  scripts/rwkv_state_cache.py \
+  scripts/eval_scheduler.py \
+  scripts/serve_rwkv.py \
+  scripts/inference_backends.py \
+  scripts/weights_cache.py \
+  scripts/lora_adapters.py \
+  scripts/step_cache.py
 python -m unittest discover -s tests -p "test_*.py"
 
 if command -v airflow >/dev/null 2>&1; then
@@ -26,6 +26,10 @@ AIRFLOW_DAG_ID="${AIRFLOW_DAG_ID:-rwkv_train_lifecycle}"
 AIRFLOW_VERSION="${AIRFLOW_VERSION:-2.10.5}"
 AIRFLOW_GPU_POOL_NAME="${AIRFLOW_GPU_POOL_NAME:-rwkv_gpu_pool}"
 AIRFLOW_GPU_POOL_SLOTS="${AIRFLOW_GPU_POOL_SLOTS:-1}"
+AIRFLOW_EVAL_POOL_NAME="${AIRFLOW_EVAL_POOL_NAME:-$AIRFLOW_GPU_POOL_NAME}"
+# Only used for a dedicated eval pool (AIRFLOW_EVAL_POOL_NAME != AIRFLOW_GPU_POOL_NAME).
+AIRFLOW_EVAL_POOL_SLOTS="${AIRFLOW_EVAL_POOL_SLOTS:-}"
+AIRFLOW_EVAL_SHARDS="${AIRFLOW_EVAL_SHARDS:-1}"
 AIRFLOW_SUPPORTED_PYTHON_MIN="${AIRFLOW_SUPPORTED_PYTHON_MIN:-3.9}"
 AIRFLOW_SUPPORTED_PYTHON_MAX="${AIRFLOW_SUPPORTED_PYTHON_MAX:-3.12}"
 AIRFLOW_WEBSERVER_CONFIG_FILE="${AIRFLOW_WEBSERVER_CONFIG_FILE:-$ROOT_DIR/orchestration/airflow/webserver_config.py}"
@@ -44,6 +48,9 @@ export AIRFLOW_DAG_ID
 export AIRFLOW_VERSION
 export AIRFLOW_GPU_POOL_NAME
 export AIRFLOW_GPU_POOL_SLOTS
+export AIRFLOW_EVAL_POOL_NAME
+export AIRFLOW_EVAL_POOL_SLOTS
+export AIRFLOW_EVAL_SHARDS
 export CUDA_HOME
 if [ -d "$CUDA_HOME/bin" ]; then
   export PATH="$CUDA_HOME/bin:$PATH"
@@ -135,6 +135,7 @@ parser.add_argument("--model", required=True)
 parser.add_argument("--prompt", required=True)
 parser.add_argument("--output-json", required=True)
 parser.add_argument("--tokens", type=int, default=0)
+parser.add_argument("--stop", action="append", default=[])
 args = parser.parse_args()
 
 prompt = args.prompt
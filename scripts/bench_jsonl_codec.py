@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Benchmark end-to-end JSONL throughput of dataset scripts for every available JSON codec."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+import build_1c_multisource_core_corpus
+import build_identity_hotfix_dataset
+import build_repo_family_trusted_corpus
+import check_dataset_quality
+import dataset_lifecycle
+import jsonl_codec
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure JSONL read/write throughput per script and codec.")
+    parser.add_argument("--input", help="Canonical JSONL to benchmark. Defaults to a synthetic corpus.")
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic corpus size when --input is omitted.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions; the best run is reported.")
+    parser.add_argument("--seed", type=int, default=20260304, help="Synthetic corpus seed.")
+    parser.add_argument(
+        "--codec",
+        action="append",
+        default=None,
+        help="Codec to benchmark (orjson|msgspec|json). Repeat for several. Defaults to all installed.",
+    )
+    parser.add_argument("--output-json", help="Optional path for the machine-readable benchmark report.")
+    return parser.parse_args()
+
+
+def synthetic_rows(count: int, seed: int) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    rows: list[dict[str, Any]] = []
+    for index in range(count):
+        body_lines = [f"    Значение{line} = Запрос.Выполнить().Выгрузить(); // шаг {rng.randint(0, 999)}" for line in range(rng.randint(3, 40))]
+        rows.append(
+            dataset_lifecycle.build_canonical_row(
+                user_prompt=f"Напиши процедуру ОбработкаДанных{index} в 1С.",
+                assistant_response="Процедура ОбработкаДанных()\n" + "\n".join(body_lines) + "\nКонецПроцедуры",
+                metadata={
+                    "source": "bench-synthetic",
+                    "license": "internal",
+                    "origin_ref": f"local://bench/{index}",
+                    "contour": "core",
+                    "segment": "onec_bsl",
+                    "split": "train",
+                },
+            )
+        )
+    return rows
+
+
+def legacy_write(path: Path, payloads: list[Any]) -> None:
+    with path.open("w", encoding="utf-8") as handle:
+        for payload in payloads:
+            handle.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+
+def sha256_path(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def best_of(repeat: int, action: Callable[[], Any]) -> float:
+    timings: list[float] = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run_benchmarks(input_path: Path, workdir: Path, repeat: int) -> dict[str, dict[str, Any]]:
+    input_bytes = input_path.stat().st_size
+    rows = dataset_lifecycle.load_canonical_rows(input_path)
+    texts = [row["text"] for row in rows]
+    samples = [
+        build_repo_family_trusted_corpus.Sample(row["user_prompt"], row["assistant_response"], row["metadata"])
+        for row in rows
+    ]
+    text_jsonl = workdir / "text.jsonl"
+    build_identity_hotfix_dataset.write_jsonl(text_jsonl, texts)
+    text_bytes = text_jsonl.stat().st_size
+
+    canonical_out = workdir / "canonical.out.jsonl"
+    repo_family_out = workdir / "repo_family.out.jsonl"
+    identity_out = workdir / "identity.out.jsonl"
+    cases: dict[str, tuple[Callable[[], Any], int]] = {
+        "dataset_lifecycle.load_canonical_rows": (
+            lambda: dataset_lifecycle.load_canonical_rows(input_path),
+            input_bytes,
+        ),
+        "build_1c_multisource_core_corpus.read_jsonl": (
+            lambda: build_1c_multisource_core_corpus.read_jsonl(input_path),
+            input_bytes,
+        ),
+        "check_dataset_quality.load_rows": (
+            lambda: check_dataset_quality.load_rows(text_jsonl),
+            text_bytes,
+        ),
+        "dataset_lifecycle.write_canonical_rows": (
+            lambda: dataset_lifecycle.write_canonical_rows(canonical_out, rows),
+            input_bytes,
+        ),
+        "build_repo_family_trusted_corpus.write_jsonl": (
+            lambda: build_repo_family_trusted_corpus.write_jsonl(repo_family_out, samples),
+            input_bytes,
+        ),
+        "build_identity_hotfix_dataset.write_jsonl": (
+            lambda: build_identity_hotfix_dataset.write_jsonl(identity_out, texts),
+            text_bytes,
+        ),
+    }
+    results: dict[str, dict[str, Any]] = {}
+    for name, (action, payload_bytes) in cases.items():
+        seconds = best_of(repeat, action)
+        results[name] = {
+            "seconds": round(seconds, 6),
+            "mb_per_sec": round(payload_bytes / (1024 * 1024) / seconds, 3) if seconds > 0 else None,
+            "rows_per_sec": round(len(rows) / seconds, 1) if seconds > 0 else None,
+        }
+
+    legacy_canonical = workdir / "canonical.legacy.jsonl"
+    legacy_write(
+        legacy_canonical,
+        [dataset_lifecycle.build_canonical_row(row["user_prompt"], row["assistant_response"], row["metadata"]) for row in rows],
+    )
+    legacy_identity = workdir / "identity.legacy.jsonl"
+    legacy_write(legacy_identity, [{"text": text} for text in texts])
+    results["dataset_lifecycle.write_canonical_rows"]["byte_identical_to_stdlib"] = (
+        sha256_path(canonical_out) == sha256_path(legacy_canonical)
+    )
+    results["build_repo_family_trusted_corpus.write_jsonl"]["byte_identical_to_stdlib"] = (
+        sha256_path(repo_family_out) == sha256_path(legacy_canonical)
+    )
+    results["build_identity_hotfix_dataset.write_jsonl"]["byte_identical_to_stdlib"] = (
+        sha256_path(identity_out) == sha256_path(legacy_identity)
+    )
+    return results
+
+
+def main() -> int:
+    args = parse_args()
+    codecs = args.codec or jsonl_codec.available_codecs()
+    with tempfile.TemporaryDirectory(prefix="bench-jsonl-") as tmp_dir:
+        workdir = Path(tmp_dir)
+        if args.input:
+            input_path = Path(args.input).resolve()
+        else:
+            input_path = workdir / "synthetic.jsonl"
+            dataset_lifecycle.write_canonical_rows(input_path, synthetic_rows(args.rows, args.seed))
+
+        report: dict[str, Any] = {
+            "input": str(input_path) if args.input else "synthetic",
+            "input_bytes": input_path.stat().st_size,
+            "repeat": args.repeat,
+            "codecs": {},
+        }
+        for codec in codecs:
+            jsonl_codec.configure_codec(codec)
+            report["codecs"][codec] = run_benchmarks(input_path, workdir, args.repeat)
+        jsonl_codec.configure_codec()
+
+    for codec, results in report["codecs"].items():
+        print(f"[{codec}]")
+        for name, payload in results.items():
+            identical = payload.get("byte_identical_to_stdlib")
+            suffix = "" if identical is None else f" byte_identical={identical}"
+            print(f"  {name}: {payload['mb_per_sec']} MB/s ({payload['seconds']}s){suffix}")
+
+    if args.output_json:
+        output_path = Path(args.output_json).resolve()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"report: {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
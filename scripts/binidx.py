@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Megatron `MMapIndexedDataset` (binidx) writer and index reader.
+
+Layout matches RWKV-PEFT `json2binidx_tool` (`--dataset-impl mmap`) and the binidx loader
+used by `train.sh --data_type binidx`:
+
+- `<prefix>.bin`: token ids of every document back to back in the header dtype;
+- `<prefix>.idx`: `MMIDIDX\\x00\\x00`, version `<Q=1>`, dtype code `<B>`, `<Q>` sizes count,
+  `<Q>` doc_idx count, then int32 sizes, int64 byte pointers and int64 doc_idx.
+
+Every document is a single item, so `doc_idx` is `0..N` exactly as json2binidx writes it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+
+INDEX_MAGIC = b"MMIDIDX\x00\x00"
+INDEX_VERSION = 1
+# Megatron dtype codes -> (name, array typecode, item size)
+DTYPES = {
+    1: ("uint8", "B", 1),
+    2: ("int8", "b", 1),
+    3: ("int16", "h", 2),
+    4: ("int32", "i", 4),
+    5: ("int64", "q", 8),
+    8: ("uint16", "H", 2),
+}
+DTYPE_CODES = {name: code for code, (name, _, _) in DTYPES.items()}
+WRITE_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+def binidx_paths(prefix: Path) -> tuple[Path, Path]:
+    return Path(f"{prefix}.bin"), Path(f"{prefix}.idx")
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def sha256_path(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(WRITE_BUFFER_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BinidxWriter:
+    """Stream documents into `<prefix>.bin` and write the matching `.idx` on `finalize`."""
+
+    def __init__(self, prefix: Path, dtype: str = "uint16") -> None:
+        if dtype not in DTYPE_CODES:
+            raise ValueError(f"Unsupported binidx dtype: {dtype} (expected {'|'.join(sorted(DTYPE_CODES))})")
+        self.prefix = Path(prefix)
+        self.dtype = dtype
+        self.dtype_code = DTYPE_CODES[dtype]
+        _, self.typecode, self.itemsize = DTYPES[self.dtype_code]
+        self.bin_path, self.idx_path = binidx_paths(self.prefix)
+        self.bin_path.parent.mkdir(parents=True, exist_ok=True)
+        self.sizes = array("i")
+        self.tokens_total = 0
+        self._bin_digest = hashlib.sha256()
+        self._handle = self.bin_path.open("wb", buffering=WRITE_BUFFER_BYTES)
+
+    def encode_tokens(self, tokens: list[int]) -> bytes:
+        try:
+            return _little_endian(array(self.typecode, tokens))
+        except OverflowError as exc:
+            raise ValueError(f"token id does not fit binidx dtype {self.dtype}") from exc
+
+    def add_document_bytes(self, payload: bytes) -> None:
+        """Append one document already encoded as little-endian items of the writer dtype."""
+        if len(payload) % self.itemsize:
+            raise ValueError("binidx document payload is not aligned to the dtype item size")
+        self._handle.write(payload)
+        self._bin_digest.update(payload)
+        count = len(payload) // self.itemsize
+        self.sizes.append(count)
+        self.tokens_total += count
+
+    def add_document(self, tokens: list[int]) -> None:
+        self.add_document_bytes(self.encode_tokens(tokens))
+
+    def finalize(self) -> dict[str, Any]:
+        self._handle.close()
+        documents = len(self.sizes)
+        pointers = array("q")
+        address = 0
+        for size in self.sizes:
+            pointers.append(address)
+            address += size * self.itemsize
+        doc_idx = array("q", range(documents + 1))
+        with self.idx_path.open("wb") as handle:
+            handle.write(INDEX_MAGIC)
+            handle.write(struct.pack("<Q", INDEX_VERSION))
+            handle.write(struct.pack("<B", self.dtype_code))
+            handle.write(struct.pack("<Q", documents))
+            handle.write(struct.pack("<Q", len(doc_idx)))
+            handle.write(_little_endian(self.sizes))
+            handle.write(_little_endian(pointers))
+            handle.write(_little_endian(doc_idx))
+        return {
+            "data_prefix": str(self.prefix),
+            "dtype": self.dtype,
+            "documents": documents,
+            "tokens_total": self.tokens_total,
+            "bin": {
+                "path": str(self.bin_path),
+                "bytes": self.tokens_total * self.itemsize,
+                "sha256": self._bin_digest.hexdigest(),
+            },
+            "idx": {
+                "path": str(self.idx_path),
+                "bytes": self.idx_path.stat().st_size,
+                "sha256": sha256_path(self.idx_path),
+            },
+        }
+
+
+@dataclass
+class BinidxIndex:
+    dtype: str
+    itemsize: int
+    sizes: array
+    pointers: array
+    doc_idx: array
+
+
+def read_binidx_index(idx_path: Path) -> BinidxIndex:
+    payload = Path(idx_path).read_bytes()
+    header_size = len(INDEX_MAGIC) + 8 + 1 + 8 + 8
+    if len(payload) < header_size or payload[: len(INDEX_MAGIC)] != INDEX_MAGIC:
+        raise ValueError(f"binidx_invalid_magic: {idx_path}")
+    offset = len(INDEX_MAGIC)
+    (version,) = struct.unpack_from("<Q", payload, offset)
+    (dtype_code,) = struct.unpack_from("<B", payload, offset + 8)
+    sizes_count, doc_count = struct.unpack_from("<QQ", payload, offset + 9)
+    if version != INDEX_VERSION:
+        raise ValueError(f"binidx_unsupported_version={version}: {idx_path}")
+    if dtype_code not in DTYPES:
+        raise ValueError(f"binidx_unsupported_dtype_code={dtype_code}: {idx_path}")
+    expected = header_size + sizes_count * 4 + sizes_count * 8 + doc_count * 8
+    if len(payload) != expected:
+        raise ValueError(f"binidx_index_size_mismatch: expected {expected} bytes, found {len(payload)}")
+
+    def take(typecode: str, start: int, count: int) -> array:
+        values = array(typecode)
+        values.frombytes(payload[start : start + count * values.itemsize])
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    sizes = take("i", header_size, sizes_count)
+    pointers = take("q", header_size + sizes_count * 4, sizes_count)
+    doc_idx = take("q", header_size + sizes_count * 12, doc_count)
+    name, _, itemsize = DTYPES[dtype_code]
+    return BinidxIndex(dtype=name, itemsize=itemsize, sizes=sizes, pointers=pointers, doc_idx=doc_idx)
+
+
+def read_document(bin_path: Path, index: BinidxIndex, document: int) -> list[int]:
+    typecode = next(code for name, code, _ in DTYPES.values() if name == index.dtype)
+    with Path(bin_path).open("rb") as handle:
+        handle.seek(index.pointers[document])
+        values = array(typecode)
+        values.frombytes(handle.read(index.sizes[document] * index.itemsize))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
@@ -4,21 +4,35 @@
 from __future__ import annotations
 
 import argparse
-import hashlib
 import json
 import random
 import re
 import sys
+from array import array
+from bisect import bisect_left
+from contextlib import ExitStack
 from dataclasses import dataclass
+from itertools import accumulate
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator, TypeVar, Union
 
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
-from dataset_lifecycle import build_canonical_row, load_canonical_rows, validate_canonical_row
+from dataset_lifecycle import build_canonical_row, parse_canonical_or_legacy_row, validate_canonical_row
+from jsonl_codec import WRITE_BUFFER_BYTES, decode_json
+from jsonl_index import JsonlLineIndex
+from rwkv_tokenizer import RwkvTokenizer, load_token_counts, resolve_vocab_path, save_token_counts
+from segment_interleave import (
+    INTERLEAVE_STRATEGIES,
+    ROUND_ROBIN_STRATEGY,
+    SegmentOrderDigest,
+    require_numpy,
+    round_robin_interleave,
+    weighted_interleave,
+)
 
 
 METHOD_PATTERN = re.compile(
@@ -33,6 +47,7 @@ USER_ASSISTANT_PATTERN = re.compile(
 )
 
 EOT_TOKEN = "<|endoftext|>"
+T = TypeVar("T")
 SEGMENT_ORDER = ("onec_bsl", "coding_general", "ru_identity")
 
 
@@ -100,6 +115,29 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--output-text", required=True, help="Output train text path.")
     parser.add_argument("--report-output", required=True, help="Output release report JSON path.")
     parser.add_argument("--seed", type=int, default=20260304, help="Deterministic shuffle seed.")
+    parser.add_argument(
+        "--mix-unit",
+        choices=("rows", "tokens"),
+        default="rows",
+        help="Unit for profile mix ratios and volume targets: row counts or RWKV tokens of formatted samples.",
+    )
+    parser.add_argument(
+        "--tokenizer-vocab",
+        default=None,
+        help="rwkv_vocab_v20230424.txt for token accounting (default: $RWKV_TOKENIZER_VOCAB or RWKV-PEFT copy).",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=None,
+        help="Explicit total token budget for --mix-unit tokens (default: smallest budget reaching target_min_mb).",
+    )
+    parser.add_argument(
+        "--interleave",
+        choices=sorted(INTERLEAVE_STRATEGIES),
+        default="round_robin",
+        help="Segment interleave engine: legacy shuffled round-robin or NumPy stratified spreading by mix share.",
+    )
     parser.add_argument(
         "--hard-min-mb",
         type=int,
@@ -149,21 +187,24 @@ def extract_methods_from_text(source: str) -> list[OneCMethod]:
     return methods
 
 
+def collect_module_methods(path: Path) -> list[OneCMethod]:
+    module_type = infer_module_type(path)
+    return [
+        OneCMethod(
+            name=row.name,
+            kind=row.kind,
+            body=row.body,
+            module_path=str(path),
+            module_type=module_type,
+        )
+        for row in extract_methods_from_text(path.read_text(encoding="utf-8", errors="ignore"))
+    ]
+
+
 def collect_onec_methods(root: Path) -> list[OneCMethod]:
     methods: list[OneCMethod] = []
     for path in sorted(root.rglob("*.bsl")):
-        extracted = extract_methods_from_text(path.read_text(encoding="utf-8", errors="ignore"))
-        module_type = infer_module_type(path)
-        for row in extracted:
-            methods.append(
-                OneCMethod(
-                    name=row.name,
-                    kind=row.kind,
-                    body=row.body,
-                    module_path=str(path),
-                    module_type=module_type,
-                )
-            )
+        methods.extend(collect_module_methods(path))
     return methods
 
 
@@ -251,101 +292,257 @@ def parse_instruction_output(payload: dict[str, Any]) -> tuple[str, str]:
     raise ValueError("Unsupported sample format: expected instruction/output or text")
 
 
-def load_segment_samples(
+def iter_indexed_canonical_rows(
+    index: JsonlLineIndex,
+    ordinals: Iterable[int],
+) -> Iterator[tuple[int, dict[str, Any]]]:
+    for ordinal in ordinals:
+        try:
+            row = parse_canonical_or_legacy_row(decode_json(index.read_line(ordinal)))
+        except ValueError as exc:
+            raise ValueError(f"{index.path}:{index.line_number(ordinal)}: {exc}") from exc
+        yield ordinal, row
+
+
+def prepared_sample(segment: str, row: dict[str, Any]) -> PreparedSample:
+    return PreparedSample(
+        segment=segment,
+        source=str(row["metadata"]["source"]),
+        text=format_sample(row["user_prompt"], row["assistant_response"]),
+        metadata=dict(row["metadata"]),
+    )
+
+
+def empty_module_type_coverage() -> dict[str, int]:
+    return {"common": 0, "manager": 0, "object": 0}
+
+
+def count_module_type(counts: dict[str, int], metadata: dict[str, Any]) -> None:
+    module_type = str(metadata.get("module_type", "")).strip()
+    if module_type in counts:
+        counts[module_type] += 1
+
+
+@dataclass
+class SegmentSizes:
+    """Per-ordinal RWKV token and UTF-8 byte lengths of the formatted samples of a segment."""
+
+    tokens: array
+    text_bytes: array
+    token_cache_hit: bool = False
+
+    def add(self, text: str, tokenizer: RwkvTokenizer | None) -> None:
+        if tokenizer is not None:
+            self.tokens.append(tokenizer.count(text))
+        self.text_bytes.append(len(text.encode("utf-8")))
+
+
+def empty_segment_sizes() -> SegmentSizes:
+    return SegmentSizes(tokens=array("I"), text_bytes=array("Q"))
+
+
+@dataclass
+class IndexedSegment:
+    """Validated JSONL segment; rows stay on disk and are formatted one at a time when written."""
+
+    segment: str
+    index: JsonlLineIndex
+    module_type_coverage: dict[str, int]
+    sizes: SegmentSizes | None = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def select(self, ordinals: list[int]) -> None:
+        return None
+
+    def sample_at(self, ordinal: int) -> PreparedSample:
+        for _, row in iter_indexed_canonical_rows(self.index, (ordinal,)):
+            return prepared_sample(self.segment, row)
+        raise IndexError(ordinal)
+
+    def close(self) -> None:
+        self.index.close()
+
+
+@dataclass
+class BslMethodSegment:
+    """onec_bsl rows extracted from `--bsl-root`, addressed as (module, method) references.
+
+    Pass one only validates and counts methods. Pass two re-extracts the modules that
+    contain selected methods, so memory holds the selected samples, not the whole tree.
+    """
+
+    bsl_root: Path
+    module_paths: list[Path]
+    refs: list[tuple[int, int]]
+    row_options: dict[str, str]
+    module_type_coverage: dict[str, int]
+    selected: dict[int, PreparedSample]
+    sizes: SegmentSizes | None = None
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+    def canonical_row(self, method: OneCMethod) -> dict[str, Any]:
+        return onec_method_to_canonical_row(
+            method,
+            self.bsl_root,
+            source=self.row_options["source"],
+            license_name=self.row_options["license_name"],
+            origin_ref=self.row_options["origin_ref"],
+            contour=self.row_options["contour"],
+        )
+
+    def select(self, ordinals: list[int]) -> None:
+        by_module: dict[int, list[tuple[int, int]]] = {}
+        for ordinal in ordinals:
+            module_index, method_index = self.refs[ordinal]
+            by_module.setdefault(module_index, []).append((method_index, ordinal))
+        for module_index in sorted(by_module):
+            methods = collect_module_methods(self.module_paths[module_index])
+            for method_index, ordinal in by_module[module_index]:
+                self.selected[ordinal] = prepared_sample("onec_bsl", self.canonical_row(methods[method_index]))
+
+    def sample_at(self, ordinal: int) -> PreparedSample:
+        return self.selected.pop(ordinal)
+
+    def close(self) -> None:
+        return None
+
+
+SegmentRows = Union[IndexedSegment, BslMethodSegment]
+
+
+def open_segment_sizes(index: JsonlLineIndex, tokenizer: RwkvTokenizer | None) -> SegmentSizes | None:
+    """Start size accounting for a JSONL segment, reusing cached token counts when the sidecar is fresh."""
+    if tokenizer is None:
+        return None
+    sizes = empty_segment_sizes()
+    cached = load_token_counts(index.path, index.sha256, tokenizer.fingerprint)
+    if cached is not None:
+        sizes.tokens = cached
+        sizes.token_cache_hit = True
+    return sizes
+
+
+def record_segment_size(sizes: SegmentSizes | None, row: dict[str, Any], tokenizer: RwkvTokenizer | None) -> None:
+    if sizes is None:
+        return
+    text = format_sample(row["user_prompt"], row["assistant_response"])
+    sizes.add(text, None if sizes.token_cache_hit else tokenizer)
+
+
+def close_segment_sizes(index: JsonlLineIndex, sizes: SegmentSizes | None, tokenizer: RwkvTokenizer | None) -> None:
+    if sizes is None or tokenizer is None or sizes.token_cache_hit:
+        return
+    save_token_counts(index.path, index.sha256, tokenizer.fingerprint, sizes.tokens)
+
+
+def index_segment_rows(
     path: Path,
     *,
     expected_segment: str,
     allowed_sources: set[str],
-) -> list[PreparedSample]:
-    rows = load_canonical_rows(path)
-    failures: list[str] = []
-    samples: list[PreparedSample] = []
-    for index, row in enumerate(rows, start=1):
-        reasons = validate_canonical_row(row)
-        if reasons:
-            failures.append(f"{path}:{index}: {','.join(reasons)}")
-            continue
-        source_reason = require_non_allowlisted_source_rationale(
-            row,
-            allowed_sources=allowed_sources,
-            path=path,
-            index=index,
-        )
-        if source_reason is not None:
-            failures.append(source_reason)
-            continue
-        samples.append(
-            PreparedSample(
-                segment=expected_segment,
-                source=str(row["metadata"]["source"]),
-                text=format_sample(row["user_prompt"], row["assistant_response"]),
-                metadata=dict(row["metadata"]),
+    tokenizer: RwkvTokenizer | None = None,
+) -> IndexedSegment:
+    index = JsonlLineIndex.open(path)
+    try:
+        sizes = open_segment_sizes(index, tokenizer)
+        failures: list[str] = []
+        for ordinal, row in iter_indexed_canonical_rows(index, range(len(index))):
+            row_number = ordinal + 1
+            reasons = validate_canonical_row(row)
+            if reasons:
+                failures.append(f"{path}:{row_number}: {','.join(reasons)}")
+                continue
+            source_reason = require_non_allowlisted_source_rationale(
+                row,
+                allowed_sources=allowed_sources,
+                path=path,
+                index=row_number,
             )
-        )
-    if failures:
-        raise ValueError("\n".join(failures))
-    return samples
+            if source_reason is not None:
+                failures.append(source_reason)
+                continue
+            record_segment_size(sizes, row, tokenizer)
+        if failures:
+            raise ValueError("\n".join(failures))
+        close_segment_sizes(index, sizes, tokenizer)
+    except BaseException:
+        index.close()
+        raise
+    return IndexedSegment(
+        segment=expected_segment,
+        index=index,
+        module_type_coverage=empty_module_type_coverage(),
+        sizes=sizes,
+    )
 
 
-def load_onec_samples(
-    methods: list[OneCMethod],
+def index_bsl_methods(
     bsl_root: Path,
     *,
     source: str,
     license_name: str,
     origin_ref: str,
     contour: str,
-) -> list[str]:
-    failures: list[str] = []
-    samples: list[PreparedSample] = []
-    for method in methods:
-        row = onec_method_to_canonical_row(
-            method,
-            bsl_root,
-            source=source,
-            license_name=license_name,
-            origin_ref=origin_ref,
-            contour=contour,
-        )
-        reasons = validate_canonical_row(row)
-        if reasons:
-            failures.append(f"{method.module_path}:{method.name}: {','.join(reasons)}")
-            continue
-        samples.append(
-            PreparedSample(
-                segment="onec_bsl",
-                source=str(row["metadata"]["source"]),
-                text=format_sample(row["user_prompt"], row["assistant_response"]),
-                metadata=dict(row["metadata"]),
-            )
-        )
-    if failures:
-        raise ValueError("\n".join(failures))
-    return samples
-
-
-def load_onec_core_samples(path: Path) -> list[PreparedSample]:
-    rows = load_canonical_rows(path)
+    tokenizer: RwkvTokenizer | None = None,
+) -> BslMethodSegment:
+    segment = BslMethodSegment(
+        bsl_root=bsl_root,
+        module_paths=[],
+        refs=[],
+        row_options={
+            "source": source,
+            "license_name": license_name,
+            "origin_ref": origin_ref,
+            "contour": contour,
+        },
+        module_type_coverage=empty_module_type_coverage(),
+        selected={},
+        sizes=None if tokenizer is None else empty_segment_sizes(),
+    )
     failures: list[str] = []
-    samples: list[PreparedSample] = []
-    for index, row in enumerate(rows, start=1):
-        reasons = validate_canonical_row(row)
-        if str(row["metadata"].get("segment", "")).strip() != "onec_bsl":
-            reasons.append("invalid_metadata.segment")
-        if reasons:
-            failures.append(f"{path}:{index}: {','.join(reasons)}")
-            continue
-        samples.append(
-            PreparedSample(
-                segment="onec_bsl",
-                source=str(row["metadata"]["source"]),
-                text=format_sample(row["user_prompt"], row["assistant_response"]),
-                metadata=dict(row["metadata"]),
-            )
-        )
+    for path in sorted(bsl_root.rglob("*.bsl")):
+        module_index = len(segment.module_paths)
+        segment.module_paths.append(path)
+        for method_index, method in enumerate(collect_module_methods(path)):
+            row = segment.canonical_row(method)
+            reasons = validate_canonical_row(row)
+            if reasons:
+                failures.append(f"{method.module_path}:{method.name}: {','.join(reasons)}")
+                continue
+            segment.refs.append((module_index, method_index))
+            count_module_type(segment.module_type_coverage, row["metadata"])
+            record_segment_size(segment.sizes, row, tokenizer)
     if failures:
         raise ValueError("\n".join(failures))
-    return samples
+    return segment
+
+
+def index_onec_core_rows(path: Path, tokenizer: RwkvTokenizer | None = None) -> IndexedSegment:
+    index = JsonlLineIndex.open(path)
+    try:
+        sizes = open_segment_sizes(index, tokenizer)
+        failures: list[str] = []
+        module_type_coverage = empty_module_type_coverage()
+        for ordinal, row in iter_indexed_canonical_rows(index, range(len(index))):
+            reasons = validate_canonical_row(row)
+            if str(row["metadata"].get("segment", "")).strip() != "onec_bsl":
+                reasons.append("invalid_metadata.segment")
+            if reasons:
+                failures.append(f"{path}:{ordinal + 1}: {','.join(reasons)}")
+                continue
+            count_module_type(module_type_coverage, row["metadata"])
+            record_segment_size(sizes, row, tokenizer)
+        if failures:
+            raise ValueError("\n".join(failures))
+        close_segment_sizes(index, sizes, tokenizer)
+    except BaseException:
+        index.close()
+        raise
+    return IndexedSegment(segment="onec_bsl", index=index, module_type_coverage=module_type_coverage, sizes=sizes)
 
 
 def validate_profile(profile: dict[str, Any]) -> None:
@@ -383,42 +580,114 @@ def pick_counts(available: dict[str, int], mix: dict[str, Any]) -> dict[str, int
     return counts
 
 
+def pick_token_selection(
+    sizes: dict[str, SegmentSizes],
+    mix: dict[str, Any],
+    rng: random.Random,
+    *,
+    target_bytes: int,
+    token_budget: int | None = None,
+) -> tuple[dict[str, list[int]], int]:
+    """Choose row ordinals so every segment gets `mix` share of one total RWKV token budget.
+
+    Each segment is walked in a seeded random order and takes the shortest prefix whose
+    tokens reach `ratio * budget`. Without an explicit budget, the smallest budget whose
+    formatted text reaches `target_bytes` is found by bisection over prefix sums, capped by
+    the largest budget every segment can still cover.
+    """
+    ratios = {key: float(mix[key]) for key in SEGMENT_ORDER}
+    orders: dict[str, list[int]] = {}
+    token_prefix: dict[str, list[int]] = {}
+    byte_prefix: dict[str, list[int]] = {}
+    for key in SEGMENT_ORDER:
+        if ratios[key] <= 0:
+            raise ValueError(f"Mix ratio must be > 0 for segment '{key}'")
+        order = list(range(len(sizes[key].tokens)))
+        rng.shuffle(order)
+        orders[key] = order
+        token_prefix[key] = [0, *accumulate(sizes[key].tokens[ordinal] for ordinal in order)]
+        byte_prefix[key] = [0, *accumulate(sizes[key].text_bytes[ordinal] for ordinal in order)]
+        if token_prefix[key][-1] <= 0:
+            raise ValueError(f"No samples available for segment '{key}'")
+
+    def take_counts(budget: int) -> dict[str, int]:
+        return {key: bisect_left(token_prefix[key], ratios[key] * budget) for key in SEGMENT_ORDER}
+
+    def selected_bytes(budget: int) -> int:
+        return sum(byte_prefix[key][count] for key, count in take_counts(budget).items())
+
+    max_budget = min(int(token_prefix[key][-1] / ratios[key]) for key in SEGMENT_ORDER)
+    if token_budget is not None:
+        budget = min(int(token_budget), max_budget)
+    elif selected_bytes(max_budget) <= target_bytes:
+        budget = max_budget
+    else:
+        low, high = 0, max_budget
+        while low < high:
+            middle = (low + high) // 2
+            if selected_bytes(middle) >= target_bytes:
+                high = middle
+            else:
+                low = middle + 1
+        budget = low
+
+    counts = take_counts(budget)
+    if any(count <= 0 for count in counts.values()):
+        raise ValueError("Unable to allocate release set: token budget too small for mix")
+    return {key: orders[key][: counts[key]] for key in SEGMENT_ORDER}, budget
+
+
+def sum_selected_tokens(sizes: SegmentSizes, ordinals: list[int]) -> int:
+    tokens = sizes.tokens
+    return sum(tokens[ordinal] for ordinal in ordinals)
+
+
 def interleave_segments(
-    segment_samples: dict[str, list[PreparedSample]],
+    segment_samples: dict[str, list[T]],
     rng: random.Random,
-) -> list[PreparedSample]:
-    buckets = {name: list(rows) for name, rows in segment_samples.items()}
-    for rows in buckets.values():
-        rng.shuffle(rows)
-
-    mixed: list[PreparedSample] = []
-    while any(buckets.values()):
-        active = [name for name in SEGMENT_ORDER if buckets[name]]
-        rng.shuffle(active)
-        for name in active:
-            mixed.append(buckets[name].pop())
-    return mixed
-
-
-def validate_sample_format(rows: list[str]) -> dict[str, int]:
-    invalid_missing_eot = 0
-    invalid_missing_headers = 0
-    raw_json_objects = 0
-    for row in rows:
-        text = row.strip()
-        if RAW_JSON_PATTERN.match(text):
-            raw_json_objects += 1
-        if not text.endswith(EOT_TOKEN):
-            invalid_missing_eot += 1
-        if "Instruction:" not in text or "Response:" not in text:
-            invalid_missing_headers += 1
+) -> list[T]:
+    return round_robin_interleave(segment_samples, SEGMENT_ORDER, rng)
+
+
+def build_mix_order(
+    selected: dict[str, list[int]],
+    rng: random.Random,
+    strategy: str,
+) -> list[tuple[str, int]]:
+    if strategy == "weighted":
+        names, ordinals = weighted_interleave(selected, SEGMENT_ORDER, rng.getrandbits(64))
+        return list(zip(names, ordinals))
+    return interleave_segments(
+        {name: [(name, ordinal) for ordinal in ordinals] for name, ordinals in selected.items()},
+        rng,
+    )
+
+
+def empty_format_stats() -> dict[str, int]:
     return {
-        "invalid_missing_eot": invalid_missing_eot,
-        "invalid_missing_headers": invalid_missing_headers,
-        "raw_json_objects": raw_json_objects,
+        "invalid_missing_eot": 0,
+        "invalid_missing_headers": 0,
+        "raw_json_objects": 0,
     }
 
 
+def update_format_stats(stats: dict[str, int], row: str) -> None:
+    text = row.strip()
+    if RAW_JSON_PATTERN.match(text):
+        stats["raw_json_objects"] += 1
+    if not text.endswith(EOT_TOKEN):
+        stats["invalid_missing_eot"] += 1
+    if "Instruction:" not in text or "Response:" not in text:
+        stats["invalid_missing_headers"] += 1
+
+
+def validate_sample_format(rows: Iterable[str]) -> dict[str, int]:
+    stats = empty_format_stats()
+    for row in rows:
+        update_format_stats(stats, row)
+    return stats
+
+
 def validate_mix(counts: dict[str, int], mix: dict[str, Any]) -> list[str]:
     total = sum(counts.values())
     tolerance = float(mix["tolerance_pp"]) / 100.0
@@ -440,31 +709,49 @@ def calculate_actual_mix(counts: dict[str, int]) -> dict[str, float]:
     return {key: round(counts[key] / total, 6) for key in SEGMENT_ORDER}
 
 
-def calculate_module_type_coverage(samples: list[PreparedSample]) -> dict[str, int]:
-    counts = {"common": 0, "manager": 0, "object": 0}
+def calculate_module_type_coverage(samples: list[PreparedSample] | SegmentRows) -> dict[str, int]:
+    if isinstance(samples, (IndexedSegment, BslMethodSegment)):
+        return dict(samples.module_type_coverage)
+    counts = empty_module_type_coverage()
     for sample in samples:
-        module_type = str(sample.metadata.get("module_type", "")).strip()
-        if module_type in counts:
-            counts[module_type] += 1
+        count_module_type(counts, sample.metadata)
     return counts
 
 
-def build_shuffle_report(samples: list[PreparedSample], seed: int) -> dict[str, Any]:
-    segment_order = [sample.segment for sample in samples]
-    preview = segment_order[: min(16, len(segment_order))]
-    switches = sum(
-        1 for previous, current in zip(segment_order, segment_order[1:]) if previous != current
-    )
-    digest = hashlib.sha256("\n".join(segment_order).encode("utf-8")).hexdigest()
+def build_shuffle_report(
+    segment_order: Iterable[str] | SegmentOrderDigest,
+    seed: int,
+    strategy: str = ROUND_ROBIN_STRATEGY,
+) -> dict[str, Any]:
+    digest = segment_order if isinstance(segment_order, SegmentOrderDigest) else SegmentOrderDigest().extend(segment_order)
     return {
-        "strategy": "segment_interleave_shuffle",
+        "strategy": strategy,
         "seed": seed,
-        "segment_order_preview": preview,
-        "segment_switches": switches,
-        "segment_order_sha256": digest,
+        "segment_order_preview": digest.preview,
+        "segment_switches": digest.switches,
+        "segment_order_sha256": digest.hexdigest(),
     }
 
 
+def write_mixed_text(
+    path: Path,
+    mixed: list[tuple[str, int]],
+    segments: dict[str, SegmentRows],
+    order_digest: SegmentOrderDigest | None = None,
+) -> dict[str, int]:
+    """Stream formatted samples to `path` in mix order and return the format gate stats."""
+    stats = empty_format_stats()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES) as handle:
+        for name, ordinal in mixed:
+            text = segments[name].sample_at(ordinal).text
+            update_format_stats(stats, text)
+            if order_digest is not None:
+                order_digest.update(name)
+            handle.write(text)
+    return stats
+
+
 def write_report(path: Path, report: dict[str, Any]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
@@ -480,70 +767,103 @@ def main() -> int:
     output_text = Path(args.output_text).resolve()
     report_path = Path(args.report_output).resolve()
 
+    if args.interleave == "weighted":
+        require_numpy()
+    if args.token_budget is not None and args.mix_unit != "tokens":
+        raise ValueError("--token-budget requires --mix-unit tokens")
+    tokenizer = (
+        RwkvTokenizer(resolve_vocab_path(args.tokenizer_vocab))
+        if args.mix_unit == "tokens" or args.tokenizer_vocab
+        else None
+    )
     profile = read_json(profile_path)
     validate_profile(profile)
     source_allowlist = build_source_allowlist(profile)
 
-    if onec_core_jsonl is not None:
-        if bsl_root is not None:
-            raise ValueError("Use either --bsl-root or --onec-core-jsonl, not both")
-        onec_samples = load_onec_core_samples(onec_core_jsonl)
-    else:
-        missing = [
-            flag
-            for flag, value in (
-                ("--bsl-root", bsl_root),
-                ("--bsl-source", args.bsl_source),
-                ("--bsl-license", args.bsl_license),
-                ("--bsl-origin-ref", args.bsl_origin_ref),
-                ("--bsl-contour", args.bsl_contour),
+    # Segment indexes keep an mmap and a file handle open until every selected row is written.
+    with ExitStack() as segments_open:
+        if onec_core_jsonl is not None:
+            if bsl_root is not None:
+                raise ValueError("Use either --bsl-root or --onec-core-jsonl, not both")
+            onec_samples = index_onec_core_rows(onec_core_jsonl, tokenizer)
+        else:
+            missing = [
+                flag
+                for flag, value in (
+                    ("--bsl-root", bsl_root),
+                    ("--bsl-source", args.bsl_source),
+                    ("--bsl-license", args.bsl_license),
+                    ("--bsl-origin-ref", args.bsl_origin_ref),
+                    ("--bsl-contour", args.bsl_contour),
+                )
+                if value is None
+            ]
+            if missing:
+                raise ValueError(f"Missing required BSL input arguments: {', '.join(missing)}")
+            onec_samples = index_bsl_methods(
+                bsl_root,
+                source=str(args.bsl_source),
+                license_name=str(args.bsl_license),
+                origin_ref=str(args.bsl_origin_ref),
+                contour=str(args.bsl_contour),
+                tokenizer=tokenizer,
             )
-            if value is None
-        ]
-        if missing:
-            raise ValueError(f"Missing required BSL input arguments: {', '.join(missing)}")
-        methods = collect_onec_methods(bsl_root)
-        onec_samples = load_onec_samples(
-            methods,
-            bsl_root,
-            source=str(args.bsl_source),
-            license_name=str(args.bsl_license),
-            origin_ref=str(args.bsl_origin_ref),
-            contour=str(args.bsl_contour),
+        segments_open.callback(onec_samples.close)
+        coding_samples = index_segment_rows(
+            coding_jsonl,
+            expected_segment="coding_general",
+            allowed_sources=source_allowlist.get("coding_general", set()),
+            tokenizer=tokenizer,
         )
-    coding_samples = load_segment_samples(
-        coding_jsonl,
-        expected_segment="coding_general",
-        allowed_sources=source_allowlist.get("coding_general", set()),
-    )
-    ru_samples = load_segment_samples(
-        ru_jsonl,
-        expected_segment="ru_identity",
-        allowed_sources=source_allowlist.get("ru_identity", set()),
-    )
-    available = {
-        "onec_bsl": len(onec_samples),
-        "coding_general": len(coding_samples),
-        "ru_identity": len(ru_samples),
-    }
-
-    rng = random.Random(args.seed)
-    counts = pick_counts(available, profile["mix"])
-    selected = {
-        "onec_bsl": rng.sample(onec_samples, counts["onec_bsl"]),
-        "coding_general": rng.sample(coding_samples, counts["coding_general"]),
-        "ru_identity": rng.sample(ru_samples, counts["ru_identity"]),
-    }
-    mixed = interleave_segments(selected, rng)
-
-    output_text.parent.mkdir(parents=True, exist_ok=True)
-    output_text.write_text("".join(sample.text for sample in mixed), encoding="utf-8")
-
-    format_stats = validate_sample_format([sample.text for sample in mixed])
-    mix_reasons = validate_mix(counts, profile["mix"])
+        segments_open.callback(coding_samples.close)
+        ru_samples = index_segment_rows(
+            ru_jsonl,
+            expected_segment="ru_identity",
+            allowed_sources=source_allowlist.get("ru_identity", set()),
+            tokenizer=tokenizer,
+        )
+        segments_open.callback(ru_samples.close)
+        segments: dict[str, SegmentRows] = {
+            "onec_bsl": onec_samples,
+            "coding_general": coding_samples,
+            "ru_identity": ru_samples,
+        }
+        available = {name: len(segments[name]) for name in SEGMENT_ORDER}
+
+        # Pass two: the seeded RNG picks row ordinals and their interleaved order exactly as
+        # `rng.sample`/`interleave_segments` did over in-memory rows; only then are rows formatted.
+        rng = random.Random(args.seed)
+        token_budget: int | None = None
+        if args.mix_unit == "tokens":
+            selected, token_budget = pick_token_selection(
+                {name: segments[name].sizes for name in SEGMENT_ORDER},
+                profile["mix"],
+                rng,
+                target_bytes=int(profile["volume"]["target_min_mb"]) * 1024 * 1024,
+                token_budget=args.token_budget,
+            )
+            counts = {name: len(selected[name]) for name in SEGMENT_ORDER}
+        else:
+            counts = pick_counts(available, profile["mix"])
+            selected = {name: rng.sample(range(available[name]), counts[name]) for name in SEGMENT_ORDER}
+        token_counts = None
+        if tokenizer is not None:
+            token_counts = {
+                "available": {name: sum(segments[name].sizes.tokens) for name in SEGMENT_ORDER},
+                "selected": {name: sum_selected_tokens(segments[name].sizes, selected[name]) for name in SEGMENT_ORDER},
+            }
+            token_counts["actual_mix"] = calculate_actual_mix(token_counts["selected"])
+        for name in SEGMENT_ORDER:
+            segments[name].select(selected[name])
+        mixed = build_mix_order(selected, rng, args.interleave)
+
+        order_digest = SegmentOrderDigest()
+        format_stats = write_mixed_text(output_text, mixed, segments, order_digest)
+    mix_counts = token_counts["selected"] if args.mix_unit == "tokens" else counts
+    mix_reasons = validate_mix(mix_counts, profile["mix"])
     actual_mix = calculate_actual_mix(counts)
     module_type_counts = calculate_module_type_coverage(onec_samples)
-    shuffle_report = build_shuffle_report(mixed, args.seed)
+    shuffle_report = build_shuffle_report(order_digest, args.seed, INTERLEAVE_STRATEGIES[args.interleave])
 
     reasons: list[str] = []
     for key, value in module_type_counts.items():
@@ -581,6 +901,7 @@ def main() -> int:
             "actual_mix": actual_mix,
             "module_type_coverage": module_type_counts,
         },
+        "mix_unit": args.mix_unit,
         "shuffle": shuffle_report,
         "gates": {
             "format": format_stats,
@@ -591,6 +912,17 @@ def main() -> int:
         "quality_status": "PASS" if not reasons else "FAIL",
         "quality_reasons": reasons or ["quality gates passed"],
     }
+    if token_counts is not None:
+        report["counts"]["tokens"] = {
+            **token_counts,
+            "token_budget": token_budget,
+            "tokenizer_vocab": str(tokenizer.vocab_path),
+            "tokenizer_fingerprint": tokenizer.fingerprint,
+            "count_backend": tokenizer.count_backend or "cache",
+            "count_cache_hits": {
+                name: bool(segments[name].sizes.token_cache_hit) for name in SEGMENT_ORDER
+            },
+        }
     write_report(report_path, report)
 
     print(f"output: {output_text}")
@@ -27,6 +27,7 @@ from dataset_lifecycle import (
     validate_canonical_row,
     write_canonical_rows,
 )
+from jsonl_codec import iter_jsonl
 
 
 METHOD_PATTERN = re.compile(
@@ -84,15 +85,10 @@ def read_json(path: Path) -> dict[str, Any]:
 
 def read_jsonl(path: Path) -> list[dict[str, Any]]:
     rows: list[dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as handle:
-        for line_number, line in enumerate(handle, start=1):
-            stripped = line.strip()
-            if not stripped:
-                continue
-            payload = json.loads(stripped)
-            if not isinstance(payload, dict):
-                raise MultiSourceError("invalid_source_row", f"{path}:{line_number}: expected JSON object")
-            rows.append(payload)
+    for line_number, payload in iter_jsonl(path):
+        if not isinstance(payload, dict):
+            raise MultiSourceError("invalid_source_row", f"{path}:{line_number}: expected JSON object")
+        rows.append(payload)
     return rows
 
 
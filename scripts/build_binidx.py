@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Tokenize JSONL or v4 plain-text releases straight into binidx (`.bin/.idx`) files.
+
+In-repo replacement for the RWKV-PEFT `json2binidx_tool` round trip used by
+`prepare_binidx.sh`:
+
+- `.jsonl` input: one document per row from the `text` key (canonical rows carry it),
+  empty texts are skipped like `preprocess_data.py` does;
+- `.txt` input: the v4 `Instruction/Response` release is split at `<|endoftext|>`, every
+  sample becomes one document and the marker is replaced by the EOD token.
+
+Documents are tokenized by a process pool and written in input order with EOD (id 0)
+appended, so the output is the `--append-eod --dataset-impl mmap` layout read by
+`train.sh --data_type binidx`. Input and artifact sha256 are computed while streaming and
+recorded in `<data_prefix>.manifest.json`. With `--token-cache` only documents missing from
+the `token_cache` are tokenized; cached payloads are copied into `.bin` unchanged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import codecs
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from binidx import DTYPE_CODES, DTYPES, BinidxWriter
+from jsonl_codec import READ_BUFFER_BYTES, decode_json
+from rwkv_tokenizer import EOD_TOKEN_ID, RwkvTokenizer, resolve_vocab_path
+from token_cache import TokenCache, document_digest, refs_name_for
+
+
+DATA_PREFIX_SUFFIX = "_text_document"
+MANIFEST_SUFFIX = ".manifest.json"
+EOT_MARKER = "<|endoftext|>"
+INPUT_FORMATS = ("auto", "jsonl", "text")
+DEFAULT_CHUNKSIZE = 64
+
+_worker_tokenizer: RwkvTokenizer | None = None
+_worker_typecode = "H"
+
+
+def _init_worker(vocab_path: str, typecode: str) -> None:
+    global _worker_tokenizer, _worker_typecode  # pylint: disable=global-statement
+    _worker_tokenizer = RwkvTokenizer(Path(vocab_path))
+    _worker_typecode = typecode
+
+
+def encode_document(text: str) -> bytes:
+    """Token ids of `text` plus EOD as little-endian bytes; empty documents yield `b""`."""
+    assert _worker_tokenizer is not None
+    tokens = _worker_tokenizer.encode(text)
+    if not tokens:
+        return b""
+    tokens.append(EOD_TOKEN_ID)
+    try:
+        values = array(_worker_typecode, tokens)
+    except OverflowError as exc:
+        raise ValueError(f"binidx_token_overflow: token id exceeds dtype typecode {_worker_typecode}") from exc
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def encode_item(item: tuple[bytes | None, str | None]) -> tuple[bytes | None, bytes | None]:
+    """`(digest, text)` -> `(digest, payload)`; cache hits arrive without text and stay `None`."""
+    digest, text = item
+    return digest, (None if text is None else encode_document(text))
+
+
+def resolve_input_format(path: Path, requested: str) -> str:
+    if requested != "auto":
+        return requested
+    return "jsonl" if path.suffix.lower() == ".jsonl" else "text"
+
+
+def iter_jsonl_documents(path: Path, digest: Any) -> Iterator[str]:
+    with path.open("rb", buffering=READ_BUFFER_BYTES) as handle:
+        for line_number, line in enumerate(handle, start=1):
+            digest.update(line)
+            stripped = line.strip()
+            if not stripped:
+                continue
+            try:
+                payload = decode_json(stripped)
+            except ValueError as exc:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({exc})") from exc
+            text = payload.get("text") if isinstance(payload, dict) else None
+            if not isinstance(text, str):
+                raise ValueError(f"{path}:{line_number}: row has no string `text` field")
+            yield text
+
+
+def _split_at_marker(buffer: str, final: bool) -> tuple[list[str], str]:
+    # Scan with a cursor and slice the remainder once: re-slicing the buffer per document is
+    # quadratic in the number of documents per chunk.
+    documents = []
+    start = 0
+    while True:
+        position = buffer.find(EOT_MARKER, start)
+        end = position + len(EOT_MARKER)
+        # The newline after the marker belongs to the separator; wait for it unless at EOF.
+        if position < 0 or (end >= len(buffer) and not final):
+            return documents, buffer[start:]
+        documents.append(buffer[start:position])
+        start = end + 1 if buffer[end : end + 1] == "\n" else end
+
+
+def iter_text_documents(path: Path, digest: Any) -> Iterator[str]:
+    """Split a v4 release at `<|endoftext|>` (plus its trailing newline) without loading the file."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    with path.open("rb", buffering=READ_BUFFER_BYTES) as handle:
+        for chunk in iter(lambda: handle.read(READ_BUFFER_BYTES), b""):
+            digest.update(chunk)
+            documents, buffer = _split_at_marker(buffer + decoder.decode(chunk), final=False)
+            yield from (document for document in documents if document.strip())
+    documents, buffer = _split_at_marker(buffer + decoder.decode(b"", final=True), final=True)
+    yield from (document for document in documents + [buffer] if document.strip())
+
+
+def build_binidx(
+    input_path: Path,
+    data_prefix: Path,
+    vocab_path: Path,
+    input_format: str = "auto",
+    dtype: str = "uint16",
+    workers: int = 1,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    token_cache_dir: Path | None = None,
+    token_cache_max_bytes: int | None = None,
+) -> dict[str, Any]:
+    input_format = resolve_input_format(input_path, input_format)
+    tokenizer_fingerprint = hashlib.sha256(vocab_path.read_bytes()).hexdigest()
+    typecode = DTYPES[DTYPE_CODES[dtype]][1]
+    input_digest = hashlib.sha256()
+    documents = (
+        iter_jsonl_documents(input_path, input_digest)
+        if input_format == "jsonl"
+        else iter_text_documents(input_path, input_digest)
+    )
+
+    cache = None
+    if token_cache_dir is not None:
+        if dtype != "uint16":
+            raise ValueError("token_cache_requires_uint16: drop --token-cache or use --dtype uint16")
+        cache = TokenCache.open(token_cache_dir, tokenizer_fingerprint)
+
+    def items() -> Iterator[tuple[bytes | None, str | None]]:
+        # Runs in the pool feeder thread: only a dict lookup here, cache reads stay in the main thread.
+        for text in documents:
+            if cache is None:
+                yield None, text
+                continue
+            digest = document_digest(text)
+            yield digest, (None if digest in cache.entries else text)
+
+    writer = BinidxWriter(data_prefix, dtype=dtype)
+    skipped_empty = 0
+    used_digests: list[bytes] = []
+    if workers <= 1:
+        _init_worker(str(vocab_path), typecode)
+        results: Iterator[tuple[bytes | None, bytes | None]] = map(encode_item, items())
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(str(vocab_path), typecode))
+        results = pool.imap(encode_item, items(), chunksize=max(1, chunksize))
+    try:
+        for digest, payload in results:
+            if payload is None:
+                payload = cache.get(digest)
+            elif cache is not None:
+                cache.misses += 1
+                cache.put(digest, payload)
+            if not payload:
+                skipped_empty += 1
+                continue
+            writer.add_document_bytes(payload)
+            if digest is not None:
+                used_digests.append(digest)
+        summary = writer.finalize()
+        cache_summary = None
+        if cache is not None:
+            cache.write_refs(refs_name_for(data_prefix), used_digests)
+            cache_summary = cache.stats()
+            if token_cache_max_bytes is not None and cache_summary["bytes"] > token_cache_max_bytes:
+                cache_summary["gc"] = cache.gc(token_cache_max_bytes)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if cache is not None:
+            cache.close()
+
+    manifest = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "input": {
+            "path": str(input_path),
+            "format": input_format,
+            "sha256": input_digest.hexdigest(),
+        },
+        "tokenizer": {
+            "vocab": str(vocab_path),
+            "fingerprint": tokenizer_fingerprint,
+            "eod_token_id": EOD_TOKEN_ID,
+        },
+        "append_eod": True,
+        "skipped_empty_documents": skipped_empty,
+        "workers": max(1, workers),
+        "token_cache": cache_summary,
+        **summary,
+    }
+    manifest_path = Path(f"{data_prefix}{MANIFEST_SUFFIX}")
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    manifest["manifest_path"] = str(manifest_path)
+    return manifest
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Tokenize JSONL or v4 text directly into binidx files.")
+    parser.add_argument("--input", required=True, help="Input .jsonl (text key) or v4 .txt release.")
+    parser.add_argument(
+        "--output-prefix",
+        required=True,
+        help=f"Output prefix; files are written as <prefix>{DATA_PREFIX_SUFFIX}.bin/.idx like json2binidx.",
+    )
+    parser.add_argument("--tokenizer-vocab", default="", help="RWKV vocab file (default: RWKV_TOKENIZER_VOCAB or third_party).")
+    parser.add_argument("--input-format", choices=INPUT_FORMATS, default="auto")
+    parser.add_argument("--dtype", choices=("uint16", "int32"), default="uint16")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "4")))
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Documents per worker task.")
+    parser.add_argument(
+        "--token-cache",
+        default="",
+        help="Token cache directory; unchanged documents are copied from it instead of re-tokenized.",
+    )
+    parser.add_argument(
+        "--token-cache-max-mb",
+        type=float,
+        default=None,
+        help="After the build, garbage-collect the cache when it grows past this size.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    input_path = Path(args.input).resolve()
+    if not input_path.is_file():
+        print(f"Input not found: {input_path}", file=sys.stderr)
+        return 1
+    try:
+        vocab_path = resolve_vocab_path(args.tokenizer_vocab or None)
+        manifest = build_binidx(
+            input_path,
+            Path(f"{Path(args.output_prefix).resolve()}{DATA_PREFIX_SUFFIX}"),
+            vocab_path,
+            input_format=args.input_format,
+            dtype=args.dtype,
+            workers=args.workers,
+            chunksize=args.chunksize,
+            token_cache_dir=Path(args.token_cache).resolve() if args.token_cache else None,
+            token_cache_max_bytes=(
+                None if args.token_cache_max_mb is None else int(args.token_cache_max_mb * 1024 * 1024)
+            ),
+        )
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    print(
+        f"documents={manifest['documents']} tokens={manifest['tokens_total']} "
+        f"bin_sha256={manifest['bin']['sha256']}"
+    )
+    if manifest["token_cache"]:
+        print(f"token_cache hits={manifest['token_cache']['hits']} misses={manifest['token_cache']['misses']}")
+    print(f"manifest={manifest['manifest_path']}")
+    print(f"data_prefix={manifest['data_prefix']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -14,6 +14,7 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
+from dataset_lifecycle import build_source_summary_from_columns, merge_metadata_columns
 from eval_summary_contract import validate_eval_summary
 
 
@@ -25,6 +26,11 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--eval-summary", required=True, help="Path to evaluation summary JSON.")
     parser.add_argument("--output-md", required=True, help="Path to output markdown report.")
     parser.add_argument("--output-json", required=True, help="Path to output machine-readable JSON summary.")
+    parser.add_argument(
+        "--columnar-composition",
+        action="store_true",
+        help="Recompute composition from the manifest's Parquet split companions (metadata columns only; requires pyarrow).",
+    )
     return parser.parse_args()
 
 
@@ -35,25 +41,45 @@ def read_json(path: Path) -> dict[str, Any]:
     return payload
 
 
-def build_summary(manifest: dict[str, Any], eval_summary: dict[str, Any]) -> dict[str, Any]:
+def build_summary(
+    manifest: dict[str, Any],
+    eval_summary: dict[str, Any],
+    columns_by_split: dict[str, dict[str, list[str]]] | None = None,
+) -> dict[str, Any]:
     hard_cases = eval_summary.get("hard_cases")
     if not isinstance(hard_cases, list):
         hard_cases = []
     by_category = Counter(str(item.get("category", "unknown")) for item in hard_cases)
+    if columns_by_split is None:
+        source_summary = manifest.get("source_summary", {})
+        splits = {
+            split_name: split_payload.get("rows_total", 0)
+            for split_name, split_payload in sorted((manifest.get("splits") or {}).items())
+        }
+    else:
+        source_summary = build_source_summary_from_columns(merge_metadata_columns(columns_by_split))
+        splits = {
+            split_name: build_source_summary_from_columns(columns)["rows_total"]
+            for split_name, columns in sorted(columns_by_split.items())
+        }
+    dataset = {
+        "name": manifest.get("dataset_name", "unknown"),
+        "version": manifest.get("dataset_version", "unknown"),
+        "quality_status": manifest.get("quality_status", "unknown"),
+        "rows_total": source_summary.get("rows_total", 0),
+        "splits": splits,
+        "contours": source_summary.get("contours", {}),
+        "segments": source_summary.get("segments", {}),
+        "categories": source_summary.get("categories", {}),
+    }
+    if columns_by_split is not None:
+        dataset["composition_source"] = "columnar"
+        dataset["split_categories"] = {
+            split_name: build_source_summary_from_columns(columns)["categories"]
+            for split_name, columns in sorted(columns_by_split.items())
+        }
     return {
-        "dataset": {
-            "name": manifest.get("dataset_name", "unknown"),
-            "version": manifest.get("dataset_version", "unknown"),
-            "quality_status": manifest.get("quality_status", "unknown"),
-            "rows_total": manifest.get("source_summary", {}).get("rows_total", 0),
-            "splits": {
-                split_name: split_payload.get("rows_total", 0)
-                for split_name, split_payload in sorted((manifest.get("splits") or {}).items())
-            },
-            "contours": manifest.get("source_summary", {}).get("contours", {}),
-            "segments": manifest.get("source_summary", {}).get("segments", {}),
-            "categories": manifest.get("source_summary", {}).get("categories", {}),
-        },
+        "dataset": dataset,
         "quality": {
             "quality_reasons": manifest.get("quality_reasons", []),
             "gates": manifest.get("quality_gates", {}),
@@ -120,7 +146,12 @@ def main() -> int:
     args = parse_args()
     manifest = read_json(Path(args.manifest).resolve())
     eval_summary = validate_eval_summary(read_json(Path(args.eval_summary).resolve()))
-    summary = build_summary(manifest, eval_summary)
+    columns_by_split = None
+    if args.columnar_composition:
+        from columnar_release import load_release_metadata_columns  # pylint: disable=import-outside-toplevel
+
+        columns_by_split = load_release_metadata_columns(manifest)
+    summary = build_summary(manifest, eval_summary, columns_by_split)
 
     output_md = Path(args.output_md).resolve()
     output_json = Path(args.output_json).resolve()
@@ -7,9 +7,17 @@ import argparse
 import hashlib
 import json
 import random
+import sys
 from pathlib import Path
 
 
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from jsonl_codec import write_jsonl as write_jsonl_payloads
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description=(
@@ -417,10 +425,7 @@ def sample_without_overlap(
 
 
 def write_jsonl(path: Path, rows: list[str]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
-        for row in rows:
-            handle.write(json.dumps({"text": row}, ensure_ascii=False) + "\n")
+    write_jsonl_payloads(path, ({"text": row} for row in rows))
 
 
 def sha256_file(path: Path) -> str:
@@ -25,6 +25,8 @@ if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
 from dataset_lifecycle import build_canonical_row, build_release_manifest, sha256_file
+from columnar_release import require_pyarrow, write_columnar_companion
+from jsonl_codec import encode_json, write_jsonl as write_jsonl_payloads
 
 
 METHOD_PATTERN = re.compile(
@@ -103,6 +105,11 @@ def parse_args() -> argparse.Namespace:
         default=3,
         help="Maximum changed files in a localizable history commit.",
     )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Also write a Parquet companion per split with dictionary-encoded metadata columns (requires pyarrow).",
+    )
     return parser.parse_args()
 
 
@@ -127,13 +134,10 @@ def write_json(path: Path, payload: dict[str, Any]) -> None:
 
 
 def write_jsonl(path: Path, rows: list[Sample]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
-        for row in rows:
-            handle.write(
-                json.dumps(build_canonical_row(row.user_prompt, row.assistant_response, row.metadata), ensure_ascii=False)
-                + "\n"
-            )
+    write_jsonl_payloads(
+        path,
+        (build_canonical_row(row.user_prompt, row.assistant_response, row.metadata) for row in rows),
+    )
 
 
 def validate_manifest(path: Path) -> dict[str, Any]:
@@ -469,7 +473,7 @@ def calculate_unique_volume(samples: list[Sample]) -> float:
         unique_by_near.setdefault(sample.near_hash, sample)
     total_bytes = 0
     for sample in unique_by_near.values():
-        payload = json.dumps(build_canonical_row(sample.user_prompt, sample.assistant_response, sample.metadata), ensure_ascii=False)
+        payload = encode_json(build_canonical_row(sample.user_prompt, sample.assistant_response, sample.metadata))
         total_bytes += len(payload.encode("utf-8")) + 1
     return total_bytes / (1024 * 1024)
 
@@ -617,6 +621,11 @@ def main() -> int:
             profile_contract = validate_profile(profile_path)
         except ValueError as exc:
             raise RepoFamilyError("invalid_profile", str(exc)) from exc
+        if args.columnar:
+            try:
+                require_pyarrow()
+            except ValueError as exc:
+                raise RepoFamilyError("columnar_dependency_missing", str(exc)) from exc
         manifest = validate_manifest(manifest_path)
         hard_min_mb = (
             int(args.hard_min_mb)
@@ -632,20 +641,29 @@ def main() -> int:
         write_jsonl(train_output, train_rows)
         write_jsonl(dev_output, dev_rows)
         write_jsonl(eval_output, eval_rows)
+        canonical_rows = {
+            "train": [build_canonical_row(row.user_prompt, row.assistant_response, row.metadata) for row in train_rows],
+            "dev": [build_canonical_row(row.user_prompt, row.assistant_response, row.metadata) for row in dev_rows],
+            "eval": [build_canonical_row(row.user_prompt, row.assistant_response, row.metadata) for row in eval_rows],
+        }
+        split_artifacts: dict[str, dict[str, Any]] = {}
+        for split_name, split_output in (("train", train_output), ("dev", dev_output), ("eval", eval_output)):
+            split_artifacts[split_name] = {
+                "path": str(split_output),
+                "sha256": sha256_file(split_output),
+                "rows_total": len(canonical_rows[split_name]),
+            }
+            if args.columnar:
+                split_artifacts[split_name]["columnar"] = write_columnar_companion(
+                    split_output,
+                    canonical_rows[split_name],
+                )
         lifecycle_manifest = build_release_manifest(
             dataset_name=f"{manifest['source_family_id']}-trusted",
             dataset_version=args.dataset_version,
             created_by="scripts/build_repo_family_trusted_corpus.py",
-            rows_by_split={
-                "train": [build_canonical_row(row.user_prompt, row.assistant_response, row.metadata) for row in train_rows],
-                "dev": [build_canonical_row(row.user_prompt, row.assistant_response, row.metadata) for row in dev_rows],
-                "eval": [build_canonical_row(row.user_prompt, row.assistant_response, row.metadata) for row in eval_rows],
-            },
-            split_artifacts={
-                "train": {"path": str(train_output), "sha256": sha256_file(train_output), "rows_total": len(train_rows)},
-                "dev": {"path": str(dev_output), "sha256": sha256_file(dev_output), "rows_total": len(dev_rows)},
-                "eval": {"path": str(eval_output), "sha256": sha256_file(eval_output), "rows_total": len(eval_rows)},
-            },
+            rows_by_split=canonical_rows,
+            split_artifacts=split_artifacts,
             enforce_balance=False,
             required_eval_categories=(),
             sampling_policy={
@@ -7,9 +7,17 @@ import argparse
 import hashlib
 import json
 import re
+import sys
 from collections import Counter
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from jsonl_codec import decode_json, iter_jsonl_lines
 
 
 USER_ASSISTANT_PATTERN = re.compile(
@@ -64,28 +72,28 @@ def sha256_file(path: Path) -> str:
     return digest.hexdigest()
 
 
+def iter_rows(path: Path) -> Iterator[str]:
+    for line_number, line in iter_jsonl_lines(path):
+        try:
+            payload = decode_json(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Invalid JSON at line {line_number}: {exc.msg}") from exc
+        if not isinstance(payload, dict) or not isinstance(payload.get("text"), str):
+            raise ValueError(f"Invalid row schema at line {line_number}: expected object with 'text' string")
+        yield payload["text"]
+
+
 def load_rows(path: Path) -> list[str]:
-    rows: list[str] = []
-    with path.open("r", encoding="utf-8") as handle:
-        for line_number, line in enumerate(handle, start=1):
-            stripped = line.strip()
-            if not stripped:
-                continue
-            try:
-                payload = json.loads(stripped)
-            except json.JSONDecodeError as exc:
-                raise ValueError(f"Invalid JSON at line {line_number}: {exc.msg}") from exc
-            if not isinstance(payload, dict) or not isinstance(payload.get("text"), str):
-                raise ValueError(f"Invalid row schema at line {line_number}: expected object with 'text' string")
-            rows.append(payload["text"])
-    return rows
-
-
-def evaluate(rows: list[str], args: argparse.Namespace) -> dict[str, Any]:
-    row_count = len(rows)
-    unique_count = len(set(rows))
-    unique_ratio = unique_count / row_count if row_count else 0.0
+    return list(iter_rows(path))
+
+
+def row_key(row: str) -> bytes:
+    # Duplicate accounting keeps 16-byte digests instead of full row text.
+    return hashlib.blake2b(row.encode("utf-8"), digest_size=16).digest()
 
+
+def evaluate(rows: Iterable[str], args: argparse.Namespace) -> dict[str, Any]:
+    row_count = 0
     format_ok = 0
     invalid_format_rows = 0
     identity_rows = 0
@@ -94,9 +102,11 @@ def evaluate(rows: list[str], args: argparse.Namespace) -> dict[str, Any]:
     identity_brand_leak_rows = 0
     transcript_leak_rows = 0
     assistant_lengths: list[int] = []
-    top_counter = Counter(rows)
+    top_counter: Counter[bytes] = Counter()
 
     for row in rows:
+        row_count += 1
+        top_counter[row_key(row)] += 1
         match = USER_ASSISTANT_PATTERN.match(row)
         if not match:
             invalid_format_rows += 1
@@ -119,6 +129,8 @@ def evaluate(rows: list[str], args: argparse.Namespace) -> dict[str, Any]:
             if any(pattern.search(assistant) for pattern in IDENTITY_BRAND_PATTERNS):
                 identity_brand_leak_rows += 1
 
+    unique_count = len(top_counter)
+    unique_ratio = unique_count / row_count if row_count else 0.0
     user_assistant_ratio = format_ok / row_count if row_count else 0.0
     identity_ratio = identity_rows / row_count if row_count else 0.0
     top1_share = (top_counter.most_common(1)[0][1] / row_count) if row_count else 0.0
@@ -192,8 +204,7 @@ def main() -> int:
     if not input_path.is_file():
         raise FileNotFoundError(f"Input dataset not found: {input_path}")
 
-    rows = load_rows(input_path)
-    report = evaluate(rows, args)
+    report = evaluate(iter_rows(input_path), args)
     manifest = {
         "dataset_path": str(input_path),
         "dataset_sha256": sha256_file(input_path),
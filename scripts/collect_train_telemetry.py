@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""Structured training telemetry from RWKV-PEFT console output and `train_log.txt`.
+
+RWKV-PEFT reports per-step metrics only through the Lightning progress bar postfix
+(`REAL it/s`, `Kt/s`, `lr`, `loss`, written with `\\r` refreshes to stderr) and appends one
+line per finished epoch to `<proj_dir>/train_log.txt`:
+
+    <epoch> <epoch_loss> <ppl> <lr> <YYYY-MM-DD HH:MM:SS.ffffff> <current_epoch>
+
+The collector either wraps the trainer (`-- python train.py ...`), echoing its output while
+parsing it, tailing `train_log.txt` and sampling `nvidia-smi`, or re-parses a recorded
+console log (`--console-log`). Both write `runs/<run>/telemetry/metrics.jsonl` (time series)
+and `runs/<run>/telemetry/summary.json`. With `--model-config/--profile-config` the summary
+also becomes `runs/<run>/resource_observation.json` for `estimate_train_resources.py`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import codecs
+import json
+import math
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from estimate_train_resources import OBSERVATION_NAME
+from profile_env import load_train_env
+
+
+TELEMETRY_DIRNAME = "telemetry"
+METRICS_NAME = "metrics.jsonl"
+SUMMARY_NAME = "summary.json"
+CONSOLE_LOG_NAME = "console.log"
+TRAIN_LOG_NAME = "train_log.txt"
+DEFAULT_STALL_FACTOR = 3.0
+DEFAULT_POLL_SECONDS = 5.0
+MAX_REPORTED_STALLS = 20
+PROGRESS_PATTERN = re.compile(
+    r"Epoch (?P<epoch>\d+):\s*\d+%\|[^|]*\|\s*(?P<step>\d+)/(?P<total>\d+|\?)\s*\[(?P<meta>[^\]]*)\]"
+)
+POSTFIX_PATTERN = re.compile(r"(?P<key>[A-Za-z][A-Za-z0-9_/ ]*)=(?P<value>[-+]?(?:\d+\.?\d*(?:[eE][-+]?\d+)?|nan|inf))")
+RATE_PATTERN = re.compile(r"(?P<value>\d+\.?\d*)(?P<unit>s/it|it/s)")
+EPOCH_LINE_PATTERN = re.compile(
+    r"^(?P<epoch>\d+) (?P<loss>\S+) (?P<ppl>\S+) (?P<lr>\S+) "
+    r"(?P<logged_at>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)?) (?P<current_epoch>\d+)$"
+)
+POSTFIX_KEYS = {"REAL it/s": "it_s", "Kt/s": "kt_s", "lr": "lr", "loss": "loss"}
+
+
+def parse_progress_line(line: str) -> dict[str, Any] | None:
+    """One Lightning progress refresh -> step record, or None for any other output."""
+    match = PROGRESS_PATTERN.search(line)
+    if match is None:
+        return None
+    record: dict[str, Any] = {
+        "epoch": int(match.group("epoch")),
+        "step": int(match.group("step")),
+        "total_steps": None if match.group("total") == "?" else int(match.group("total")),
+    }
+    meta = match.group("meta")
+    for postfix in POSTFIX_PATTERN.finditer(meta):
+        key = POSTFIX_KEYS.get(postfix.group("key").strip())
+        if key:
+            record[key] = float(postfix.group("value"))
+    if record.get("it_s"):
+        record["step_time_s"] = 1.0 / record["it_s"]
+    else:
+        rate = RATE_PATTERN.search(meta)
+        if rate and float(rate.group("value")) > 0:
+            value = float(rate.group("value"))
+            record["step_time_s"] = value if rate.group("unit") == "s/it" else 1.0 / value
+    return record
+
+
+def parse_train_log_line(line: str) -> dict[str, Any] | None:
+    match = EPOCH_LINE_PATTERN.match(line.strip())
+    if match is None:
+        return None
+    return {
+        "epoch": int(match.group("epoch")),
+        "loss": float(match.group("loss")),
+        "ppl": float(match.group("ppl")),
+        "lr": float(match.group("lr")),
+        "logged_at": match.group("logged_at"),
+    }
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _distribution(values: list[float], digits: int = 3) -> dict[str, float] | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "p10": round(_percentile(ordered, 0.10), digits),
+        "p50": round(_percentile(ordered, 0.50), digits),
+        "p90": round(_percentile(ordered, 0.90), digits),
+        "mean": round(statistics.fmean(ordered), digits),
+    }
+
+
+class TelemetryCollector:
+    """Accumulates step/epoch/gpu records and mirrors each one to `metrics.jsonl`."""
+
+    def __init__(self, run_dir: Path, devices: int = 1, stall_factor: float = DEFAULT_STALL_FACTOR) -> None:
+        self.run_dir = Path(run_dir)
+        self.telemetry_dir = self.run_dir / TELEMETRY_DIRNAME
+        self.telemetry_dir.mkdir(parents=True, exist_ok=True)
+        self.devices = devices
+        self.stall_factor = stall_factor
+        self.steps: list[dict[str, Any]] = []
+        self.epochs: list[dict[str, Any]] = []
+        self.peak_memory_mb: float | None = None
+        self._last_step_key: tuple[int, int] | None = None
+        self._pending = ""
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._lock = threading.Lock()
+        self._metrics = (self.telemetry_dir / METRICS_NAME).open("w", encoding="utf-8")
+
+    def _emit(self, kind: str, record: dict[str, Any], timestamp: float | None) -> None:
+        payload = {"kind": kind, "t": None if timestamp is None else round(timestamp, 3), **record}
+        with self._lock:
+            self._metrics.write(json.dumps(payload, ensure_ascii=True) + "\n")
+            self._metrics.flush()
+
+    def feed_console(self, data: bytes, timestamp: float | None = None, final: bool = False) -> None:
+        """Console bytes in arbitrary chunks; progress refreshes are split on `\\r` and `\\n`."""
+        self._pending += self._decoder.decode(data, final)
+        *lines, self._pending = re.split(r"[\r\n]", self._pending)
+        if final:
+            lines.append(self._pending)
+            self._pending = ""
+        for line in lines:
+            record = parse_progress_line(line)
+            if record is None:
+                continue
+            key = (record["epoch"], record["step"])
+            # Lightning redraws the bar without advancing; only a new (epoch, step) is a step.
+            if key == self._last_step_key or record["step"] == 0:
+                continue
+            self._last_step_key = key
+            self.steps.append(record)
+            self._emit("step", record, timestamp)
+
+    def feed_train_log_line(self, line: str, timestamp: float | None = None) -> None:
+        record = parse_train_log_line(line)
+        if record is None:
+            return
+        checkpoint = self.run_dir / f"rwkv-{record['epoch']}.pth"
+        record["checkpoint"] = str(checkpoint) if checkpoint.is_file() else None
+        self.epochs.append(record)
+        self._emit("epoch", record, timestamp)
+
+    def record_gpu_memory(self, used_mb: list[float], timestamp: float | None = None) -> None:
+        if not used_mb:
+            return
+        self.peak_memory_mb = max(self.peak_memory_mb or 0.0, *used_mb)
+        self._emit("gpu", {"memory_used_mb": used_mb}, timestamp)
+
+    def summary(self, exit_code: int | None = None) -> dict[str, Any]:
+        step_times = [step["step_time_s"] for step in self.steps if step.get("step_time_s")]
+        kt_s = [step["kt_s"] for step in self.steps if step.get("kt_s")]
+        losses = [step["loss"] for step in self.steps if step.get("loss") is not None and math.isfinite(step["loss"])]
+        stall_threshold = statistics.median(step_times) * self.stall_factor if step_times else None
+        stalls = [
+            {"epoch": step["epoch"], "step": step["step"], "step_time_s": round(step["step_time_s"], 3)}
+            for step in self.steps
+            if stall_threshold is not None and step.get("step_time_s", 0.0) > stall_threshold
+        ]
+        # RWKV-PEFT's Kt/s counts ctx_len x micro_bsz x devices tokens per step.
+        tokens_per_sec = statistics.median(kt_s) * 1000 if kt_s else None
+        return {
+            "run_dir": str(self.run_dir),
+            "status": "recorded" if exit_code is None else ("complete" if exit_code == 0 else "failed"),
+            "exit_code": exit_code,
+            "devices": self.devices,
+            "steps": len(self.steps),
+            "kt_s": _distribution(kt_s),
+            "step_time_s": _distribution(step_times),
+            "tokens_per_sec": None if tokens_per_sec is None else round(tokens_per_sec, 1),
+            "tokens_per_sec_per_device": None if tokens_per_sec is None else round(tokens_per_sec / self.devices, 1),
+            "stalls": {
+                "threshold_s": None if stall_threshold is None else round(stall_threshold, 3),
+                "count": len(stalls),
+                "events": stalls[:MAX_REPORTED_STALLS],
+            },
+            "loss": {
+                "first": losses[0] if losses else None,
+                "last": losses[-1] if losses else None,
+                "min": min(losses) if losses else None,
+            },
+            "epochs": self.epochs,
+            "checkpoints": [
+                {"epoch": epoch["epoch"], "loss": epoch["loss"], "checkpoint": epoch["checkpoint"]}
+                for epoch in self.epochs
+                if epoch["checkpoint"]
+            ],
+            "peak_memory_gb": None if self.peak_memory_mb is None else round(self.peak_memory_mb / 1024, 2),
+        }
+
+    def write_summary(self, exit_code: int | None = None) -> dict[str, Any]:
+        summary = self.summary(exit_code)
+        path = self.telemetry_dir / SUMMARY_NAME
+        path.write_text(json.dumps(summary, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        return summary
+
+    def close(self) -> None:
+        self._metrics.close()
+
+
+def write_resource_observation(
+    run_dir: Path,
+    summary: dict[str, Any],
+    env: dict[str, str],
+    model_config: Path | None = None,
+    profile_config: Path | None = None,
+) -> Path | None:
+    """Calibration sample for `estimate_train_resources.py`; skipped when nothing was measured."""
+    if summary["tokens_per_sec_per_device"] is None and summary["peak_memory_gb"] is None:
+        return None
+    path = Path(run_dir) / OBSERVATION_NAME
+    payload = {
+        "model_config": None if model_config is None else str(model_config),
+        "profile_config": None if profile_config is None else str(profile_config),
+        "env": env,
+        "devices": summary["devices"],
+        "peak_memory_gb": summary["peak_memory_gb"],
+        "tokens_per_sec": summary["tokens_per_sec_per_device"],
+        "source": str(Path(run_dir) / TELEMETRY_DIRNAME / SUMMARY_NAME),
+    }
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+def query_gpu_memory_mb() -> list[float]:
+    if shutil.which("nvidia-smi") is None:
+        return []
+    try:
+        result = subprocess.run(
+            ["nvidia-smi", "--query-gpu=memory.used", "--format=csv,noheader,nounits"],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return []
+    values = []
+    for line in result.stdout.splitlines():
+        try:
+            values.append(float(line.strip()))
+        except ValueError:
+            continue
+    return values
+
+
+class _TrainLogTail:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.offset = 0
+        self.pending = ""
+
+    def read_lines(self) -> list[str]:
+        if not self.path.is_file():
+            return []
+        with self.path.open("r", encoding="utf-8", errors="replace") as handle:
+            handle.seek(self.offset)
+            chunk = handle.read()
+            self.offset = handle.tell()
+        *lines, self.pending = (self.pending + chunk).split("\n")
+        return lines
+
+
+def _poll_side_channels(
+    collector: TelemetryCollector,
+    tail: _TrainLogTail,
+    stop: threading.Event,
+    poll_seconds: float,
+    sample_gpu: bool,
+) -> None:
+    while True:
+        for line in tail.read_lines():
+            collector.feed_train_log_line(line, time.time())
+        if sample_gpu:
+            collector.record_gpu_memory(query_gpu_memory_mb(), time.time())
+        if stop.wait(poll_seconds):
+            break
+
+
+def run_with_telemetry(
+    command: list[str],
+    collector: TelemetryCollector,
+    echo: IO[bytes] | None = None,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    sample_gpu: bool = True,
+) -> int:
+    """Run the trainer with stdout+stderr piped through the collector; returns its exit code."""
+    echo = echo if echo is not None else sys.stdout.buffer
+    tail = _TrainLogTail(collector.run_dir / TRAIN_LOG_NAME)
+    stop = threading.Event()
+    poller = threading.Thread(
+        target=_poll_side_channels,
+        args=(collector, tail, stop, poll_seconds, sample_gpu),
+        daemon=True,
+    )
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    poller.start()
+    assert process.stdout is not None
+    with (collector.telemetry_dir / CONSOLE_LOG_NAME).open("wb") as console:
+        while True:
+            data = os.read(process.stdout.fileno(), 65536)
+            if not data:
+                break
+            echo.write(data)
+            echo.flush()
+            console.write(data)
+            collector.feed_console(data, time.time())
+    collector.feed_console(b"", time.time(), final=True)
+    exit_code = process.wait()
+    stop.set()
+    poller.join()
+    for line in tail.read_lines() + [tail.pending]:
+        collector.feed_train_log_line(line, time.time())
+    return exit_code
+
+
+def collect_recorded(collector: TelemetryCollector, console_log: Path, train_log: Path | None = None) -> None:
+    collector.feed_console(Path(console_log).read_bytes(), final=True)
+    train_log = train_log or collector.run_dir / TRAIN_LOG_NAME
+    if train_log.is_file():
+        for line in train_log.read_text(encoding="utf-8", errors="replace").splitlines():
+            collector.feed_train_log_line(line)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Parse RWKV-PEFT training output into runs/<run>/telemetry/.",
+        usage="%(prog)s --run-dir DIR [options] (--console-log FILE | -- command ...)",
+    )
+    parser.add_argument("--run-dir", required=True, help="RWKV-PEFT proj_dir (runs/<run>).")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--model-config", default=None, help="Model env; with --profile-config writes resource_observation.json.")
+    parser.add_argument("--profile-config", default=None)
+    parser.add_argument("--console-log", default=None, help="Re-parse a recorded console log instead of running a command.")
+    parser.add_argument("--train-log", default=None, help=f"Epoch log (default: <run-dir>/{TRAIN_LOG_NAME}).")
+    parser.add_argument("--stall-factor", type=float, default=DEFAULT_STALL_FACTOR, help="Stall = step time > factor x median.")
+    parser.add_argument("--poll-seconds", type=float, default=DEFAULT_POLL_SECONDS)
+    parser.add_argument("--no-gpu-sampling", action="store_true", help="Do not poll nvidia-smi for memory.used.")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="Trainer command after `--`.")
+    args = parser.parse_args()
+    if args.command[:1] == ["--"]:
+        args.command = args.command[1:]
+    if bool(args.command) == bool(args.console_log):
+        parser.error("pass exactly one of --console-log or a command after --")
+    return args
+
+
+def main() -> int:
+    args = parse_args()
+    run_dir = Path(args.run_dir)
+    collector = TelemetryCollector(run_dir, devices=args.devices, stall_factor=args.stall_factor)
+    try:
+        if args.console_log:
+            collect_recorded(collector, Path(args.console_log), Path(args.train_log) if args.train_log else None)
+            exit_code = 0
+        else:
+            try:
+                exit_code = run_with_telemetry(
+                    args.command,
+                    collector,
+                    poll_seconds=args.poll_seconds,
+                    sample_gpu=not args.no_gpu_sampling,
+                )
+            except OSError as exc:
+                print(f"telemetry_command_failed: {exc}", file=sys.stderr)
+                exit_code = 127
+        summary = collector.write_summary(exit_code if args.command else None)
+    finally:
+        collector.close()
+    if args.model_config and args.profile_config:
+        try:
+            env = load_train_env(Path(args.model_config), Path(args.profile_config))
+        except (OSError, ValueError) as exc:
+            print(f"telemetry_observation_skipped: {exc}", file=sys.stderr)
+        else:
+            write_resource_observation(run_dir, summary, env, Path(args.model_config), Path(args.profile_config))
+    print(
+        f"telemetry: steps={summary['steps']} tokens_per_sec={summary['tokens_per_sec']} "
+        f"stalls={summary['stalls']['count']} peak_memory_gb={summary['peak_memory_gb']} "
+        f"-> {run_dir / TELEMETRY_DIRNAME}",
+        file=sys.stderr,
+    )
+    return exit_code
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
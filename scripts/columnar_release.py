@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Optional Parquet companions for canonical release splits.
+
+Every split JSONL can get a `<split>.parquet` next to it with dictionary-encoded metadata
+columns. Summaries and reports then read only the projected metadata columns instead of
+re-parsing full rows with response text. `pyarrow` is optional: callers request the
+columnar artifact explicitly and get a clear error when it is not installed.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Any, Iterable
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from dataset_lifecycle import SUMMARY_METADATA_KEYS, infer_task_category, sha256_file
+from jsonl_codec import encode_json
+
+
+COLUMNAR_FORMAT = "parquet"
+METADATA_COLUMNS = ("source", "license", "origin_ref", "contour", "segment", "split", "category")
+TEXT_COLUMNS = ("user_prompt", "assistant_response")
+
+
+def require_pyarrow() -> tuple[Any, Any]:
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+    except ImportError as exc:
+        raise ValueError("columnar_release_requires_pyarrow: install pyarrow to write or read parquet splits") from exc
+    return pyarrow, pyarrow.parquet
+
+
+def columnar_path_for(jsonl_path: Path) -> Path:
+    return jsonl_path.with_suffix(f".{COLUMNAR_FORMAT}")
+
+
+def metadata_column_value(row: dict[str, Any], key: str) -> str:
+    if key == "category":
+        return infer_task_category(row)
+    metadata = row.get("metadata", {})
+    return str(metadata.get(key, "unknown"))
+
+
+def write_split_columnar(path: Path, rows: Iterable[dict[str, Any]]) -> int:
+    pa, pq = require_pyarrow()
+    columns: dict[str, list[str]] = {name: [] for name in (*TEXT_COLUMNS, *METADATA_COLUMNS, "metadata_json")}
+    rows_total = 0
+    for row in rows:
+        rows_total += 1
+        for name in TEXT_COLUMNS:
+            columns[name].append(str(row[name]))
+        for name in METADATA_COLUMNS:
+            columns[name].append(metadata_column_value(row, name))
+        columns["metadata_json"].append(encode_json(row.get("metadata", {})))
+
+    arrays = {}
+    for name, values in columns.items():
+        array = pa.array(values, type=pa.string())
+        if name in METADATA_COLUMNS:
+            array = array.dictionary_encode()
+        arrays[name] = array
+    table = pa.table(arrays)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(
+        table,
+        str(path),
+        use_dictionary=list(METADATA_COLUMNS),
+        compression="zstd",
+    )
+    return rows_total
+
+
+def read_split_columns(path: Path, columns: Iterable[str] = SUMMARY_METADATA_KEYS) -> dict[str, list[str]]:
+    """Read only the requested columns; response text is never materialized for metadata projections."""
+    _, pq = require_pyarrow()
+    requested = list(columns)
+    table = pq.read_table(str(path), columns=requested)
+    return {name: [str(value) for value in table.column(name).to_pylist()] for name in requested}
+
+
+def columnar_artifact_summary(path: Path, rows_total: int) -> dict[str, Any]:
+    return {
+        "path": str(path),
+        "format": COLUMNAR_FORMAT,
+        "sha256": sha256_file(path),
+        "rows_total": rows_total,
+        "dictionary_columns": list(METADATA_COLUMNS),
+    }
+
+
+def write_columnar_companion(jsonl_path: Path, rows: list[dict[str, Any]]) -> dict[str, Any]:
+    path = columnar_path_for(jsonl_path)
+    rows_total = write_split_columnar(path, rows)
+    return columnar_artifact_summary(path, rows_total)
+
+
+def load_release_metadata_columns(
+    manifest: dict[str, Any],
+    columns: Iterable[str] = SUMMARY_METADATA_KEYS,
+) -> dict[str, dict[str, list[str]]]:
+    """Load projected metadata columns for every manifest split that has a columnar artifact."""
+    requested = tuple(columns)
+    columns_by_split: dict[str, dict[str, list[str]]] = {}
+    for split_name, split_payload in sorted((manifest.get("splits") or {}).items()):
+        artifact = (split_payload or {}).get("artifact") or {}
+        columnar = artifact.get("columnar")
+        if not isinstance(columnar, dict) or not columnar.get("path"):
+            raise ValueError(f"missing_columnar_artifact[{split_name}]")
+        path = Path(str(columnar["path"]))
+        expected_sha = str(columnar.get("sha256", "")).strip().lower()
+        if expected_sha and sha256_file(path) != expected_sha:
+            raise ValueError(f"columnar_artifact_checksum_mismatch[{split_name}]={path}")
+        columns_by_split[split_name] = read_split_columns(path, requested)
+    return columns_by_split
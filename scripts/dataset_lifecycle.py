@@ -4,7 +4,6 @@
 from __future__ import annotations
 
 import hashlib
-import json
 import re
 import sys
 from collections import Counter
@@ -17,6 +16,7 @@ if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
 from bsl_diagnostics import diagnose_bsl_text
+from jsonl_codec import iter_jsonl, write_jsonl
 
 
 TASK_CATEGORIES = (
@@ -53,6 +53,7 @@ CATEGORY_BASELINE = {
     "onec_query": 0.15,
     "explanation_review": 0.15,
 }
+SUMMARY_METADATA_KEYS = ("contour", "segment", "source", "license", "category")
 VERSION_RE = re.compile(r"^v[0-9]+(?:\.[0-9]+)*$")
 CHAT_TEXT_RE = re.compile(
     r"^\s*User:\s*(?P<user>.*?)\s*Assistant:\s*(?P<assistant>.*?)\s*$",
@@ -218,24 +219,19 @@ def parse_canonical_or_legacy_row(payload: dict[str, Any]) -> dict[str, Any]:
 
 def load_canonical_rows(path: Path) -> list[dict[str, Any]]:
     rows: list[dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as handle:
-        for line_number, line in enumerate(handle, start=1):
-            stripped = line.strip()
-            if not stripped:
-                continue
-            payload = json.loads(stripped)
-            try:
-                rows.append(parse_canonical_or_legacy_row(payload))
-            except ValueError as exc:
-                raise ValueError(f"{path}:{line_number}: {exc}") from exc
+    for line_number, payload in iter_jsonl(path):
+        try:
+            rows.append(parse_canonical_or_legacy_row(payload))
+        except ValueError as exc:
+            raise ValueError(f"{path}:{line_number}: {exc}") from exc
     return rows
 
 
 def write_canonical_rows(path: Path, rows: list[dict[str, Any]]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
-        for row in rows:
-            handle.write(json.dumps(build_canonical_row(row["user_prompt"], row["assistant_response"], row["metadata"]), ensure_ascii=False) + "\n")
+    write_jsonl(
+        path,
+        (build_canonical_row(row["user_prompt"], row["assistant_response"], row["metadata"]) for row in rows),
+    )
 
 
 def category_distribution(rows: list[dict[str, Any]]) -> dict[str, int]:
@@ -487,31 +483,54 @@ def split_rows_by_repo_time(
     return buckets, report
 
 
-def build_source_summary(rows_by_split: dict[str, list[dict[str, Any]]]) -> dict[str, Any]:
-    all_rows = [row for rows in rows_by_split.values() for row in rows]
-    contours = Counter(str(row["metadata"].get("contour", "unknown")) for row in all_rows)
-    segments = Counter(str(row["metadata"].get("segment", "unknown")) for row in all_rows)
-    sources = Counter(str(row["metadata"].get("source", "unknown")) for row in all_rows)
-    categories = Counter(infer_task_category(row) for row in all_rows)
+def metadata_columns(rows: list[dict[str, Any]], keys: tuple[str, ...] = SUMMARY_METADATA_KEYS) -> dict[str, list[str]]:
+    columns: dict[str, list[str]] = {key: [] for key in keys}
+    for row in rows:
+        for key in keys:
+            if key == "category":
+                columns[key].append(infer_task_category(row))
+            else:
+                columns[key].append(str(row["metadata"].get(key, "unknown")))
+    return columns
+
+
+def merge_metadata_columns(columns_by_split: dict[str, dict[str, list[str]]]) -> dict[str, list[str]]:
+    merged: dict[str, list[str]] = {}
+    for columns in columns_by_split.values():
+        for key, values in columns.items():
+            merged.setdefault(key, []).extend(values)
+    return merged
+
+
+def build_source_summary_from_columns(columns: dict[str, list[str]]) -> dict[str, Any]:
+    rows_total = len(next(iter(columns.values()), []))
     return {
-        "rows_total": len(all_rows),
-        "contours": dict(sorted(contours.items())),
-        "segments": dict(sorted(segments.items())),
-        "sources": dict(sorted(sources.items())),
-        "categories": dict(sorted(categories.items())),
+        "rows_total": rows_total,
+        "contours": dict(sorted(Counter(columns.get("contour", [])).items())),
+        "segments": dict(sorted(Counter(columns.get("segment", [])).items())),
+        "sources": dict(sorted(Counter(columns.get("source", [])).items())),
+        "categories": dict(sorted(Counter(columns.get("category", [])).items())),
     }
 
 
-def build_license_summary(rows_by_split: dict[str, list[dict[str, Any]]]) -> dict[str, Any]:
-    licenses = Counter(
-        str(row["metadata"].get("license", "unknown")) for rows in rows_by_split.values() for row in rows
-    )
+def build_license_summary_from_columns(columns: dict[str, list[str]]) -> dict[str, Any]:
+    licenses = Counter(columns.get("license", []))
     return {
         "licenses": dict(sorted(licenses.items())),
-        "missing_license_rows": sum(1 for key, value in licenses.items() if key == "unknown" for _ in range(value)),
+        "missing_license_rows": licenses.get("unknown", 0),
     }
 
 
+def build_source_summary(rows_by_split: dict[str, list[dict[str, Any]]]) -> dict[str, Any]:
+    all_rows = [row for rows in rows_by_split.values() for row in rows]
+    return build_source_summary_from_columns(metadata_columns(all_rows))
+
+
+def build_license_summary(rows_by_split: dict[str, list[dict[str, Any]]]) -> dict[str, Any]:
+    all_rows = [row for rows in rows_by_split.values() for row in rows]
+    return build_license_summary_from_columns(metadata_columns(all_rows, ("license",)))
+
+
 def iso8601_from_timestamp(value: int) -> str:
     return datetime.fromtimestamp(value, tz=timezone.utc).replace(microsecond=0).isoformat()
 
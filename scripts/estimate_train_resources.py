@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Offline peak-VRAM and throughput estimate for a model env x profile env combination.
+
+CPU-only and stdlib-only, so `train.sh` and the DAG can refuse a configuration before it
+takes a GPU slot. Memory per device is the sum of:
+
+- base weights: RWKV-7 blocks (`12 x N_LAYER x N_EMBD^2`) at the `QUANT` width plus
+  embedding and head (`2 x VOCAB_SIZE x N_EMBD`) kept in bf16;
+- trainable PEFT state: LoRA on the 6 block projections (`18 x r x N_EMBD` per layer),
+  fp32 gradients plus Adam master/moments (sharded across devices by DeepSpeed stage >= 1);
+- activations: with `GRAD_CP=1` one `N_EMBD` checkpoint per layer and token plus one
+  recomputed layer, otherwise every layer; `infctx` training uses `CHUNK_CTX` tokens;
+- logits (bf16 + fp32 softmax gradient) and a fixed CUDA/allocator overhead.
+
+Throughput assumes ~`2P` FLOPs per token forward, `2P` backward (frozen base) and `2P`
+recompute with gradient checkpointing. Both figures are multiplied by the median
+observed/predicted ratio of past runs (`runs/*/resource_observation.json`) when present.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import statistics
+import sys
+from pathlib import Path
+from typing import Any
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from profile_env import DEFAULT_MODEL_CONFIG, ROOT_DIR, env_int, load_train_env
+
+
+RUNS_DIR = ROOT_DIR / "runs"
+OBSERVATION_NAME = "resource_observation.json"
+GIB = 1024**3
+WEIGHT_BYTES_PER_PARAM = {"none": 2.0, "int8": 1.0, "nf4": 0.5625, "fp4": 0.5625}
+QUANT_COMPUTE_OVERHEAD = {"none": 1.0, "int8": 1.2, "nf4": 1.3, "fp4": 1.3}
+LORA_PROJECTIONS_PER_LAYER = 18  # r x (in + out) over att r/k/v/o (4 x 2D) and ffn key/value (2 x 5D)
+ACTIVATION_TENSORS_PER_LAYER = 20
+OPTIMIZER_BYTES_PER_PARAM = 12  # fp32 master + Adam m/v
+GRADIENT_BYTES_PER_PARAM = 4
+CUDA_OVERHEAD_BYTES = int(1.2 * GIB)
+DEFAULT_DEVICE_TFLOPS = 30.0
+DEFAULT_HEADROOM = 0.92
+
+
+def estimate_model_params(env: dict[str, str]) -> int:
+    """RWKV-7 parameter count: ~12 x N_LAYER x N_EMBD^2 blocks plus embedding and head."""
+    n_layer = env_int(env, "N_LAYER")
+    n_embd = env_int(env, "N_EMBD")
+    vocab_size = env_int(env, "VOCAB_SIZE")
+    return 12 * n_layer * n_embd * n_embd + 2 * vocab_size * n_embd
+
+
+def estimate_weight_bytes(env: dict[str, str]) -> float:
+    """Frozen base weights: blocks at the `QUANT` width, embedding and head in bf16."""
+    n_layer = env_int(env, "N_LAYER")
+    n_embd = env_int(env, "N_EMBD")
+    vocab_size = env_int(env, "VOCAB_SIZE")
+    quant = env.get("QUANT", "none") or "none"
+    return 12 * n_layer * n_embd * n_embd * WEIGHT_BYTES_PER_PARAM.get(quant, 2.0) + 2 * vocab_size * n_embd * 2
+
+
+def _lora_rank(env: dict[str, str]) -> int:
+    try:
+        config = json.loads(env.get("PEFT_CONFIG", "") or "{}")
+    except json.JSONDecodeError:
+        config = {}
+    return int(config.get("r", 8)) if isinstance(config, dict) else 8
+
+
+def _deepspeed_stage(strategy: str) -> int:
+    for stage in (3, 2, 1):
+        if f"stage_{stage}" in strategy:
+            return stage
+    return 0
+
+
+def predict_resources(env: dict[str, str], devices: int = 1, device_tflops: float = DEFAULT_DEVICE_TFLOPS) -> dict[str, Any]:
+    """Uncalibrated per-device prediction; byte counts are exact model terms, not rounded."""
+    n_layer = env_int(env, "N_LAYER")
+    n_embd = env_int(env, "N_EMBD")
+    vocab_size = env_int(env, "VOCAB_SIZE")
+    ctx_len = env_int(env, "CTX_LEN")
+    micro_bsz = env_int(env, "MICRO_BSZ", 1)
+    grad_cp = env.get("GRAD_CP", "0") == "1"
+    quant = env.get("QUANT", "none") or "none"
+    peft = env.get("PEFT", "lora") or "lora"
+    stage = _deepspeed_stage(env.get("STRATEGY", ""))
+    chunk_ctx = env_int(env, "CHUNK_CTX", ctx_len)
+
+    block_params = 12 * n_layer * n_embd * n_embd
+    embed_params = 2 * vocab_size * n_embd
+    params = block_params + embed_params
+    weight_bytes = estimate_weight_bytes(env)
+    if peft == "none":
+        trainable = params
+    else:
+        trainable = LORA_PROJECTIONS_PER_LAYER * _lora_rank(env) * n_embd * n_layer
+    shards = max(1, devices) if stage >= 1 else 1
+    grad_shards = max(1, devices) if stage >= 2 else 1
+    state_bytes = trainable * (GRADIENT_BYTES_PER_PARAM / grad_shards + OPTIMIZER_BYTES_PER_PARAM / shards)
+
+    window = min(ctx_len, chunk_ctx) if env.get("TRAIN_TYPE") == "infctx" else ctx_len
+    tokens = micro_bsz * window
+    layer_activation = ACTIVATION_TENSORS_PER_LAYER * tokens * n_embd * 2
+    if grad_cp:
+        activation_bytes = n_layer * tokens * n_embd * 2 + layer_activation
+    else:
+        activation_bytes = n_layer * layer_activation
+    logits_bytes = tokens * vocab_size * 6
+    total = weight_bytes + state_bytes + activation_bytes + logits_bytes + CUDA_OVERHEAD_BYTES
+
+    flops_per_token = (6 if grad_cp else 4) * params + 6 * trainable
+    tokens_per_sec = device_tflops * 1e12 / flops_per_token / QUANT_COMPUTE_OVERHEAD.get(quant, 1.0)
+    return {
+        "params": params,
+        "trainable_params": trainable,
+        "memory_gb": {
+            "weights": round(weight_bytes / GIB, 3),
+            "peft_state": round(state_bytes / GIB, 3),
+            "activations": round(activation_bytes / GIB, 3),
+            "logits": round(logits_bytes / GIB, 3),
+            "overhead": round(CUDA_OVERHEAD_BYTES / GIB, 3),
+        },
+        "peak_memory_gb": total / GIB,
+        "tokens_per_sec_per_device": tokens_per_sec,
+    }
+
+
+def load_observations(runs_dir: Path) -> list[dict[str, Any]]:
+    observations = []
+    for path in sorted(runs_dir.glob(f"*/{OBSERVATION_NAME}")):
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            continue
+        if isinstance(payload, dict) and isinstance(payload.get("env"), dict):
+            payload["path"] = str(path)
+            observations.append(payload)
+    return observations
+
+
+def calibrate(observations: list[dict[str, Any]], device_tflops: float) -> dict[str, Any]:
+    memory_ratios = []
+    throughput_ratios = []
+    for observation in observations:
+        try:
+            predicted = predict_resources(observation["env"], int(observation.get("devices", 1)), device_tflops)
+        except ValueError:
+            continue
+        if observation.get("peak_memory_gb"):
+            memory_ratios.append(float(observation["peak_memory_gb"]) / predicted["peak_memory_gb"])
+        if observation.get("tokens_per_sec"):
+            throughput_ratios.append(float(observation["tokens_per_sec"]) / predicted["tokens_per_sec_per_device"])
+    return {
+        "observations": len(observations),
+        "memory_scale": round(statistics.median(memory_ratios), 4) if memory_ratios else 1.0,
+        "throughput_scale": round(statistics.median(throughput_ratios), 4) if throughput_ratios else 1.0,
+        "memory_samples": len(memory_ratios),
+        "throughput_samples": len(throughput_ratios),
+    }
+
+
+def suggest_adjustments(
+    env: dict[str, str],
+    devices: int,
+    budget_gb: float,
+    memory_scale: float,
+    device_tflops: float,
+) -> dict[str, str] | None:
+    """Cheapest override set that fits: GRAD_CP, then MICRO_BSZ, then infctx CHUNK_CTX; tokens/step kept."""
+    micro_bsz = env_int(env, "MICRO_BSZ", 1)
+    accumulate = env_int(env, "ACCUMULATE_GRAD_BATCHES", 1)
+    candidates: list[dict[str, str]] = [{"GRAD_CP": "1"}]
+    for smaller in (micro_bsz // 2, 1):
+        if 1 <= smaller < micro_bsz:
+            candidates.append(
+                {
+                    "GRAD_CP": "1",
+                    "MICRO_BSZ": str(smaller),
+                    "ACCUMULATE_GRAD_BATCHES": str(math.ceil(accumulate * micro_bsz / smaller)),
+                }
+            )
+    base = candidates[-1]
+    chunk = env_int(env, "CHUNK_CTX", env_int(env, "CTX_LEN"))
+    while chunk > 128:
+        chunk //= 2
+        candidates.append({**base, "TRAIN_TYPE": "infctx", "CHUNK_CTX": str(chunk)})
+    for overrides in candidates:
+        changed = {key: value for key, value in overrides.items() if env.get(key) != value}
+        if not changed:
+            continue
+        predicted = predict_resources({**env, **overrides}, devices, device_tflops)
+        if predicted["peak_memory_gb"] * memory_scale <= budget_gb:
+            return changed
+    return None
+
+
+def estimate(
+    model_config: Path,
+    profile_config: Path,
+    devices: int = 1,
+    gpu_memory_gb: float | None = None,
+    headroom: float = DEFAULT_HEADROOM,
+    device_tflops: float = DEFAULT_DEVICE_TFLOPS,
+    runs_dir: Path = RUNS_DIR,
+    overrides: dict[str, str] | None = None,
+) -> dict[str, Any]:
+    env = load_train_env(model_config, profile_config)
+    env.update(overrides or {})
+    calibration = calibrate(load_observations(runs_dir), device_tflops)
+    predicted = predict_resources(env, devices, device_tflops)
+    peak = predicted["peak_memory_gb"] * calibration["memory_scale"]
+    tokens_per_sec = predicted["tokens_per_sec_per_device"] * calibration["throughput_scale"]
+    report: dict[str, Any] = {
+        "model_config": str(model_config),
+        "profile_config": str(profile_config),
+        "devices": devices,
+        "params": predicted["params"],
+        "trainable_params": predicted["trainable_params"],
+        "memory_breakdown_gb": predicted["memory_gb"],
+        "peak_memory_gb": round(peak, 2),
+        "tokens_per_sec_per_device": round(tokens_per_sec, 1),
+        "tokens_per_sec_total": round(tokens_per_sec * devices, 1),
+        "calibration": calibration,
+    }
+    if gpu_memory_gb:
+        budget = gpu_memory_gb * headroom
+        fits = peak <= budget
+        report.update(
+            {
+                "gpu_memory_gb": gpu_memory_gb,
+                "budget_gb": round(budget, 2),
+                "verdict": "fits" if fits else "exceeds",
+                "suggested_overrides": None
+                if fits
+                else suggest_adjustments(env, devices, budget, calibration["memory_scale"], device_tflops),
+            }
+        )
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Estimate peak VRAM and tokens/sec for a training configuration.")
+    parser.add_argument("--model", default=str(DEFAULT_MODEL_CONFIG), help="Model env (configs/model/*.env).")
+    parser.add_argument("--profile", required=True, help="Profile env (configs/profile/*.env).")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--gpu-memory-gb", type=float, default=None, help="Per-device VRAM; enables the verdict.")
+    parser.add_argument("--headroom", type=float, default=DEFAULT_HEADROOM, help="Usable share of --gpu-memory-gb.")
+    parser.add_argument("--device-tflops", type=float, default=DEFAULT_DEVICE_TFLOPS, help="Sustained bf16 TFLOPS per device.")
+    parser.add_argument("--runs-dir", default=str(RUNS_DIR), help="Where runs/*/resource_observation.json live.")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="Override an env value.")
+    parser.add_argument("--check", action="store_true", help="Exit 3 when the configuration exceeds the budget.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    overrides = {}
+    for item in args.set:
+        key, separator, value = item.partition("=")
+        if not separator:
+            print(f"--set expects KEY=VALUE, got: {item}", file=sys.stderr)
+            return 1
+        overrides[key] = value
+    try:
+        report = estimate(
+            Path(args.model),
+            Path(args.profile),
+            devices=args.devices,
+            gpu_memory_gb=args.gpu_memory_gb,
+            headroom=args.headroom,
+            device_tflops=args.device_tflops,
+            runs_dir=Path(args.runs_dir),
+            overrides=overrides,
+        )
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.check and report.get("verdict") == "exceeds":
+        suggestion = report["suggested_overrides"]
+        hint = " ".join(f"{key}={value}" for key, value in suggestion.items()) if suggestion else "none found"
+        print(
+            f"resource_preflight_refused: ~{report['peak_memory_gb']} GB > budget {report['budget_gb']} GB; "
+            f"suggested overrides: {hint}",
+            file=sys.stderr,
+        )
+        return 3
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
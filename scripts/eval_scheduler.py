@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Length-bucketed batch scheduler for eval prompts.
+
+Rows are grouped by `(key, length bucket)` where the bucket is the next power of two of the
+tokenized prompt length (at least `MIN_BUCKET_TOKENS`) and `key` separates rows that cannot
+share a batch (e.g. different decode budgets). Within a group, rows are packed in length
+order while `rows x longest prompt` stays under `max_batch_tokens`, so a 10-token identity
+question never waits on a BSL method. Outputs are returned in the original row order with
+per-bucket throughput.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from typing import Any, Callable, Hashable, Sequence
+
+
+MIN_BUCKET_TOKENS = 16
+
+
+def length_bucket(length: int) -> int:
+    bucket = MIN_BUCKET_TOKENS
+    while bucket < length:
+        bucket *= 2
+    return bucket
+
+
+def plan_batches(
+    lengths: Sequence[int],
+    max_batch_tokens: int,
+    max_batch_rows: int = 0,
+    keys: Sequence[Hashable] | None = None,
+) -> list[dict[str, Any]]:
+    """Batches as `{"key", "bucket", "indices"}`; a row longer than the budget runs alone."""
+    if max_batch_tokens < 1:
+        raise ValueError("scheduler_invalid_budget: max_batch_tokens must be >= 1")
+    groups: dict[tuple[Any, int], list[int]] = defaultdict(list)
+    for index, length in enumerate(lengths):
+        key = keys[index] if keys is not None else None
+        groups[(key, length_bucket(length))].append(index)
+
+    batches: list[dict[str, Any]] = []
+    for (key, bucket), indices in sorted(groups.items(), key=lambda item: (item[0][1], repr(item[0][0]))):
+        current: list[int] = []
+        longest = 0
+        for index in sorted(indices, key=lambda i: (lengths[i], i)):
+            widest = max(longest, lengths[index])
+            full = max_batch_rows and len(current) >= max_batch_rows
+            if current and (full or widest * (len(current) + 1) > max_batch_tokens):
+                batches.append({"key": key, "bucket": bucket, "indices": current})
+                current, widest = [], lengths[index]
+            current.append(index)
+            longest = widest
+        if current:
+            batches.append({"key": key, "bucket": bucket, "indices": current})
+    return batches
+
+
+def run_batches(
+    items: Sequence[Any],
+    lengths: Sequence[int],
+    batches: list[dict[str, Any]],
+    generate_batch: Callable[[list[Any], Any], list[dict[str, Any]]],
+    clock: Callable[[], float] = time.perf_counter,
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """Run `generate_batch(batch_items, key)` per batch; results in item order plus stats per bucket.
+
+    A result may report `tokens_generated`; bucket tok/s counts prompt plus generated tokens.
+    """
+    results: list[dict[str, Any] | None] = [None] * len(items)
+    stats: dict[str, dict[str, Any]] = {}
+    for batch in batches:
+        indices = batch["indices"]
+        started = clock()
+        outputs = generate_batch([items[index] for index in indices], batch["key"])
+        elapsed = clock() - started
+        if len(outputs) != len(indices):
+            raise ValueError(f"scheduler_batch_size_mismatch: expected {len(indices)} results, got {len(outputs)}")
+        bucket = stats.setdefault(
+            str(batch["bucket"]),
+            {"batches": 0, "rows": 0, "prompt_tokens": 0, "generated_tokens": 0, "seconds": 0.0},
+        )
+        bucket["batches"] += 1
+        bucket["rows"] += len(indices)
+        bucket["seconds"] += elapsed
+        for index, output in zip(indices, outputs):
+            results[index] = output
+            bucket["prompt_tokens"] += lengths[index]
+            bucket["generated_tokens"] += output.get("tokens_generated") or 0
+    for bucket in stats.values():
+        tokens = bucket["prompt_tokens"] + bucket["generated_tokens"]
+        bucket["seconds"] = round(bucket["seconds"], 6)
+        bucket["tok_s"] = round(tokens / bucket["seconds"], 2) if bucket["seconds"] > 0 else 0.0
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        raise ValueError(f"scheduler_rows_unscheduled: {missing[:10]}")
+    return results, dict(sorted(stats.items(), key=lambda kv: int(kv[0])))
+
+
+def merge_bucket_stats(into: dict[str, dict[str, Any]], stats: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Add `run_batches` bucket stats into `into` (e.g. across suites), recomputing tok/s."""
+    for name, bucket in stats.items():
+        total = into.setdefault(
+            name, {"batches": 0, "rows": 0, "prompt_tokens": 0, "generated_tokens": 0, "seconds": 0.0}
+        )
+        for field in ("batches", "rows", "prompt_tokens", "generated_tokens"):
+            total[field] += bucket[field]
+        total["seconds"] = round(total["seconds"] + bucket["seconds"], 6)
+        tokens = total["prompt_tokens"] + total["generated_tokens"]
+        total["tok_s"] = round(tokens / total["seconds"], 2) if total["seconds"] > 0 else 0.0
+    return into
@@ -1,16 +1,35 @@
 #!/usr/bin/env python3
-"""CLI inference wrapper around BlinkDL/Albatross for RWKV models."""
+"""CLI inference wrapper around BlinkDL/Albatross for RWKV models.
+
+`--prompts-jsonl` runs many prompts against one loaded model; prefill then resumes from the
+deepest prefix state cached by an earlier prompt (`rwkv_state_cache`). With
+`--max-batch-tokens`, prompts are grouped by length (`eval_scheduler`): each row of a batch is
+prefilled on its own and the batch decodes together.
+
+Arguments, checkpoint/tokenizer/Albatross paths and prompts are validated before torch is
+imported, so `--help`, usage errors and `--dry-run` return without paying for it.
+"""
 
 from __future__ import annotations
 
 import argparse
 import json
 import random
-import subprocess
 import sys
 import time
 from pathlib import Path
 from types import SimpleNamespace
+from typing import Any, Callable, Sequence
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from eval_scheduler import plan_batches, run_batches
+from rwkv_state_cache import DEFAULT_BLOCK_TOKENS, DEFAULT_MAX_MB, PrefixStateCache, concat_states, prefill_with_cache, state_batch_axes
+from weights_cache import add_weights_cache_arguments, load_safetensors, peak_rss_mb, prepare_weights, redirect_torch_load
+
+EOD_TOKEN_ID = 0
 
 
 def parse_args() -> argparse.Namespace:
@@ -23,9 +42,26 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--prompt",
-        required=True,
+        default=None,
         help="Input prompt.",
     )
+    parser.add_argument(
+        "--prompts-jsonl",
+        default="",
+        help='Run every prompt of a JSONL file (`{"prompt": ...}` per line) with one model load.',
+    )
+    parser.add_argument(
+        "--state-cache-mb",
+        type=int,
+        default=DEFAULT_MAX_MB,
+        help="Memory budget of the prefix-state cache shared by prompts (0 disables).",
+    )
+    parser.add_argument(
+        "--state-cache-block",
+        type=int,
+        default=DEFAULT_BLOCK_TOKENS,
+        help="Prefix states are cached every N prompt tokens and at each prompt end.",
+    )
     parser.add_argument(
         "--tokens",
         type=int,
@@ -76,7 +112,62 @@ def parse_args() -> argparse.Namespace:
         default="",
         help="Optional path to write structured inference output as JSON.",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--stop",
+        action="append",
+        default=[],
+        help="Stop decoding a sample once its completion contains this string (repeatable); it is cut off.",
+    )
+    parser.add_argument(
+        "--stop-token",
+        action="append",
+        type=int,
+        default=[],
+        help=f"Stop decoding a sample on this token id (repeatable). Default: {EOD_TOKEN_ID} (end of document).",
+    )
+    parser.add_argument(
+        "--ignore-eos",
+        action="store_true",
+        help="Do not stop on the end-of-document token unless it is passed via --stop-token.",
+    )
+    parser.add_argument(
+        "--max-batch-tokens",
+        type=int,
+        default=0,
+        help="--prompts-jsonl: batch prompts of similar length under rows x longest prompt <= N (0 = one at a time).",
+    )
+    add_weights_cache_arguments(parser)
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Validate arguments, paths and prompts, print the resolved plan as JSON and exit without loading torch.",
+    )
+    args = parser.parse_args()
+    if (args.prompt is None) == (not args.prompts_jsonl):
+        parser.error("pass exactly one of --prompt or --prompts-jsonl")
+    if args.max_batch_tokens and (not args.prompts_jsonl or args.batch != 1):
+        parser.error("--max-batch-tokens needs --prompts-jsonl and --batch 1")
+    if args.tokens < 0:
+        parser.error("--tokens must be >= 0")
+    if args.batch < 1:
+        parser.error("--batch must be >= 1")
+    if args.temperature <= 0:
+        parser.error("--temperature must be > 0")
+    return args
+
+
+def load_prompts(path: Path) -> list[str]:
+    prompts = []
+    with path.open("r", encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            prompt = item.get("prompt") if isinstance(item, dict) else item
+            if not isinstance(prompt, str):
+                raise ValueError(f"{path}:{line_number}: expected a string or an object with a string prompt")
+            prompts.append(prompt)
+    return prompts
 
 
 def normalize_model_prefix(model_arg: str) -> str:
@@ -98,6 +189,8 @@ def ensure_albatross_repo(albatross_dir: Path, auto_clone: bool) -> None:
             f"Albatross not found at {albatross_dir}. "
             "Use --auto-clone or clone manually: git clone https://github.com/BlinkDL/Albatross <dir>"
         )
+    import subprocess  # pylint: disable=import-outside-toplevel
+
     albatross_dir.parent.mkdir(parents=True, exist_ok=True)
     subprocess.run(
         ["git", "clone", "--depth", "1", "https://github.com/BlinkDL/Albatross", str(albatross_dir)],
@@ -105,6 +198,141 @@ def ensure_albatross_repo(albatross_dir: Path, auto_clone: bool) -> None:
     )
 
 
+def truncate_at_stop(text: str, stop_sequences: Sequence[str]) -> str:
+    cut = min((text.find(stop) for stop in stop_sequences if stop and stop in text), default=-1)
+    return text if cut < 0 else text[:cut]
+
+
+def decode_with_stops(
+    out,
+    sample: Callable,
+    forward: Callable,
+    decode: Callable[[list[int]], str],
+    batch: int,
+    max_tokens: int,
+    stop_tokens: Sequence[int] = (),
+    stop_sequences: Sequence[str] = (),
+) -> tuple[list[list[int]], list[str]]:
+    """Decode up to `max_tokens` per sample; a sample stops on a stop token or once its decoded
+    tail contains a stop sequence, and decoding ends when every sample has stopped.
+
+    `sample(out)` returns one `[token]` per sample and `forward(next_tokens)` the next logits.
+    Returns generated tokens (stop tokens excluded) and a `stop_token|stop_sequence|length`
+    reason per sample.
+    """
+    generated: list[list[int]] = [[] for _ in range(batch)]
+    reasons = ["length"] * batch
+    active = set(range(batch))
+    stop_token_set = set(stop_tokens)
+    # Every token is at least one byte, so the last N tokens cover any stop of N bytes.
+    window = max((len(stop.encode("utf-8")) for stop in stop_sequences), default=0)
+    for _ in range(max_tokens):
+        next_tokens = sample(out)
+        for i in sorted(active):
+            token = next_tokens[i][0]
+            if token in stop_token_set:
+                reasons[i] = "stop_token"
+                active.discard(i)
+                continue
+            generated[i].append(token)
+            if window and any(stop in decode(generated[i][-window:]) for stop in stop_sequences):
+                reasons[i] = "stop_sequence"
+                active.discard(i)
+        if not active:
+            break
+        out = forward(next_tokens)
+    return generated, reasons
+
+
+def resolve_albatross_paths(
+    albatross_dir: str,
+    model_arg: str,
+    tokenizer_arg: str = "",
+    auto_clone: bool = False,
+    lora_adapter: str = "",
+) -> SimpleNamespace:
+    """`albatross_path`, `model_prefix` and `tokenizer_path`, checked to exist (no torch needed)."""
+    albatross_path = Path(albatross_dir).expanduser().resolve()
+    ensure_albatross_repo(albatross_path, auto_clone=auto_clone)
+
+    model_prefix = normalize_model_prefix(model_arg)
+    tokenizer_path = (
+        Path(tokenizer_arg).expanduser().resolve()
+        if tokenizer_arg
+        else albatross_path / "reference" / "rwkv_vocab_v20230424.txt"
+    )
+    if not tokenizer_path.exists():
+        raise FileNotFoundError(f"Tokenizer not found: {tokenizer_path}")
+    if lora_adapter and not Path(lora_adapter).expanduser().is_file():
+        raise FileNotFoundError(f"LoRA adapter not found: {lora_adapter}")
+    return SimpleNamespace(albatross_path=albatross_path, model_prefix=model_prefix, tokenizer_path=tokenizer_path)
+
+
+def load_albatross(
+    albatross_dir: str,
+    model_arg: str,
+    tokenizer_arg: str = "",
+    auto_clone: bool = False,
+    weights_cache: bool = False,
+    weights_cache_dir: str = "",
+    lora_adapter: str = "",
+    lora_alpha: float | None = None,
+) -> SimpleNamespace:
+    """Load an `RWKV_x070` model and its tokenizer from the Albatross reference implementation.
+
+    With `weights_cache` (implied by `lora_adapter`) the model gets the memory-mapped
+    safetensors copy of the checkpoint, merged with the adapter, from `weights_cache`
+    instead of unpickling the `.pth`.
+
+    Returns `model`, `tokenizer`, `model_prefix` (checkpoint path without `.pth`),
+    `sampler_simple_batch` and `load` (seconds, peak host RSS and the weights used).
+    """
+    started = time.perf_counter()
+    paths = resolve_albatross_paths(albatross_dir, model_arg, tokenizer_arg, auto_clone, lora_adapter)
+    albatross_path, model_prefix, tokenizer_path = paths.albatross_path, paths.model_prefix, paths.tokenizer_path
+
+    # Albatross modules are repo-relative imports.
+    sys.path.insert(0, str(albatross_path))
+    import torch  # pylint: disable=import-outside-toplevel
+    from reference.rwkv7 import RWKV_x070  # pylint: disable=import-outside-toplevel
+    from reference.utils import (  # pylint: disable=import-outside-toplevel
+        TRIE_TOKENIZER,
+        sampler_simple_batch,
+    )
+
+    model_args = SimpleNamespace(vocab_size=65536, head_size=64, MODEL_NAME=model_prefix)
+    checkpoint = Path(model_prefix + ".pth")
+    cached = None
+    if weights_cache or lora_adapter:
+        cached = prepare_weights(
+            checkpoint,
+            Path(weights_cache_dir).expanduser() if weights_cache_dir else None,
+            Path(lora_adapter).expanduser() if lora_adapter else None,
+            lora_alpha,
+        )
+        print(f"Loading model: {cached['path']} (mmap)")
+        state_dict, _ = load_safetensors(Path(cached["path"]))
+        with redirect_torch_load(torch, checkpoint, state_dict):
+            model = RWKV_x070(model_args)
+    else:
+        print(f"Loading model: {checkpoint}")
+        model = RWKV_x070(model_args)
+    load = {
+        "seconds": round(time.perf_counter() - started, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "weights": cached["path"] if cached else str(checkpoint),
+        "weights_cache": cached,
+    }
+    print(f"Model loaded in {load['seconds']:.2f}s, peak host RSS {load['peak_rss_mb']} MiB")
+    return SimpleNamespace(
+        model=model,
+        tokenizer=TRIE_TOKENIZER(str(tokenizer_path)),
+        model_prefix=model_prefix,
+        sampler_simple_batch=sampler_simple_batch,
+        load=load,
+    )
+
+
 def set_seed(seed: int) -> None:
     import numpy as np  # pylint: disable=import-outside-toplevel
     import torch  # pylint: disable=import-outside-toplevel
@@ -116,88 +344,188 @@ def set_seed(seed: int) -> None:
         torch.cuda.manual_seed(seed)
 
 
-def main() -> int:
-    args = parse_args()
+class AlbatrossGenerator:
+    """Prefill and decode groups of prompts on one loaded Albatross model.
 
-    import torch  # pylint: disable=import-outside-toplevel
+    Prompts are prefilled one at a time through the prefix-state cache; a group's states are
+    then joined along their batch axes and decoded together.
+    """
 
-    if args.tokens < 0:
-        raise ValueError("--tokens must be >= 0")
-    if args.batch < 1:
-        raise ValueError("--batch must be >= 1")
-    if args.temperature <= 0:
-        raise ValueError("--temperature must be > 0")
+    def __init__(
+        self,
+        albatross: SimpleNamespace,
+        state_cache: PrefixStateCache | None = None,
+        stop_tokens: Sequence[int] = (EOD_TOKEN_ID,),
+        noise: float = 0.0,
+        temperature: float = 1.0,
+        verbose: bool = True,
+    ) -> None:
+        import torch  # pylint: disable=import-outside-toplevel
 
-    albatross_dir = Path(args.albatross_dir).expanduser().resolve()
-    ensure_albatross_repo(albatross_dir, auto_clone=args.auto_clone)
+        self.torch = torch
+        self.model = albatross.model
+        self.tokenizer = albatross.tokenizer
+        self.sampler = albatross.sampler_simple_batch
+        self.state_cache = state_cache
+        self.stop_tokens = list(stop_tokens)
+        self.noise = noise
+        self.temperature = temperature
+        self.verbose = verbose
+        self._batch_axes: Any = None
 
-    model_prefix = normalize_model_prefix(args.model)
-    tokenizer_path = (
-        Path(args.tokenizer).expanduser().resolve()
-        if args.tokenizer
-        else albatross_dir / "reference" / "rwkv_vocab_v20230424.txt"
+    def log(self, message: str = "") -> None:
+        if self.verbose:
+            print(message)
+
+    def synchronize(self) -> None:
+        if self.torch.cuda.is_available():
+            self.torch.cuda.synchronize()
+
+    def generate(
+        self,
+        group: list[tuple[str, list[int]]],
+        tokens: int,
+        stop_sequences: Sequence[str] = (),
+        samples_per_prompt: int = 1,
+    ) -> list[dict[str, Any]]:
+        """One result per prompt; a single prompt gets `samples_per_prompt` samples, a group one per row."""
+        model = self.model
+        if len(group) == 1:
+            rows = samples_per_prompt
+            out, state, reused = prefill_with_cache(
+                self.state_cache, group[0][1], lambda: model.generate_zero_state(rows), model.forward_batch, rows
+            )
+            self.log(f"Prefill: batch={rows} reused_prefix_tokens={reused}")
+        else:
+            if self._batch_axes is None:
+                self._batch_axes = state_batch_axes(model.generate_zero_state)
+            rows = len(group)
+            prefilled = [
+                prefill_with_cache(self.state_cache, ids, lambda: model.generate_zero_state(1), model.forward_batch, 1)
+                for _, ids in group
+            ]
+            out = concat_states([item[0] for item in prefilled], self.torch.cat, 0)
+            state = concat_states([item[1] for item in prefilled], self.torch.cat, self._batch_axes)
+            self.log(f"Prefill: rows={rows} reused_prefix_tokens={sum(item[2] for item in prefilled)}")
+
+        generated_tokens: list[list[int]] = [[] for _ in range(rows)]
+        stop_reasons = ["length"] * rows
+        if tokens > 0:
+            self.synchronize()
+            t0 = time.perf_counter()
+            generated_tokens, stop_reasons = decode_with_stops(
+                out,
+                lambda logits: self.sampler(logits, noise=self.noise, temp=self.temperature).tolist(),
+                lambda next_tokens: model.forward_batch(next_tokens, state),
+                lambda ids: self.tokenizer.decode(ids, utf8_errors="ignore"),
+                rows,
+                tokens,
+                self.stop_tokens,
+                stop_sequences,
+            )
+            self.synchronize()
+            dt = time.perf_counter() - t0
+            decoded = sum(len(ids) for ids in generated_tokens)
+            tps = decoded / dt if dt > 0 else 0.0
+            self.log(f"Decode done: {max(map(len, generated_tokens))}/{tokens} tokens/seq, {tps:.2f} tok/s total")
+
+        self.log()
+        samples = []
+        for i in range(rows):
+            prompt = group[0][0] if len(group) == 1 else group[i][0]
+            completion = truncate_at_stop(self.tokenizer.decode(generated_tokens[i], utf8_errors="ignore"), stop_sequences)
+            samples.append(
+                {
+                    "index": i if len(group) == 1 else 0,
+                    "completion": completion,
+                    "text": prompt + completion,
+                    "tokens_generated": len(generated_tokens[i]),
+                    "stop_reason": stop_reasons[i],
+                }
+            )
+            self.log(f"[sample {i}]")
+            self.log(prompt + completion)
+            self.log("-" * 80)
+        grouped = [samples] if len(group) == 1 else [[sample] for sample in samples]
+        return [
+            {
+                "prompt": prompt,
+                "samples": prompt_samples,
+                "tokens_generated": sum(sample["tokens_generated"] for sample in prompt_samples),
+            }
+            for (prompt, _), prompt_samples in zip(group, grouped)
+        ]
+
+
+def main() -> int:
+    args = parse_args()
+    paths = resolve_albatross_paths(
+        args.albatross_dir, args.model, args.tokenizer, args.auto_clone and not args.dry_run, args.lora_adapter
     )
-    if not tokenizer_path.exists():
-        raise FileNotFoundError(f"Tokenizer not found: {tokenizer_path}")
+    prompts = load_prompts(Path(args.prompts_jsonl)) if args.prompts_jsonl else [args.prompt]
+    if args.dry_run:
+        plan = {
+            "model": str(Path(paths.model_prefix + ".pth")),
+            "tokenizer": str(paths.tokenizer_path),
+            "albatross_dir": str(paths.albatross_path),
+            "prompts": len(prompts),
+            "tokens": args.tokens,
+            "batch": args.batch,
+            "max_batch_tokens": args.max_batch_tokens,
+            "weights_cache": bool(args.weights_cache or args.lora_adapter),
+            "lora_adapter": args.lora_adapter or None,
+        }
+        print(json.dumps(plan, ensure_ascii=False, indent=2))
+        return 0
 
     set_seed(args.seed)
+    albatross = load_albatross(
+        args.albatross_dir,
+        args.model,
+        args.tokenizer,
+        args.auto_clone,
+        args.weights_cache,
+        args.weights_cache_dir,
+        args.lora_adapter,
+        args.lora_alpha,
+    )
 
-    # Albatross modules are repo-relative imports.
-    sys.path.insert(0, str(albatross_dir))
-    from reference.rwkv7 import RWKV_x070  # pylint: disable=import-outside-toplevel
-    from reference.utils import (  # pylint: disable=import-outside-toplevel
-        TRIE_TOKENIZER,
-        sampler_simple_batch,
+    stop_tokens = list(args.stop_token) or ([] if args.ignore_eos else [EOD_TOKEN_ID])
+    state_cache = (
+        PrefixStateCache(args.state_cache_mb * 1024 * 1024, args.state_cache_block) if args.state_cache_mb > 0 else None
     )
+    generator = AlbatrossGenerator(albatross, state_cache, stop_tokens, noise=args.noise, temperature=args.temperature)
 
-    model_args = SimpleNamespace(vocab_size=65536, head_size=64, MODEL_NAME=model_prefix)
-    print(f"Loading model: {model_prefix}.pth")
-    model = RWKV_x070(model_args)
-    tokenizer = TRIE_TOKENIZER(str(tokenizer_path))
-
-    prompts = [args.prompt for _ in range(args.batch)]
-    state = model.generate_zero_state(args.batch)
-    encoded = [tokenizer.encode(p) for p in prompts]
-
-    print(f"Prefill: batch={args.batch}")
-    out = model.forward_batch(encoded, state)
-
-    generated_tokens = [[] for _ in range(args.batch)]
-    if args.tokens > 0:
-        torch.cuda.synchronize()
-        t0 = time.perf_counter()
-        for _ in range(args.tokens):
-            next_tokens = sampler_simple_batch(
-                out, noise=args.noise, temp=args.temperature
-            ).tolist()
-            for i in range(args.batch):
-                generated_tokens[i].extend(next_tokens[i])
-            out = model.forward_batch(next_tokens, state)
-        torch.cuda.synchronize()
-        dt = time.perf_counter() - t0
-        tps = (args.tokens * args.batch) / dt if dt > 0 else 0.0
-        print(f"Decode done: {args.tokens} tokens/seq, {tps:.2f} tok/s total")
-
-    print()
-    payload = {
-        "model": str(Path(model_prefix + ".pth")),
-        "prompt": args.prompt,
+    def generate(group: list[tuple[str, list[int]]], key: Any = None) -> list[dict[str, Any]]:
+        return generator.generate(group, args.tokens, args.stop, samples_per_prompt=args.batch)
+
+    payload: dict[str, Any] = {
+        "model": str(Path(albatross.model_prefix + ".pth")),
         "tokens": args.tokens,
         "batch": args.batch,
-        "samples": [],
+        "load": albatross.load,
     }
-    for i in range(args.batch):
-        completion = tokenizer.decode(generated_tokens[i], utf8_errors="ignore")
-        payload["samples"].append(
-            {
-                "index": i,
-                "completion": completion,
-                "text": prompts[i] + completion,
-            }
+    encoded = [(prompt, albatross.tokenizer.encode(prompt)) for prompt in prompts]
+    if args.max_batch_tokens:
+        lengths = [len(ids) for _, ids in encoded]
+        results, payload["scheduler"] = run_batches(
+            encoded, lengths, plan_batches(lengths, args.max_batch_tokens), generate
+        )
+        for bucket, stats in payload["scheduler"].items():
+            print(f"Bucket <= {bucket} tokens: rows={stats['rows']} batches={stats['batches']} {stats['tok_s']} tok/s")
+    else:
+        results = [generate([item])[0] for item in encoded]
+    if args.prompts_jsonl:
+        payload["results"] = results
+    else:
+        payload.update(results[0])
+    payload["state_cache"] = state_cache.stats() if state_cache is not None else None
+    if state_cache is not None:
+        stats = payload["state_cache"]
+        print(
+            f"State cache: hit_rate={stats['hit_rate']} "
+            f"saved_prefill_tokens={stats['saved_prefill_tokens']}/{stats['prefill_tokens']}"
         )
-        print(f"[sample {i}]")
-        print(prompts[i] + completion)
-        print("-" * 80)
 
     if args.output_json:
         output_path = Path(args.output_json).expanduser().resolve()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""Inference backends behind one `generate_batch(prompts, params)` call.
+
+- `SubprocessBackend`: the legacy protocol, one `--output-json` inference script call per
+  batch (`--prompt` for one prompt, `--prompts-jsonl` for several);
+- `AlbatrossBackend`: `infer_albatross.AlbatrossGenerator` in-process, so the model loads once
+  per eval process instead of once per call;
+- `MockBackend`: deterministic CPU backend for tests, dry runs and load tests of the eval
+  gates and scheduler, with simulated latency.
+
+`use_adapter(path)` scores the following prompts with a LoRA adapter on top of the base
+model: the Albatross backend swaps it in place (`lora_adapters`) without reloading the
+base, the subprocess backend passes `--lora-adapter` to the script.
+
+Every backend returns one `{"completion", "tokens_generated"}` per prompt, in prompt order,
+with the completion cut at the first stop sequence and stripped.
+"""
+
+from __future__ import annotations
+
+import abc
+import hashlib
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+BACKEND_NAMES = ("subprocess", "albatross", "mock")
+MOCK_WRONG_ANSWER = "mock: wrong answer"
+
+
+@dataclass
+class GenerationParams:
+    max_tokens: int
+    stop_sequences: list[str] = field(default_factory=list)
+
+
+def approx_token_count(text: str) -> int:
+    """About one BPE token per 4 UTF-8 bytes; the mock's stand-in for a tokenizer."""
+    return -(-len(text.encode("utf-8")) // 4)
+
+
+def completion_sample(sample: Any, stop_sequences: Sequence[str]) -> dict[str, Any]:
+    """`{"completion", "tokens_generated"}` of one inference sample, cut at the first stop sequence."""
+    if not isinstance(sample, dict) or not isinstance(sample.get("completion"), str):
+        raise ValueError("inference_output_missing_completion")
+    completion = sample["completion"]
+    # Scripts that ignore --stop still must not fail exact match on the next turn.
+    cut = min((completion.find(stop) for stop in stop_sequences if stop and stop in completion), default=-1)
+    if cut >= 0:
+        completion = completion[:cut]
+    tokens_generated = sample.get("tokens_generated")
+    return {
+        "completion": completion.strip(),
+        "tokens_generated": tokens_generated if isinstance(tokens_generated, int) else None,
+    }
+
+
+def _first_sample(result: Any) -> Any:
+    samples = result.get("samples") if isinstance(result, dict) else None
+    if not isinstance(samples, list) or not samples:
+        raise ValueError("inference_output_missing_samples")
+    return samples[0]
+
+
+class InferenceBackend(abc.ABC):
+    name = ""
+    # Identity of what generates completions when there is no model file to hash (see MockBackend).
+    fingerprint: str | None = None
+
+    @abc.abstractmethod
+    def generate_batch(self, prompts: list[str], params: GenerationParams) -> list[dict[str, Any]]:
+        """One `{"completion", "tokens_generated"}` per prompt, in prompt order."""
+
+    def use_adapter(self, path: Path, lora_alpha: float | None = None) -> dict[str, Any]:
+        """Generate with the LoRA adapter at `path` from now on; returns what was activated."""
+        raise ValueError(f"backend_adapters_unsupported: {self.name}")
+
+
+class SubprocessBackend(InferenceBackend):
+    name = "subprocess"
+
+    def __init__(
+        self,
+        inference_script: Path,
+        model_path: Path,
+        max_batch_tokens: int = 0,
+        extra_args: Sequence[str] = (),
+    ) -> None:
+        self.inference_script = Path(inference_script)
+        self.model_path = Path(model_path)
+        self.max_batch_tokens = max_batch_tokens
+        self.extra_args = list(extra_args)
+        self.adapter_args: list[str] = []
+
+    def generate_batch(self, prompts: list[str], params: GenerationParams) -> list[dict[str, Any]]:
+        import tempfile  # pylint: disable=import-outside-toplevel
+
+        if len(prompts) == 1:
+            payload = self._run(["--prompt", prompts[0]], params)
+            return [completion_sample(_first_sample(payload), params.stop_sequences)]
+
+        with tempfile.NamedTemporaryFile(
+            "w", prefix="eval-prompts-", suffix=".jsonl", encoding="utf-8", delete=False
+        ) as handle:
+            prompts_jsonl = Path(handle.name)
+            for prompt in prompts:
+                handle.write(json.dumps({"prompt": prompt}, ensure_ascii=False) + "\n")
+        prompt_args = ["--prompts-jsonl", str(prompts_jsonl)]
+        if self.max_batch_tokens:
+            prompt_args += ["--max-batch-tokens", str(self.max_batch_tokens)]
+        try:
+            payload = self._run(prompt_args, params)
+        finally:
+            prompts_jsonl.unlink(missing_ok=True)
+        results = payload.get("results")
+        if not isinstance(results, list) or len(results) != len(prompts):
+            raise ValueError(f"inference_output_results_mismatch: expected {len(prompts)} results")
+        return [completion_sample(_first_sample(result), params.stop_sequences) for result in results]
+
+    def use_adapter(self, path: Path, lora_alpha: float | None = None) -> dict[str, Any]:
+        from lora_adapters import adapter_name  # pylint: disable=import-outside-toplevel
+
+        self.adapter_args = ["--lora-adapter", str(path)]
+        if lora_alpha is not None:
+            self.adapter_args += ["--lora-alpha", f"{lora_alpha:g}"]
+        return {"name": adapter_name(Path(path)), "path": str(path)}
+
+    def _run(self, prompt_args: list[str], params: GenerationParams) -> dict[str, Any]:
+        import subprocess  # pylint: disable=import-outside-toplevel
+        import tempfile  # pylint: disable=import-outside-toplevel
+
+        with tempfile.NamedTemporaryFile(prefix="eval-infer-", suffix=".json", delete=False) as handle:
+            output_json = Path(handle.name)
+        command = [
+            sys.executable,
+            str(self.inference_script),
+            "--model",
+            str(self.model_path),
+            *prompt_args,
+            "--tokens",
+            str(params.max_tokens),
+            "--output-json",
+            str(output_json),
+            *self.extra_args,
+            *self.adapter_args,
+        ]
+        for stop in params.stop_sequences:
+            command.append(f"--stop={stop}")
+        try:
+            result = subprocess.run(
+                command,
+                check=False,
+                text=True,
+                capture_output=True,
+            )
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"inference_failed script={self.inference_script} stdout={result.stdout} stderr={result.stderr}"
+                )
+            return json.loads(output_json.read_text(encoding="utf-8"))
+        finally:
+            output_json.unlink(missing_ok=True)
+
+
+class AlbatrossBackend(InferenceBackend):
+    """Greedy decoding (the `infer_albatross.py` defaults) on a model loaded once.
+
+    Adapters are swapped in place on that model, which needs the base loaded from the weight
+    cache (`weights_cache=True`).
+    """
+
+    name = "albatross"
+
+    def __init__(
+        self,
+        model_path: Path,
+        albatross_dir: str | Path,
+        tokenizer: str = "",
+        auto_clone: bool = False,
+        state_cache_mb: int | None = None,
+        seed: int = 42,
+        weights_cache: bool = False,
+        weights_cache_dir: str = "",
+    ) -> None:
+        # torch and the Albatross reference code are only needed by this backend.
+        from infer_albatross import AlbatrossGenerator, load_albatross, set_seed  # pylint: disable=import-outside-toplevel
+        from rwkv_state_cache import DEFAULT_MAX_MB, PrefixStateCache  # pylint: disable=import-outside-toplevel
+
+        set_seed(seed)
+        albatross = load_albatross(
+            str(albatross_dir), str(model_path), tokenizer, auto_clone, weights_cache, weights_cache_dir
+        )
+        cache_mb = DEFAULT_MAX_MB if state_cache_mb is None else state_cache_mb
+        state_cache = PrefixStateCache(cache_mb * 1024 * 1024) if cache_mb > 0 else None
+        self.tokenizer = albatross.tokenizer
+        self.load = albatross.load
+        self.state_cache = state_cache
+        self.generator = AlbatrossGenerator(albatross, state_cache, verbose=False)
+        self.switcher: Any = None
+
+    def generate_batch(self, prompts: list[str], params: GenerationParams) -> list[dict[str, Any]]:
+        group = [(prompt, self.tokenizer.encode(prompt)) for prompt in prompts]
+        results = self.generator.generate(group, params.max_tokens, params.stop_sequences)
+        return [completion_sample(_first_sample(result), params.stop_sequences) for result in results]
+
+    def use_adapter(self, path: Path, lora_alpha: float | None = None) -> dict[str, Any]:
+        from lora_adapters import AdapterSwitcher, load_adapter  # pylint: disable=import-outside-toplevel
+        from weights_cache import load_safetensors  # pylint: disable=import-outside-toplevel
+
+        if self.switcher is None:
+            cached = self.load.get("weights_cache")
+            if not cached or cached.get("adapter_sha256"):
+                raise ValueError("lora_hot_swap_requires_weights_cache: load the plain base with weights_cache=True")
+            weights = getattr(self.generator.model, "z", None)
+            if not isinstance(weights, dict):
+                raise ValueError("lora_hot_swap_unsupported_model: the model keeps no `z` weight dict")
+            # A mapping of its own: the model's tensors may be views of the one it was built from.
+            base, _ = load_safetensors(Path(cached["path"]))
+            on_change = self.state_cache.clear if self.state_cache is not None else None
+            self.switcher = AdapterSwitcher(weights, base, on_change)
+        adapter = self.switcher.add(load_adapter(Path(path), lora_alpha))
+        return {**adapter.describe(), **self.switcher.activate(adapter.name)}
+
+
+class MockBackend(InferenceBackend):
+    """Deterministic CPU backend: no model, no torch.
+
+    A prompt's completion is `table[prompt]`, or the prompt echoed back when the table has no
+    entry. With `fail_rate`, a fraction of prompts chosen by a stable hash answers
+    `MOCK_WRONG_ANSWER` instead, so gates see failures. Completions are cut at stop sequences
+    and at `max_tokens` tokens of `count_tokens` (`approx_token_count` by default).
+
+    Simulated latency per batch follows the Albatross path: prompts prefill one after another
+    (`prefill_ms_per_token` x prompt tokens) and the batch decodes in lockstep
+    (`decode_ms_per_token` x the longest completion), times lognormal noise with
+    `jitter_sigma`. `sleep` is injectable so tests can count simulated time instead.
+    """
+
+    name = "mock"
+
+    def __init__(
+        self,
+        table: dict[str, str] | None = None,
+        fail_rate: float = 0.0,
+        prefill_ms_per_token: float = 0.0,
+        decode_ms_per_token: float = 0.0,
+        jitter_sigma: float = 0.0,
+        seed: int = 0,
+        count_tokens: Callable[[str], int] = approx_token_count,
+        sleep: Callable[[float], Any] = time.sleep,
+    ) -> None:
+        if not 0 <= fail_rate <= 1:
+            raise ValueError("mock_backend_invalid_fail_rate: fail_rate must be in [0, 1]")
+        self.table = dict(table or {})
+        self.fail_rate = fail_rate
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.decode_ms_per_token = decode_ms_per_token
+        self.jitter_sigma = jitter_sigma
+        self.seed = seed
+        self.count_tokens = count_tokens
+        self.sleep = sleep
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.simulated_seconds = 0.0
+        self.adapter_sha256 = ""
+        digest = hashlib.sha256(json.dumps(self.table, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        digest.update(f"fail_rate={fail_rate} seed={seed}".encode("utf-8"))
+        self.base_fingerprint = self.fingerprint = f"mock:{digest.hexdigest()}"
+
+    @staticmethod
+    def load_table(path: Path) -> dict[str, str]:
+        """`{"prompt": ..., "completion": ...}` JSONL as a prompt -> completion table."""
+        table = {}
+        with Path(path).open("r", encoding="utf-8") as handle:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if not isinstance(item.get("prompt"), str) or not isinstance(item.get("completion"), str):
+                    raise ValueError(f"mock_table_invalid_row: {path}:{line_number}")
+                table[item["prompt"]] = item["completion"]
+        return table
+
+    def fails(self, prompt: str) -> bool:
+        # An adapter reshuffles which prompts fail, so sweeps over adapters see different scores.
+        key = f"{self.seed}:{self.adapter_sha256}:{prompt}" if self.adapter_sha256 else f"{self.seed}:{prompt}"
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2**64 < self.fail_rate
+
+    def use_adapter(self, path: Path, lora_alpha: float | None = None) -> dict[str, Any]:
+        from lora_adapters import adapter_name  # pylint: disable=import-outside-toplevel
+
+        self.adapter_sha256 = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+        self.fingerprint = f"{self.base_fingerprint}+lora:{self.adapter_sha256}"
+        return {"name": adapter_name(Path(path)), "path": str(path), "sha256": self.adapter_sha256}
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+    def generate_batch(self, prompts: list[str], params: GenerationParams) -> list[dict[str, Any]]:
+        samples = []
+        for prompt in prompts:
+            completion = MOCK_WRONG_ANSWER if self.fails(prompt) else self.table.get(prompt, prompt)
+            sample = completion_sample({"completion": completion}, params.stop_sequences)
+            sample["completion"] = self._truncate(sample["completion"], params.max_tokens)
+            sample["tokens_generated"] = self.count_tokens(sample["completion"])
+            samples.append(sample)
+
+        prefill_tokens = sum(self.count_tokens(prompt) for prompt in prompts)
+        decode_tokens = max((sample["tokens_generated"] for sample in samples), default=0)
+        seconds = (prefill_tokens * self.prefill_ms_per_token + decode_tokens * self.decode_ms_per_token) / 1000
+        if self.jitter_sigma > 0:
+            seconds *= self._rng.lognormvariate(0.0, self.jitter_sigma)
+        self.calls += 1
+        self.simulated_seconds += seconds
+        if seconds > 0:
+            self.sleep(seconds)
+        return samples
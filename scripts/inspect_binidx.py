@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""Verify a binidx pair and report token statistics and per-profile data coverage.
+
+Both files are memory-mapped; with NumPy the index arrays are viewed in place and every
+check is vectorized, so multi-GB datasets are inspected in seconds. Without NumPy the
+same checks run over list copies of the index.
+
+Checks: header, index size, `pointers` against the cumulative `sizes`, `doc_idx` bounds,
+the `.bin` size against the last document, and EOD termination of every document.
+Coverage per profile follows `train.sh`: one epoch reads
+`EPOCH_STEPS x MICRO_BSZ x devices` samples of `CTX_LEN` tokens.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+from pathlib import Path
+from typing import Any
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from binidx import DTYPES, INDEX_MAGIC, INDEX_VERSION, binidx_paths
+from profile_env import DEFAULT_MODEL_CONFIG, PROFILE_CONFIG_DIR, env_int, load_train_env
+from rwkv_tokenizer import EOD_TOKEN_ID
+
+
+HEADER = struct.Struct("<9sQBQQ")
+PERCENTILES = (50, 90, 99)
+HISTOGRAM_MIN_EDGE = 16
+
+
+def _optional_numpy() -> Any:
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return numpy
+
+
+def _histogram_edges(max_size: int) -> list[int]:
+    edges = [HISTOGRAM_MIN_EDGE]
+    while edges[-1] < max_size:
+        edges.append(edges[-1] * 2)
+    return edges
+
+
+def _percentile(sorted_sizes: Any, percentile: int) -> int:
+    if len(sorted_sizes) == 0:
+        return 0
+    rank = max(0, -(-percentile * len(sorted_sizes) // 100) - 1)
+    return int(sorted_sizes[rank])
+
+
+def _stats_numpy(np: Any, index_buffer: Any, bin_buffer: Any, layout: dict[str, int]) -> dict[str, Any]:
+    documents = layout["documents"]
+    sizes = np.frombuffer(index_buffer, dtype="<i4", count=documents, offset=layout["sizes_offset"])
+    pointers = np.frombuffer(index_buffer, dtype="<i8", count=documents, offset=layout["pointers_offset"])
+    doc_idx = np.frombuffer(index_buffer, dtype="<i8", count=layout["doc_count"], offset=layout["doc_idx_offset"])
+    itemsize = layout["itemsize"]
+    issues = []
+    if documents and int(sizes.min()) < 0:
+        issues.append("binidx_negative_size")
+    expected_pointers = np.zeros(documents, dtype=np.int64)
+    if documents > 1:
+        np.cumsum(sizes[:-1].astype(np.int64) * itemsize, out=expected_pointers[1:])
+    if not np.array_equal(pointers, expected_pointers):
+        issues.append("binidx_pointer_mismatch")
+    if layout["doc_count"] == 0 or int(doc_idx[0]) != 0 or int(doc_idx[-1]) != documents or np.any(np.diff(doc_idx) < 0):
+        issues.append("binidx_doc_idx_invalid")
+    tokens_total = int(sizes.sum(dtype=np.int64))
+    eod_terminated = 0
+    if documents and not issues and tokens_total * itemsize <= len(bin_buffer):
+        dtype = np.dtype(DTYPES[layout["dtype_code"]][0]).newbyteorder("<")
+        tokens = np.frombuffer(bin_buffer, dtype=dtype, count=tokens_total)
+        nonempty = sizes > 0
+        last_positions = (pointers[nonempty] // itemsize) + sizes[nonempty] - 1
+        eod_terminated = int(np.count_nonzero(tokens[last_positions] == EOD_TOKEN_ID))
+    sorted_sizes = np.sort(sizes)
+    edges = _histogram_edges(int(sorted_sizes[-1]) if documents else 0)
+    counts = np.searchsorted(sorted_sizes, np.asarray(edges), side="right")
+    return {
+        "issues": issues,
+        "tokens_total": tokens_total,
+        "eod_terminated_documents": eod_terminated,
+        "length_min": int(sorted_sizes[0]) if documents else 0,
+        "length_max": int(sorted_sizes[-1]) if documents else 0,
+        "percentiles": {f"p{p}": _percentile(sorted_sizes, p) for p in PERCENTILES},
+        "histogram": _histogram_payload(edges, counts.tolist()),
+        "sorted_sizes": sorted_sizes,
+    }
+
+
+def _stats_stdlib(index_buffer: Any, bin_buffer: Any, layout: dict[str, int]) -> dict[str, Any]:
+    documents = layout["documents"]
+    view = memoryview(index_buffer)
+    sizes = view[layout["sizes_offset"] : layout["pointers_offset"]].cast("i").tolist()
+    pointers = view[layout["pointers_offset"] : layout["doc_idx_offset"]].cast("q").tolist()
+    doc_idx = view[layout["doc_idx_offset"] :].cast("q").tolist()
+    itemsize = layout["itemsize"]
+    issues = []
+    if any(size < 0 for size in sizes):
+        issues.append("binidx_negative_size")
+    address = 0
+    for size, pointer in zip(sizes, pointers):
+        if pointer != address:
+            issues.append("binidx_pointer_mismatch")
+            break
+        address += size * itemsize
+    if not doc_idx or doc_idx[0] != 0 or doc_idx[-1] != documents or any(b < a for a, b in zip(doc_idx, doc_idx[1:])):
+        issues.append("binidx_doc_idx_invalid")
+    tokens_total = sum(sizes)
+    eod_terminated = 0
+    if not issues and tokens_total * itemsize <= len(bin_buffer):
+        eod = EOD_TOKEN_ID.to_bytes(itemsize, "little", signed=False)
+        for size, pointer in zip(sizes, pointers):
+            if size and bin_buffer[pointer + (size - 1) * itemsize : pointer + size * itemsize] == eod:
+                eod_terminated += 1
+    sorted_sizes = sorted(sizes)
+    edges = _histogram_edges(sorted_sizes[-1] if sorted_sizes else 0)
+    counts = []
+    position = 0
+    for edge in edges:
+        while position < len(sorted_sizes) and sorted_sizes[position] <= edge:
+            position += 1
+        counts.append(position)
+    return {
+        "issues": issues,
+        "tokens_total": tokens_total,
+        "eod_terminated_documents": eod_terminated,
+        "length_min": sorted_sizes[0] if sorted_sizes else 0,
+        "length_max": sorted_sizes[-1] if sorted_sizes else 0,
+        "percentiles": {f"p{p}": _percentile(sorted_sizes, p) for p in PERCENTILES},
+        "histogram": _histogram_payload(edges, counts),
+        "sorted_sizes": sorted_sizes,
+    }
+
+
+def _histogram_payload(edges: list[int], cumulative: list[int]) -> list[dict[str, int]]:
+    buckets = []
+    previous = 0
+    for edge, total in zip(edges, cumulative):
+        buckets.append({"le": edge, "documents": int(total) - previous})
+        previous = int(total)
+    return buckets
+
+
+def _read_layout(index_buffer: Any, idx_path: Path) -> dict[str, int]:
+    if len(index_buffer) < HEADER.size:
+        raise ValueError(f"binidx_invalid_magic: {idx_path}")
+    magic, version, dtype_code, documents, doc_count = HEADER.unpack_from(index_buffer)
+    if magic != INDEX_MAGIC:
+        raise ValueError(f"binidx_invalid_magic: {idx_path}")
+    if version != INDEX_VERSION:
+        raise ValueError(f"binidx_unsupported_version={version}: {idx_path}")
+    if dtype_code not in DTYPES:
+        raise ValueError(f"binidx_unsupported_dtype_code={dtype_code}: {idx_path}")
+    sizes_offset = HEADER.size
+    pointers_offset = sizes_offset + documents * 4
+    doc_idx_offset = pointers_offset + documents * 8
+    expected = doc_idx_offset + doc_count * 8
+    if len(index_buffer) != expected:
+        raise ValueError(f"binidx_index_size_mismatch: expected {expected} bytes, found {len(index_buffer)}")
+    return {
+        "dtype_code": dtype_code,
+        "itemsize": DTYPES[dtype_code][2],
+        "documents": documents,
+        "doc_count": doc_count,
+        "sizes_offset": sizes_offset,
+        "pointers_offset": pointers_offset,
+        "doc_idx_offset": doc_idx_offset,
+    }
+
+
+def profile_coverage(
+    tokens_total: int,
+    sorted_sizes: Any,
+    profile_config: Path,
+    model_config: Path,
+    devices: int = 1,
+) -> dict[str, Any]:
+    env = load_train_env(model_config, profile_config)
+    ctx_len = env_int(env, "CTX_LEN")
+    micro_bsz = env_int(env, "MICRO_BSZ")
+    epoch_steps = env_int(env, "EPOCH_STEPS")
+    epoch_count = env_int(env, "EPOCH_COUNT", 1)
+    tokens_per_epoch = epoch_steps * micro_bsz * devices * ctx_len
+    tokens_planned = tokens_per_epoch * epoch_count
+    over_ctx = len(sorted_sizes) - int(_count_le(sorted_sizes, ctx_len))
+    return {
+        "profile": profile_config.name,
+        "model": model_config.name,
+        "ctx_len": ctx_len,
+        "micro_bsz": micro_bsz,
+        "devices": devices,
+        "epoch_steps": epoch_steps,
+        "epoch_count": epoch_count,
+        "tokens_per_epoch": tokens_per_epoch,
+        "tokens_planned": tokens_planned,
+        "data_passes": round(tokens_planned / tokens_total, 4) if tokens_total else None,
+        "epochs_per_data_pass": round(tokens_total / tokens_per_epoch, 4) if tokens_per_epoch else None,
+        "documents_over_ctx_len": over_ctx,
+    }
+
+
+def _count_le(sorted_sizes: Any, value: int) -> int:
+    low, high = 0, len(sorted_sizes)
+    while low < high:
+        middle = (low + high) // 2
+        if sorted_sizes[middle] <= value:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def inspect_binidx(
+    data_prefix: Path,
+    profile_configs: list[Path] | None = None,
+    model_config: Path = DEFAULT_MODEL_CONFIG,
+    devices: int = 1,
+    use_numpy: bool = True,
+) -> dict[str, Any]:
+    bin_path, idx_path = binidx_paths(data_prefix)
+    for path in (bin_path, idx_path):
+        if not path.is_file():
+            raise ValueError(f"binidx_missing_file: {path}")
+    np = _optional_numpy() if use_numpy else None
+    bin_size = bin_path.stat().st_size
+    with idx_path.open("rb") as idx_handle, bin_path.open("rb") as bin_handle:
+        with mmap.mmap(idx_handle.fileno(), 0, access=mmap.ACCESS_READ) as index_buffer:
+            layout = _read_layout(index_buffer, idx_path)
+            # mmap cannot map an empty file; an empty .bin is still checked against the index.
+            bin_buffer = mmap.mmap(bin_handle.fileno(), 0, access=mmap.ACCESS_READ) if bin_size else b""
+            try:
+                if np is not None:
+                    stats = _stats_numpy(np, index_buffer, bin_buffer, layout)
+                else:
+                    stats = _stats_stdlib(index_buffer, bin_buffer, layout)
+            finally:
+                if bin_size:
+                    bin_buffer.close()
+
+    issues = stats["issues"]
+    expected_bin = stats["tokens_total"] * layout["itemsize"]
+    if not issues and expected_bin != bin_size:
+        issues.append("binidx_bin_size_mismatch")
+    documents = layout["documents"]
+    if not issues and stats["eod_terminated_documents"] != documents:
+        issues.append("binidx_missing_eod")
+    sorted_sizes = stats.pop("sorted_sizes")
+    report = {
+        "data_prefix": str(data_prefix),
+        "status": "PASS" if not issues else "FAIL",
+        "issues": issues,
+        "engine": "numpy" if np is not None else "stdlib",
+        "dtype": DTYPES[layout["dtype_code"]][0],
+        "documents": documents,
+        "bin_bytes": bin_size,
+        "expected_bin_bytes": expected_bin,
+        "tokens_total": stats["tokens_total"],
+        "eod_terminated_documents": stats["eod_terminated_documents"],
+        "length": {
+            "min": stats["length_min"],
+            "max": stats["length_max"],
+            "mean": round(stats["tokens_total"] / documents, 2) if documents else 0,
+            **stats["percentiles"],
+        },
+        "histogram": stats["histogram"],
+        "profiles": [
+            profile_coverage(stats["tokens_total"], sorted_sizes, profile, model_config, devices)
+            for profile in (profile_configs or [])
+        ],
+    }
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Verify a binidx pair and report token statistics.")
+    parser.add_argument("--data-prefix", required=True, help="Prefix of <prefix>.bin/.idx (e.g. ..._text_document).")
+    parser.add_argument(
+        "--profile",
+        action="append",
+        default=[],
+        help="Profile env for the coverage estimate (repeatable). Default: every configs/profile/*.env.",
+    )
+    parser.add_argument("--model-config", default=str(DEFAULT_MODEL_CONFIG), help="Model env providing CTX_LEN.")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--no-numpy", action="store_true", help="Force the stdlib engine.")
+    parser.add_argument("--output-json", default="", help="Also write the report to this path.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    profiles = [Path(path) for path in args.profile] or sorted(PROFILE_CONFIG_DIR.glob("*.env"))
+    try:
+        report = inspect_binidx(
+            Path(args.data_prefix),
+            profiles,
+            Path(args.model_config),
+            devices=args.devices,
+            use_numpy=not args.no_numpy,
+        )
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output_json:
+        output = Path(args.output_json)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(payload + "\n", encoding="utf-8")
+    print(payload)
+    return 0 if report["status"] == "PASS" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
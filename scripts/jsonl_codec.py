@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Pluggable JSON codec shared by JSONL dataset readers and writers.
+
+Decoding prefers `orjson` or `msgspec` when installed and falls back to the stdlib
+parser for anything the fast decoder rejects (NaN literals, integers outside 64 bits),
+so accepted inputs and error messages stay identical to `json.loads`.
+
+Encoding always goes through a cached stdlib encoder configured like
+`json.dumps(payload, ensure_ascii=False)`: fast encoders use compact separators, and
+manifest sha256 values must stay stable across environments.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+
+CODEC_ENV_VAR = "RWKV_JSON_CODEC"
+SUPPORTED_CODECS = ("orjson", "msgspec", "json")
+READ_BUFFER_BYTES = 8 * 1024 * 1024
+WRITE_BUFFER_BYTES = 8 * 1024 * 1024
+
+_STDLIB_ENCODER = json.JSONEncoder(ensure_ascii=False)
+# Empty until the first decode: importing orjson/msgspec is deferred so CLIs that never read
+# JSONL (`--help`, argument errors) do not pay for it.
+_codec_name = ""
+_fast_decode: Callable[[bytes | str], Any] = json.loads
+
+
+def _load_decoder(name: str) -> Callable[[bytes | str], Any]:
+    if name == "orjson":
+        import orjson  # pylint: disable=import-outside-toplevel
+
+        return orjson.loads
+    if name == "msgspec":
+        import msgspec  # pylint: disable=import-outside-toplevel
+
+        return msgspec.json.Decoder().decode
+    return json.loads
+
+
+def configure_codec(name: str | None = None) -> str:
+    """Select the decoder backend (`auto`, `orjson`, `msgspec` or `json`) and return the active name."""
+    global _codec_name, _fast_decode  # pylint: disable=global-statement
+
+    requested = (name or os.getenv(CODEC_ENV_VAR, "") or "auto").strip().lower()
+    if requested != "auto" and requested not in SUPPORTED_CODECS:
+        raise ValueError(f"Unsupported JSON codec: {requested} (expected auto|{'|'.join(SUPPORTED_CODECS)})")
+    candidates = SUPPORTED_CODECS if requested == "auto" else (requested,)
+    for candidate in candidates:
+        try:
+            decoder = _load_decoder(candidate)
+        except ImportError:
+            if requested != "auto":
+                raise
+            continue
+        _codec_name = candidate
+        _fast_decode = decoder
+        return _codec_name
+    raise ValueError("No JSON codec available")
+
+
+def codec_name() -> str:
+    return _codec_name or configure_codec()
+
+
+def available_codecs() -> list[str]:
+    names: list[str] = []
+    for candidate in SUPPORTED_CODECS:
+        try:
+            _load_decoder(candidate)
+        except ImportError:
+            continue
+        names.append(candidate)
+    return names
+
+
+def decode_json(data: bytes | str) -> Any:
+    if _codec_name == "json":
+        return json.loads(data)
+    if not _codec_name:
+        configure_codec()
+    try:
+        return _fast_decode(data)
+    except Exception:  # pylint: disable=broad-except
+        # Re-parse with stdlib: either it accepts the input or raises the canonical JSONDecodeError.
+        return json.loads(data)
+
+
+def encode_json(payload: Any) -> str:
+    return _STDLIB_ENCODER.encode(payload)
+
+
+def iter_jsonl_lines(path: Path) -> Iterator[tuple[int, bytes]]:
+    """Yield `(line_number, stripped_bytes)` for every non-blank JSONL line."""
+    with path.open("rb", buffering=READ_BUFFER_BYTES) as handle:
+        for line_number, line in enumerate(handle, start=1):
+            stripped = line.strip()
+            if stripped:
+                yield line_number, stripped
+
+
+def iter_jsonl(path: Path) -> Iterator[tuple[int, Any]]:
+    for line_number, line in iter_jsonl_lines(path):
+        yield line_number, decode_json(line)
+
+
+def write_jsonl(path: Path, payloads: Iterable[Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    encode = _STDLIB_ENCODER.encode
+    with path.open("w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES) as handle:
+        for payload in payloads:
+            handle.write(encode(payload))
+            handle.write("\n")
+
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Line-offset index for JSONL files with a cached `.idx` sidecar.
+
+The index stores `(line_number, start, end)` for every non-blank line (offsets of the
+stripped payload, same rows as `jsonl_codec.iter_jsonl_lines`). Row counts come from the
+sidecar without reading the data file, and sampled rows are materialized through `mmap`,
+so reading k of n rows touches roughly k/n of the bytes.
+
+The sidecar is reused while the data file size and `mtime_ns` match. A file whose mtime
+changed but size did not is re-hashed and the index is kept if its sha256 still matches.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from jsonl_codec import READ_BUFFER_BYTES, decode_json
+
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"RWKVJIDX"
+INDEX_VERSION = 1
+# magic, version, data size, data mtime_ns, data sha256, rows
+INDEX_HEADER = struct.Struct("<8sIQq32sQ")
+ARRAY_TYPECODE = "Q"
+
+
+def sidecar_path_for(path: Path) -> Path:
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def scan_line_offsets(path: Path) -> tuple[array, array, array, str]:
+    """Single sequential pass: offsets of stripped non-blank lines plus the file sha256."""
+    line_numbers = array(ARRAY_TYPECODE)
+    starts = array(ARRAY_TYPECODE)
+    ends = array(ARRAY_TYPECODE)
+    digest = hashlib.sha256()
+    offset = 0
+    with path.open("rb", buffering=READ_BUFFER_BYTES) as handle:
+        for line_number, line in enumerate(handle, start=1):
+            digest.update(line)
+            stripped = line.strip()
+            if stripped:
+                start = offset + len(line) - len(line.lstrip())
+                line_numbers.append(line_number)
+                starts.append(start)
+                ends.append(start + len(stripped))
+            offset += len(line)
+    return line_numbers, starts, ends, digest.hexdigest()
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(READ_BUFFER_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JsonlLineIndex:
+    """Random access to the non-blank lines of a JSONL file by ordinal."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        line_numbers: array,
+        starts: array,
+        ends: array,
+        sha256: str,
+        size: int,
+        mtime_ns: int,
+        from_sidecar: bool,
+    ) -> None:
+        self.path = path
+        self.line_numbers = line_numbers
+        self.starts = starts
+        self.ends = ends
+        self.sha256 = sha256
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.from_sidecar = from_sidecar
+        self.bytes_materialized = 0
+        self._handle: Any = None
+        self._mmap: mmap.mmap | None = None
+
+    @classmethod
+    def open(cls, path: Path, *, use_sidecar: bool = True) -> "JsonlLineIndex":
+        path = Path(path)
+        stat = path.stat()
+        sidecar = sidecar_path_for(path)
+        if use_sidecar:
+            cached = cls._load_sidecar(path, sidecar, stat.st_size, stat.st_mtime_ns)
+            if cached is not None:
+                return cached
+
+        line_numbers, starts, ends, sha256 = scan_line_offsets(path)
+        index = cls(
+            path,
+            line_numbers=line_numbers,
+            starts=starts,
+            ends=ends,
+            sha256=sha256,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            from_sidecar=False,
+        )
+        if use_sidecar:
+            index.write_sidecar(sidecar)
+        return index
+
+    @classmethod
+    def _load_sidecar(cls, path: Path, sidecar: Path, size: int, mtime_ns: int) -> "JsonlLineIndex | None":
+        try:
+            payload = sidecar.read_bytes()
+        except OSError:
+            return None
+        if len(payload) < INDEX_HEADER.size:
+            return None
+        magic, version, stored_size, stored_mtime_ns, stored_sha, rows = INDEX_HEADER.unpack_from(payload)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or stored_size != size:
+            return None
+        sha256 = stored_sha.hex()
+        if stored_mtime_ns != mtime_ns and file_sha256(path) != sha256:
+            return None
+
+        item_size = array(ARRAY_TYPECODE).itemsize
+        body = memoryview(payload)[INDEX_HEADER.size :]
+        if len(body) != 3 * rows * item_size:
+            return None
+        arrays = []
+        for position in range(3):
+            values = array(ARRAY_TYPECODE)
+            values.frombytes(body[position * rows * item_size : (position + 1) * rows * item_size])
+            if sys.byteorder != "little":
+                values.byteswap()
+            arrays.append(values)
+        index = cls(
+            path,
+            line_numbers=arrays[0],
+            starts=arrays[1],
+            ends=arrays[2],
+            sha256=sha256,
+            size=size,
+            mtime_ns=mtime_ns,
+            from_sidecar=True,
+        )
+        if stored_mtime_ns != mtime_ns:
+            index.write_sidecar(sidecar)
+        return index
+
+    def write_sidecar(self, sidecar: Path | None = None) -> bool:
+        """Persist the index atomically; read-only data directories are silently skipped."""
+        sidecar = sidecar or sidecar_path_for(self.path)
+        header = INDEX_HEADER.pack(
+            INDEX_MAGIC,
+            INDEX_VERSION,
+            self.size,
+            self.mtime_ns,
+            bytes.fromhex(self.sha256),
+            len(self),
+        )
+        tmp_path = sidecar.with_name(f".{sidecar.name}.{os.getpid()}.tmp")
+        try:
+            with tmp_path.open("wb") as handle:
+                handle.write(header)
+                for values in (self.line_numbers, self.starts, self.ends):
+                    if sys.byteorder != "little":
+                        values = array(ARRAY_TYPECODE, values)
+                        values.byteswap()
+                    handle.write(values.tobytes())
+            os.replace(tmp_path, sidecar)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __enter__(self) -> "JsonlLineIndex":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _buffer(self) -> mmap.mmap:
+        if self._mmap is None:
+            stat = self.path.stat()
+            if stat.st_size != self.size or stat.st_mtime_ns != self.mtime_ns:
+                raise ValueError(f"jsonl_index_stale: {self.path} changed after indexing")
+            self._handle = self.path.open("rb")
+            self._mmap = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def line_number(self, ordinal: int) -> int:
+        return int(self.line_numbers[ordinal])
+
+    def read_line(self, ordinal: int) -> bytes:
+        start = self.starts[ordinal]
+        end = self.ends[ordinal]
+        self.bytes_materialized += end - start
+        return self._buffer()[start:end]
+
+    def iter_lines(self, ordinals: Iterable[int]) -> Iterator[tuple[int, bytes]]:
+        """Yield `(line_number, stripped_bytes)` for the given ordinals, in the given order."""
+        for ordinal in ordinals:
+            yield self.line_number(ordinal), self.read_line(ordinal)
+
+    def iter_rows(self, ordinals: Iterable[int]) -> Iterator[tuple[int, Any]]:
+        for line_number, line in self.iter_lines(ordinals):
+            yield line_number, decode_json(line)
+
+    def sample(self, rng: random.Random, k: int) -> list[int]:
+        """Pick `k` ordinals exactly like `rng.sample(rows, k)` would pick rows from a list."""
+        return rng.sample(range(len(self)), k)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build or inspect the `.idx` line index of a JSONL file.")
+    parser.add_argument("inputs", nargs="+", help="JSONL files to index.")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore an existing sidecar and rescan the file.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    for raw_path in args.inputs:
+        path = Path(raw_path).resolve()
+        if args.rebuild:
+            index = JsonlLineIndex.open(path, use_sidecar=False)
+            index.write_sidecar()
+        else:
+            index = JsonlLineIndex.open(path)
+        state = "cached" if index.from_sidecar else "built"
+        print(f"{path}: rows={len(index)} sha256={index.sha256} index={state}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
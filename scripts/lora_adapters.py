@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""LoRA adapters swapped in place on a loaded base model.
+
+Comparing adapters trained on the same base used to mean one full model load per adapter.
+`AdapterSwitcher` keeps any number of RWKV-PEFT adapters resident (only their
+`lora_A`/`lora_B` and trained tensors, megabytes each) and activates one at a time by
+rewriting just the model tensors that adapter touches:
+
+- activating writes `weights_cache.adapter_updates` of the pristine base, the same values
+  the merged weight cache holds;
+- deactivating copies the base tensors back from their own mapping of the cached
+  safetensors file, so swaps never accumulate rounding error.
+
+Albatross transposes, squeezes and casts checkpoint tensors when it builds `model.z`; the
+layout of every touched key is matched against the base tensor once, and keys the model
+derives in some other way are refused before anything is written. States computed under
+one adapter are invalid under the next, so `on_change` (e.g. `PrefixStateCache.clear`)
+runs on every swap.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from step_cache import StepCache
+from weights_cache import adapter_keys, adapter_updates, lora_alpha_from_run, lora_rank, torch_load_cpu
+
+
+@dataclass
+class LoraAdapter:
+    name: str
+    path: str
+    sha256: str
+    lora_alpha: float
+    lora_r: int
+    tensors: dict[str, Any]
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "path": self.path,
+            "sha256": self.sha256,
+            "lora_alpha": self.lora_alpha,
+            "lora_r": self.lora_r,
+        }
+
+
+def adapter_name(path: Path) -> str:
+    """`<run>/<checkpoint stem>`, e.g. `20260301-identity-v4/rwkv-3`."""
+    path = Path(path)
+    return f"{path.parent.name}/{path.stem}"
+
+
+def load_adapter(
+    path: Path,
+    lora_alpha: float | None = None,
+    name: str = "",
+    load_checkpoint: Callable[[Path], dict[str, Any]] = torch_load_cpu,
+    digests: StepCache | None = None,
+) -> LoraAdapter:
+    """Read an adapter checkpoint; `lora_alpha` defaults to the PEFT config of its run directory."""
+    path = Path(path).resolve()
+    if not path.is_file():
+        raise FileNotFoundError(f"LoRA adapter not found: {path}")
+    if lora_alpha is None:
+        lora_alpha = lora_alpha_from_run(path.parent)
+    if lora_alpha is None:
+        raise ValueError(f"lora_alpha_unknown: pass --lora-alpha; {path.parent} has no PEFT config with lora_alpha")
+    digests = digests or StepCache(path.parent)
+    tensors = load_checkpoint(path)
+    return LoraAdapter(
+        name=name or adapter_name(path),
+        path=str(path),
+        sha256=digests.file_digest(path),
+        lora_alpha=float(lora_alpha),
+        lora_r=lora_rank(tensors),
+        tensors=tensors,
+    )
+
+
+def _is_torch(value: Any) -> bool:
+    return hasattr(value, "copy_")
+
+
+def _cast_like(value: Any, like: Any) -> Any:
+    if _is_torch(like):
+        return value.to(device=like.device, dtype=like.dtype)
+    return value.astype(like.dtype)
+
+
+def _equal(a: Any, b: Any) -> bool:
+    if _is_torch(a):
+        import torch  # pylint: disable=import-outside-toplevel
+
+        return torch.equal(a, b)
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    return bool(np.array_equal(a, b))
+
+
+def _layouts(value: Any, target: Any) -> list[Callable[[Any], Any]]:
+    """Candidate checkpoint -> model tensor transforms, most likely first."""
+    count = 1
+    for dim in target.shape:
+        count *= dim
+    size = 1
+    for dim in value.shape:
+        size *= dim
+    if size != count:
+        return []
+    shape = tuple(target.shape)
+    candidates = [lambda v: v.reshape(shape)]
+    if len(value.shape) == 2:
+        candidates.append(lambda v: v.T.reshape(shape))
+    return candidates
+
+
+class AdapterSwitcher:
+    def __init__(
+        self,
+        weights: dict[str, Any],
+        base: dict[str, Any],
+        on_change: Callable[[], Any] | None = None,
+    ) -> None:
+        """`weights` are the model's tensors (Albatross `model.z`), updated in place; `base` the
+        checkpoint tensors they were built from, in a mapping the model does not write to."""
+        self.weights = weights
+        self.base = base
+        self.on_change = on_change
+        self.adapters: dict[str, LoraAdapter] = {}
+        self.active: str | None = None
+        self.swaps = 0
+        self._layouts: dict[str, Callable[[Any], Any]] = {}
+        self._touched: list[str] = []
+
+    def add(self, adapter: LoraAdapter) -> LoraAdapter:
+        """Keep `adapter` resident; its keys are checked against the base and the model now."""
+        for key in adapter_keys(self.base, adapter.tensors):
+            self._layout(key)
+        self.adapters[adapter.name] = adapter
+        return adapter
+
+    def _layout(self, key: str) -> Callable[[Any], Any]:
+        if key not in self._layouts:
+            target = self.weights.get(key)
+            if target is None:
+                raise ValueError(f"lora_hot_swap_unsupported_key: {key} is not a model tensor")
+            base = self.base[key]
+            for layout in _layouts(base, target):
+                if _equal(_cast_like(layout(base), target), target):
+                    self._layouts[key] = layout
+                    break
+            else:
+                raise ValueError(f"lora_hot_swap_unsupported_key: the model derives {key} from the checkpoint")
+        return self._layouts[key]
+
+    def _write(self, key: str, value: Any) -> None:
+        target = self.weights[key]
+        value = _cast_like(self._layout(key)(value), target)
+        if _is_torch(target):
+            target.copy_(value)
+        else:
+            target[...] = value
+
+    def _place(self, key: str, value: Any) -> Any:
+        target = self.weights[key]
+        return value.to(target.device) if _is_torch(target) and _is_torch(value) else value
+
+    def activate(self, name: str | None) -> dict[str, Any]:
+        """Make adapter `name` (None: the plain base) the one the model runs with."""
+        if name is not None and name not in self.adapters:
+            raise ValueError(f"lora_adapter_not_loaded: {name}")
+        started = time.perf_counter()
+        if name == self.active:
+            return {"adapter": name, "keys": 0, "seconds": 0.0}
+        adapter = self.adapters[name] if name is not None else None
+        touched = adapter_keys(self.base, adapter.tensors) if adapter is not None else []
+        for key in sorted(set(self._touched) - set(touched)):
+            self._write(key, self._place(key, self.base[key]))
+        if adapter is not None:
+            for key, value in adapter_updates(self.base, adapter.tensors, adapter.lora_alpha, self._place):
+                self._write(key, value)
+        self.active, self._touched = name, touched
+        self.swaps += 1
+        if self.on_change is not None:
+            self.on_change()
+        return {
+            "adapter": name,
+            "keys": len(touched),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
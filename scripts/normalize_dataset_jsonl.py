@@ -4,7 +4,6 @@
 from __future__ import annotations
 
 import argparse
-import json
 import sys
 from pathlib import Path
 
@@ -14,6 +13,7 @@ if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
 from dataset_lifecycle import build_canonical_row, load_canonical_rows, validate_canonical_row
+from jsonl_codec import write_jsonl
 
 
 def parse_args() -> argparse.Namespace:
@@ -56,10 +56,7 @@ def main() -> int:
         print("\n".join(failures), file=sys.stderr)
         return 1
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w", encoding="utf-8") as handle:
-        for row in normalized:
-            handle.write(json.dumps(row, ensure_ascii=False) + "\n")
+    write_jsonl(output_path, normalized)
 
     print(f"rows: {len(normalized)}")
     print(f"output: {output_path}")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Derive `EPOCH_STEPS` (and optionally `ACCUMULATE_GRAD_BATCHES`) from the binidx token count.
+
+RWKV-PEFT stops an epoch after `EPOCH_STEPS` dataloader batches (`limit_train_batches`),
+each `MICRO_BSZ x devices` samples of `CTX_LEN` tokens. For a target number of data
+passes the planner solves
+
+    EPOCH_STEPS = ceil(passes x tokens_total / (EPOCH_COUNT x MICRO_BSZ x devices x CTX_LEN))
+
+rounded up to a multiple of `ACCUMULATE_GRAD_BATCHES` so the last optimizer step of an
+epoch is not partial. The 16 GB VRAM profile invariants are checked before anything is
+written. The result is a complete profile env in `runs/<run>/resolved_profile.env` that
+`train.sh --profile` consumes like any file in `configs/profile/`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import shlex
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from binidx import binidx_paths, read_binidx_index
+from estimate_train_resources import GIB, estimate_weight_bytes
+from profile_env import DEFAULT_MODEL_CONFIG, ENV_LINE_PATTERN, ROOT_DIR, env_int, load_train_env
+
+
+RUNS_DIR = ROOT_DIR / "runs"
+RESOLVED_PROFILE_NAME = "resolved_profile.env"
+EPOCH_PLAN_NAME = "epoch_plan.json"
+SAFE_16GB_PATTERN = re.compile(r"16gb", re.IGNORECASE)
+# Invariants of the *_safe_16gb profiles: the settings that stopped the 16 GB runs from OOMing.
+SAFE_16GB_LIMITS = {"MICRO_BSZ": 1, "CHUNK_CTX": 512, "CTX_LEN": 1024}
+SAFE_16GB_REQUIRED = {"GRAD_CP": "1"}
+# Share of VRAM the frozen base weights may take; the rest is activations, LoRA state and workspace.
+WEIGHT_VRAM_SHARE = 0.6
+
+
+def check_vram_profile(env: dict[str, str], vram_gb: float) -> list[str]:
+    violations = []
+    if vram_gb <= 16:
+        for key, limit in SAFE_16GB_LIMITS.items():
+            if key in env and env_int(env, key) > limit:
+                violations.append(f"{key}={env[key]} exceeds {limit} for {vram_gb:g} GB")
+        for key, required in SAFE_16GB_REQUIRED.items():
+            if env.get(key) != required:
+                violations.append(f"{key}={env.get(key, '')} must be {required} for {vram_gb:g} GB")
+    quant = env.get("QUANT", "none")
+    weight_gb = estimate_weight_bytes(env) / GIB
+    if weight_gb > vram_gb * WEIGHT_VRAM_SHARE:
+        violations.append(
+            f"base weights ~{weight_gb:.1f} GB with QUANT={quant} exceed "
+            f"{WEIGHT_VRAM_SHARE:.0%} of {vram_gb:g} GB"
+        )
+    return violations
+
+
+def plan_epoch_steps(
+    tokens_total: int,
+    env: dict[str, str],
+    target_passes: float = 1.0,
+    devices: int = 1,
+    tokens_per_optimizer_step: int = 0,
+) -> dict[str, Any]:
+    if tokens_total <= 0:
+        raise ValueError("epoch_plan_empty_dataset")
+    if target_passes <= 0:
+        raise ValueError("epoch_plan_target_passes_must_be_positive")
+    ctx_len = env_int(env, "CTX_LEN")
+    micro_bsz = env_int(env, "MICRO_BSZ")
+    epoch_count = env_int(env, "EPOCH_COUNT", 1)
+    accumulate = env_int(env, "ACCUMULATE_GRAD_BATCHES", 1)
+    tokens_per_batch = micro_bsz * devices * ctx_len
+    if tokens_per_optimizer_step > 0:
+        accumulate = max(1, round(tokens_per_optimizer_step / tokens_per_batch))
+    raw_steps = math.ceil(target_passes * tokens_total / (epoch_count * tokens_per_batch))
+    epoch_steps = max(accumulate, math.ceil(raw_steps / accumulate) * accumulate)
+    tokens_planned = epoch_steps * epoch_count * tokens_per_batch
+    return {
+        "tokens_total": tokens_total,
+        "target_passes": target_passes,
+        "devices": devices,
+        "ctx_len": ctx_len,
+        "micro_bsz": micro_bsz,
+        "epoch_count": epoch_count,
+        "tokens_per_batch": tokens_per_batch,
+        "tokens_per_optimizer_step": tokens_per_batch * accumulate,
+        "previous": {
+            "EPOCH_STEPS": env.get("EPOCH_STEPS"),
+            "ACCUMULATE_GRAD_BATCHES": env.get("ACCUMULATE_GRAD_BATCHES"),
+            "data_passes": round(
+                env_int(env, "EPOCH_STEPS", 0) * epoch_count * tokens_per_batch / tokens_total, 4
+            ),
+        },
+        "resolved": {
+            "EPOCH_STEPS": str(epoch_steps),
+            "ACCUMULATE_GRAD_BATCHES": str(accumulate),
+        },
+        "optimizer_steps_per_epoch": epoch_steps // accumulate,
+        "data_passes": round(tokens_planned / tokens_total, 4),
+    }
+
+
+def render_resolved_profile(profile_config: Path, overrides: dict[str, str], header: list[str]) -> str:
+    """Copy the profile env line by line, replacing overridden keys in place."""
+    lines = [f"# {line}" for line in header]
+    seen = set()
+    for raw_line in profile_config.read_text(encoding="utf-8").splitlines():
+        match = ENV_LINE_PATTERN.match(raw_line.strip())
+        if match and match.group("key") in overrides:
+            key = match.group("key")
+            lines.append(f"{key}={shlex.quote(overrides[key])}")
+            seen.add(key)
+        else:
+            lines.append(raw_line)
+    for key, value in overrides.items():
+        if key not in seen:
+            lines.append(f"{key}={shlex.quote(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def resolve_profile(
+    data_prefix: Path,
+    model_config: Path,
+    profile_config: Path,
+    run_dir: Path,
+    target_passes: float = 1.0,
+    devices: int = 1,
+    tokens_per_optimizer_step: int = 0,
+    vram_gb: float | None = None,
+) -> dict[str, Any]:
+    _, idx_path = binidx_paths(data_prefix)
+    if not idx_path.is_file():
+        raise ValueError(f"binidx_missing_file: {idx_path}")
+    tokens_total = sum(read_binidx_index(idx_path).sizes)
+    env = load_train_env(model_config, profile_config)
+    if vram_gb is None and SAFE_16GB_PATTERN.search(profile_config.name):
+        vram_gb = 16.0
+    plan = plan_epoch_steps(tokens_total, env, target_passes, devices, tokens_per_optimizer_step)
+    violations = check_vram_profile({**env, **plan["resolved"]}, vram_gb) if vram_gb else []
+    plan.update(
+        {
+            "data_prefix": str(data_prefix),
+            "model_config": str(model_config),
+            "profile_config": str(profile_config),
+            "vram_gb": vram_gb,
+            "vram_violations": violations,
+        }
+    )
+    if violations:
+        raise ValueError("epoch_plan_vram_constraints_failed: " + "; ".join(violations))
+
+    run_dir.mkdir(parents=True, exist_ok=True)
+    resolved_path = run_dir / RESOLVED_PROFILE_NAME
+    header = [
+        f"Resolved by scripts/plan_epoch_steps.py at {datetime.now(timezone.utc).isoformat()}",
+        f"base profile: {profile_config}",
+        f"data prefix: {data_prefix} ({tokens_total} tokens, {plan['data_passes']} passes)",
+    ]
+    resolved_path.write_text(render_resolved_profile(profile_config, plan["resolved"], header), encoding="utf-8")
+    plan["resolved_profile"] = str(resolved_path)
+    (run_dir / EPOCH_PLAN_NAME).write_text(json.dumps(plan, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return plan
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Resolve EPOCH_STEPS from binidx token counts.")
+    parser.add_argument("--data-prefix", required=True)
+    parser.add_argument("--model-config", default=str(DEFAULT_MODEL_CONFIG))
+    parser.add_argument("--profile", required=True, help="Base profile env from configs/profile/.")
+    parser.add_argument("--run-name", required=True, help="Writes runs/<run-name>/resolved_profile.env.")
+    parser.add_argument("--runs-dir", default=str(RUNS_DIR))
+    parser.add_argument("--target-passes", type=float, default=1.0, help="Data passes over all epochs.")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument(
+        "--tokens-per-step",
+        type=int,
+        default=0,
+        help="Target tokens per optimizer step; re-derives ACCUMULATE_GRAD_BATCHES (0 keeps the profile value).",
+    )
+    parser.add_argument("--vram-gb", type=float, default=None, help="Check VRAM constraints (default: 16 for *16gb* profiles).")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        plan = resolve_profile(
+            Path(args.data_prefix),
+            Path(args.model_config),
+            Path(args.profile),
+            Path(args.runs_dir) / args.run_name,
+            target_passes=args.target_passes,
+            devices=args.devices,
+            tokens_per_optimizer_step=args.tokens_per_step,
+            vram_gb=args.vram_gb,
+        )
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    resolved = plan["resolved"]
+    print(
+        f"EPOCH_STEPS={resolved['EPOCH_STEPS']} ACCUMULATE_GRAD_BATCHES={resolved['ACCUMULATE_GRAD_BATCHES']} "
+        f"data_passes={plan['data_passes']} (was {plan['previous']['data_passes']})"
+    )
+    print(f"resolved_profile={plan['resolved_profile']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Pack binidx documents into `CTX_LEN`-sized training sequences.
+
+Token lengths come from the `.idx` of a one-document-per-row binidx (EOD included).
+Documents are packed with best-fit decreasing: longest first, each one goes into the open
+sequence whose free space is the smallest that still fits it. Equal lengths are ordered
+by a seeded shuffle and the finished sequences are shuffled with the same seed, so a
+plan is reproducible and the packed file is not sorted by length. Documents longer than
+the capacity get a sequence of their own and are reported as oversize.
+
+With `--output-prefix` the packed plan is written as a new binidx where every item is one
+packed sequence (documents concatenated, each still ending with EOD).
+
+The report covers padding and slot efficiency for a loader that reads one binidx item per
+sample. It says nothing about optimizer steps for this repo's training: `train.sh`
+(`--data_type binidx`, fixed `EPOCH_STEPS`) samples random `CTX_LEN` windows from the flat
+token stream, which packing only reorders.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import mmap
+import random
+import sys
+from pathlib import Path
+from typing import Any, Sequence
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from binidx import BinidxWriter, binidx_paths, read_binidx_index
+from profile_env import DEFAULT_MODEL_CONFIG, env_int, load_env_file, load_train_env
+
+
+DEFAULT_SEED = 42
+
+
+def best_fit_decreasing(sizes: Sequence[int], capacity: int, seed: int = DEFAULT_SEED) -> list[list[int]]:
+    """Return packed sequences as lists of document ids."""
+    if capacity <= 0:
+        raise ValueError("packing_capacity_must_be_positive")
+    rng = random.Random(seed)
+    order = list(range(len(sizes)))
+    rng.shuffle(order)
+    order.sort(key=lambda doc_id: sizes[doc_id], reverse=True)
+
+    bins: list[list[int]] = []
+    # free capacity -> ids of open bins with exactly that much room; `free_levels` is sorted.
+    open_bins: dict[int, list[int]] = {}
+    free_levels: list[int] = []
+    for doc_id in order:
+        size = sizes[doc_id]
+        if size >= capacity:
+            bins.append([doc_id])
+            continue
+        position = bisect.bisect_left(free_levels, size)
+        if position < len(free_levels):
+            level = free_levels[position]
+            bin_id = open_bins[level].pop()
+            if not open_bins[level]:
+                del open_bins[level]
+                del free_levels[position]
+        else:
+            level = capacity
+            bin_id = len(bins)
+            bins.append([])
+        bins[bin_id].append(doc_id)
+        remaining = level - size
+        if remaining > 0:
+            if remaining not in open_bins:
+                open_bins[remaining] = []
+                bisect.insort(free_levels, remaining)
+            open_bins[remaining].append(bin_id)
+    rng.shuffle(bins)
+    return bins
+
+
+def packing_report(
+    sizes: Sequence[int],
+    bins: list[list[int]],
+    capacity: int,
+) -> dict[str, Any]:
+    documents = len(sizes)
+    tokens = sum(sizes)
+    unpacked_slots = documents * capacity
+    packed_slots = len(bins) * capacity
+    return {
+        "capacity": capacity,
+        "documents": documents,
+        "tokens_total": tokens,
+        "sequences": len(bins),
+        "oversize_documents": sum(1 for size in sizes if size > capacity),
+        "documents_per_sequence": round(documents / len(bins), 3) if bins else 0,
+        "efficiency": {
+            "unpacked": round(sum(min(size, capacity) for size in sizes) / unpacked_slots, 4) if documents else 0,
+            "packed": round(sum(min(sum(sizes[d] for d in b), capacity) for b in bins) / packed_slots, 4) if bins else 0,
+        },
+        "padding_tokens": {
+            "unpacked": sum(capacity - size for size in sizes if size < capacity),
+            "packed": sum(max(0, capacity - sum(sizes[d] for d in b)) for b in bins),
+        },
+    }
+
+
+def write_packed_binidx(data_prefix: Path, bins: list[list[int]], output_prefix: Path) -> dict[str, Any]:
+    bin_path, idx_path = binidx_paths(data_prefix)
+    index = read_binidx_index(idx_path)
+    writer = BinidxWriter(output_prefix, dtype=index.dtype)
+    with bin_path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        for packed in bins:
+            writer.add_document_bytes(
+                b"".join(
+                    buffer[index.pointers[doc_id] : index.pointers[doc_id] + index.sizes[doc_id] * index.itemsize]
+                    for doc_id in packed
+                )
+            )
+    return writer.finalize()
+
+
+def plan_sequence_packing(
+    data_prefix: Path,
+    capacity: int,
+    seed: int = DEFAULT_SEED,
+    output_prefix: Path | None = None,
+) -> dict[str, Any]:
+    _, idx_path = binidx_paths(data_prefix)
+    if not idx_path.is_file():
+        raise ValueError(f"binidx_missing_file: {idx_path}")
+    sizes = read_binidx_index(idx_path).sizes.tolist()
+    bins = best_fit_decreasing(sizes, capacity, seed)
+    report = {
+        "data_prefix": str(data_prefix),
+        "strategy": "best_fit_decreasing",
+        "seed": seed,
+        **packing_report(sizes, bins, capacity),
+    }
+    if output_prefix is not None:
+        report["packed_binidx"] = write_packed_binidx(data_prefix, bins, output_prefix)
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Plan (and optionally write) CTX_LEN-aware sequence packing.")
+    parser.add_argument("--data-prefix", required=True, help="One-document-per-row binidx prefix.")
+    parser.add_argument("--model-config", default=str(DEFAULT_MODEL_CONFIG), help="Model env providing CTX_LEN.")
+    parser.add_argument("--profile", default="", help="Profile env; may override CTX_LEN.")
+    parser.add_argument("--ctx-len", type=int, default=0, help="Override CTX_LEN (sequence capacity in tokens).")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output-prefix", default="", help="Write the packed binidx to <prefix>.bin/.idx.")
+    parser.add_argument("--report-json", default="", help="Also write the report to this path.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        if args.profile:
+            env = load_train_env(Path(args.model_config), Path(args.profile))
+        else:
+            env = load_env_file(Path(args.model_config))
+        capacity = args.ctx_len or env_int(env, "CTX_LEN")
+        report = plan_sequence_packing(
+            Path(args.data_prefix),
+            capacity,
+            seed=args.seed,
+            output_prefix=Path(args.output_prefix) if args.output_prefix else None,
+        )
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.report_json:
+        output = Path(args.report_json)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(payload + "\n", encoding="utf-8")
+    print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
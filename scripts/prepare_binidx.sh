@@ -12,6 +12,11 @@ fi
 RWKV_PEFT_DIR="${RWKV_PEFT_DIR:-$ROOT_DIR/third_party/RWKV-PEFT}"
 VENV_DIR="${VENV_DIR:-$ROOT_DIR/.venv}"
 WORKERS="${WORKERS:-4}"
+# json2binidx (RWKV-PEFT preprocess_data.py) or native (scripts/build_binidx.py).
+BINIDX_BACKEND="${BINIDX_BACKEND:-json2binidx}"
+# native backend only; set to an empty string to disable the token cache.
+BINIDX_TOKEN_CACHE_DIR="${BINIDX_TOKEN_CACHE_DIR-$ROOT_DIR/data/cache/tokens}"
+BINIDX_TOKEN_CACHE_MAX_MB="${BINIDX_TOKEN_CACHE_MAX_MB:-}"
 
 if [ "$#" -lt 2 ] || [ "$#" -gt 3 ]; then
   echo "Usage: $0 <input.jsonl> <output_prefix> [tokenizer_vocab_file]" >&2
@@ -27,7 +32,12 @@ if [ ! -f "$INPUT_JSONL" ]; then
   exit 1
 fi
 
-if [ ! -d "$RWKV_PEFT_DIR/json2binidx_tool" ]; then
+if [ "$BINIDX_BACKEND" != "json2binidx" ] && [ "$BINIDX_BACKEND" != "native" ]; then
+  echo "Unsupported BINIDX_BACKEND=$BINIDX_BACKEND (expected json2binidx|native)" >&2
+  exit 1
+fi
+
+if [ "$BINIDX_BACKEND" = "json2binidx" ] && [ ! -d "$RWKV_PEFT_DIR/json2binidx_tool" ]; then
   echo "RWKV-PEFT json2binidx_tool not found at $RWKV_PEFT_DIR/json2binidx_tool" >&2
   echo "Run ./scripts/bootstrap.sh first." >&2
   exit 1
@@ -45,14 +55,30 @@ fi
 
 mkdir -p "$(dirname "$OUTPUT_PREFIX")"
 
-python "$RWKV_PEFT_DIR/json2binidx_tool/tools/preprocess_data.py" \
-  --input "$INPUT_JSONL" \
-  --output-prefix "$OUTPUT_PREFIX" \
-  --vocab-file "$TOKENIZER_FILE" \
-  --dataset-impl mmap \
-  --tokenizer-type RWKVTokenizer \
-  --append-eod \
-  --workers "$WORKERS"
+if [ "$BINIDX_BACKEND" = "native" ]; then
+  NATIVE_ARGS=()
+  if [ -n "$BINIDX_TOKEN_CACHE_DIR" ]; then
+    NATIVE_ARGS+=(--token-cache "$BINIDX_TOKEN_CACHE_DIR")
+  fi
+  if [ -n "$BINIDX_TOKEN_CACHE_MAX_MB" ]; then
+    NATIVE_ARGS+=(--token-cache-max-mb "$BINIDX_TOKEN_CACHE_MAX_MB")
+  fi
+  python "$ROOT_DIR/scripts/build_binidx.py" \
+    --input "$INPUT_JSONL" \
+    --output-prefix "$OUTPUT_PREFIX" \
+    --tokenizer-vocab "$TOKENIZER_FILE" \
+    --workers "$WORKERS" \
+    ${NATIVE_ARGS[@]+"${NATIVE_ARGS[@]}"}
+else
+  python "$RWKV_PEFT_DIR/json2binidx_tool/tools/preprocess_data.py" \
+    --input "$INPUT_JSONL" \
+    --output-prefix "$OUTPUT_PREFIX" \
+    --vocab-file "$TOKENIZER_FILE" \
+    --dataset-impl mmap \
+    --tokenizer-type RWKVTokenizer \
+    --append-eod \
+    --workers "$WORKERS"
+fi
 
 echo
 echo "Done."
@@ -1,13 +1,35 @@
 #!/usr/bin/env python3
-"""Produce category-level evaluation artifacts and hard-cases from runtime eval suites."""
+"""Produce category-level evaluation artifacts and hard-cases from runtime eval suites.
+
+Besides evaluating both suites in one process, the producer can evaluate one shard of one
+suite (`--suite`, `--shard-index`, `--shard-count`; rows are dealt round-robin) into a
+partial JSON, and merge partials (`--merge-partials`) into the same category and hard-case
+artifacts. The Airflow DAG runs the shards as parallel tasks and merges them.
+
+Every scored row is appended to a checkpoint JSONL (`<suite>[-<i>-of-<n>].eval_rows.jsonl`)
+keyed by the sha256 of the exact row, the model sha256 and its decode settings; a restarted
+run reuses those rows instead of calling inference again.
+
+Exact-match scoring cannot pass a completion longer than the expected answer, so each
+category decodes at most `--budget-factor` x its longest expected `assistant_response` (plus
+`BUDGET_MARGIN_TOKENS`, capped by `--tokens`), and the inference script is asked to stop at
+`--stop` sequences.
+
+Completions come from an `inference_backends` backend (`--backend`): the legacy inference
+script subprocess (default), Albatross in-process, or a deterministic CPU mock for dry runs.
+`--lora-adapter` scores an adapter on top of `--model`; with `--sweep-output-dir` several
+adapters are scored one after another in the same process (the Albatross backend swaps
+them in place on one loaded base) and compared in `sweep.json`.
+"""
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
-import subprocess
+import math
+import os
 import sys
-import tempfile
 from collections import defaultdict
 from pathlib import Path
 from typing import Any
@@ -18,6 +40,25 @@ if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
 from dataset_lifecycle import infer_task_category, load_canonical_rows
+from eval_scheduler import merge_bucket_stats, plan_batches, run_batches
+from inference_backends import (
+    BACKEND_NAMES,
+    AlbatrossBackend,
+    GenerationParams,
+    InferenceBackend,
+    MockBackend,
+    SubprocessBackend,
+)
+from rwkv_tokenizer import RwkvTokenizer, resolve_vocab_path
+
+
+SUITES = ("domain_eval", "retention_eval")
+PARTIAL_SCHEMA_VERSION = 1
+CHECKPOINT_SUFFIX = ".eval_rows.jsonl"
+# "\nUser:" also covers the "\n\nUser:" turn separator.
+DEFAULT_STOP_SEQUENCES = ("\nUser:", "<|endoftext|>")
+DEFAULT_BUDGET_FACTOR = 1.25
+BUDGET_MARGIN_TOKENS = 8
 
 
 def parse_args() -> argparse.Namespace:
@@ -30,56 +71,192 @@ def parse_args() -> argparse.Namespace:
         default="",
         help="Optional explicit run directory. Defaults to repository runs/<run-name>.",
     )
-    parser.add_argument("--model", required=True, help="Checkpoint path used for inference.")
-    parser.add_argument("--domain-eval-jsonl", required=True, help="Path to domain eval JSONL.")
-    parser.add_argument("--retention-eval-jsonl", required=True, help="Path to retention eval JSONL.")
-    parser.add_argument("--domain-output", required=True, help="Path to domain category summary JSON.")
-    parser.add_argument("--retention-output", required=True, help="Path to retention category summary JSON.")
-    parser.add_argument("--hard-cases-output", required=True, help="Path to hard-cases JSON.")
+    parser.add_argument("--model", default="", help="Checkpoint path used for inference.")
+    parser.add_argument("--domain-eval-jsonl", default="", help="Path to domain eval JSONL.")
+    parser.add_argument("--retention-eval-jsonl", default="", help="Path to retention eval JSONL.")
+    parser.add_argument("--domain-output", default="", help="Path to domain category summary JSON.")
+    parser.add_argument("--retention-output", default="", help="Path to retention category summary JSON.")
+    parser.add_argument("--hard-cases-output", default="", help="Path to hard-cases JSON.")
+    parser.add_argument("--suite", choices=SUITES, default="", help="Shard mode: evaluate one suite only.")
+    parser.add_argument("--eval-jsonl", default="", help="Shard mode: eval JSONL of --suite.")
+    parser.add_argument("--shard-index", type=int, default=0, help="Shard mode: rows with index %% count == shard.")
+    parser.add_argument("--shard-count", type=int, default=1)
+    parser.add_argument("--shard", default="", help="Shard mode: shorthand for --shard-index/--shard-count as i/N.")
+    parser.add_argument("--partial-output", default="", help="Shard mode: partial JSON to write.")
+    parser.add_argument(
+        "--merge-partials",
+        nargs="+",
+        default=[],
+        help="Merge mode: partial JSONs covering every shard of both suites.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKEND_NAMES,
+        default="subprocess",
+        help="subprocess: --inference-script per call; albatross: model loaded in-process; mock: CPU dry run.",
+    )
+    parser.add_argument(
+        "--albatross-dir",
+        default=str(SCRIPT_DIR.parent / "third_party" / "Albatross"),
+        help="albatross backend: local Albatross checkout (tokenizer: --tokenizer-vocab or its bundled vocab).",
+    )
+    parser.add_argument(
+        "--weights-cache",
+        action="store_true",
+        help="albatross backend, or passed to the inference script: load the mmap'd safetensors copy of --model.",
+    )
+    parser.add_argument(
+        "--lora-adapter",
+        action="append",
+        default=[],
+        help="LoRA adapter .pth (runs/<run>/rwkv-*.pth) applied on top of --model; repeatable with --sweep-output-dir.",
+    )
+    parser.add_argument(
+        "--lora-alpha",
+        type=float,
+        default=None,
+        help="lora_alpha of the adapters. Default: PEFT config of each adapter's run directory.",
+    )
+    parser.add_argument(
+        "--sweep-output-dir",
+        default="",
+        help="Score every --lora-adapter in one process: <dir>/<run>__<checkpoint>/*.json and <dir>/sweep.json.",
+    )
+    parser.add_argument(
+        "--mock-table",
+        default="",
+        help='mock backend: JSONL of {"prompt", "completion"}; unknown prompts are echoed back.',
+    )
+    parser.add_argument(
+        "--mock-oracle",
+        action="store_true",
+        help="mock backend: answer every eval prompt with its expected response.",
+    )
+    parser.add_argument("--mock-fail-rate", type=float, default=0.0, help="mock backend: share of wrong answers.")
+    parser.add_argument("--mock-prefill-ms", type=float, default=0.0, help="mock backend: latency per prompt token.")
+    parser.add_argument("--mock-decode-ms", type=float, default=0.0, help="mock backend: latency per decode step.")
+    parser.add_argument("--mock-jitter", type=float, default=0.0, help="mock backend: lognormal latency sigma.")
+    parser.add_argument("--mock-seed", type=int, default=0)
     parser.add_argument(
         "--inference-script",
         default=str(SCRIPT_DIR / "infer_albatross.py"),
         help="Inference script used to produce a completion for one prompt.",
     )
     parser.add_argument("--tokens", type=int, default=128, help="Max generated tokens per eval sample.")
-    return parser.parse_args()
+    parser.add_argument(
+        "--stop",
+        action="append",
+        default=None,
+        help=f"Stop sequence passed to the inference script (repeatable). Default: {list(DEFAULT_STOP_SEQUENCES)!r}.",
+    )
+    parser.add_argument("--no-stop", action="store_true", help="Do not pass stop sequences.")
+    parser.add_argument(
+        "--budget-factor",
+        type=float,
+        default=DEFAULT_BUDGET_FACTOR,
+        help="Per-category token budget as a multiple of the longest expected answer; 0 always uses --tokens.",
+    )
+    parser.add_argument(
+        "--tokenizer-vocab",
+        default="",
+        help="RWKV vocab for counting expected answer tokens. Without one, UTF-8 bytes (an upper bound) are used.",
+    )
+    parser.add_argument(
+        "--max-batch-tokens",
+        type=int,
+        default=0,
+        help=(
+            "Batch rows into length-bucketed --prompts-jsonl calls of at most this many prompt tokens "
+            "(rows x longest prompt); 0 runs one inference call per row."
+        ),
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        default="",
+        help="Per-row checkpoint directory. Defaults to the partial output directory in shard mode, else the run dir.",
+    )
+    parser.add_argument("--no-checkpoint", action="store_true", help="Do not read or append per-row checkpoints.")
+    parser.add_argument(
+        "--model-sha256",
+        default="",
+        help="Known sha256 of --model (skips hashing a multi-GB checkpoint in every shard).",
+    )
+    args = parser.parse_args()
+    if args.max_batch_tokens < 0:
+        parser.error("--max-batch-tokens must be >= 0")
+    if args.no_stop:
+        args.stop = []
+    elif args.stop is None:
+        args.stop = list(DEFAULT_STOP_SEQUENCES)
+    if args.shard:
+        try:
+            index, count = args.shard.split("/")
+            args.shard_index, args.shard_count = int(index), int(count)
+        except ValueError:
+            parser.error(f"--shard must look like i/N, got {args.shard!r}")
+    if len(args.lora_adapter) > 1 and not args.sweep_output_dir:
+        parser.error("several --lora-adapter need --sweep-output-dir")
+    if args.sweep_output_dir and (args.suite or args.merge_partials or not args.lora_adapter):
+        parser.error("--sweep-output-dir needs --lora-adapter and cannot be combined with --suite or --merge-partials")
+    if args.merge_partials:
+        required = ["domain_output", "retention_output", "hard_cases_output"]
+    elif args.sweep_output_dir:
+        required = ["domain_eval_jsonl", "retention_eval_jsonl"]
+    elif args.suite:
+        required = ["eval_jsonl", "partial_output"]
+        if not 0 <= args.shard_index < args.shard_count:
+            parser.error("--shard-index must be in [0, --shard-count)")
+    else:
+        required = [
+            "domain_eval_jsonl",
+            "retention_eval_jsonl",
+            "domain_output",
+            "retention_output",
+            "hard_cases_output",
+        ]
+    if not args.merge_partials and args.backend != "mock":
+        required.insert(0, "model")
+    missing = [f"--{name.replace('_', '-')}" for name in required if not getattr(args, name)]
+    if missing:
+        parser.error(f"the following arguments are required: {', '.join(missing)}")
+    return args
 
 
 def read_inference_completion(inference_script: Path, model_path: Path, prompt: str, tokens: int) -> str:
-    with tempfile.NamedTemporaryFile(prefix="eval-infer-", suffix=".json", delete=False) as handle:
-        output_json = Path(handle.name)
+    backend = SubprocessBackend(inference_script, model_path)
+    return backend.generate_batch([prompt], GenerationParams(tokens))[0]["completion"]
+
+
+def expected_token_counter(vocab: str = "") -> tuple[str, Any]:
+    """`(name, count)` counting tokens of an expected answer: the RWKV tokenizer when a vocab
+    resolves, else UTF-8 bytes, which no tokenization of the same text can exceed."""
     try:
-        result = subprocess.run(
-            [
-                sys.executable,
-                str(inference_script),
-                "--model",
-                str(model_path),
-                "--prompt",
-                prompt,
-                "--tokens",
-                str(tokens),
-                "--output-json",
-                str(output_json),
-            ],
-            check=False,
-            text=True,
-            capture_output=True,
-        )
-        if result.returncode != 0:
-            raise RuntimeError(
-                f"inference_failed script={inference_script} stdout={result.stdout} stderr={result.stderr}"
-            )
-        payload = json.loads(output_json.read_text(encoding="utf-8"))
-        samples = payload.get("samples")
-        if not isinstance(samples, list) or not samples:
-            raise ValueError("inference_output_missing_samples")
-        completion = samples[0].get("completion")
-        if not isinstance(completion, str):
-            raise ValueError("inference_output_missing_completion")
-        return completion.strip()
-    finally:
-        output_json.unlink(missing_ok=True)
+        tokenizer = RwkvTokenizer(resolve_vocab_path(vocab or None))
+    except ValueError:
+        if vocab:
+            raise
+        return "utf8_bytes", lambda text: len(text.encode("utf-8"))
+    return "rwkv_vocab", tokenizer.count
+
+
+def category_token_budgets(
+    rows: list[dict[str, Any]],
+    suite_name: str,
+    max_tokens: int,
+    factor: float,
+    count_tokens: Any,
+) -> dict[str, int]:
+    """Decode budget per category, from the whole suite so every shard agrees."""
+    longest: dict[str, int] = defaultdict(int)
+    for row in rows:
+        category = resolve_category(row, suite_name)
+        longest[category] = max(longest[category], count_tokens(row["assistant_response"]))
+    if factor <= 0:
+        return {category: max_tokens for category in longest}
+    return {
+        category: min(max_tokens, math.ceil(length * factor) + BUDGET_MARGIN_TOKENS)
+        for category, length in longest.items()
+    }
 
 
 def normalize_answer(text: str) -> str:
@@ -116,37 +293,201 @@ def failure_mode_for_completion(predicted: str) -> str:
     return "prediction_mismatch"
 
 
-def evaluate_suite(
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def checkpoint_path(directory: Path, suite_name: str, shard_index: int = 0, shard_count: int = 1) -> Path:
+    shard = f"-{shard_index}-of-{shard_count}" if shard_count > 1 else ""
+    return directory / f"{suite_name}{shard}{CHECKPOINT_SUFFIX}"
+
+
+def row_checkpoint_key(
+    suite_name: str,
+    row: dict[str, Any],
+    model_sha256: str,
+    tokens: int,
+    stop_sequences: list[str] | tuple[str, ...] = (),
+) -> str:
+    canonical = json.dumps(
+        {"suite": suite_name, "row": row, "model_sha256": model_sha256, "tokens": tokens, "stop": list(stop_sequences)},
+        ensure_ascii=True,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load_row_checkpoint(path: Path) -> dict[str, dict[str, Any]]:
+    """Scored rows by key; a line torn by a crash mid-append is ignored."""
+    records: dict[str, dict[str, Any]] = {}
+    if not path.is_file():
+        return records
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and isinstance(record.get("key"), str):
+                records[record["key"]] = record
+    return records
+
+
+def eval_prompt(user_prompt: str) -> str:
+    return f"User: {user_prompt}\nAssistant:"
+
+
+def evaluate_rows(
     suite_name: str,
     path: Path,
-    inference_script: Path,
-    model_path: Path,
+    backend: InferenceBackend,
     tokens: int,
-) -> tuple[dict[str, dict[str, Any]], list[dict[str, str]]]:
+    shard_index: int = 0,
+    shard_count: int = 1,
+    checkpoint: Path | None = None,
+    model_sha256: str = "",
+    stop_sequences: list[str] | tuple[str, ...] = (),
+    budget_factor: float = 0.0,
+    count_tokens: Any = None,
+    max_batch_tokens: int = 0,
+    decode_stats: dict[str, Any] | None = None,
+) -> tuple[dict[str, dict[str, int]], list[dict[str, Any]]]:
+    """Raw per-category totals and hard cases (with `row_index`) for one shard of a suite.
+
+    With `count_tokens` and `budget_factor`, each category decodes at most its
+    `category_token_budgets` budget instead of `tokens`. With `max_batch_tokens`, rows still to
+    score are length-bucketed by `eval_scheduler` and sent to `backend` as batches; otherwise
+    every row is its own batch. Checkpoint keys use `model_sha256`, else the backend fingerprint.
+    `decode_stats`, when given, accumulates decoded and checkpoint-reused rows, budgeted and
+    reported decoded tokens, and per-bucket throughput.
+    """
     rows = load_canonical_rows(path)
-    category_totals: dict[str, dict[str, Any]] = defaultdict(
+    budgets: dict[str, int] = {}
+    if count_tokens is not None and budget_factor > 0:
+        budgets = category_token_budgets(rows, suite_name, tokens, budget_factor, count_tokens)
+    category_totals: dict[str, dict[str, int]] = defaultdict(
         lambda: {"samples_total": 0, "failures_total": 0}
     )
-    hard_cases: list[dict[str, str]] = []
-
-    for row in rows:
-        prompt = f"User: {row['user_prompt']}\nAssistant:"
-        predicted = read_inference_completion(inference_script, model_path, prompt, tokens)
+    hard_cases: list[dict[str, Any]] = []
+    scored: dict[str, dict[str, Any]] = {}
+    handle = None
+    if checkpoint is not None:
+        model_sha256 = model_sha256 or backend.fingerprint or ""
+        if not model_sha256:
+            raise ValueError("eval_checkpoint_missing_model_sha256: checkpoints are keyed by the model sha256")
+        scored = load_row_checkpoint(checkpoint)
+        checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        handle = checkpoint.open("a", encoding="utf-8")
+        if handle.tell():
+            with checkpoint.open("rb") as tail:
+                tail.seek(-1, os.SEEK_END)
+                if tail.read(1) != b"\n":
+                    handle.write("\n")
+
+    selected = []
+    for row_index, row in enumerate(rows):
+        if row_index % shard_count != shard_index:
+            continue
         category = resolve_category(row, suite_name)
+        budget = budgets.get(category, tokens)
+        key = row_checkpoint_key(suite_name, row, model_sha256, budget, stop_sequences) if handle else ""
+        selected.append(
+            {
+                "row_index": row_index,
+                "row": row,
+                "category": category,
+                "budget": budget,
+                "key": key,
+                "prompt": eval_prompt(row["user_prompt"]),
+            }
+        )
+
+    def score(item: dict[str, Any], sample: dict[str, Any]) -> dict[str, Any]:
+        predicted = sample["completion"]
+        passed = match_prediction(item["row"]["assistant_response"], predicted)
+        record = {
+            "key": item["key"],
+            "suite": suite_name,
+            "row_index": item["row_index"],
+            "model_sha256": model_sha256,
+            "tokens_budget": item["budget"],
+            "tokens_generated": sample["tokens_generated"],
+            "passed": passed,
+            "failure_mode": "" if passed else failure_mode_for_completion(predicted),
+        }
+        if decode_stats is not None:
+            decode_stats["rows_decoded"] += 1
+            decode_stats["tokens_budget"] += item["budget"]
+            decode_stats["tokens_generated"] += sample["tokens_generated"] or 0
+        if handle is not None:
+            handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+            scored[item["key"]] = record
+        return record
+
+    records: dict[int, dict[str, Any]] = {}
+    try:
+        pending = []
+        for item in selected:
+            record = scored.get(item["key"])
+            if record is None:
+                pending.append(item)
+            else:
+                records[item["row_index"]] = record
+                if decode_stats is not None:
+                    decode_stats["rows_reused"] += 1
+
+        def generate_batch(items: list[dict[str, Any]], budget: int) -> list[dict[str, Any]]:
+            params = GenerationParams(budget, list(stop_sequences))
+            samples = backend.generate_batch([item["prompt"] for item in items], params)
+            if len(samples) != len(items):
+                raise ValueError(f"inference_output_results_mismatch: expected {len(items)} results")
+            return [score(item, sample) for item, sample in zip(items, samples)]
+
+        if max_batch_tokens and pending:
+            measure = count_tokens or (lambda text: len(text.encode("utf-8")))
+
+            lengths = [measure(item["prompt"]) for item in pending]
+            plan = plan_batches(lengths, max_batch_tokens, keys=[item["budget"] for item in pending])
+            batch_records, bucket_stats = run_batches(pending, lengths, plan, generate_batch)
+            for item, record in zip(pending, batch_records):
+                records[item["row_index"]] = record
+            if decode_stats is not None:
+                merge_bucket_stats(decode_stats.setdefault("buckets", {}), bucket_stats)
+        else:
+            for item in pending:
+                records[item["row_index"]] = generate_batch([item], item["budget"])[0]
+    finally:
+        if handle is not None:
+            handle.close()
+
+    for item in selected:
+        record = records[item["row_index"]]
+        category = item["category"]
         bucket = category_totals[category]
         bucket["samples_total"] += 1
-        if not match_prediction(row["assistant_response"], predicted):
+        if not record["passed"]:
             bucket["failures_total"] += 1
             hard_cases.append(
                 {
+                    "row_index": item["row_index"],
                     "suite": suite_name,
                     "category": category,
-                    "prompt": row["user_prompt"],
-                    "failure_mode": failure_mode_for_completion(predicted),
+                    "prompt": item["row"]["user_prompt"],
+                    "failure_mode": record["failure_mode"],
                     "action": build_default_action(suite_name, category),
                 }
             )
+    return dict(category_totals), hard_cases
+
 
+def summarize_categories(category_totals: dict[str, dict[str, int]]) -> dict[str, dict[str, Any]]:
     normalized: dict[str, dict[str, Any]] = {}
     for category, totals in sorted(category_totals.items()):
         samples_total = int(totals["samples_total"])
@@ -158,7 +499,92 @@ def evaluate_suite(
             "samples_total": samples_total,
             "failures_total": failures_total,
         }
-    return normalized, hard_cases
+    return normalized
+
+
+def _strip_row_index(hard_cases: list[dict[str, Any]]) -> list[dict[str, str]]:
+    return [{key: value for key, value in case.items() if key != "row_index"} for case in hard_cases]
+
+
+def evaluate_suite(
+    suite_name: str,
+    path: Path,
+    backend: InferenceBackend,
+    tokens: int,
+    checkpoint: Path | None = None,
+    model_sha256: str = "",
+    **decode_options: Any,
+) -> tuple[dict[str, dict[str, Any]], list[dict[str, str]]]:
+    category_totals, hard_cases = evaluate_rows(
+        suite_name,
+        path,
+        backend,
+        tokens,
+        checkpoint=checkpoint,
+        model_sha256=model_sha256,
+        **decode_options,
+    )
+    return summarize_categories(category_totals), _strip_row_index(hard_cases)
+
+
+def merge_partials(partials: list[dict[str, Any]]) -> tuple[dict[str, dict[str, dict[str, Any]]], list[dict[str, str]]]:
+    """Per-suite category summaries and hard cases, in the order a single-process run produces."""
+    shards: dict[str, dict[int, dict[str, Any]]] = {suite: {} for suite in SUITES}
+    for partial in partials:
+        if partial.get("schema_version") != PARTIAL_SCHEMA_VERSION or partial.get("suite") not in shards:
+            raise ValueError(f"eval_partial_invalid: {partial.get('suite')!r}")
+        by_index = shards[partial["suite"]]
+        if partial["shard_index"] in by_index:
+            raise ValueError(f"eval_partial_duplicate_shard: {partial['suite']}[{partial['shard_index']}]")
+        by_index[partial["shard_index"]] = partial
+
+    categories: dict[str, dict[str, dict[str, Any]]] = {}
+    hard_cases: list[dict[str, Any]] = []
+    for suite in SUITES:
+        by_index = shards[suite]
+        counts = {partial["shard_count"] for partial in by_index.values()}
+        if len(counts) != 1 or sorted(by_index) != list(range(counts.pop())):
+            raise ValueError(f"eval_partial_missing_shards: {suite} has shards {sorted(by_index)}")
+        totals: dict[str, dict[str, int]] = defaultdict(lambda: {"samples_total": 0, "failures_total": 0})
+        suite_cases: list[dict[str, Any]] = []
+        for partial in by_index.values():
+            for category, counters in partial["categories"].items():
+                totals[category]["samples_total"] += int(counters["samples_total"])
+                totals[category]["failures_total"] += int(counters["failures_total"])
+            suite_cases.extend(partial["hard_cases"])
+        categories[suite] = summarize_categories(dict(totals))
+        hard_cases.extend(sorted(suite_cases, key=lambda case: case["row_index"]))
+    return categories, _strip_row_index(hard_cases)
+
+
+def build_backend(args: argparse.Namespace, model_path: Path | None, eval_jsonls: list[Path]) -> InferenceBackend:
+    if args.backend == "mock":
+        table = MockBackend.load_table(Path(args.mock_table)) if args.mock_table else {}
+        if args.mock_oracle:
+            for path in eval_jsonls:
+                table.update((eval_prompt(row["user_prompt"]), row["assistant_response"]) for row in load_canonical_rows(path))
+        options: dict[str, Any] = {}
+        counter_name, count_tokens = expected_token_counter(args.tokenizer_vocab)
+        if counter_name == "rwkv_vocab":
+            options["count_tokens"] = count_tokens
+        return MockBackend(
+            table,
+            fail_rate=args.mock_fail_rate,
+            prefill_ms_per_token=args.mock_prefill_ms,
+            decode_ms_per_token=args.mock_decode_ms,
+            jitter_sigma=args.mock_jitter,
+            seed=args.mock_seed,
+            **options,
+        )
+    if args.backend == "albatross":
+        # Adapters are swapped in place on the base, which must come from the weight cache.
+        weights_cache = args.weights_cache or bool(args.lora_adapter)
+        return AlbatrossBackend(model_path, args.albatross_dir, tokenizer=args.tokenizer_vocab, weights_cache=weights_cache)
+    inference_script = Path(args.inference_script).resolve()
+    if not inference_script.is_file():
+        raise FileNotFoundError(f"Inference script not found: {inference_script}")
+    extra_args = ["--weights-cache"] if args.weights_cache else []
+    return SubprocessBackend(inference_script, model_path, args.max_batch_tokens, extra_args)
 
 
 def write_json(path: Path, payload: Any) -> None:
@@ -166,8 +592,126 @@ def write_json(path: Path, payload: Any) -> None:
     path.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
 
 
+def evaluate_suites(
+    args: argparse.Namespace,
+    backend: InferenceBackend,
+    model_sha256: str,
+    checkpoint_dir: Path | None,
+    decode_options: dict[str, Any],
+) -> tuple[dict[str, dict[str, Any]], dict[str, dict[str, Any]], list[dict[str, str]]]:
+    """Domain and retention category summaries plus their hard cases; no checkpoints without `checkpoint_dir`."""
+    summaries = []
+    hard_cases: list[dict[str, str]] = []
+    for suite_name, path in (("domain_eval", args.domain_eval_jsonl), ("retention_eval", args.retention_eval_jsonl)):
+        categories, suite_hard_cases = evaluate_suite(
+            suite_name,
+            Path(path).resolve(),
+            backend,
+            args.tokens,
+            checkpoint=checkpoint_path(checkpoint_dir, suite_name) if checkpoint_dir else None,
+            model_sha256=model_sha256,
+            **decode_options,
+        )
+        summaries.append(categories)
+        hard_cases.extend(suite_hard_cases)
+    return summaries[0], summaries[1], hard_cases
+
+
+def activate_adapter(
+    args: argparse.Namespace,
+    backend: InferenceBackend,
+    adapter_path: Path,
+    model_sha256: str,
+) -> tuple[dict[str, Any], str]:
+    """Switch `backend` to the adapter; returns what was activated and the checkpoint key of base + adapter."""
+    if not adapter_path.is_file():
+        raise FileNotFoundError(f"LoRA adapter not found: {adapter_path}")
+    activated = backend.use_adapter(adapter_path, args.lora_alpha)
+    activated["sha256"] = activated.get("sha256") or sha256_file(adapter_path)
+    alpha = activated.get("lora_alpha", args.lora_alpha)
+    key = f"{model_sha256}+lora:{activated['sha256']}" + (f":a{alpha:g}" if alpha is not None else "")
+    print(f"adapter: {activated['name']} ({adapter_path})")
+    return activated, key
+
+
+def suite_totals(categories: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    samples_total = sum(int(payload["samples_total"]) for payload in categories.values())
+    failures_total = sum(int(payload["failures_total"]) for payload in categories.values())
+    score = 0.0 if samples_total == 0 else (samples_total - failures_total) / samples_total
+    return {"score": round(score, 6), "samples_total": samples_total, "failures_total": failures_total}
+
+
+def run_adapter_sweep(
+    args: argparse.Namespace,
+    backend: InferenceBackend,
+    model_path: Path | None,
+    model_sha256: str,
+    decode_options: dict[str, Any],
+) -> int:
+    """Score every `--lora-adapter` with one backend (one base load) and rank them in `sweep.json`."""
+    sweep_dir = Path(args.sweep_output_dir).resolve()
+    entries = []
+    for adapter in args.lora_adapter:
+        adapter_path = Path(adapter).resolve()
+        activated, adapter_sha256 = activate_adapter(args, backend, adapter_path, model_sha256)
+        output_dir = sweep_dir / activated["name"].replace("/", "__")
+        checkpoint_dir = None
+        if not args.no_checkpoint:
+            checkpoint_dir = (
+                Path(args.checkpoint_dir).resolve() / output_dir.name if args.checkpoint_dir else output_dir
+            )
+        domain_categories, retention_categories, hard_cases = evaluate_suites(
+            args, backend, adapter_sha256, checkpoint_dir, decode_options
+        )
+        outputs = {
+            "domain_output": output_dir / "domain_eval.json",
+            "retention_output": output_dir / "retention_eval.json",
+            "hard_cases_output": output_dir / "hard_cases.json",
+        }
+        write_json(outputs["domain_output"], domain_categories)
+        write_json(outputs["retention_output"], retention_categories)
+        write_json(outputs["hard_cases_output"], hard_cases)
+        entry = {
+            "adapter": activated,
+            "outputs": {name: str(path) for name, path in outputs.items()},
+            "domain_eval": suite_totals(domain_categories),
+            "retention_eval": suite_totals(retention_categories),
+        }
+        entries.append(entry)
+        print(
+            f"adapter_scores: {activated['name']} domain={entry['domain_eval']['score']} "
+            f"retention={entry['retention_eval']['score']}"
+        )
+
+    ranking = sorted(
+        entries, key=lambda entry: (-entry["domain_eval"]["score"], -entry["retention_eval"]["score"])
+    )
+    sweep = {
+        "run_name": args.run_name,
+        "backend": backend.name,
+        "model": str(model_path) if model_path else None,
+        "load": getattr(backend, "load", None),
+        "adapters": entries,
+        "ranking": [entry["adapter"]["name"] for entry in ranking],
+        "decode": decode_options["decode_stats"],
+    }
+    write_json(sweep_dir / "sweep.json", sweep)
+    print(f"decode: {json.dumps(decode_options['decode_stats'], sort_keys=True)}")
+    print(f"sweep: {sweep_dir / 'sweep.json'}")
+    return 0
+
+
 def main() -> int:
     args = parse_args()
+    if args.merge_partials:
+        partials = [json.loads(Path(path).read_text(encoding="utf-8")) for path in args.merge_partials]
+        categories, hard_cases = merge_partials(partials)
+        write_json(Path(args.domain_output).resolve(), categories["domain_eval"])
+        write_json(Path(args.retention_output).resolve(), categories["retention_eval"])
+        write_json(Path(args.hard_cases_output).resolve(), hard_cases)
+        print(f"merged_partials: {len(partials)}")
+        return 0
+
     run_dir = (
         Path(args.run_dir).resolve()
         if args.run_dir
@@ -176,38 +720,85 @@ def main() -> int:
     if not run_dir.is_dir():
         raise FileNotFoundError(f"Run directory not found: {run_dir}")
 
-    model_path = Path(args.model).resolve()
-    if not model_path.is_file():
+    model_path = Path(args.model).resolve() if args.model else None
+    if model_path is not None and not model_path.is_file():
         raise FileNotFoundError(f"Model checkpoint not found: {model_path}")
-
-    inference_script = Path(args.inference_script).resolve()
-    if not inference_script.is_file():
-        raise FileNotFoundError(f"Inference script not found: {inference_script}")
+    eval_jsonls = [args.eval_jsonl] if args.suite else [args.domain_eval_jsonl, args.retention_eval_jsonl]
+    backend = build_backend(args, model_path, [Path(path).resolve() for path in eval_jsonls])
+    print(f"backend: {backend.name}")
+
+    model_sha256 = args.model_sha256 or backend.fingerprint or ""
+    if not args.no_checkpoint and not model_sha256:
+        model_sha256 = sha256_file(model_path)
+    if args.checkpoint_dir:
+        checkpoint_dir = Path(args.checkpoint_dir).resolve()
+    elif args.suite:
+        checkpoint_dir = Path(args.partial_output).resolve().parent
+    else:
+        checkpoint_dir = run_dir
+
+    decode_stats = {"rows_decoded": 0, "rows_reused": 0, "tokens_budget": 0, "tokens_generated": 0}
+    decode_options: dict[str, Any] = {"stop_sequences": args.stop, "decode_stats": decode_stats}
+    if args.budget_factor > 0 or args.max_batch_tokens:
+        counter_name, decode_options["count_tokens"] = expected_token_counter(args.tokenizer_vocab)
+    if args.budget_factor > 0:
+        decode_options["budget_factor"] = args.budget_factor
+        print(f"token_budgets: factor={args.budget_factor} counter={counter_name} cap={args.tokens}")
+    if args.max_batch_tokens:
+        decode_options["max_batch_tokens"] = args.max_batch_tokens
+        print(f"batching: max_batch_tokens={args.max_batch_tokens} counter={counter_name}")
+
+    if args.sweep_output_dir:
+        return run_adapter_sweep(args, backend, model_path, model_sha256, decode_options)
+
+    if args.lora_adapter:
+        model_sha256 = activate_adapter(args, backend, Path(args.lora_adapter[0]).resolve(), model_sha256)[1]
+
+    if args.suite:
+        category_totals, shard_hard_cases = evaluate_rows(
+            args.suite,
+            Path(args.eval_jsonl).resolve(),
+            backend,
+            args.tokens,
+            args.shard_index,
+            args.shard_count,
+            checkpoint=None
+            if args.no_checkpoint
+            else checkpoint_path(checkpoint_dir, args.suite, args.shard_index, args.shard_count),
+            model_sha256=model_sha256,
+            **decode_options,
+        )
+        partial_output = Path(args.partial_output).resolve()
+        write_json(
+            partial_output,
+            {
+                "schema_version": PARTIAL_SCHEMA_VERSION,
+                "run_name": args.run_name,
+                "suite": args.suite,
+                "shard_index": args.shard_index,
+                "shard_count": args.shard_count,
+                "categories": category_totals,
+                "hard_cases": shard_hard_cases,
+                "decode": decode_stats,
+            },
+        )
+        print(f"decode: {json.dumps(decode_stats, sort_keys=True)}")
+        print(f"{args.suite}_partial: {partial_output}")
+        return 0
 
     domain_output = Path(args.domain_output).resolve()
     retention_output = Path(args.retention_output).resolve()
     hard_cases_output = Path(args.hard_cases_output).resolve()
 
-    domain_categories, domain_hard_cases = evaluate_suite(
-        "domain_eval",
-        Path(args.domain_eval_jsonl).resolve(),
-        inference_script,
-        model_path,
-        args.tokens,
-    )
-    retention_categories, retention_hard_cases = evaluate_suite(
-        "retention_eval",
-        Path(args.retention_eval_jsonl).resolve(),
-        inference_script,
-        model_path,
-        args.tokens,
+    domain_categories, retention_categories, hard_cases = evaluate_suites(
+        args, backend, model_sha256, None if args.no_checkpoint else checkpoint_dir, decode_options
     )
-    hard_cases = [*domain_hard_cases, *retention_hard_cases]
 
     write_json(domain_output, domain_categories)
     write_json(retention_output, retention_categories)
     write_json(hard_cases_output, hard_cases)
 
+    print(f"decode: {json.dumps(decode_stats, sort_keys=True)}")
     print(f"domain_categories: {domain_output}")
     print(f"retention_categories: {retention_output}")
     print(f"hard_cases: {hard_cases_output}")
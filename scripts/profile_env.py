@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Read `configs/model/*.env` and `configs/profile/*.env` the way `train.sh` sources them.
+
+Only the subset of shell syntax used by these files is supported: `KEY=value` lines,
+optional `export`, single/double quotes and `#` comments. `train.sh` sources the model env
+first and the profile env second, so `load_train_env` merges them in that order.
+"""
+
+from __future__ import annotations
+
+import re
+import shlex
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+MODEL_CONFIG_DIR = ROOT_DIR / "configs" / "model"
+PROFILE_CONFIG_DIR = ROOT_DIR / "configs" / "profile"
+# Same default as train.sh (TRAIN_MODEL_CONFIG) and every train_*.sh wrapper.
+DEFAULT_MODEL_CONFIG = MODEL_CONFIG_DIR / "rwkv7-7.2b.env"
+ENV_LINE_PATTERN = re.compile(r"^(?:export\s+)?(?P<key>[A-Za-z_][A-Za-z0-9_]*)=(?P<value>.*)$")
+WRAPPER_CONFIG_PATTERN = re.compile(r'--(?P<kind>model|profile)\s+"\$ROOT_DIR/(?P<path>[^"]+)"')
+
+
+def load_env_file(path: Path) -> dict[str, str]:
+    values: dict[str, str] = {}
+    for line_number, raw_line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), start=1):
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = ENV_LINE_PATTERN.match(line)
+        if match is None:
+            raise ValueError(f"{path}:{line_number}: unsupported env line")
+        try:
+            parts = shlex.split(match.group("value"), comments=True)
+        except ValueError as exc:
+            raise ValueError(f"{path}:{line_number}: {exc}") from exc
+        values[match.group("key")] = parts[0] if parts else ""
+    return values
+
+
+def load_train_env(model_config: Path, profile_config: Path) -> dict[str, str]:
+    merged = load_env_file(model_config)
+    merged.update(load_env_file(profile_config))
+    return merged
+
+
+def env_int(env: dict[str, str], key: str, default: int | None = None) -> int:
+    raw = env.get(key, "")
+    if raw == "":
+        if default is None:
+            raise ValueError(f"missing_env_value: {key}")
+        return default
+    try:
+        return int(raw)
+    except ValueError as exc:
+        raise ValueError(f"invalid_env_int: {key}={raw}") from exc
+
+
+def wrapper_configs(wrapper: Path) -> tuple[Path | None, Path | None]:
+    """`(model_env, profile_env)` passed by a `train_*.sh` wrapper to `train.sh`."""
+    found: dict[str, Path] = {}
+    for match in WRAPPER_CONFIG_PATTERN.finditer(Path(wrapper).read_text(encoding="utf-8")):
+        found[match.group("kind")] = ROOT_DIR / match.group("path")
+    return found.get("model"), found.get("profile")
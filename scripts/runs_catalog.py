@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""Index `runs/*` and the Airflow audit records into SQLite and report cross-run regressions.
+
+`index` walks every run directory and every DAG-run audit directory and re-reads only the
+ones whose newest artifact mtime changed since the last pass. Per run it records model,
+profile, dataset sha, training throughput (`telemetry/summary.json`), eval scores per
+suite/category (`eval_summary.json`) and gate verdicts; per DAG task attempt it records the
+wall time (`started_at` -> `timestamp` in the audit JSON, or the gap since the previous
+task of the same DAG run for audits written before `started_at` existed).
+
+`report` indexes, then renders a Markdown or static HTML report with trends per run and
+the regressions against the previous run of the same base model past the thresholds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import html
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from collect_train_telemetry import SUMMARY_NAME, TELEMETRY_DIRNAME, TRAIN_LOG_NAME
+from estimate_train_resources import OBSERVATION_NAME
+from profile_env import ROOT_DIR
+
+
+RUNS_DIR = ROOT_DIR / "runs"
+AUDIT_DIR = Path(os.getenv("AIRFLOW_AUDIT_DIR", str(ROOT_DIR / "orchestration/airflow/runtime/audit")))
+DEFAULT_DB = RUNS_DIR / "catalog.sqlite"
+SCHEMA_VERSION = 1
+RUN_ARTIFACTS = (
+    "eval_summary.json",
+    "release_manifest.json",
+    OBSERVATION_NAME,
+    TRAIN_LOG_NAME,
+    "train_smoke_stub.json",
+    f"{TELEMETRY_DIRNAME}/{SUMMARY_NAME}",
+)
+EVAL_SUITES = ("domain_eval", "retention_eval")
+DEFAULT_THRESHOLDS = {
+    "max_throughput_drop": 0.10,
+    "max_score_drop": 0.05,
+    "max_wall_increase": 0.25,
+    "max_memory_increase": 0.10,
+}
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS runs (
+    run_name TEXT PRIMARY KEY,
+    run_dir TEXT NOT NULL,
+    source_mtime_ns INTEGER NOT NULL,
+    source_count INTEGER NOT NULL,
+    first_seen TEXT NOT NULL,
+    model TEXT,
+    profile TEXT,
+    quant TEXT,
+    peft TEXT,
+    ctx_len INTEGER,
+    micro_bsz INTEGER,
+    devices INTEGER,
+    data_prefix TEXT,
+    dataset_sha256 TEXT,
+    train_status TEXT,
+    tokens_per_sec REAL,
+    step_time_p50 REAL,
+    stalls INTEGER,
+    final_loss REAL,
+    peak_memory_gb REAL,
+    overall_verdict TEXT,
+    domain_verdict TEXT,
+    retention_verdict TEXT,
+    gates TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS eval_scores (
+    run_name TEXT NOT NULL,
+    suite TEXT NOT NULL,
+    category TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    samples_total INTEGER NOT NULL,
+    failures_total INTEGER NOT NULL,
+    score REAL,
+    PRIMARY KEY (run_name, suite, category)
+);
+CREATE TABLE IF NOT EXISTS dag_runs (
+    dag_run_id TEXT PRIMARY KEY,
+    source_mtime_ns INTEGER NOT NULL,
+    source_count INTEGER NOT NULL,
+    run_name TEXT
+);
+CREATE TABLE IF NOT EXISTS task_runs (
+    dag_run_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    run_name TEXT,
+    status TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT NOT NULL,
+    wall_seconds REAL,
+    details TEXT NOT NULL,
+    PRIMARY KEY (dag_run_id, task_id, attempt)
+);
+"""
+
+
+def _read_json(path: Path) -> Any:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _parse_iso(value: Any) -> datetime | None:
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _iso(timestamp_ns: int) -> str:
+    return datetime.fromtimestamp(timestamp_ns / 1e9, timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def _source_fingerprint(paths: Iterable[Path]) -> tuple[int, int, int]:
+    """`(max mtime_ns, min mtime_ns, count)` over the existing paths."""
+    mtimes = [path.stat().st_mtime_ns for path in paths if path.is_file()]
+    return (max(mtimes), min(mtimes), len(mtimes)) if mtimes else (0, 0, 0)
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(db_path))
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    row = connection.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+    if row is not None and int(row["value"]) != SCHEMA_VERSION:
+        raise ValueError(f"runs_catalog_schema_mismatch: {db_path} has {row['value']}, expected {SCHEMA_VERSION}")
+    connection.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+    return connection
+
+
+def train_args(run_dir: Path) -> dict[str, Any]:
+    """`vars(args)` dict RWKV-PEFT writes after each `NEW RUN` header in train_log.txt."""
+    path = run_dir / TRAIN_LOG_NAME
+    if not path.is_file():
+        return {}
+    found: dict[str, Any] = {}
+    for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
+        if line.startswith("{"):
+            try:
+                parsed = ast.literal_eval(line)
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(parsed, dict):
+                found = parsed
+    return found
+
+
+def _int_or_none(value: Any) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_run(run_dir: Path) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """Catalog row and eval score rows for one run directory."""
+    observation = _read_json(run_dir / OBSERVATION_NAME) or {}
+    env = observation.get("env") if isinstance(observation.get("env"), dict) else {}
+    args = train_args(run_dir)
+    telemetry = _read_json(run_dir / TELEMETRY_DIRNAME / SUMMARY_NAME) or {}
+    smoke = _read_json(run_dir / "train_smoke_stub.json") or {}
+    summary = _read_json(run_dir / "eval_summary.json") or {}
+
+    model = env.get("MODEL_TAG")
+    if not model and observation.get("model_config"):
+        model = Path(observation["model_config"]).stem
+    load_model = args.get("load_model") or smoke.get("load_model")
+    if not model and load_model:
+        model = Path(str(load_model)).stem
+    data_prefix = args.get("data_file") or smoke.get("data_prefix")
+    dataset_sha = None
+    if data_prefix:
+        manifest = _read_json(Path(f"{data_prefix}.manifest.json")) or {}
+        dataset_sha = (manifest.get("bin") or {}).get("sha256")
+    gates = {}
+    for gate_path in sorted((run_dir / "gates").glob("*.json")):
+        gate = _read_json(gate_path) or {}
+        gates[gate.get("gate", gate_path.stem)] = gate.get("verdict")
+
+    row = {
+        "model": model,
+        "profile": Path(observation["profile_config"]).stem if observation.get("profile_config") else None,
+        "quant": env.get("QUANT") or args.get("quant"),
+        "peft": env.get("PEFT") or args.get("peft"),
+        "ctx_len": _int_or_none(env.get("CTX_LEN") or args.get("ctx_len")),
+        "micro_bsz": _int_or_none(env.get("MICRO_BSZ") or args.get("micro_bsz")),
+        "devices": _int_or_none(telemetry.get("devices") or observation.get("devices") or smoke.get("devices")),
+        "data_prefix": data_prefix,
+        "dataset_sha256": dataset_sha,
+        "train_status": telemetry.get("status") or smoke.get("status"),
+        "tokens_per_sec": telemetry.get("tokens_per_sec"),
+        "step_time_p50": (telemetry.get("step_time_s") or {}).get("p50"),
+        "stalls": (telemetry.get("stalls") or {}).get("count"),
+        "final_loss": (telemetry.get("loss") or {}).get("last"),
+        "peak_memory_gb": telemetry.get("peak_memory_gb"),
+        "overall_verdict": summary.get("overall_verdict"),
+        "domain_verdict": (summary.get("domain_eval") or {}).get("verdict"),
+        "retention_verdict": (summary.get("retention_eval") or {}).get("verdict"),
+        "gates": json.dumps(gates, sort_keys=True),
+    }
+    scores = []
+    for suite in EVAL_SUITES:
+        categories = (summary.get(suite) or {}).get("categories") or {}
+        for category, payload in sorted(categories.items()):
+            samples = int(payload.get("samples_total", 0))
+            failures = int(payload.get("failures_total", 0))
+            score = payload.get("score")
+            if score is None and samples:
+                score = 1.0 - failures / samples
+            scores.append(
+                {
+                    "suite": suite,
+                    "category": category,
+                    "verdict": str(payload.get("verdict", "FAIL")),
+                    "samples_total": samples,
+                    "failures_total": failures,
+                    "score": None if score is None else float(score),
+                }
+            )
+    return row, scores
+
+
+def _index_runs(connection: sqlite3.Connection, runs_dir: Path) -> dict[str, int]:
+    stats = {"runs_indexed": 0, "runs_unchanged": 0, "runs_removed": 0}
+    seen = set()
+    for run_dir in sorted(path for path in runs_dir.iterdir() if path.is_dir()) if runs_dir.is_dir() else []:
+        sources = [run_dir / name for name in RUN_ARTIFACTS] + sorted((run_dir / "gates").glob("*.json"))
+        newest, oldest, count = _source_fingerprint(sources)
+        if count == 0:
+            continue
+        seen.add(run_dir.name)
+        stored = connection.execute(
+            "SELECT source_mtime_ns, source_count FROM runs WHERE run_name = ?", (run_dir.name,)
+        ).fetchone()
+        if stored is not None and (stored["source_mtime_ns"], stored["source_count"]) == (newest, count):
+            stats["runs_unchanged"] += 1
+            continue
+        row, scores = extract_run(run_dir)
+        row.update(
+            {
+                "run_name": run_dir.name,
+                "run_dir": str(run_dir),
+                "source_mtime_ns": newest,
+                "source_count": count,
+                "first_seen": _iso(oldest),
+            }
+        )
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{key}" for key in row)
+        connection.execute(f"INSERT OR REPLACE INTO runs ({columns}) VALUES ({placeholders})", row)
+        connection.execute("DELETE FROM eval_scores WHERE run_name = ?", (run_dir.name,))
+        connection.executemany(
+            "INSERT INTO eval_scores VALUES (:run_name, :suite, :category, :verdict, :samples_total, :failures_total, :score)",
+            [{"run_name": run_dir.name, **score} for score in scores],
+        )
+        stats["runs_indexed"] += 1
+    for (run_name,) in connection.execute("SELECT run_name FROM runs").fetchall():
+        if run_name not in seen:
+            connection.execute("DELETE FROM runs WHERE run_name = ?", (run_name,))
+            connection.execute("DELETE FROM eval_scores WHERE run_name = ?", (run_name,))
+            stats["runs_removed"] += 1
+    return stats
+
+
+def extract_dag_run(audit_run_dir: Path) -> tuple[str | None, list[dict[str, Any]]]:
+    """Task attempt rows of one DAG run, ordered by completion time."""
+    records = []
+    for path in sorted(audit_run_dir.glob("*.json")):
+        payload = _read_json(path)
+        if isinstance(payload, dict) and payload.get("task_id") and _parse_iso(payload.get("timestamp")):
+            records.append(payload)
+    records.sort(key=lambda item: _parse_iso(item["timestamp"]))
+    run_name = next((item["run_name"] for item in records if item.get("run_name")), None)
+    if run_name is None:
+        # Audits written before `run_name` was recorded: train_adapter names the run dir.
+        run_name = next(
+            (
+                Path(item["details"]["run_dir"]).name
+                for item in records
+                if isinstance(item.get("details"), dict) and item["details"].get("run_dir")
+            ),
+            None,
+        )
+    rows = []
+    previous_finished = None
+    for item in records:
+        finished = _parse_iso(item["timestamp"])
+        started = _parse_iso(item.get("started_at")) or previous_finished
+        rows.append(
+            {
+                "task_id": str(item["task_id"]),
+                "attempt": int(item.get("attempt", 1)),
+                "run_name": item.get("run_name") or run_name,
+                "status": str(item.get("status", "")),
+                "started_at": item.get("started_at"),
+                "finished_at": item["timestamp"],
+                "wall_seconds": None if started is None else max(0.0, (finished - started).total_seconds()),
+                "details": json.dumps(item.get("details", {}), ensure_ascii=False, sort_keys=True),
+            }
+        )
+        previous_finished = finished
+    return run_name, rows
+
+
+def _index_audits(connection: sqlite3.Connection, audit_dir: Path) -> dict[str, int]:
+    stats = {"dag_runs_indexed": 0, "dag_runs_unchanged": 0}
+    for audit_run_dir in sorted(path for path in audit_dir.iterdir() if path.is_dir()) if audit_dir.is_dir() else []:
+        newest, _, count = _source_fingerprint(audit_run_dir.glob("*.json"))
+        if count == 0:
+            continue
+        stored = connection.execute(
+            "SELECT source_mtime_ns, source_count FROM dag_runs WHERE dag_run_id = ?", (audit_run_dir.name,)
+        ).fetchone()
+        if stored is not None and (stored["source_mtime_ns"], stored["source_count"]) == (newest, count):
+            stats["dag_runs_unchanged"] += 1
+            continue
+        run_name, rows = extract_dag_run(audit_run_dir)
+        connection.execute(
+            "INSERT OR REPLACE INTO dag_runs VALUES (?, ?, ?, ?)", (audit_run_dir.name, newest, count, run_name)
+        )
+        connection.execute("DELETE FROM task_runs WHERE dag_run_id = ?", (audit_run_dir.name,))
+        connection.executemany(
+            "INSERT OR REPLACE INTO task_runs VALUES "
+            "(:dag_run_id, :task_id, :attempt, :run_name, :status, :started_at, :finished_at, :wall_seconds, :details)",
+            [{"dag_run_id": audit_run_dir.name, **row} for row in rows],
+        )
+        stats["dag_runs_indexed"] += 1
+    return stats
+
+
+def index_catalog(db_path: Path, runs_dir: Path = RUNS_DIR, audit_dir: Path = AUDIT_DIR) -> dict[str, int]:
+    connection = connect(db_path)
+    try:
+        with connection:
+            stats = _index_runs(connection, runs_dir)
+            stats.update(_index_audits(connection, audit_dir))
+    finally:
+        connection.close()
+    return stats
+
+
+def load_catalog(db_path: Path) -> list[dict[str, Any]]:
+    """Runs ordered by first_seen, each with `scores` and the latest attempt wall time per task."""
+    connection = connect(db_path)
+    try:
+        runs = [dict(row) for row in connection.execute("SELECT * FROM runs ORDER BY first_seen, run_name")]
+        for run in runs:
+            run["gates"] = json.loads(run["gates"])
+            run["scores"] = {
+                f"{row['suite']}/{row['category']}": row["score"]
+                for row in connection.execute(
+                    "SELECT suite, category, score FROM eval_scores WHERE run_name = ? ORDER BY suite, category",
+                    (run["run_name"],),
+                )
+            }
+            run["task_seconds"] = {}
+            for row in connection.execute(
+                "SELECT task_id, wall_seconds, details FROM task_runs WHERE run_name = ? ORDER BY finished_at",
+                (run["run_name"],),
+            ):
+                if row["wall_seconds"] is not None:
+                    run["task_seconds"][row["task_id"]] = row["wall_seconds"]
+                if row["task_id"] == "prepare_dataset" and not run["dataset_sha256"]:
+                    run["dataset_sha256"] = json.loads(row["details"]).get("bin_sha256")
+    finally:
+        connection.close()
+    return runs
+
+
+def _relative_change(baseline: float, value: float) -> float:
+    return (value - baseline) / baseline if baseline else 0.0
+
+
+def find_regressions(runs: list[dict[str, Any]], thresholds: dict[str, float] | None = None) -> list[dict[str, Any]]:
+    """Compare each run with the previous run of the same base model."""
+    limits = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    regressions = []
+    previous_by_model: dict[Any, dict[str, Any]] = {}
+
+    def flag(run: dict[str, Any], baseline: dict[str, Any], metric: str, before: float, after: float, change: float) -> None:
+        regressions.append(
+            {
+                "run_name": run["run_name"],
+                "baseline": baseline["run_name"],
+                "profile": run["profile"],
+                "baseline_profile": baseline["profile"],
+                "metric": metric,
+                "baseline_value": round(before, 4),
+                "value": round(after, 4),
+                "change": round(change, 4),
+            }
+        )
+
+    for run in runs:
+        baseline = previous_by_model.get(run["model"])
+        if baseline is not None:
+            if run["tokens_per_sec"] and baseline["tokens_per_sec"]:
+                change = _relative_change(baseline["tokens_per_sec"], run["tokens_per_sec"])
+                if change < -limits["max_throughput_drop"]:
+                    flag(run, baseline, "tokens_per_sec", baseline["tokens_per_sec"], run["tokens_per_sec"], change)
+            if run["peak_memory_gb"] and baseline["peak_memory_gb"]:
+                change = _relative_change(baseline["peak_memory_gb"], run["peak_memory_gb"])
+                if change > limits["max_memory_increase"]:
+                    flag(run, baseline, "peak_memory_gb", baseline["peak_memory_gb"], run["peak_memory_gb"], change)
+            for key, score in run["scores"].items():
+                before = baseline["scores"].get(key)
+                if score is not None and before is not None and before - score > limits["max_score_drop"]:
+                    flag(run, baseline, f"score:{key}", before, score, score - before)
+            for task_id, seconds in run["task_seconds"].items():
+                before = baseline["task_seconds"].get(task_id)
+                if before and _relative_change(before, seconds) > limits["max_wall_increase"]:
+                    flag(run, baseline, f"wall_seconds:{task_id}", before, seconds, _relative_change(before, seconds))
+        previous_by_model[run["model"]] = run
+    return regressions
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return "—"
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def _tables(runs: list[dict[str, Any]], regressions: list[dict[str, Any]]) -> list[tuple[str, list[str], list[list[Any]]]]:
+    score_keys = sorted({key for run in runs for key in run["scores"]})
+    task_ids = sorted({task for run in runs for task in run["task_seconds"]})
+    return [
+        (
+            "Regressions",
+            ["run", "baseline", "profile (baseline)", "metric", "baseline value", "value", "change"],
+            [
+                [
+                    item["run_name"],
+                    item["baseline"],
+                    f"{item['profile']} ({item['baseline_profile']})",
+                    item["metric"],
+                    item["baseline_value"],
+                    item["value"],
+                    f"{item['change']:+.1%}" if not item["metric"].startswith("score:") else f"{item['change']:+.3f}",
+                ]
+                for item in regressions
+            ],
+        ),
+        (
+            "Training",
+            ["run", "first seen", "model", "profile", "dataset sha256", "tokens/s", "step p50 s", "stalls", "final loss", "peak GB"],
+            [
+                [
+                    run["run_name"],
+                    run["first_seen"],
+                    run["model"],
+                    run["profile"],
+                    (run["dataset_sha256"] or "")[:12] or None,
+                    run["tokens_per_sec"],
+                    run["step_time_p50"],
+                    run["stalls"],
+                    run["final_loss"],
+                    run["peak_memory_gb"],
+                ]
+                for run in runs
+            ],
+        ),
+        (
+            "Eval scores",
+            ["run", "overall", *score_keys],
+            [[run["run_name"], run["overall_verdict"], *(run["scores"].get(key) for key in score_keys)] for run in runs],
+        ),
+        (
+            "DAG task wall time (s)",
+            ["run", *task_ids],
+            [[run["run_name"], *(run["task_seconds"].get(task) for task in task_ids)] for run in runs if run["task_seconds"]],
+        ),
+    ]
+
+
+def render_markdown(runs: list[dict[str, Any]], regressions: list[dict[str, Any]]) -> str:
+    lines = ["# Runs catalog report", "", f"{len(runs)} runs, {len(regressions)} regressions.", ""]
+    for title, header, rows in _tables(runs, regressions):
+        lines.extend([f"## {title}", ""])
+        if not rows:
+            lines.extend(["None.", ""])
+            continue
+        lines.append("| " + " | ".join(header) + " |")
+        lines.append("|" + "---|" * len(header))
+        for row in rows:
+            lines.append("| " + " | ".join(_cell(value).replace("|", "\\|") for value in row) + " |")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def render_html(runs: list[dict[str, Any]], regressions: list[dict[str, Any]]) -> str:
+    parts = [
+        "<!DOCTYPE html>",
+        '<html><head><meta charset="utf-8"><title>Runs catalog report</title>',
+        "<style>body{font-family:sans-serif}table{border-collapse:collapse;margin-bottom:2em}"
+        "td,th{border:1px solid #ccc;padding:2px 6px;text-align:right}td:first-child{text-align:left}"
+        "h2.regressions+table td{background:#fde2e2}</style></head><body>",
+        "<h1>Runs catalog report</h1>",
+        f"<p>{len(runs)} runs, {len(regressions)} regressions.</p>",
+    ]
+    for title, header, rows in _tables(runs, regressions):
+        css = ' class="regressions"' if title == "Regressions" else ""
+        parts.append(f"<h2{css}>{html.escape(title)}</h2>")
+        if not rows:
+            parts.append("<p>None.</p>")
+            continue
+        parts.append("<table><tr>" + "".join(f"<th>{html.escape(item)}</th>" for item in header) + "</tr>")
+        for row in rows:
+            parts.append("<tr>" + "".join(f"<td>{html.escape(_cell(value))}</td>" for value in row) + "</tr>")
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "\n".join(parts) + "\n"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Index runs/ into SQLite and report cross-run regressions.")
+    parser.add_argument("command", choices=("index", "report"))
+    parser.add_argument("--db", default=str(DEFAULT_DB))
+    parser.add_argument("--runs-dir", default=str(RUNS_DIR))
+    parser.add_argument("--audit-dir", default=str(AUDIT_DIR))
+    parser.add_argument("--format", choices=("md", "html"), default="md")
+    parser.add_argument("--output", default=None, help="report: write here instead of stdout.")
+    for key, default in DEFAULT_THRESHOLDS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=default)
+    parser.add_argument("--fail-on-regression", action="store_true", help="report: exit 1 when anything regressed.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    db_path = Path(args.db)
+    try:
+        stats = index_catalog(db_path, Path(args.runs_dir), Path(args.audit_dir))
+    except (ValueError, sqlite3.DatabaseError) as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    if args.command == "index":
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return 0
+    runs = load_catalog(db_path)
+    regressions = find_regressions(runs, {key: getattr(args, key) for key in DEFAULT_THRESHOLDS})
+    rendered = render_html(runs, regressions) if args.format == "html" else render_markdown(runs, regressions)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(rendered, encoding="utf-8")
+    else:
+        sys.stdout.write(rendered)
+    print(f"runs={len(runs)} regressions={len(regressions)} {json.dumps(stats)}", file=sys.stderr)
+    return 1 if args.fail_on_regression and regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Prefix-state cache for RWKV prefill.
+
+An RWKV state after a token prefix is all a later prompt with the same prefix needs, so
+prefill can resume from the deepest cached prefix instead of `generate_zero_state`.
+States (and the logits after them) are kept in a token trie, snapshotted every
+`block_tokens` tokens and at the end of each prompt, and evicted least-recently-used once
+their total size exceeds `max_bytes`.
+
+States depend on the weights: a cache must be cleared whenever the model changes.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Callable, Sequence
+
+
+DEFAULT_BLOCK_TOKENS = 32
+DEFAULT_MAX_MB = 1024
+
+
+def state_nbytes(value: Any) -> int:
+    """Size of a (nested list/tuple of) tensor or ndarray state; scalars count 8 bytes."""
+    if isinstance(value, (list, tuple)):
+        return sum(state_nbytes(item) for item in value)
+    if value is None:
+        return 0
+    if hasattr(value, "element_size") and hasattr(value, "numel"):
+        return int(value.element_size() * value.numel())
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return 8
+
+
+def clone_state(value: Any) -> Any:
+    """Deep copy that keeps tensors on their device; prefill and decode update states in place."""
+    if isinstance(value, list):
+        return [clone_state(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(clone_state(item) for item in value)
+    if hasattr(value, "clone"):
+        return value.clone()
+    if hasattr(value, "copy"):
+        return value.copy()
+    return value
+
+
+def state_batch_axes(zero_state: Callable[[int], Any]) -> Any:
+    """Batch axis of every tensor of a state (`None` where no axis depends on the batch size).
+
+    Albatross does not keep the batch dimension first in every state tensor, so the axes are
+    read off the shapes of `zero_state(1)` and `zero_state(2)`.
+    """
+    return _batch_axes(zero_state(1), zero_state(2))
+
+
+def _batch_axes(one: Any, two: Any) -> Any:
+    if isinstance(one, (list, tuple)):
+        return [_batch_axes(a, b) for a, b in zip(one, two)]
+    for axis, (a, b) in enumerate(zip(getattr(one, "shape", ()), getattr(two, "shape", ()))):
+        if a != b:
+            return axis
+    return None
+
+
+def concat_states(states: Sequence[Any], cat: Callable[[list[Any], int], Any], axes: Any = 0) -> Any:
+    """Join per-row states (or logits) along their batch axes, e.g. `cat=torch.cat`.
+
+    `axes` mirrors the state structure (see `state_batch_axes`) or is one axis for every tensor;
+    tensors without a batch axis are taken from the first row.
+    """
+    first = states[0]
+    if isinstance(first, (list, tuple)):
+        joined = [
+            concat_states([state[i] for state in states], cat, axes[i] if isinstance(axes, list) else axes)
+            for i in range(len(first))
+        ]
+        return joined if isinstance(first, list) else tuple(joined)
+    if first is None or axes is None:
+        return first
+    return cat(list(states), axes)
+
+
+class _Node:
+    __slots__ = ("parent", "token", "children", "entry")
+
+    def __init__(self, parent: "_Node | None" = None, token: int = -1) -> None:
+        self.parent = parent
+        self.token = token
+        self.children: dict[int, _Node] = {}
+        self.entry: tuple[Any, Any, int] | None = None
+
+
+class PrefixStateCache:
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+        block_tokens: int = DEFAULT_BLOCK_TOKENS,
+        size_fn: Callable[[Any], int] = state_nbytes,
+    ) -> None:
+        if block_tokens < 1:
+            raise ValueError("state_cache_invalid_block: block_tokens must be >= 1")
+        self.max_bytes = max_bytes
+        self.block_tokens = block_tokens
+        self.size_fn = size_fn
+        self._root = _Node()
+        self._lru: OrderedDict[int, _Node] = OrderedDict()
+        self.bytes = 0
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.prefill_tokens = 0
+        self.saved_prefill_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def lookup(self, tokens: Sequence[int]) -> tuple[int, Any, Any]:
+        """`(depth, state, logits)` of the deepest cached prefix of `tokens`; `(0, None, None)` on a miss.
+
+        The returned state and logits are the cached objects: clone them before resuming.
+        """
+        self.lookups += 1
+        node = self._root
+        best: _Node | None = None
+        depth = best_depth = 0
+        for token in tokens:
+            node = node.children.get(token)
+            if node is None:
+                break
+            depth += 1
+            if node.entry is not None:
+                best, best_depth = node, depth
+        if best is None:
+            return 0, None, None
+        self.hits += 1
+        self._lru.move_to_end(id(best))
+        state, logits, _ = best.entry
+        return best_depth, state, logits
+
+    def insert(self, tokens: Sequence[int], state: Any, logits: Any) -> None:
+        """Store copies of `state`/`logits` reached after `tokens`."""
+        if not tokens or self.max_bytes <= 0:
+            return
+        size = self.size_fn(state) + self.size_fn(logits)
+        if size > self.max_bytes:
+            return
+        node = self._root
+        for token in tokens:
+            child = node.children.get(token)
+            if child is None:
+                child = node.children[token] = _Node(node, token)
+            node = child
+        if node.entry is not None:
+            self._lru.move_to_end(id(node))
+            return
+        node.entry = (clone_state(state), clone_state(logits), size)
+        self._lru[id(node)] = node
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._evict(next(iter(self._lru.values())))
+
+    def _evict(self, node: _Node) -> None:
+        assert node.entry is not None
+        self.bytes -= node.entry[2]
+        node.entry = None
+        del self._lru[id(node)]
+        self.evictions += 1
+        while node.parent is not None and node.entry is None and not node.children:
+            del node.parent.children[node.token]
+            node = node.parent
+
+    def clear(self) -> None:
+        self._root = _Node()
+        self._lru.clear()
+        self.bytes = 0
+
+    def snapshot_depths(self, start: int, length: int) -> list[int]:
+        """Prefill segment ends after `start`: every block boundary, then the prompt end."""
+        first = (start // self.block_tokens + 1) * self.block_tokens
+        return [*range(first, length, self.block_tokens), length] if start < length else []
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._lru),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "block_tokens": self.block_tokens,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "evictions": self.evictions,
+            "prefill_tokens": self.prefill_tokens,
+            "saved_prefill_tokens": self.saved_prefill_tokens,
+        }
+
+
+def prefill_with_cache(
+    cache: PrefixStateCache | None,
+    tokens: Sequence[int],
+    zero_state: Callable[[], Any],
+    forward: Callable[[list[list[int]], Any], Any],
+    batch: int = 1,
+) -> tuple[Any, Any, int]:
+    """Prefill `tokens` (the same prompt for every batch row) into a fresh state.
+
+    `forward(token_lists, state)` must advance `state` in place and return the logits.
+    Returns `(logits, state, reused_depth)`; the state is private to the caller.
+    """
+    tokens = list(tokens)
+    if cache is None:
+        state = zero_state()
+        return forward([tokens] * batch, state), state, 0
+
+    depth, cached_state, cached_logits = cache.lookup(tokens)
+    cache.prefill_tokens += len(tokens)
+    cache.saved_prefill_tokens += depth
+    if cached_state is None:
+        state, logits = zero_state(), None
+    else:
+        state, logits = clone_state(cached_state), clone_state(cached_logits)
+    start = depth
+    for end in cache.snapshot_depths(start, len(tokens)):
+        logits = forward([tokens[start:end]] * batch, state)
+        cache.insert(tokens[:end], state, logits)
+        start = end
+    return logits, state, depth
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Pure-Python RWKV `rwkv_vocab_v20230424` tokenizer and cached per-row token counts.
+
+Encoding is the greedy longest-match over the vocab trie used by RWKV's `TRIE_TOKENIZER`
+and `json2binidx_tool` (`RWKVTokenizer`), so token ids and counts match what training sees.
+Token id 0 is the end-of-document marker appended after every document in binidx files.
+
+Per-row token counts of a JSONL file are cached in a `<file>.jsonl.tokcount` sidecar keyed
+by the file sha256 (from `jsonl_index`) and the vocab fingerprint. Only repeat runs hit that
+cache; the first pass over a source is CPU-bound in the pure-Python trie (a few MB/s on
+one core, minutes per GB), so `count` uses the Rust `pyrwkv_tokenizer` package instead when
+it is installed and encodes every token of this vocab to its own id.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Callable
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+VOCAB_ENV_VAR = "RWKV_TOKENIZER_VOCAB"
+DEFAULT_VOCAB_CANDIDATES = (
+    ROOT_DIR / "third_party" / "RWKV-PEFT" / "json2binidx_tool" / "rwkv_vocab_v20230424.txt",
+    ROOT_DIR / "third_party" / "Albatross" / "reference" / "rwkv_vocab_v20230424.txt",
+)
+EOD_TOKEN_ID = 0
+_TOKEN_KEY = 256
+
+TOKEN_COUNT_SUFFIX = ".tokcount"
+TOKEN_COUNT_MAGIC = b"RWKVTCNT"
+TOKEN_COUNT_VERSION = 1
+# magic, version, data sha256, vocab fingerprint, rows
+TOKEN_COUNT_HEADER = struct.Struct("<8sI32s32sQ")
+
+
+def resolve_vocab_path(explicit: str | Path | None = None) -> Path:
+    if explicit:
+        path = Path(explicit).resolve()
+        if not path.is_file():
+            raise ValueError(f"tokenizer_vocab_not_found: {path}")
+        return path
+    env_value = os.getenv(VOCAB_ENV_VAR, "").strip()
+    if env_value:
+        return resolve_vocab_path(env_value)
+    for candidate in DEFAULT_VOCAB_CANDIDATES:
+        if candidate.is_file():
+            return candidate
+    raise ValueError(
+        "tokenizer_vocab_not_found: pass --tokenizer-vocab or set "
+        f"{VOCAB_ENV_VAR} (expected rwkv_vocab_v20230424.txt from RWKV-PEFT json2binidx_tool)"
+    )
+
+
+class RwkvTokenizer:
+    """Greedy longest-match byte tokenizer over an RWKV vocab file (`<id> <repr> <byte_len>` per line)."""
+
+    def __init__(self, vocab_path: Path) -> None:
+        import ast  # pylint: disable=import-outside-toplevel
+
+        self.vocab_path = Path(vocab_path)
+        payload = self.vocab_path.read_bytes()
+        self.fingerprint = hashlib.sha256(payload).hexdigest()
+        self.id_to_token: dict[int, bytes] = {}
+        self._root: dict[int, dict] = {}
+        for line_number, line in enumerate(payload.decode("utf-8").splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                token_id = int(line[: line.index(" ")])
+                literal = ast.literal_eval(line[line.index(" ") : line.rindex(" ")].strip())
+                expected_len = int(line[line.rindex(" ") :])
+            except (ValueError, SyntaxError) as exc:
+                raise ValueError(f"{self.vocab_path}:{line_number}: invalid vocab line") from exc
+            token = literal.encode("utf-8") if isinstance(literal, str) else literal
+            if not isinstance(token, bytes) or len(token) != expected_len:
+                raise ValueError(f"{self.vocab_path}:{line_number}: token length mismatch")
+            self.id_to_token[token_id] = token
+            node = self._root
+            for byte in token:
+                node = node.setdefault(byte, {})
+            node[_TOKEN_KEY] = token_id
+        self.vocab_size = max(self.id_to_token, default=0) + 1
+        self._native_count: Callable[[str], int] | None = None
+        self.count_backend = ""
+
+    def _load_native_count(self) -> Callable[[str], int] | None:
+        try:
+            import pyrwkv_tokenizer  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            return None
+        native = pyrwkv_tokenizer.RWKVTokenizer()
+        for token_id, token in self.id_to_token.items():
+            try:
+                text = token.decode("utf-8")
+            except UnicodeDecodeError:
+                continue
+            if native.encode(text) != [token_id]:
+                return None
+        return lambda text: len(native.encode(text))
+
+    def encode_bytes(self, data: bytes) -> list[int]:
+        root = self._root
+        tokens: list[int] = []
+        append = tokens.append
+        position = 0
+        length = len(data)
+        while position < length:
+            node = root
+            cursor = position
+            best_id = -1
+            best_end = position
+            while cursor < length:
+                node = node.get(data[cursor])
+                if node is None:
+                    break
+                cursor += 1
+                token_id = node.get(_TOKEN_KEY)
+                if token_id is not None:
+                    best_id = token_id
+                    best_end = cursor
+            if best_id < 0:
+                raise ValueError(f"tokenizer_unknown_byte: 0x{data[position]:02x} at offset {position}")
+            append(best_id)
+            position = best_end
+        return tokens
+
+    def encode(self, text: str) -> list[int]:
+        return self.encode_bytes(text.encode("utf-8"))
+
+    def count(self, text: str) -> int:
+        if not self.count_backend:
+            self._native_count = self._load_native_count()
+            self.count_backend = "pyrwkv_tokenizer" if self._native_count is not None else "python"
+        if self._native_count is not None:
+            return self._native_count(text)
+        return len(self.encode_bytes(text.encode("utf-8")))
+
+    def decode(self, tokens: list[int]) -> str:
+        return b"".join(self.id_to_token[token] for token in tokens).decode("utf-8")
+
+
+def token_count_sidecar_path(path: Path) -> Path:
+    return path.with_name(path.name + TOKEN_COUNT_SUFFIX)
+
+
+def load_token_counts(path: Path, data_sha256: str, fingerprint: str) -> array | None:
+    sidecar = token_count_sidecar_path(path)
+    try:
+        payload = sidecar.read_bytes()
+    except OSError:
+        return None
+    if len(payload) < TOKEN_COUNT_HEADER.size:
+        return None
+    magic, version, stored_sha, stored_fingerprint, rows = TOKEN_COUNT_HEADER.unpack_from(payload)
+    if (
+        magic != TOKEN_COUNT_MAGIC
+        or version != TOKEN_COUNT_VERSION
+        or stored_sha.hex() != data_sha256
+        or stored_fingerprint.hex() != fingerprint
+    ):
+        return None
+    counts = array("I")
+    body = payload[TOKEN_COUNT_HEADER.size :]
+    if len(body) != rows * counts.itemsize:
+        return None
+    counts.frombytes(body)
+    if sys.byteorder != "little":
+        counts.byteswap()
+    return counts
+
+
+def save_token_counts(path: Path, data_sha256: str, fingerprint: str, counts: array) -> bool:
+    sidecar = token_count_sidecar_path(path)
+    tmp_path = sidecar.with_name(f".{sidecar.name}.{os.getpid()}.tmp")
+    values = array("I", counts)
+    if sys.byteorder != "little":
+        values.byteswap()
+    try:
+        with tmp_path.open("wb") as handle:
+            handle.write(
+                TOKEN_COUNT_HEADER.pack(
+                    TOKEN_COUNT_MAGIC,
+                    TOKEN_COUNT_VERSION,
+                    bytes.fromhex(data_sha256),
+                    bytes.fromhex(fingerprint),
+                    len(values),
+                )
+            )
+            handle.write(values.tobytes())
+        os.replace(tmp_path, sidecar)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        return False
+    return True
+
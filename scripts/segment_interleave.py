@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Segment interleaving engines for plain-text release mixes.
+
+`round_robin_interleave` reproduces the legacy builder order for a given seed (one seeded
+shuffle per bucket, then a shuffled segment round until every bucket is exhausted) without
+rescanning the buckets every round. `weighted_interleave` spreads every segment evenly
+across the whole file: item `i` of a segment with `n` rows gets the stratified key
+`(i + u) / n`, `u ~ U[0, 1)`, and the merged order is one stable argsort. Because per-segment
+counts follow the profile `mix` ratios, every window of the output keeps roughly the mix
+shares instead of leaving the largest segment alone at the tail. The weighted engine is
+vectorized with NumPy and needs it installed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+from typing import Any, Iterable, Sequence, TypeVar
+
+
+T = TypeVar("T")
+
+ROUND_ROBIN_STRATEGY = "segment_interleave_shuffle"
+WEIGHTED_STRATEGY = "segment_weighted_stratified"
+INTERLEAVE_STRATEGIES = {
+    "round_robin": ROUND_ROBIN_STRATEGY,
+    "weighted": WEIGHTED_STRATEGY,
+}
+ORDER_PREVIEW_SIZE = 16
+
+
+def require_numpy() -> Any:
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError as exc:
+        raise ValueError("weighted_interleave_requires_numpy: install numpy or use --interleave round_robin") from exc
+    return numpy
+
+
+def round_robin_interleave(
+    segment_items: dict[str, Sequence[T]],
+    segment_order: Sequence[str],
+    rng: random.Random,
+) -> list[T]:
+    """Same output and RNG consumption as shuffling buckets and popping one item per active segment per round."""
+    reversed_buckets: dict[str, list[T]] = {}
+    for name, items in segment_items.items():
+        bucket = list(items)
+        rng.shuffle(bucket)
+        bucket.reverse()
+        reversed_buckets[name] = bucket
+
+    lengths = {name: len(reversed_buckets[name]) for name in segment_order}
+    mixed: list[T] = []
+    shuffle = rng.shuffle
+    start = 0
+    # The active set only changes when a bucket runs out, so rounds are processed in spans.
+    for stop in sorted(set(lengths.values())):
+        if stop <= start:
+            continue
+        base = [name for name in segment_order if lengths[name] >= stop]
+        for round_index in range(start, stop):
+            active = list(base)
+            shuffle(active)
+            for name in active:
+                mixed.append(reversed_buckets[name][round_index])
+        start = stop
+    return mixed
+
+
+def weighted_interleave(
+    segment_items: dict[str, Sequence[int]],
+    segment_order: Sequence[str],
+    seed: int,
+) -> tuple[list[str], list[int]]:
+    """Return `(segment_names, items)` in the stratified order; items are permuted within each segment."""
+    np = require_numpy()
+    generator = np.random.default_rng(seed)
+    codes = []
+    items = []
+    keys = []
+    for code, name in enumerate(segment_order):
+        values = np.asarray(segment_items.get(name, ()), dtype=np.int64)
+        count = int(values.shape[0])
+        if count == 0:
+            continue
+        items.append(generator.permutation(values))
+        keys.append((np.arange(count, dtype=np.float64) + generator.random(count)) / count)
+        codes.append(np.full(count, code, dtype=np.int16))
+    if not keys:
+        return [], []
+    order = np.argsort(np.concatenate(keys), kind="stable")
+    names = list(segment_order)
+    return [names[code] for code in np.concatenate(codes)[order].tolist()], np.concatenate(items)[order].tolist()
+
+
+class SegmentOrderDigest:
+    """Streaming shuffle-report accumulator; `sha256` equals hashing the newline-joined order."""
+
+    def __init__(self, preview_size: int = ORDER_PREVIEW_SIZE) -> None:
+        self._digest = hashlib.sha256()
+        self._previous: str | None = None
+        self._preview_size = preview_size
+        self.preview: list[str] = []
+        self.switches = 0
+        self.total = 0
+
+    def update(self, segment: str) -> None:
+        if self._previous is not None:
+            self._digest.update(b"\n")
+            if segment != self._previous:
+                self.switches += 1
+        self._digest.update(segment.encode("utf-8"))
+        if len(self.preview) < self._preview_size:
+            self.preview.append(segment)
+        self._previous = segment
+        self.total += 1
+
+    def extend(self, segments: Iterable[str]) -> "SegmentOrderDigest":
+        for segment in segments:
+            self.update(segment)
+        return self
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
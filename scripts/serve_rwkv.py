@@ -0,0 +1,718 @@
+#!/usr/bin/env python3
+"""Continuous-batching local generation server for RWKV (OpenAI-compatible subset).
+
+One Albatross `RWKV_x070` model serves `--slots` rows of a batch state. Every scheduler
+iteration first prefills waiting requests into free slots, then forwards one token for every
+busy slot, so a request arriving mid-generation joins the next decode step instead of waiting
+for the batch to drain. Endpoints:
+
+- `POST /v1/completions`, `POST /v1/chat/completions`: per-request `max_tokens`,
+  `temperature`, `top_p`, `top_k`, `stop`, `seed`; `"stream": true` answers with SSE;
+- `GET /v1/models`, `GET /health`;
+- `GET /metrics` (Prometheus text): queue depth, busy slots, tok/s, time to first token.
+
+There is no authentication: keep `--host` on localhost.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict, deque
+from contextlib import suppress
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Sequence
+
+# asyncio, its thread pool and numpy cost more than the rest of startup together and only
+# the running server needs them, so `--help` and argument errors skip them.
+if TYPE_CHECKING:
+    import asyncio
+
+    import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from infer_albatross import EOD_TOKEN_ID, load_albatross, set_seed, truncate_at_stop
+from rwkv_state_cache import DEFAULT_BLOCK_TOKENS, DEFAULT_MAX_MB, PrefixStateCache, prefill_with_cache, state_batch_axes
+from weights_cache import add_weights_cache_arguments
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_SLOTS = 8
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_MAX_TOKENS = 256
+MAX_TOKENS_CAP = 4096
+MAX_BODY_BYTES = 8 * 1024 * 1024
+METRICS_WINDOW_SECONDS = 10.0
+TTFT_QUANTILES = (0.5, 0.9, 0.99)
+CHAT_ROLES = {"system": "System", "user": "User", "assistant": "Assistant"}
+CHAT_STOP = "\nUser:"
+# ValueError token prefix -> HTTP status; any other ValueError is a 400.
+ERROR_STATUS = {
+    "serve_not_found": 404,
+    "serve_method_not_allowed": 405,
+    "serve_body_too_large": 413,
+    "serve_queue_full": 429,
+}
+
+
+def parse_args() -> argparse.Namespace:
+    root = Path(__file__).resolve().parents[1]
+    parser = argparse.ArgumentParser(description="Serve an RWKV model over a local OpenAI-compatible HTTP API.")
+    parser.add_argument("--model", required=True, help="Path to checkpoint prefix or .pth file.")
+    parser.add_argument("--model-name", default="", help="Model id reported by the API. Default: checkpoint file name.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Bind address. There is no auth: keep it on localhost.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS, help="Requests decoded together (batch rows).")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="Waiting requests before 429.")
+    parser.add_argument(
+        "--max-tokens-cap",
+        type=int,
+        default=MAX_TOKENS_CAP,
+        help="Upper bound for a request's max_tokens.",
+    )
+    parser.add_argument(
+        "--state-cache-mb",
+        type=int,
+        default=DEFAULT_MAX_MB,
+        help="Memory budget of the prefix-state cache shared by requests (0 disables).",
+    )
+    parser.add_argument("--state-cache-block", type=int, default=DEFAULT_BLOCK_TOKENS)
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the global RNGs (requests pass their own).")
+    parser.add_argument(
+        "--albatross-dir",
+        default=str(root / "third_party" / "Albatross"),
+        help="Local Albatross directory.",
+    )
+    parser.add_argument("--tokenizer", default="", help="Default: <albatross-dir>/reference/rwkv_vocab_v20230424.txt")
+    parser.add_argument("--auto-clone", action="store_true", help="Clone Albatross if the directory is missing.")
+    add_weights_cache_arguments(parser)
+    args = parser.parse_args()
+    if args.slots < 1:
+        parser.error("--slots must be >= 1")
+    if args.max_queue < 1:
+        parser.error("--max-queue must be >= 1")
+    return args
+
+
+@dataclass
+class SamplingParams:
+    max_tokens: int = DEFAULT_MAX_TOKENS
+    temperature: float = 1.0
+    top_p: float = 1.0
+    top_k: int = 0
+    stop: list[str] = field(default_factory=list)
+    seed: int | None = None
+
+    @classmethod
+    def from_request(cls, body: dict[str, Any], max_tokens_cap: int = MAX_TOKENS_CAP) -> "SamplingParams":
+        def number(name: str, kind: type, default: Any) -> Any:
+            value = body.get(name)
+            if value is None:
+                return default
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or (kind is int and isinstance(value, float)):
+                raise ValueError(f"serve_invalid_request: {name} must be {'an integer' if kind is int else 'a number'}")
+            return kind(value)
+
+        params = cls(
+            max_tokens=number("max_tokens", int, min(DEFAULT_MAX_TOKENS, max_tokens_cap)),
+            temperature=number("temperature", float, 1.0),
+            top_p=number("top_p", float, 1.0),
+            top_k=number("top_k", int, 0),
+            seed=number("seed", int, None),
+        )
+        stop = body.get("stop")
+        if isinstance(stop, str):
+            stop = [stop]
+        if stop is not None and not (isinstance(stop, list) and all(isinstance(item, str) for item in stop)):
+            raise ValueError("serve_invalid_request: stop must be a string or a list of strings")
+        params.stop = [item for item in stop or [] if item]
+        if not 1 <= params.max_tokens <= max_tokens_cap:
+            raise ValueError(f"serve_invalid_request: max_tokens must be in [1, {max_tokens_cap}]")
+        if params.temperature < 0:
+            raise ValueError("serve_invalid_request: temperature must be >= 0")
+        if not 0 < params.top_p <= 1:
+            raise ValueError("serve_invalid_request: top_p must be in (0, 1]")
+        if params.top_k < 0:
+            raise ValueError("serve_invalid_request: top_k must be >= 0")
+        if body.get("n", 1) != 1:
+            raise ValueError("serve_invalid_request: only n=1 is supported")
+        return params
+
+
+def sample_token(logits: Any, params: SamplingParams, rng: np.random.Generator) -> int:
+    """Temperature / top-k / top-p sampling over one row of logits; temperature 0 is greedy."""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    logits = np.asarray(logits, dtype=np.float64)
+    if params.temperature == 0 or params.top_k == 1:
+        return int(np.argmax(logits))
+    scaled = logits / params.temperature
+    if 0 < params.top_k < scaled.size:
+        kth = np.partition(scaled, -params.top_k)[-params.top_k]
+        scaled = np.where(scaled < kth, -np.inf, scaled)
+    probs = np.exp(scaled - scaled.max())
+    probs /= probs.sum()
+    if params.top_p < 1:
+        order = np.argsort(-probs)
+        sorted_probs = probs[order]
+        # Keep the smallest head of the distribution whose mass reaches top_p.
+        keep = np.cumsum(sorted_probs) - sorted_probs < params.top_p
+        probs = np.zeros_like(probs)
+        probs[order[keep]] = sorted_probs[keep]
+        probs /= probs.sum()
+    return int(rng.choice(probs.size, p=probs))
+
+
+def stop_holdback(text: str, stop_sequences: Sequence[str]) -> int:
+    """Length of the longest tail of `text` that may still grow into a stop sequence."""
+    longest = 0
+    for stop in stop_sequences:
+        for size in range(min(len(stop) - 1, len(text)), longest, -1):
+            if text.endswith(stop[:size]):
+                longest = size
+                break
+    return longest
+
+
+@dataclass
+class Generation:
+    request_id: str
+    prompt_tokens: list[int]
+    params: SamplingParams
+    rng: np.random.Generator
+    submitted_at: float
+    events: asyncio.Queue
+    tokens: list[int] = field(default_factory=list)
+    text: str = ""
+    emitted: str = ""
+    slot: int = -1
+    pending_token: int | None = None
+    first_token_at: float | None = None
+    ttft_recorded: bool = False
+    finish_reason: str | None = None
+    cancelled: bool = False
+
+
+class ContinuousBatchingEngine:
+    """Schedules generations onto the slots of a slot model.
+
+    A slot model has `slots`, `encode(text)`, `decode(tokens)`, `prefill(slot, tokens)` (reset
+    the slot's state, run the prompt, return its last logits) and `step({slot: token})`
+    (forward one token per listed slot, return `{slot: logits}`; the states of unlisted slots
+    may change, so admitted slots are prefilled after the step). Model calls run on one
+    worker thread so the event loop keeps serving HTTP while the GPU is busy.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        stop_tokens: Sequence[int] = (EOD_TOKEN_ID,),
+        clock: Any = time.perf_counter,
+    ) -> None:
+        import asyncio  # pylint: disable=import-outside-toplevel
+        from concurrent.futures import ThreadPoolExecutor  # pylint: disable=import-outside-toplevel
+
+        self.model = model
+        self.max_queue = max_queue
+        self.stop_tokens = set(stop_tokens)
+        self.clock = clock
+        self.waiting: deque[Generation] = deque()
+        self.active: dict[int, Generation] = {}
+        self.free_slots = list(range(model.slots))
+        self._wake = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rwkv-engine")
+        self._task: asyncio.Task | None = None
+        self.started_at = clock()
+        self.requests_total = 0
+        self.finished_total: dict[str, int] = defaultdict(int)
+        self.prompt_tokens_total = 0
+        self.generated_tokens_total = 0
+        self.decode_steps_total = 0
+        self.ttft_sum = 0.0
+        self.ttft_count = 0
+        self._ttft_recent: deque[float] = deque(maxlen=1024)
+        self._recent_tokens: deque[tuple[float, int]] = deque()
+
+    def start(self) -> asyncio.Task:
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def close(self) -> None:
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        self._executor.shutdown(wait=False)
+
+    def submit(self, prompt_tokens: list[int], params: SamplingParams) -> Generation:
+        import asyncio  # pylint: disable=import-outside-toplevel
+        import uuid  # pylint: disable=import-outside-toplevel
+
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        if not prompt_tokens:
+            raise ValueError("serve_invalid_request: prompt is empty")
+        if len(self.waiting) >= self.max_queue:
+            raise ValueError(f"serve_queue_full: {len(self.waiting)} requests waiting")
+        generation = Generation(
+            request_id=uuid.uuid4().hex[:24],
+            prompt_tokens=list(prompt_tokens),
+            params=params,
+            rng=np.random.default_rng(params.seed),
+            submitted_at=self.clock(),
+            events=asyncio.Queue(),
+        )
+        self.waiting.append(generation)
+        self.requests_total += 1
+        self._wake.set()
+        return generation
+
+    def cancel(self, generation: Generation) -> None:
+        generation.cancelled = True
+        self._wake.set()
+
+    async def run(self) -> None:
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        loop = asyncio.get_running_loop()
+        while True:
+            for generation in [item for item in self.active.values() if item.cancelled]:
+                self._release(generation, "cancelled")
+            admitted = []
+            while self.waiting and self.free_slots:
+                generation = self.waiting.popleft()
+                if generation.cancelled:
+                    continue
+                generation.slot = self.free_slots.pop(0)
+                self.active[generation.slot] = generation
+                admitted.append(generation)
+            if not self.active:
+                self._wake.clear()
+                if not self.waiting:
+                    await self._wake.wait()
+                continue
+            decoding = [item for item in self.active.values() if item.pending_token is not None]
+            generated = await loop.run_in_executor(self._executor, self._step, admitted, decoding)
+            self._publish(admitted + decoding, generated)
+
+    def _step(self, admitted: list[Generation], decoding: list[Generation]) -> int:
+        """Model work of one iteration (engine thread); returns the number of tokens generated."""
+        rows = []
+        if decoding:
+            logits = self.model.step({generation.slot: generation.pending_token for generation in decoding})
+            rows += [(generation, logits[generation.slot]) for generation in decoding]
+        rows += [(generation, self.model.prefill(generation.slot, generation.prompt_tokens)) for generation in admitted]
+        now = self.clock()
+        generated = 0
+        for generation, row_logits in rows:
+            token = sample_token(row_logits, generation.params, generation.rng)
+            generated += self._accept(generation, token, now)
+        return generated
+
+    def _accept(self, generation: Generation, token: int, now: float) -> int:
+        if generation.first_token_at is None:
+            generation.first_token_at = now
+        generation.pending_token = None
+        if token in self.stop_tokens:
+            generation.finish_reason = "stop"
+            return 0
+        generation.tokens.append(token)
+        text = self.model.decode(generation.tokens)
+        generation.text = truncate_at_stop(text, generation.params.stop)
+        if len(generation.text) < len(text):
+            generation.finish_reason = "stop"
+        elif len(generation.tokens) >= generation.params.max_tokens:
+            generation.finish_reason = "length"
+        else:
+            generation.pending_token = token
+        return 1
+
+    def _publish(self, generations: list[Generation], generated: int) -> None:
+        now = self.clock()
+        self.decode_steps_total += 1
+        self.generated_tokens_total += generated
+        self._recent_tokens.append((now, generated))
+        for generation in generations:
+            if self.active.get(generation.slot) is not generation:
+                continue
+            if not generation.ttft_recorded and generation.first_token_at is not None:
+                ttft = generation.first_token_at - generation.submitted_at
+                generation.ttft_recorded = True
+                self.prompt_tokens_total += len(generation.prompt_tokens)
+                self.ttft_sum += ttft
+                self.ttft_count += 1
+                self._ttft_recent.append(ttft)
+            text = generation.text
+            if generation.finish_reason is None:
+                text = text[: len(text) - stop_holdback(text, generation.params.stop)]
+            delta = text[len(generation.emitted) :]
+            if delta:
+                generation.emitted += delta
+                generation.events.put_nowait({"text": delta})
+            if generation.finish_reason is not None:
+                generation.events.put_nowait({"finish_reason": generation.finish_reason})
+                self._release(generation, generation.finish_reason)
+
+    def _release(self, generation: Generation, reason: str) -> None:
+        del self.active[generation.slot]
+        self.free_slots.append(generation.slot)
+        self.free_slots.sort()
+        self.finished_total[reason] += 1
+
+    def tokens_per_second(self) -> float:
+        now = self.clock()
+        while self._recent_tokens and self._recent_tokens[0][0] < now - METRICS_WINDOW_SECONDS:
+            self._recent_tokens.popleft()
+        elapsed = min(METRICS_WINDOW_SECONDS, now - self.started_at)
+        return sum(count for _, count in self._recent_tokens) / elapsed if elapsed > 0 else 0.0
+
+    def metrics_text(self) -> str:
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, description: str, samples: list[tuple[str, Any]]) -> None:
+            lines.extend([f"# HELP {name} {description}", f"# TYPE {name} {kind}"])
+            lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+        metric("rwkv_queue_depth", "gauge", "Requests waiting for a free slot.", [("", len(self.waiting))])
+        metric("rwkv_active_requests", "gauge", "Requests holding a batch slot.", [("", len(self.active))])
+        metric("rwkv_batch_slots", "gauge", "Batch slots of the model.", [("", self.model.slots)])
+        metric("rwkv_requests_total", "counter", "Accepted requests.", [("", self.requests_total)])
+        metric(
+            "rwkv_requests_finished_total",
+            "counter",
+            "Finished requests by finish reason.",
+            [(f'{{reason="{reason}"}}', count) for reason, count in sorted(self.finished_total.items())],
+        )
+        metric("rwkv_prompt_tokens_total", "counter", "Prefilled prompt tokens.", [("", self.prompt_tokens_total)])
+        metric("rwkv_generated_tokens_total", "counter", "Generated tokens.", [("", self.generated_tokens_total)])
+        metric("rwkv_decode_steps_total", "counter", "Scheduler iterations.", [("", self.decode_steps_total)])
+        metric(
+            "rwkv_generation_tokens_per_second",
+            "gauge",
+            f"Generated tokens per second over the last {METRICS_WINDOW_SECONDS:g}s.",
+            [("", round(self.tokens_per_second(), 3))],
+        )
+        recent = sorted(self._ttft_recent)
+        quantiles = [
+            (f'{{quantile="{q}"}}', round(recent[min(len(recent) - 1, int(q * len(recent)))], 6) if recent else "NaN")
+            for q in TTFT_QUANTILES
+        ]
+        metric(
+            "rwkv_time_to_first_token_seconds",
+            "summary",
+            "Time from request arrival to its first sampled token.",
+            quantiles + [("_sum", round(self.ttft_sum, 6)), ("_count", self.ttft_count)],
+        )
+        stats = self.model.stats() if hasattr(self.model, "stats") else {}
+        for name in ("hit_rate", "saved_prefill_tokens", "entries", "bytes", "evictions"):
+            if name in stats:
+                metric(f"rwkv_state_cache_{name}", "gauge", f"Prefix-state cache {name}.", [("", stats[name])])
+        return "\n".join(lines) + "\n"
+
+
+class AlbatrossSlotModel:
+    """Slot model over one Albatross batch state of `slots` rows.
+
+    Every decode step forwards the whole batch (idle rows get the EOD token, which advances
+    their state); a row's state is overwritten when a request is prefilled into it. Prefill runs with batch 1 through the
+    prefix-state cache, so shared prompt prefixes are not recomputed.
+    """
+
+    def __init__(self, model: Any, tokenizer: Any, slots: int, state_cache: PrefixStateCache | None = None) -> None:
+        self.model = model
+        self.tokenizer = tokenizer
+        self.slots = slots
+        self.state_cache = state_cache
+        self.state = model.generate_zero_state(slots)
+        self.axes = state_batch_axes(model.generate_zero_state)
+
+    def encode(self, text: str) -> list[int]:
+        return self.tokenizer.encode(text)
+
+    def decode(self, tokens: list[int]) -> str:
+        return self.tokenizer.decode(tokens, utf8_errors="ignore")
+
+    def prefill(self, slot: int, tokens: list[int]) -> Any:
+        logits, row_state, _ = prefill_with_cache(
+            self.state_cache, tokens, lambda: self.model.generate_zero_state(1), self.model.forward_batch, 1
+        )
+        _write_state_row(self.state, row_state, slot, self.axes)
+        return logits[0].float().cpu().numpy()
+
+    def step(self, tokens: dict[int, int]) -> dict[int, Any]:
+        token_lists = [[tokens.get(slot, EOD_TOKEN_ID)] for slot in range(self.slots)]
+        logits = self.model.forward_batch(token_lists, self.state).float().cpu()
+        return {slot: logits[slot].numpy() for slot in tokens}
+
+    def stats(self) -> dict[str, Any]:
+        return self.state_cache.stats() if self.state_cache is not None else {}
+
+
+def _write_state_row(full: Any, row: Any, slot: int, axes: Any) -> None:
+    if isinstance(full, (list, tuple)):
+        for index, item in enumerate(full):
+            _write_state_row(item, row[index], slot, axes[index] if isinstance(axes, list) else axes)
+    elif full is not None and axes is not None:
+        full.narrow(axes, slot, 1).copy_(row)
+
+
+def chat_prompt(messages: Any) -> str:
+    """`System:`/`User:`/`Assistant:` transcript in the fine-tuning format, ending with `Assistant:`."""
+    if not isinstance(messages, list) or not messages:
+        raise ValueError("serve_invalid_request: messages must be a non-empty list")
+    lines = []
+    for message in messages:
+        role = message.get("role") if isinstance(message, dict) else None
+        content = message.get("content") if isinstance(message, dict) else None
+        if role not in CHAT_ROLES or not isinstance(content, str):
+            raise ValueError(f"serve_invalid_request: messages need a role in {sorted(CHAT_ROLES)} and string content")
+        lines.append(f"{CHAT_ROLES[role]}: {content}")
+    return "\n".join(lines) + "\nAssistant:"
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes] | None:
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise ValueError("serve_bad_request: malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise ValueError(f"serve_body_too_large: {length} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return parts[0].upper(), parts[1].split("?", 1)[0], body
+
+
+async def write_response(
+    writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str = "application/json"
+) -> None:
+    head = (
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def write_json(writer: asyncio.StreamWriter, status: int, payload: Any) -> None:
+    await write_response(writer, status, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+
+class CompletionServer:
+    def __init__(self, engine: ContinuousBatchingEngine, model_name: str, max_tokens_cap: int = MAX_TOKENS_CAP) -> None:
+        self.engine = engine
+        self.model_name = model_name
+        self.max_tokens_cap = max_tokens_cap
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        try:
+            request = await read_request(reader)
+            if request is not None:
+                await self.route(*request, writer)
+        except ValueError as error:
+            message = str(error)
+            status = ERROR_STATUS.get(message.split(":", 1)[0], 400)
+            with suppress(ConnectionError):
+                await write_json(writer, status, {"error": {"message": message, "type": "invalid_request_error"}})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        routes = {
+            "/health": ("GET", self.health),
+            "/metrics": ("GET", self.metrics),
+            "/v1/models": ("GET", self.models),
+            "/v1/completions": ("POST", self.completions),
+            "/v1/chat/completions": ("POST", self.chat_completions),
+        }
+        if path not in routes:
+            raise ValueError(f"serve_not_found: {path}")
+        expected, handler = routes[path]
+        if method != expected:
+            raise ValueError(f"serve_method_not_allowed: {method} {path}")
+        if method == "GET":
+            await handler(writer)
+            return
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as error:
+            raise ValueError(f"serve_bad_request: invalid JSON body: {error}") from error
+        if not isinstance(payload, dict):
+            raise ValueError("serve_bad_request: JSON body must be an object")
+        await handler(payload, writer)
+
+    async def health(self, writer: asyncio.StreamWriter) -> None:
+        await write_json(writer, 200, {"status": "ok", "model": self.model_name, "slots": self.engine.model.slots})
+
+    async def metrics(self, writer: asyncio.StreamWriter) -> None:
+        body = self.engine.metrics_text().encode("utf-8")
+        await write_response(writer, 200, body, "text/plain; version=0.0.4; charset=utf-8")
+
+    async def models(self, writer: asyncio.StreamWriter) -> None:
+        await write_json(
+            writer, 200, {"object": "list", "data": [{"id": self.model_name, "object": "model", "owned_by": "local"}]}
+        )
+
+    async def completions(self, payload: dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        prompt = payload.get("prompt")
+        if isinstance(prompt, list) and len(prompt) == 1:
+            prompt = prompt[0]
+        if not isinstance(prompt, str):
+            raise ValueError("serve_invalid_request: prompt must be a string")
+        params = SamplingParams.from_request(payload, self.max_tokens_cap)
+        await self.generate(prompt, params, bool(payload.get("stream")), "text_completion", writer)
+
+    async def chat_completions(self, payload: dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        prompt = chat_prompt(payload.get("messages"))
+        params = SamplingParams.from_request(payload, self.max_tokens_cap)
+        if CHAT_STOP not in params.stop:
+            params.stop.append(CHAT_STOP)
+        await self.generate(prompt, params, bool(payload.get("stream")), "chat.completion", writer)
+
+    async def generate(
+        self, prompt: str, params: SamplingParams, stream: bool, kind: str, writer: asyncio.StreamWriter
+    ) -> None:
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        generation = self.engine.submit(self.engine.model.encode(prompt), params)
+        prefix = "chatcmpl" if kind == "chat.completion" else "cmpl"
+        envelope = {"id": f"{prefix}-{generation.request_id}", "created": int(time.time()), "model": self.model_name}
+        try:
+            if stream:
+                await self.stream(generation, kind, envelope, writer)
+                return
+            text, finish_reason = [], None
+            while finish_reason is None:
+                event = await generation.events.get()
+                text.append(event.get("text", ""))
+                finish_reason = event.get("finish_reason")
+        except (ConnectionError, asyncio.CancelledError):
+            self.engine.cancel(generation)
+            raise
+        completion_tokens = len(generation.tokens)
+        choice: dict[str, Any] = {"index": 0, "finish_reason": finish_reason}
+        if kind == "chat.completion":
+            choice["message"] = {"role": "assistant", "content": "".join(text)}
+        else:
+            choice.update(text="".join(text), logprobs=None)
+        await write_json(
+            writer,
+            200,
+            {
+                **envelope,
+                "object": kind,
+                "choices": [choice],
+                "usage": {
+                    "prompt_tokens": len(generation.prompt_tokens),
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": len(generation.prompt_tokens) + completion_tokens,
+                },
+            },
+        )
+
+    async def stream(
+        self, generation: Generation, kind: str, envelope: dict[str, Any], writer: asyncio.StreamWriter
+    ) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        chat = kind == "chat.completion"
+        obj = "chat.completion.chunk" if chat else "text_completion"
+
+        async def send(text: str | None, finish_reason: str | None, role: bool = False) -> None:
+            if chat:
+                delta: dict[str, Any] = {"role": "assistant"} if role else {}
+                if text:
+                    delta["content"] = text
+                choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+            else:
+                choice = {"index": 0, "text": text or "", "logprobs": None, "finish_reason": finish_reason}
+            chunk = {**envelope, "object": obj, "choices": [choice]}
+            writer.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await writer.drain()
+
+        if chat:
+            await send(None, None, role=True)
+        while True:
+            event = await generation.events.get()
+            if "text" in event:
+                await send(event["text"], None)
+            if "finish_reason" in event:
+                await send(None, event["finish_reason"])
+                break
+        writer.write(b"data: [DONE]\n\n")
+        await writer.drain()
+
+
+async def serve(model: Any, args: argparse.Namespace, model_name: str) -> None:
+    import asyncio  # pylint: disable=import-outside-toplevel
+
+    engine = ContinuousBatchingEngine(model, max_queue=args.max_queue)
+    engine.start()
+    handler = CompletionServer(engine, model_name, args.max_tokens_cap)
+    server = await asyncio.start_server(handler.handle, args.host, args.port)
+    print(f"Serving {model_name} on http://{args.host}:{args.port} (slots={model.slots}, queue={args.max_queue})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await engine.close()
+
+
+def main() -> int:
+    args = parse_args()
+    set_seed(args.seed)
+    albatross = load_albatross(
+        args.albatross_dir,
+        args.model,
+        args.tokenizer,
+        args.auto_clone,
+        args.weights_cache,
+        args.weights_cache_dir,
+        args.lora_adapter,
+        args.lora_alpha,
+    )
+    state_cache = (
+        PrefixStateCache(args.state_cache_mb * 1024 * 1024, args.state_cache_block) if args.state_cache_mb > 0 else None
+    )
+    model = AlbatrossSlotModel(albatross.model, albatross.tokenizer, args.slots, state_cache)
+    model_name = args.model_name or Path(albatross.model_prefix).name
+    import asyncio  # pylint: disable=import-outside-toplevel
+
+    try:
+        asyncio.run(serve(model, args, model_name))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
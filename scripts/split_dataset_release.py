@@ -7,6 +7,7 @@ import argparse
 import json
 import sys
 from pathlib import Path
+from typing import Any
 
 
 SCRIPT_DIR = Path(__file__).resolve().parent
@@ -23,6 +24,7 @@ from dataset_lifecycle import (
     split_rows_by_repo_time,
     write_canonical_rows,
 )
+from columnar_release import require_pyarrow, write_columnar_companion
 
 
 def parse_args() -> argparse.Namespace:
@@ -63,15 +65,23 @@ def parse_args() -> argparse.Namespace:
         help="Metadata key candidate used to resolve temporal ordering. Repeat for precedence order.",
     )
     parser.add_argument("--enforce-balance", action="store_true", help="Enable train category balance gate.")
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Also write a Parquet companion per split with dictionary-encoded metadata columns (requires pyarrow).",
+    )
     return parser.parse_args()
 
 
-def artifact_summary(path: Path, rows_total: int) -> dict[str, object]:
-    return {
+def artifact_summary(path: Path, rows: list[dict[str, Any]], columnar: bool = False) -> dict[str, object]:
+    summary: dict[str, object] = {
         "path": str(path),
         "sha256": sha256_file(path),
-        "rows_total": rows_total,
+        "rows_total": len(rows),
     }
+    if columnar:
+        summary["columnar"] = write_columnar_companion(path, rows)
+    return summary
 
 
 def main() -> int:
@@ -86,6 +96,8 @@ def main() -> int:
     time_keys = tuple(args.time_key or DEFAULT_TIME_METADATA_KEYS)
 
     try:
+        if args.columnar:
+            require_pyarrow()
         rows = load_canonical_rows(input_path)
         rows_by_split, split_report = split_rows_by_repo_time(
             rows,
@@ -114,9 +126,17 @@ def main() -> int:
         rows_by_split=manifest_rows,
         created_at=args.created_at,
         split_artifacts={
-            "train": artifact_summary(train_output, len(manifest_rows["train"])),
-            "eval_generation": artifact_summary(eval_generation_output, len(manifest_rows["eval_generation"])),
-            "eval_refactoring": artifact_summary(eval_refactoring_output, len(manifest_rows["eval_refactoring"])),
+            "train": artifact_summary(train_output, manifest_rows["train"], args.columnar),
+            "eval_generation": artifact_summary(
+                eval_generation_output,
+                manifest_rows["eval_generation"],
+                args.columnar,
+            ),
+            "eval_refactoring": artifact_summary(
+                eval_refactoring_output,
+                manifest_rows["eval_refactoring"],
+                args.columnar,
+            ),
         },
         split_policy={
             "strategy": "repo_temporal_boundary",
@@ -128,7 +148,7 @@ def main() -> int:
             "repo_row_counts": split_report["repo_row_counts"],
             "eval_split_categories": dict(DEFAULT_EVAL_SPLIT_CATEGORIES),
             "split_time_ranges": split_report["split_time_ranges"],
-            "combined_eval_artifact": artifact_summary(eval_output, len(rows_by_split["eval"])),
+            "combined_eval_artifact": artifact_summary(eval_output, rows_by_split["eval"], args.columnar),
         },
         dedup_policy={
             "exact_hash_basis": "sha256(user_prompt + assistant_response)",
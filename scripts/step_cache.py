@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Content-addressed cache of DAG step outputs.
+
+A step fingerprint is the sha256 of the task id, its scalar inputs and the sha256 of every
+input file (scripts included, so editing a wrapper invalidates its entries; `module_files`
+adds the repo modules a Python script imports, so editing those does too). File digests
+are memoised in `<root>/digests.json` by `(size, mtime_ns)` so multi-GB base models are
+hashed once, not on every DAG run.
+
+An entry is `<root>/<task_id>/<fingerprint>/` with the output files under `files/` and
+`entry.json`, which is renamed into place last: a directory without it is never reused.
+Outputs of at least `LINK_MIN_BYTES` (checkpoints, `.bin`) are hard-linked when the cache
+and the run share a filesystem; smaller files, which later steps may rewrite in place, are
+copied. `detach_links` must run before a step rebuilds linked outputs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from profile_env import ROOT_DIR
+
+
+DEFAULT_CACHE_DIR = ROOT_DIR / "data" / "cache" / "steps"
+ENTRY_NAME = "entry.json"
+FILES_DIRNAME = "files"
+DIGESTS_NAME = "digests.json"
+LINK_MIN_BYTES = 16 * 1024 * 1024
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def _write_json_atomic(path: Path, payload: Any) -> None:
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _link_or_copy(source: Path, destination: Path) -> str:
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if destination.exists() or destination.is_symlink():
+        destination.unlink()
+    if source.stat().st_size >= LINK_MIN_BYTES:
+        try:
+            os.link(source, destination)
+            return "link"
+        except OSError:
+            pass
+    shutil.copy2(source, destination)
+    return "copy"
+
+
+def detach_links(paths: Iterable[Path]) -> int:
+    """Unlink outputs that share an inode with a cache entry before a step rewrites them in place."""
+    detached = 0
+    for path in paths:
+        if path.is_file() and not path.is_symlink() and path.stat().st_nlink > 1:
+            path.unlink()
+            detached += 1
+    return detached
+
+
+def module_files(*scripts: Path | str) -> dict[str, Path]:
+    """`scripts` and the sibling modules they import, transitively: file name -> path.
+
+    Imports are read from the source (function-level ones included) and resolved to
+    `<script dir>/<module>.py`; stdlib and third-party imports have no such file and are
+    skipped, as are non-Python scripts.
+    """
+    import ast  # pylint: disable=import-outside-toplevel
+
+    found: dict[str, Path] = {}
+    pending = [Path(script).resolve() for script in scripts]
+    while pending:
+        path = pending.pop()
+        if path.name in found or path.suffix != ".py" or not path.is_file():
+            continue
+        found[path.name] = path
+        for node in ast.walk(ast.parse(path.read_bytes(), filename=str(path))):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            pending.extend(path.parent / f"{name.split('.')[0]}.py" for name in names)
+    return dict(sorted(found.items()))
+
+
+def source_revision(path: Path | str) -> str | None:
+    """Git HEAD of the checkout rooted at `path`, plus a digest of its uncommitted changes.
+
+    None when `path` is not the top of a git checkout (a plain copy, or a directory inside
+    another repository, whose HEAD says nothing about it).
+    """
+    import subprocess  # pylint: disable=import-outside-toplevel
+
+    git = ["git", "-C", str(path)]
+    try:
+        toplevel, head = subprocess.run(
+            [*git, "rev-parse", "--show-toplevel", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.split()
+        diff = subprocess.run([*git, "diff", "HEAD"], capture_output=True, check=True).stdout
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+    if Path(toplevel).resolve() != Path(path).resolve():
+        return None
+    return f"{head}+{hashlib.sha256(diff).hexdigest()[:16]}" if diff else head
+
+
+class StepCache:
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR) -> None:
+        self.root = Path(root)
+        self._digests: dict[str, dict[str, Any]] | None = None
+
+    def entry_dir(self, task_id: str, fingerprint: str) -> Path:
+        return self.root / task_id / fingerprint
+
+    def file_digest(self, path: Path) -> str:
+        path = Path(path).resolve()
+        stat = path.stat()
+        if self._digests is None:
+            try:
+                self._digests = json.loads((self.root / DIGESTS_NAME).read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                self._digests = {}
+        known = self._digests.get(str(path))
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+        digest = hashlib.sha256()
+        with path.open("rb") as handle:
+            for chunk in iter(lambda: handle.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        self._digests[str(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def save_digests(self) -> None:
+        """Persist digests memoised by `file_digest` to `<root>/digests.json`."""
+        if self._digests is not None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            _write_json_atomic(self.root / DIGESTS_NAME, self._digests)
+
+    def fingerprint(
+        self,
+        task_id: str,
+        values: dict[str, Any],
+        files: dict[str, Path | str | None],
+    ) -> dict[str, Any]:
+        """`{"fingerprint": sha256, "inputs": {...}}`; missing files hash as `None`."""
+        inputs: dict[str, Any] = {"task_id": task_id, "values": values, "files": {}}
+        for name, path in sorted(files.items()):
+            inputs["files"][name] = self.file_digest(Path(path)) if path and Path(path).is_file() else None
+        self.save_digests()
+        canonical = json.dumps(inputs, ensure_ascii=True, sort_keys=True, separators=(",", ":"))
+        return {"fingerprint": hashlib.sha256(canonical.encode("utf-8")).hexdigest(), "inputs": inputs}
+
+    def lookup(self, task_id: str, fingerprint: str) -> dict[str, Any] | None:
+        entry_dir = self.entry_dir(task_id, fingerprint)
+        try:
+            entry = json.loads((entry_dir / ENTRY_NAME).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not all((entry_dir / FILES_DIRNAME / key).is_file() for key in entry["files"]):
+            return None
+        entry["path"] = str(entry_dir)
+        return entry
+
+    def store(
+        self,
+        task_id: str,
+        step: dict[str, Any],
+        files: dict[str, Path],
+        run_name: str = "",
+    ) -> dict[str, Any]:
+        """Snapshot `files` (relative key -> output path) as the entry for `step`, replacing any old one."""
+        entry_dir = self.entry_dir(task_id, step["fingerprint"])
+        entry_dir.parent.mkdir(parents=True, exist_ok=True)
+        staging = entry_dir.parent / f".staging-{step['fingerprint']}-{uuid.uuid4().hex}"
+        modes = {}
+        for key, source in sorted(files.items()):
+            modes[key] = _link_or_copy(Path(source), staging / FILES_DIRNAME / key)
+        entry = {
+            "task_id": task_id,
+            "fingerprint": step["fingerprint"],
+            "inputs": step["inputs"],
+            "run_name": run_name,
+            "created_at": _now_iso(),
+            "files": {key: Path(source).stat().st_size for key, source in sorted(files.items())},
+            "store_modes": modes,
+        }
+        staging.mkdir(parents=True, exist_ok=True)
+        _write_json_atomic(staging / ENTRY_NAME, entry)
+        if entry_dir.exists():
+            retired = entry_dir.parent / f".retired-{step['fingerprint']}-{uuid.uuid4().hex}"
+            os.rename(entry_dir, retired)
+            shutil.rmtree(retired, ignore_errors=True)
+        os.rename(staging, entry_dir)
+        entry["path"] = str(entry_dir)
+        return entry
+
+    def restore(self, entry: dict[str, Any], destination: Callable[[str], Path]) -> dict[str, str]:
+        """Materialise every cached file at `destination(key)`; returns key -> link|copy."""
+        source_dir = Path(entry["path"]) / FILES_DIRNAME
+        return {key: _link_or_copy(source_dir / key, destination(key)) for key in sorted(entry["files"])}
+
+    def entries(self, task_id: str | None = None) -> list[dict[str, Any]]:
+        found: list[dict[str, Any]] = []
+        if not self.root.is_dir():
+            return found
+        task_dirs = [self.root / task_id] if task_id else sorted(path for path in self.root.iterdir() if path.is_dir())
+        for task_dir in task_dirs:
+            for entry_dir in sorted(task_dir.glob("[!.]*")) if task_dir.is_dir() else []:
+                entry = self.lookup(task_dir.name, entry_dir.name)
+                if entry is not None:
+                    found.append(entry)
+        return found
+
+    def invalidate(self, task_id: str | None = None, fingerprint: str | None = None) -> list[str]:
+        """Remove matching entries (all entries when both filters are empty)."""
+        removed = []
+        for entry in self.entries(task_id):
+            if fingerprint and not entry["fingerprint"].startswith(fingerprint):
+                continue
+            shutil.rmtree(entry["path"], ignore_errors=True)
+            removed.append(entry["path"])
+        return removed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="List or invalidate cached DAG step outputs.")
+    parser.add_argument("command", choices=("list", "invalidate"))
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument("--task", default=None, help="prepare_dataset, train_adapter or eval_<suite>_shard_<i>.")
+    parser.add_argument("--fingerprint", default=None, help="invalidate: fingerprint or its prefix.")
+    parser.add_argument("--all", action="store_true", help="invalidate: allow dropping every entry.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    cache = StepCache(Path(args.cache_dir))
+    if args.command == "list":
+        payload: Any = [
+            {key: entry[key] for key in ("task_id", "fingerprint", "run_name", "created_at", "path")}
+            for entry in cache.entries(args.task)
+        ]
+    else:
+        if not (args.task or args.fingerprint or args.all):
+            print("invalidate needs --task, --fingerprint or --all", file=sys.stderr)
+            return 1
+        payload = {"removed": cache.invalidate(args.task, args.fingerprint)}
+    print(json.dumps(payload, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Persistent per-document token cache for incremental binidx builds.
+
+Layout under `<cache_dir>/<tokenizer fingerprint[:16]>/`:
+
+- `tokens.bin`: append-only uint16 payloads (document tokens + EOD), read through `mmap`;
+- `index.bin`: append-only `(digest, byte offset, token count)` records;
+- `refs/<name>.refs`: digests used by one built data prefix (GC roots).
+
+Documents are keyed by the blake2b-128 digest of their UTF-8 text, so unchanged rows of a
+hotfix iteration are copied from the cache instead of re-tokenized. Both files start with
+the same random epoch; `gc` compacts into new files and a crash between the two renames
+leaves mismatched epochs, which resets the cache instead of serving wrong tokens.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Iterable
+
+
+CACHE_MAGIC = b"RWKVTKC\x00"
+CACHE_VERSION = 1
+# magic, version, tokenizer fingerprint, epoch
+CACHE_HEADER = struct.Struct("<8sI32s16s")
+# document digest, byte offset in tokens.bin, token count
+INDEX_RECORD = struct.Struct("<16sQI")
+TOKEN_ITEMSIZE = 2
+REFS_SUFFIX = ".refs"
+DIGEST_SIZE = 16
+
+
+def document_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def refs_name_for(data_prefix: Path) -> str:
+    return hashlib.blake2b(str(Path(data_prefix).resolve()).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class TokenCache:
+    """Open with `TokenCache.open(cache_dir, fingerprint)`; holds an exclusive lock until `close`."""
+
+    def __init__(self, root: Path, fingerprint: str) -> None:
+        self.root = root
+        self.fingerprint = fingerprint
+        self.tokens_path = root / "tokens.bin"
+        self.index_path = root / "index.bin"
+        self.refs_dir = root / "refs"
+        self.entries: dict[bytes, tuple[int, int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock_handle = None
+        self._tokens_handle = None
+        self._index_handle = None
+        self._mmap: mmap.mmap | None = None
+        self._mapped_size = 0
+
+    @classmethod
+    def open(cls, cache_dir: Path, fingerprint: str) -> "TokenCache":
+        root = Path(cache_dir) / fingerprint[:16]
+        root.mkdir(parents=True, exist_ok=True)
+        cache = cls(root, fingerprint)
+        cache._lock_handle = (root / ".lock").open("a+b")
+        fcntl.flock(cache._lock_handle.fileno(), fcntl.LOCK_EX)
+        cache._load()
+        return cache
+
+    def __enter__(self) -> "TokenCache":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def _header(self, epoch: bytes) -> bytes:
+        return CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, bytes.fromhex(self.fingerprint), epoch)
+
+    def _read_header(self, path: Path) -> bytes | None:
+        try:
+            with path.open("rb") as handle:
+                payload = handle.read(CACHE_HEADER.size)
+        except OSError:
+            return None
+        if len(payload) != CACHE_HEADER.size:
+            return None
+        magic, version, fingerprint, epoch = CACHE_HEADER.unpack(payload)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or fingerprint.hex() != self.fingerprint:
+            return None
+        return epoch
+
+    def _reset(self) -> None:
+        header = self._header(os.urandom(16))
+        for path in (self.tokens_path, self.index_path):
+            path.write_bytes(header)
+
+    def _load(self) -> None:
+        tokens_epoch = self._read_header(self.tokens_path)
+        if tokens_epoch is None or tokens_epoch != self._read_header(self.index_path):
+            self._reset()
+        tokens_size = self.tokens_path.stat().st_size
+        payload = self.index_path.read_bytes()
+        records = (len(payload) - CACHE_HEADER.size) // INDEX_RECORD.size
+        for digest, offset, count in INDEX_RECORD.iter_unpack(
+            payload[CACHE_HEADER.size : CACHE_HEADER.size + records * INDEX_RECORD.size]
+        ):
+            # Records past the end of tokens.bin come from a torn append and are ignored.
+            if offset + count * TOKEN_ITEMSIZE <= tokens_size:
+                self.entries[digest] = (offset, count)
+        valid_index_size = CACHE_HEADER.size + records * INDEX_RECORD.size
+        self._index_handle = self.index_path.open("r+b")
+        self._index_handle.truncate(valid_index_size)
+        self._index_handle.seek(0, os.SEEK_END)
+        self._tokens_handle = self.tokens_path.open("r+b")
+        self._tokens_handle.seek(0, os.SEEK_END)
+
+    def _buffer(self, end: int) -> mmap.mmap:
+        if self._mmap is None or end > self._mapped_size:
+            if self._mmap is not None:
+                self._mmap.close()
+            self._tokens_handle.flush()
+            self._mmap = mmap.mmap(self._tokens_handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = len(self._mmap)
+        return self._mmap
+
+    def get(self, digest: bytes) -> bytes | None:
+        entry = self.entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        offset, count = entry
+        end = offset + count * TOKEN_ITEMSIZE
+        return self._buffer(end)[offset:end]
+
+    def put(self, digest: bytes, payload: bytes) -> None:
+        """Append a little-endian uint16 payload; existing digests are kept as is."""
+        if digest in self.entries or not payload:
+            return
+        if len(payload) % TOKEN_ITEMSIZE:
+            raise ValueError("token_cache_payload_not_uint16")
+        offset = self._tokens_handle.tell()
+        self._tokens_handle.write(payload)
+        self._tokens_handle.flush()
+        count = len(payload) // TOKEN_ITEMSIZE
+        self._index_handle.write(INDEX_RECORD.pack(digest, offset, count))
+        self.entries[digest] = (offset, count)
+
+    def write_refs(self, name: str, digests: Iterable[bytes]) -> Path:
+        self.refs_dir.mkdir(parents=True, exist_ok=True)
+        path = self.refs_dir / f"{name}{REFS_SUFFIX}"
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(b"".join(sorted(set(digests))))
+        os.replace(tmp_path, path)
+        return path
+
+    def size_bytes(self) -> int:
+        self._tokens_handle.flush()
+        self._index_handle.flush()
+        return self.tokens_path.stat().st_size + self.index_path.stat().st_size
+
+    def referenced_digests(self, max_bytes: int | None = None) -> tuple[set[bytes], list[str]]:
+        """Union of GC roots; with `max_bytes`, the oldest refs are dropped until live data fits."""
+        refs = sorted(self.refs_dir.glob(f"*{REFS_SUFFIX}"), key=lambda path: path.stat().st_mtime_ns, reverse=True)
+        live: set[bytes] = set()
+        live_bytes = 0
+        dropped: list[str] = []
+        for path in refs:
+            payload = path.read_bytes()
+            digests = {payload[start : start + DIGEST_SIZE] for start in range(0, len(payload), DIGEST_SIZE)}
+            added = sum(self.entries[digest][1] * TOKEN_ITEMSIZE for digest in digests - live if digest in self.entries)
+            if max_bytes is not None and live and live_bytes + added > max_bytes:
+                dropped.append(path.name)
+                path.unlink()
+                continue
+            live |= digests
+            live_bytes += added
+        return live, dropped
+
+    def gc(self, max_bytes: int | None = None) -> dict[str, Any]:
+        """Compact the cache to entries referenced by `refs/`, honouring an optional size limit."""
+        before_entries = len(self.entries)
+        before_bytes = self.size_bytes()
+        live, dropped_refs = self.referenced_digests(max_bytes)
+        epoch = os.urandom(16)
+        tokens_tmp = self.tokens_path.with_name(".tokens.bin.tmp")
+        index_tmp = self.index_path.with_name(".index.bin.tmp")
+        buffer = self._buffer(self.tokens_path.stat().st_size)
+        with tokens_tmp.open("wb") as tokens_out, index_tmp.open("wb") as index_out:
+            tokens_out.write(self._header(epoch))
+            index_out.write(self._header(epoch))
+            for digest, (offset, count) in sorted(self.entries.items(), key=lambda item: item[1][0]):
+                if digest not in live:
+                    continue
+                new_offset = tokens_out.tell()
+                tokens_out.write(buffer[offset : offset + count * TOKEN_ITEMSIZE])
+                index_out.write(INDEX_RECORD.pack(digest, new_offset, count))
+        self._close_files()
+        os.replace(tokens_tmp, self.tokens_path)
+        os.replace(index_tmp, self.index_path)
+        self.entries = {}
+        self._load()
+        return {
+            "entries_before": before_entries,
+            "entries_after": len(self.entries),
+            "bytes_before": before_bytes,
+            "bytes_after": self.size_bytes(),
+            "dropped_refs": dropped_refs,
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "path": str(self.root),
+            "entries": len(self.entries),
+            "bytes": self.size_bytes(),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _close_files(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._mapped_size = 0
+        for handle in (self._tokens_handle, self._index_handle):
+            if handle is not None:
+                handle.close()
+        self._tokens_handle = None
+        self._index_handle = None
+
+    def close(self) -> None:
+        self._close_files()
+        if self._lock_handle is not None:
+            fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_UN)
+            self._lock_handle.close()
+            self._lock_handle = None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Inspect or garbage-collect the binidx token cache.")
+    parser.add_argument("command", choices=("stats", "gc"))
+    parser.add_argument("--cache-dir", required=True)
+    parser.add_argument("--tokenizer-fingerprint", required=True, help="sha256 of the vocab file (see binidx manifest).")
+    parser.add_argument("--max-mb", type=float, default=None, help="gc: drop oldest build refs until live data fits.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    max_bytes = None if args.max_mb is None else int(args.max_mb * 1024 * 1024)
+    with TokenCache.open(Path(args.cache_dir), args.tokenizer_fingerprint) as cache:
+        payload = cache.gc(max_bytes) if args.command == "gc" else cache.stats()
+    print(json.dumps(payload, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
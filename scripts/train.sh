@@ -115,6 +115,19 @@ if [ ! -f "$PROFILE_CONFIG" ]; then
   exit 1
 fi
 
+# Offline VRAM preflight: refuse a config that will not fit before the GPU slot is taken.
+if [ -n "${GPU_MEMORY_GB:-}" ] && [ "${RESOURCE_PREFLIGHT:-1}" = "1" ]; then
+  if ! python "$ROOT_DIR/scripts/estimate_train_resources.py" \
+    --model "$MODEL_CONFIG" \
+    --profile "$PROFILE_CONFIG" \
+    --devices "$DEVICES" \
+    --gpu-memory-gb "$GPU_MEMORY_GB" \
+    --check >/dev/null; then
+    echo "Resource preflight refused this configuration (GPU_MEMORY_GB=$GPU_MEMORY_GB, RESOURCE_PREFLIGHT=0 skips)." >&2
+    exit 1
+  fi
+fi
+
 if [ ! -f "$LOAD_MODEL" ]; then
   echo "Base model checkpoint not found: $LOAD_MODEL" >&2
   exit 1
@@ -222,6 +235,19 @@ if [ "${FUSED_KERNEL:-0}" = "1" ]; then
   CMD+=(--fused_kernel)
 fi
 
+# Telemetry wrapper: echoes trainer output and writes runs/<run>/telemetry/ (TRAIN_TELEMETRY=0 disables).
+LAUNCH=()
+if [ "${TRAIN_TELEMETRY:-1}" = "1" ]; then
+  LAUNCH=(
+    python "$ROOT_DIR/scripts/collect_train_telemetry.py"
+    --run-dir "$PROJ_DIR"
+    --devices "$DEVICES"
+    --model-config "$(realpath "$MODEL_CONFIG")"
+    --profile-config "$(realpath "$PROFILE_CONFIG")"
+    --
+  )
+fi
+
 echo "Running command:"
 printf ' %q' "${CMD[@]}"
 echo
@@ -229,5 +255,5 @@ echo
 
 (
   cd "$RWKV_PEFT_DIR"
-  "${CMD[@]}"
+  ${LAUNCH[@]+"${LAUNCH[@]}"} "${CMD[@]}"
 )
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""Memory-mapped weight cache for Albatross checkpoints.
+
+`RWKV_x070` `torch.load`s the whole `.pth` (about 15 GB for the 7.2B base) on every start.
+`prepare_weights` converts a checkpoint once into a safetensors file keyed by the `.pth`
+sha256, `<checkpoint stem>.<sha16>.safetensors` in the cache directory (by default next to
+the checkpoint), and `load_safetensors` maps it copy-on-write: tensors are views of the
+file, so only the pages a model reads are paged in and a restart re-reads nothing the page
+cache still holds. With a LoRA adapter (`runs/<run>/rwkv-*.pth` of a `PEFT=lora` run) the
+merged base+adapter weights are cached the same way, keyed by both digests, `lora_alpha`
+and the rank.
+
+Checkpoint digests are memoised by `StepCache.file_digest`, so the 15 GB `.pth` is hashed
+once per `(size, mtime_ns)`. The file layout is plain safetensors (8-byte little-endian
+header length, JSON header, tensor bytes) and is written and read with the stdlib and
+torch alone; the `safetensors` package is not needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from step_cache import StepCache
+
+
+SAFETENSORS_SUFFIX = ".safetensors"
+LORA_A_SUFFIX = ".lora_A"
+LORA_B_SUFFIX = ".lora_B"
+HEADER_ALIGN_BYTES = 8
+DTYPE_CODES = {
+    "float64": "F64",
+    "float32": "F32",
+    "float16": "F16",
+    "bfloat16": "BF16",
+    "int64": "I64",
+    "int32": "I32",
+    "int16": "I16",
+    "int8": "I8",
+    "uint8": "U8",
+    "bool": "BOOL",
+}
+DTYPE_NAMES = {code: name for name, code in DTYPE_CODES.items()}
+
+
+def _dtype_name(value: Any) -> str:
+    """`float32`/`bfloat16`/... of a torch tensor or numpy array."""
+    return str(value.dtype).replace("torch.", "")
+
+
+def _tensor_nbytes(value: Any) -> int:
+    if hasattr(value, "element_size"):
+        return int(value.element_size() * value.numel())
+    return int(value.nbytes)
+
+
+def _tensor_bytes(value: Any) -> Any:
+    """Flat uint8 view of a tensor's data for writing (torch tensors are moved to the CPU)."""
+    if hasattr(value, "element_size"):
+        import torch  # pylint: disable=import-outside-toplevel
+
+        return value.detach().to("cpu").contiguous().reshape(-1).view(torch.uint8).numpy()
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    return np.ascontiguousarray(value).reshape(-1).view(np.uint8)
+
+
+def write_safetensors(path: Path, tensors: dict[str, Any], metadata: dict[str, str] | None = None) -> None:
+    """Write torch tensors or numpy arrays as safetensors; the file appears atomically."""
+    path = Path(path)
+    header: dict[str, Any] = {"__metadata__": {key: str(value) for key, value in (metadata or {}).items()}}
+    offset = 0
+    for name, value in tensors.items():
+        dtype = _dtype_name(value)
+        if dtype not in DTYPE_CODES:
+            raise ValueError(f"weights_cache_dtype_unsupported: {name} has dtype {dtype}")
+        size = _tensor_nbytes(value)
+        header[name] = {"dtype": DTYPE_CODES[dtype], "shape": list(value.shape), "data_offsets": [offset, offset + size]}
+        offset += size
+    encoded = json.dumps(header, ensure_ascii=True, separators=(",", ":")).encode("utf-8")
+    # Tensor data starts 8-byte aligned, as the safetensors writer does.
+    encoded += b" " * (-(8 + len(encoded)) % HEADER_ALIGN_BYTES)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with tmp_path.open("wb") as handle:
+            handle.write(struct.pack("<Q", len(encoded)))
+            handle.write(encoded)
+            for value in tensors.values():
+                handle.write(memoryview(_tensor_bytes(value)))
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def read_safetensors_header(path: Path) -> tuple[dict[str, Any], int]:
+    """`(header, data_start)` of a safetensors file."""
+    with Path(path).open("rb") as handle:
+        raw = handle.read(8)
+        if len(raw) != 8:
+            raise ValueError(f"weights_cache_corrupt: {path} is shorter than a safetensors header")
+        (length,) = struct.unpack("<Q", raw)
+        try:
+            header = json.loads(handle.read(length))
+        except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ValueError(f"weights_cache_corrupt: {path} has an unreadable header") from exc
+    return header, 8 + length
+
+
+def load_safetensors(path: Path, framework: str = "torch") -> tuple[dict[str, Any], dict[str, str]]:
+    """`(tensors, metadata)` with every tensor a view of a copy-on-write mapping of `path`.
+
+    Nothing is read until a tensor is touched; writes stay private to the process.
+    `framework` is `torch` or `numpy` (numpy has no bfloat16).
+    """
+    header, data_start = read_safetensors_header(path)
+    metadata = header.pop("__metadata__", None) or {}
+    with Path(path).open("rb") as handle:
+        # mmap refuses empty mappings: a file of empty tensors only has the header.
+        empty = os.fstat(handle.fileno()).st_size <= data_start
+        mapped = None if empty else mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    if framework == "torch":
+        import torch  # pylint: disable=import-outside-toplevel
+
+        def view(dtype: str, count: int, offset: int, shape: list[int]) -> Any:
+            if count == 0:
+                return torch.empty(shape, dtype=getattr(torch, dtype))
+            return torch.frombuffer(mapped, dtype=getattr(torch, dtype), count=count, offset=offset).reshape(shape)
+
+    elif framework == "numpy":
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        def view(dtype: str, count: int, offset: int, shape: list[int]) -> Any:
+            if dtype == "bfloat16":
+                raise ValueError("weights_cache_dtype_unsupported: numpy has no bfloat16, load with framework=torch")
+            if count == 0:
+                return np.empty(shape, dtype=dtype)
+            return np.frombuffer(mapped, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+    else:
+        raise ValueError(f"weights_cache_invalid_framework: {framework}")
+
+    tensors = {}
+    for name, info in header.items():
+        dtype = DTYPE_NAMES.get(info["dtype"])
+        if dtype is None:
+            raise ValueError(f"weights_cache_dtype_unsupported: {name} has dtype {info['dtype']}")
+        count = 1
+        for dim in info["shape"]:
+            count *= dim
+        tensors[name] = view(dtype, count, data_start + info["data_offsets"][0], info["shape"])
+    return tensors, metadata
+
+
+def torch_load_cpu(path: Path) -> dict[str, Any]:
+    """State dict of a `.pth` on the CPU, memory-mapped when the checkpoint is a zip archive."""
+    import torch  # pylint: disable=import-outside-toplevel
+
+    try:
+        return torch.load(str(path), map_location="cpu", mmap=True, weights_only=True)
+    except (RuntimeError, TypeError):
+        # Legacy (non-zip) checkpoints and torch < 2.1 cannot be mapped.
+        return torch.load(str(path), map_location="cpu", weights_only=True)
+
+
+def lora_rank(adapter: dict[str, Any]) -> int:
+    """LoRA rank `r` of an adapter: rows of its `lora_A` matrices."""
+    ranks = {int(value.shape[0]) for key, value in adapter.items() if key.endswith(LORA_A_SUFFIX)}
+    if not ranks:
+        raise ValueError("lora_adapter_invalid: no lora_A/lora_B tensors")
+    if len(ranks) > 1:
+        raise ValueError(f"lora_adapter_invalid: mixed ranks {sorted(ranks)}")
+    return ranks.pop()
+
+
+def _merged_weight(weight: Any, lora_a: Any, lora_b: Any, scale: float) -> Any:
+    if hasattr(weight, "float"):
+        # torch: accumulate in fp32, store in the base dtype (bf16 checkpoints).
+        return (weight.float() + (lora_b.float() @ lora_a.float()) * scale).to(weight.dtype)
+    return (weight + (lora_b @ lora_a) * scale).astype(weight.dtype)
+
+
+def adapter_keys(base: dict[str, Any], adapter: dict[str, Any]) -> list[str]:
+    """Base keys an RWKV-PEFT adapter changes; raises before anything is touched on a mismatch."""
+    keys = []
+    for key in adapter:
+        if key.endswith(LORA_B_SUFFIX):
+            continue
+        if not key.endswith(LORA_A_SUFFIX):
+            keys.append(key)
+            continue
+        module = key[: -len(LORA_A_SUFFIX)]
+        if f"{module}{LORA_B_SUFFIX}" not in adapter:
+            raise ValueError(f"lora_adapter_invalid: {module} has lora_A without lora_B")
+        keys.append(f"{module}.weight")
+    for key in keys:
+        if key not in base:
+            raise ValueError(f"lora_adapter_mismatch: {key} is not in the base checkpoint")
+    return keys
+
+
+def adapter_updates(
+    base: dict[str, Any],
+    adapter: dict[str, Any],
+    lora_alpha: float,
+    place: Callable[[str, Any], Any] | None = None,
+) -> Iterator[tuple[str, Any]]:
+    """`(key, merged tensor)` for every base tensor the adapter changes, one at a time.
+
+    `<module>.weight + lora_B @ lora_A * lora_alpha / r` for every `<module>.lora_A/lora_B`
+    pair; every other adapter tensor (trained norms, time-mix params) replaces the base
+    tensor. `place(key, tensor)` moves the operands first (e.g. to the model's device).
+    """
+    keys = adapter_keys(base, adapter)
+    scale = float(lora_alpha) / lora_rank(adapter)
+    place = place or (lambda key, value: value)
+    for key in keys:
+        if key in adapter:
+            yield key, place(key, adapter[key])
+            continue
+        module = key[: -len(".weight")]
+        yield key, _merged_weight(
+            place(key, base[key]),
+            place(key, adapter[f"{module}{LORA_A_SUFFIX}"]),
+            place(key, adapter[f"{module}{LORA_B_SUFFIX}"]),
+            scale,
+        )
+
+
+def merge_lora(base: dict[str, Any], adapter: dict[str, Any], lora_alpha: float) -> dict[str, Any]:
+    """Base weights with an RWKV-PEFT LoRA adapter applied (see `adapter_updates`).
+
+    Untouched base tensors are shared, not copied.
+    """
+    merged = dict(base)
+    merged.update(adapter_updates(base, adapter, lora_alpha))
+    return merged
+
+
+def lora_alpha_from_run(run_dir: Path) -> float | None:
+    """`lora_alpha` of the PEFT config a run trained with (`train_log.txt` args, then `resource_observation.json`)."""
+    from runs_catalog import train_args  # pylint: disable=import-outside-toplevel
+
+    candidates = [train_args(run_dir).get("peft_config")]
+    try:
+        observation = json.loads((run_dir / "resource_observation.json").read_text(encoding="utf-8"))
+        candidates.append((observation.get("env") or {}).get("PEFT_CONFIG"))
+    except (OSError, json.JSONDecodeError, AttributeError):
+        pass
+    for raw in candidates:
+        try:
+            config = json.loads(raw) if isinstance(raw, str) else raw
+        except json.JSONDecodeError:
+            continue
+        if isinstance(config, dict) and config.get("lora_alpha") is not None:
+            return float(config["lora_alpha"])
+    return None
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process in MiB (None where `resource` is unavailable)."""
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _format_alpha(lora_alpha: float) -> str:
+    return f"{lora_alpha:g}".replace(".", "p")
+
+
+def prepare_weights(
+    checkpoint: Path,
+    cache_dir: Path | None = None,
+    lora_adapter: Path | None = None,
+    lora_alpha: float | None = None,
+    load_checkpoint: Callable[[Path], dict[str, Any]] = torch_load_cpu,
+    framework: str = "torch",
+    log: Callable[[str], Any] = print,
+) -> dict[str, Any]:
+    """Make sure the cached safetensors for `checkpoint` (merged with `lora_adapter`) exist.
+
+    Returns `{"path", "checkpoint_sha256", "adapter_sha256", "lora_alpha", "lora_r",
+    "converted", "merged", "prepare_seconds"}`; `converted`/`merged` say whether this call
+    wrote the file.
+    """
+    started = time.perf_counter()
+    checkpoint = Path(checkpoint).resolve()
+    cache_dir = Path(cache_dir).resolve() if cache_dir else checkpoint.parent
+    digests = StepCache(cache_dir)
+    checkpoint_sha = digests.file_digest(checkpoint)
+    adapter_sha = digests.file_digest(Path(lora_adapter)) if lora_adapter else None
+    digests.save_digests()
+
+    base_path = cache_dir / f"{checkpoint.stem}.{checkpoint_sha[:16]}{SAFETENSORS_SUFFIX}"
+    report: dict[str, Any] = {
+        "path": str(base_path),
+        "checkpoint_sha256": checkpoint_sha,
+        "adapter_sha256": adapter_sha,
+        "lora_alpha": None,
+        "lora_r": None,
+        "converted": False,
+        "merged": False,
+    }
+    if not base_path.is_file():
+        log(f"Converting {checkpoint} -> {base_path}")
+        write_safetensors(base_path, load_checkpoint(checkpoint), {"source_sha256": checkpoint_sha})
+        report["converted"] = True
+
+    if lora_adapter:
+        adapter_path = Path(lora_adapter).resolve()
+        if lora_alpha is None:
+            lora_alpha = lora_alpha_from_run(adapter_path.parent)
+        if lora_alpha is None:
+            raise ValueError(
+                f"lora_alpha_unknown: pass --lora-alpha; {adapter_path.parent} has no PEFT config with lora_alpha"
+            )
+        adapter = load_checkpoint(adapter_path)
+        rank = lora_rank(adapter)
+        merged_path = cache_dir / (
+            f"{checkpoint.stem}.{checkpoint_sha[:16]}.lora-{adapter_sha[:16]}"
+            f"-a{_format_alpha(lora_alpha)}-r{rank}{SAFETENSORS_SUFFIX}"
+        )
+        report.update({"path": str(merged_path), "lora_alpha": lora_alpha, "lora_r": rank})
+        if not merged_path.is_file():
+            log(f"Merging {adapter_path} (lora_alpha={lora_alpha:g}, r={rank}) -> {merged_path}")
+            base, _ = load_safetensors(base_path, framework)
+            metadata = {
+                "source_sha256": checkpoint_sha,
+                "adapter_sha256": adapter_sha,
+                "lora_alpha": f"{lora_alpha:g}",
+                "lora_r": str(rank),
+            }
+            write_safetensors(merged_path, merge_lora(base, adapter, lora_alpha), metadata)
+            report["merged"] = True
+    report["prepare_seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+@contextmanager
+def redirect_torch_load(torch: Any, checkpoint: Path, state_dict: dict[str, Any]) -> Iterator[None]:
+    """Serve `state_dict` to code that calls `torch.load(checkpoint, map_location=...)`.
+
+    The Albatross reference model reads `MODEL_NAME + '.pth'` itself; this hands it the
+    mapped tensors instead (moved to `map_location` when one is given). Other paths go to
+    the real `torch.load`.
+    """
+    original = torch.load
+    target = Path(checkpoint).resolve()
+
+    def load(path: Any, *args: Any, **kwargs: Any) -> Any:
+        if isinstance(path, (str, os.PathLike)) and Path(path).resolve() == target:
+            location = kwargs.get("map_location", args[0] if args else None)
+            if location is None:
+                return dict(state_dict)
+            return {key: value.to(location) for key, value in state_dict.items()}
+        return original(path, *args, **kwargs)
+
+    torch.load = load
+    try:
+        yield
+    finally:
+        torch.load = original
+
+
+def add_weights_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--weights-cache",
+        action="store_true",
+        help="Convert the checkpoint once to a sha-keyed safetensors file and memory-map it on every load.",
+    )
+    parser.add_argument(
+        "--weights-cache-dir",
+        default="",
+        help="--weights-cache: directory of converted/merged weights. Default: next to the checkpoint.",
+    )
+    parser.add_argument(
+        "--lora-adapter",
+        default="",
+        help="RWKV-PEFT LoRA adapter .pth (runs/<run>/rwkv-*.pth) merged into the base; merges are cached (implies --weights-cache).",
+    )
+    parser.add_argument(
+        "--lora-alpha",
+        type=float,
+        default=None,
+        help="--lora-adapter: lora_alpha. Default: PEFT config of the adapter's run directory.",
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Convert (and LoRA-merge) a checkpoint into the mmap weight cache.")
+    parser.add_argument("--model", required=True, help="Checkpoint .pth.")
+    parser.add_argument("--cache-dir", default="", help="Default: next to the checkpoint.")
+    parser.add_argument("--lora-adapter", default="", help="RWKV-PEFT LoRA adapter .pth to merge.")
+    parser.add_argument("--lora-alpha", type=float, default=None, help="Default: PEFT config of the adapter's run.")
+    args = parser.parse_args()
+    report = prepare_weights(
+        Path(args.model),
+        Path(args.cache_dir) if args.cache_dir else None,
+        Path(args.lora_adapter) if args.lora_adapter else None,
+        args.lora_alpha,
+    )
+    report["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -154,6 +154,7 @@ class OneCExpertV4BuilderTests(unittest.TestCase):
         bsl_origin_ref: str = "local://onec/unit",
         bsl_contour: str = "core",
         onec_core_jsonl: Path | None = None,
+        extra_args: tuple[str, ...] = (),
     ) -> subprocess.CompletedProcess[str]:
         output_text = workdir / "release.txt"
         report = workdir / "release.report.json"
@@ -192,6 +193,7 @@ class OneCExpertV4BuilderTests(unittest.TestCase):
                     bsl_contour,
                 ]
             )
+        command.extend(extra_args)
         return subprocess.run(command, cwd=self.repo_root, check=False, text=True, capture_output=True)
 
     def test_pipeline_passes_with_all_module_types_and_zero_hard_min(self):
@@ -290,6 +292,46 @@ class OneCExpertV4BuilderTests(unittest.TestCase):
             self.assertGreater(report["shuffle"]["segment_switches"], 0)
             self.assertTrue(report["shuffle"]["segment_order_sha256"])
 
+    def test_pipeline_token_mix_reports_tokens_per_segment(self):
+        vocab = self.repo_root / "tests" / "fixtures" / "rwkv_vocab_test.txt"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            bsl_root = root / "onec"
+            bsl_root.mkdir(parents=True, exist_ok=True)
+            self.write_bsl_modules(bsl_root, include_manager=True)
+            coding, ru = self.write_canonical_jsonl_inputs(root)
+            result = self.run_builder(
+                root,
+                bsl_root,
+                coding,
+                ru,
+                hard_min_mb=0,
+                extra_args=("--mix-unit", "tokens", "--tokenizer-vocab", str(vocab)),
+            )
+            self.assertIn("quality_status:", result.stdout, msg=result.stderr)
+
+            report = json.loads((root / "release.report.json").read_text(encoding="utf-8"))
+            tokens = report["counts"]["tokens"]
+            self.assertEqual(report["mix_unit"], "tokens")
+            self.assertEqual(set(tokens["selected"]), {"onec_bsl", "coding_general", "ru_identity"})
+            self.assertTrue(all(value > 0 for value in tokens["selected"].values()))
+            self.assertLessEqual(sum(tokens["selected"].values()), sum(tokens["available"].values()))
+            self.assertGreater(tokens["token_budget"], 0)
+            self.assertTrue((root / "coding.jsonl.tokcount").is_file())
+
+            rerun = self.run_builder(
+                root,
+                bsl_root,
+                coding,
+                ru,
+                hard_min_mb=0,
+                extra_args=("--mix-unit", "tokens", "--tokenizer-vocab", str(vocab)),
+            )
+            self.assertIn("quality_status:", rerun.stdout, msg=rerun.stderr)
+            cached = json.loads((root / "release.report.json").read_text(encoding="utf-8"))["counts"]["tokens"]
+            self.assertTrue(cached["count_cache_hits"]["coding_general"])
+            self.assertEqual(cached["selected"], tokens["selected"])
+
     def test_pipeline_fails_closed_on_non_russian_prompt(self):
         with tempfile.TemporaryDirectory() as tmp_dir:
             root = Path(tmp_dir)
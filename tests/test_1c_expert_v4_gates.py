@@ -1,8 +1,10 @@
 import importlib.util
 import sys
+import tempfile
 import unittest
 from pathlib import Path
 from types import ModuleType
+from unittest import mock
 
 
 def load_module() -> ModuleType:
@@ -47,6 +49,67 @@ class OneCExpertV4GatesTests(unittest.TestCase):
         self.assertGreaterEqual(len(reasons), 1)
         self.assertTrue(any("mix[onec_bsl]" in reason for reason in reasons))
 
+    def test_bsl_segment_materializes_only_selected_methods(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            module = root / "CommonModules" / "Common" / "CommonModule.bsl"
+            module.parent.mkdir(parents=True)
+            module.write_text(
+                "".join(f"Процедура Шаг{index}()\n    Сообщить({index});\nКонецПроцедуры\n\n" for index in range(4)),
+                encoding="utf-8",
+            )
+            segment = self.module.index_bsl_methods(
+                root,
+                source="unit-test-bsl",
+                license_name="internal",
+                origin_ref="local://onec/unit",
+                contour="core",
+            )
+            self.assertEqual(len(segment), 4)
+            self.assertEqual(segment.module_type_coverage["common"], 4)
+
+            segment.select([3, 1])
+            self.assertEqual(sorted(segment.selected), [1, 3])
+            sample = segment.sample_at(3)
+            self.assertIn("Шаг3", sample.text)
+            self.assertEqual(sample.metadata["origin_relpath"], "CommonModules/Common/CommonModule.bsl")
+            self.assertEqual(list(segment.selected), [1])
+
+    def test_write_mixed_text_streams_in_mix_order(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            module = root / "Documents" / "Order" / "ObjectModule.bsl"
+            module.parent.mkdir(parents=True)
+            module.write_text(
+                "Процедура А()\nКонецПроцедуры\n\nФункция Б()\n    Возврат 1;\nКонецФункции\n",
+                encoding="utf-8",
+            )
+            segment = self.module.index_bsl_methods(
+                root,
+                source="unit-test-bsl",
+                license_name="internal",
+                origin_ref="local://onec/unit",
+                contour="core",
+            )
+            segment.select([0, 1])
+            output = root / "out" / "release.txt"
+            stats = self.module.write_mixed_text(output, [("onec_bsl", 1), ("onec_bsl", 0)], {"onec_bsl": segment})
+
+            text = output.read_text(encoding="utf-8")
+            self.assertLess(text.index("Функция Б"), text.index("Процедура А"))
+            self.assertEqual(stats, {"invalid_missing_eot": 0, "invalid_missing_headers": 0, "raw_json_objects": 0})
+            self.assertEqual(text.count("<|endoftext|>"), 2)
+
+    def test_indexed_segments_release_their_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bad = Path(tmp_dir) / "bad.jsonl"
+            bad.write_text('{"text": "not canonical"}\n', encoding="utf-8")
+            close = self.module.JsonlLineIndex.close
+            with mock.patch.object(self.module.JsonlLineIndex, "close", autospec=True, side_effect=close) as closed:
+                with self.assertRaises(ValueError):
+                    self.module.index_segment_rows(bad, expected_segment="coding_general", allowed_sources=set())
+            closed.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,12 +1,16 @@
+import hashlib
 import importlib.util
 import json
 import os
+import shutil
 import sys
 import tempfile
 import types
 import unittest
 from pathlib import Path
 
+from scripts import step_cache
+
 
 def load_dag_module():
     module_name = "rwkv_airflow_dag_under_test"
@@ -80,9 +84,13 @@ class AirflowGateLogicTests(unittest.TestCase):
         root = Path(self.tmp.name)
         self.module.RUNS_DIR = root / "runs"
         self.module.AUDIT_DIR = root / "audit"
-        self._saved_env = {name: os.environ.get(name) for name in ["RWKV_AIRFLOW_INPUT_JSONL", "RWKV_AIRFLOW_DATASET_MANIFEST"]}
+        self._saved_env = {
+            name: os.environ.get(name)
+            for name in ["RWKV_AIRFLOW_INPUT_JSONL", "RWKV_AIRFLOW_DATASET_MANIFEST", "RWKV_AIRFLOW_STEP_CACHE_DIR"]
+        }
         os.environ.pop("RWKV_AIRFLOW_INPUT_JSONL", None)
         os.environ.pop("RWKV_AIRFLOW_DATASET_MANIFEST", None)
+        os.environ["RWKV_AIRFLOW_STEP_CACHE_DIR"] = str(root / "step-cache")
 
     def tearDown(self):
         for name, value in self._saved_env.items():
@@ -259,20 +267,16 @@ class AirflowGateLogicTests(unittest.TestCase):
         payload = json.loads(gate_path.read_text(encoding="utf-8"))
         self.assertEqual(payload["verdict"], "FAIL")
 
-    def test_produce_eval_artifacts_runs_runtime_producer_and_validates_outputs(self):
-        run_name = "eval-producer-pass"
+    def test_eval_shard_runs_runtime_producer_for_one_suite_slice(self):
+        run_name = "eval-shard-pass"
         run_dir = self.module.RUNS_DIR / run_name
         run_dir.mkdir(parents=True, exist_ok=True)
         root = Path(self.tmp.name)
-        domain_eval_jsonl = root / "domain_eval.jsonl"
         retention_eval_jsonl = root / "retention_eval.jsonl"
         eval_model_path = root / "eval-model.pth"
         inference_script = root / "stub_infer.py"
-        domain_output = run_dir / "domain_eval.categories.json"
-        retention_output = run_dir / "retention_eval.categories.json"
-        hard_cases_output = run_dir / "hard_cases.json"
+        partial_path = run_dir / "eval_shards" / "retention_eval-1-of-2.json"
 
-        domain_eval_jsonl.write_text('{"text":"User: test\\nAssistant: ok"}\n', encoding="utf-8")
         retention_eval_jsonl.write_text('{"text":"User: test\\nAssistant: ok"}\n', encoding="utf-8")
         eval_model_path.write_text("stub", encoding="utf-8")
         inference_script.write_text("#!/usr/bin/env python3\n", encoding="utf-8")
@@ -282,29 +286,27 @@ class AirflowGateLogicTests(unittest.TestCase):
         def fake_run_shell(context, task_id, command):
             captured["task_id"] = task_id
             captured["command"] = command
-            domain_output.write_text("{}", encoding="utf-8")
-            retention_output.write_text("{}", encoding="utf-8")
-            hard_cases_output.write_text("[]", encoding="utf-8")
+            partial_path.parent.mkdir(parents=True, exist_ok=True)
+            partial_path.write_text("{}", encoding="utf-8")
 
         self.module._run_shell = fake_run_shell
 
-        self.module.produce_eval_artifacts(
+        self.module.evaluate_eval_shard(
+            "retention_eval",
+            1,
+            2,
             **self.context(
                 {
                     "run_name": run_name,
                     "eval_model_path": str(eval_model_path),
-                    "domain_eval_jsonl": str(domain_eval_jsonl),
                     "retention_eval_jsonl": str(retention_eval_jsonl),
                     "eval_inference_script": str(inference_script),
-                    "domain_categories_path": str(domain_output),
-                    "retention_categories_path": str(retention_output),
-                    "hard_cases_path": str(hard_cases_output),
                     "eval_tokens": "48",
                 }
-            )
+            ),
         )
 
-        self.assertEqual(captured["task_id"], "produce_eval_artifacts")
+        self.assertEqual(captured["task_id"], "eval_retention_shard_1")
         self.assertEqual(
             captured["command"],
             [
@@ -316,27 +318,34 @@ class AirflowGateLogicTests(unittest.TestCase):
                 str(run_dir),
                 "--model",
                 str(eval_model_path),
-                "--domain-eval-jsonl",
-                str(domain_eval_jsonl),
-                "--retention-eval-jsonl",
+                "--suite",
+                "retention_eval",
+                "--eval-jsonl",
                 str(retention_eval_jsonl),
-                "--domain-output",
-                str(domain_output),
-                "--retention-output",
-                str(retention_output),
-                "--hard-cases-output",
-                str(hard_cases_output),
+                "--shard-index",
+                "1",
+                "--shard-count",
+                "2",
+                "--partial-output",
+                str(partial_path),
                 "--inference-script",
                 str(inference_script),
                 "--tokens",
                 "48",
+                "--backend",
+                "subprocess",
+                "--model-sha256",
+                hashlib.sha256(b"stub").hexdigest(),
             ],
         )
-        self.assertTrue(domain_output.is_file())
-        self.assertTrue(retention_output.is_file())
-        self.assertTrue(hard_cases_output.is_file())
-
-    def test_produce_eval_artifacts_fails_closed_when_eval_inputs_missing(self):
+        audit_path = self.module.AUDIT_DIR / "manual__test" / "eval_retention_shard_1-attempt-1.json"
+        self.assertEqual(json.loads(audit_path.read_text(encoding="utf-8"))["details"]["shard"], "1/2")
+        (entry,) = step_cache.StepCache(Path(os.environ["RWKV_AIRFLOW_STEP_CACHE_DIR"])).entries("eval_retention_shard_1")
+        hashed = entry["inputs"]["files"]
+        for module in ("inference_backends.py", "eval_scheduler.py", "rwkv_state_cache.py", "weights_cache.py"):
+            self.assertIsNotNone(hashed[module], module)
+
+    def test_eval_shard_fails_closed_when_eval_inputs_missing(self):
         run_name = "eval-producer-missing"
         run_dir = self.module.RUNS_DIR / run_name
         run_dir.mkdir(parents=True, exist_ok=True)
@@ -347,7 +356,10 @@ class AirflowGateLogicTests(unittest.TestCase):
         inference_script.write_text("#!/usr/bin/env python3\n", encoding="utf-8")
 
         with self.assertRaises(self.airflow_fail):
-            self.module.produce_eval_artifacts(
+            self.module.evaluate_eval_shard(
+                "domain_eval",
+                0,
+                1,
                 **self.context(
                     {
                         "run_name": run_name,
@@ -355,9 +367,53 @@ class AirflowGateLogicTests(unittest.TestCase):
                         "retention_eval_jsonl": str(root / "retention_eval.jsonl"),
                         "eval_inference_script": str(inference_script),
                     }
-                )
+                ),
             )
 
+    def test_produce_eval_artifacts_merges_every_shard_partial(self):
+        run_name = "eval-merge"
+        run_dir = self.module.RUNS_DIR / run_name
+        run_dir.mkdir(parents=True, exist_ok=True)
+        self.module.EVAL_SHARDS = 2
+        domain_output = run_dir / "domain_eval.categories.json"
+        retention_output = run_dir / "retention_eval.categories.json"
+        hard_cases_output = run_dir / "hard_cases.json"
+        conf = {
+            "run_name": run_name,
+            "domain_categories_path": str(domain_output),
+            "retention_categories_path": str(retention_output),
+            "hard_cases_path": str(hard_cases_output),
+        }
+        captured: dict[str, object] = {}
+
+        def fake_run_shell(context, task_id, command):
+            captured["command"] = command
+            domain_output.write_text("{}", encoding="utf-8")
+            retention_output.write_text("{}", encoding="utf-8")
+            hard_cases_output.write_text("[]", encoding="utf-8")
+
+        self.module._run_shell = fake_run_shell
+        partials = [
+            run_dir / "eval_shards" / f"{suite}-{index}-of-2.json"
+            for suite in ("domain_eval", "retention_eval")
+            for index in (0, 1)
+        ]
+        (run_dir / "eval_shards").mkdir()
+        for partial in partials[:3]:
+            partial.write_text("{}", encoding="utf-8")
+
+        with self.assertRaises(self.airflow_fail):
+            self.module.produce_eval_artifacts(**self.context(conf))
+        self.assertNotIn("command", captured)
+
+        partials[3].write_text("{}", encoding="utf-8")
+        self.module.produce_eval_artifacts(**self.context(conf))
+
+        command = captured["command"]
+        merge_at = command.index("--merge-partials")
+        self.assertEqual(command[merge_at + 1 : merge_at + 5], [str(path) for path in partials])
+        self.assertEqual(command[command.index("--hard-cases-output") + 1], str(hard_cases_output))
+
     def test_evaluate_adapter_omits_verdict_flags_when_not_configured(self):
         run_name = "eval-command-derived"
         run_dir = self.module.RUNS_DIR / run_name
@@ -414,6 +470,74 @@ class AirflowGateLogicTests(unittest.TestCase):
             ],
         )
 
+    def test_train_adapter_reuses_step_cache_for_identical_inputs(self):
+        root = Path(self.tmp.name)
+        repo_runs = Path(__file__).resolve().parents[1] / "runs"
+        self.module.RUNS_DIR = repo_runs
+        base_model = root / "base-model.pth"
+        base_model.write_text("stub", encoding="utf-8")
+        data_prefix = root / "sample_text_document"
+        Path(f"{data_prefix}.bin").write_bytes(b"\x01\x00")
+        Path(f"{data_prefix}.idx").write_bytes(b"idx")
+        run_names = [f"step-cache-{os.getpid()}-{index}" for index in range(5)]
+        self.addCleanup(lambda: [shutil.rmtree(repo_runs / name, ignore_errors=True) for name in run_names])
+
+        calls = []
+        original_run_shell = self.module._run_shell
+
+        def counting_run_shell(context, task_id, command, extra_env=None):
+            calls.append(command[command.index("--run-name") + 1])
+            original_run_shell(context, task_id, command, extra_env)
+
+        self.module._run_shell = counting_run_shell
+
+        def train(run_name, **extra):
+            conf = {
+                "run_name": run_name,
+                "train_wrapper": str(self.module.SCRIPTS_DIR / "train_smoke_stub.sh"),
+                "load_model": str(base_model),
+                "data_prefix": str(data_prefix),
+                **extra,
+            }
+            self.module.train_adapter(**self.context(conf))
+            audit = self.module.AUDIT_DIR / "manual__test" / "train_adapter-attempt-1.json"
+            return json.loads(audit.read_text(encoding="utf-8"))
+
+        first = train(run_names[0])
+        self.assertEqual(first["status"], "validated")
+        self.assertEqual(first["details"]["step_cache"]["stored"], ["train_smoke_stub.json"])
+
+        hit = train(run_names[1])
+        self.assertEqual(hit["status"], "cache_hit")
+        self.assertEqual(hit["details"]["source_run_name"], run_names[0])
+        self.assertEqual(hit["details"]["fingerprint"], first["details"]["step_cache"]["fingerprint"])
+        restored = json.loads((repo_runs / run_names[1] / "train_smoke_stub.json").read_text(encoding="utf-8"))
+        self.assertEqual(restored["run_name"], run_names[0])
+
+        forced = train(run_names[2], force_rebuild="true")
+        self.assertEqual(forced["status"], "validated")
+        self.assertTrue(forced["details"]["force_rebuild"])
+
+        # A changed input (dataset content) is a different fingerprint.
+        Path(f"{data_prefix}.bin").write_bytes(b"\x02\x00")
+        changed = train(run_names[3])
+        self.assertEqual(changed["status"], "validated")
+        self.assertNotEqual(changed["details"]["step_cache"]["fingerprint"], first["details"]["step_cache"]["fingerprint"])
+
+        # So is a trainer knob train.sh reads from the environment.
+        saved_fused = os.environ.get("FUSED_KERNEL")
+        os.environ["FUSED_KERNEL"] = "0" if saved_fused == "1" else "1"
+        try:
+            fused = train(run_names[4])
+        finally:
+            if saved_fused is None:
+                os.environ.pop("FUSED_KERNEL", None)
+            else:
+                os.environ["FUSED_KERNEL"] = saved_fused
+        self.assertEqual(fused["status"], "validated")
+        self.assertNotEqual(fused["details"]["step_cache"]["fingerprint"], changed["details"]["step_cache"]["fingerprint"])
+        self.assertEqual(calls, [run_names[0], run_names[2], run_names[3], run_names[4]])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import binidx, build_binidx, rwkv_tokenizer
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPT_PATH = ROOT_DIR / "scripts" / "build_binidx.py"
+FIXTURE_VOCAB = Path(__file__).resolve().parent / "fixtures" / "rwkv_vocab_test.txt"
+
+SAMPLES = [
+    ("Напиши функцию", "Процедура Тест()\n    Возврат;\nКонецПроцедуры"),
+    ("def", "def f():\n    return 1"),
+    ("Instruction", "Response"),
+]
+
+
+def v4_text() -> str:
+    return "".join(f"Instruction: {inst}\n\nResponse: {resp}\n<|endoftext|>\n" for inst, resp in SAMPLES)
+
+
+class BuildBinidxTests(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = rwkv_tokenizer.RwkvTokenizer(FIXTURE_VOCAB)
+
+    def test_jsonl_layout_matches_megatron_mmap_index(self):
+        texts = ["Напиши функцию", "", "    return 1\n", "Instruction"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = Path(tmp_dir) / "rows.jsonl"
+            input_path.write_text("".join(json.dumps({"text": text}) + "\n" for text in texts), encoding="utf-8")
+            prefix = Path(tmp_dir) / "out_text_document"
+
+            manifest = build_binidx.build_binidx(input_path, prefix, FIXTURE_VOCAB)
+
+            expected_docs = [self.tokenizer.encode(text) + [0] for text in texts if text]
+            sizes = [len(tokens) for tokens in expected_docs]
+            pointers = [sum(sizes[:index]) * 2 for index in range(len(sizes))]
+            expected_idx = (
+                b"MMIDIDX\x00\x00"
+                + struct.pack("<QBQQ", 1, 8, len(sizes), len(sizes) + 1)
+                + struct.pack(f"<{len(sizes)}i", *sizes)
+                + struct.pack(f"<{len(sizes)}q", *pointers)
+                + struct.pack(f"<{len(sizes) + 1}q", *range(len(sizes) + 1))
+            )
+            expected_bin = b"".join(struct.pack(f"<{len(tokens)}H", *tokens) for tokens in expected_docs)
+            bin_path = Path(f"{prefix}.bin")
+            idx_path = Path(f"{prefix}.idx")
+
+            self.assertEqual(idx_path.read_bytes(), expected_idx)
+            self.assertEqual(bin_path.read_bytes(), expected_bin)
+            self.assertEqual(manifest["documents"], 3)
+            self.assertEqual(manifest["skipped_empty_documents"], 1)
+            self.assertEqual(manifest["bin"]["sha256"], hashlib.sha256(expected_bin).hexdigest())
+            self.assertEqual(manifest["idx"]["sha256"], hashlib.sha256(expected_idx).hexdigest())
+            self.assertEqual(manifest["input"]["sha256"], hashlib.sha256(input_path.read_bytes()).hexdigest())
+            self.assertEqual(manifest["tokenizer"]["fingerprint"], self.tokenizer.fingerprint)
+            on_disk = json.loads(Path(f"{prefix}.manifest.json").read_text(encoding="utf-8"))
+            self.assertEqual(on_disk["bin"], manifest["bin"])
+
+            index = binidx.read_binidx_index(idx_path)
+            self.assertEqual(binidx.read_document(bin_path, index, 1), expected_docs[1])
+
+    def test_text_release_splits_samples_and_worker_pool_is_ordered(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = Path(tmp_dir) / "release.txt"
+            input_path.write_text(v4_text() * 20, encoding="utf-8")
+            serial = build_binidx.build_binidx(input_path, Path(tmp_dir) / "serial", FIXTURE_VOCAB)
+            pooled = build_binidx.build_binidx(
+                input_path, Path(tmp_dir) / "pooled", FIXTURE_VOCAB, workers=2, chunksize=3
+            )
+
+            self.assertEqual(serial["input"]["format"], "text")
+            self.assertEqual(serial["documents"], len(SAMPLES) * 20)
+            self.assertEqual(pooled["bin"]["sha256"], serial["bin"]["sha256"])
+            self.assertEqual(pooled["idx"]["sha256"], serial["idx"]["sha256"])
+            index = binidx.read_binidx_index(Path(tmp_dir) / "serial.idx")
+            first = binidx.read_document(Path(tmp_dir) / "serial.bin", index, 0)
+            self.assertEqual(first[-1], rwkv_tokenizer.EOD_TOKEN_ID)
+            inst, resp = SAMPLES[0]
+            self.assertEqual(self.tokenizer.decode(first[:-1]), f"Instruction: {inst}\n\nResponse: {resp}\n")
+
+    def test_text_split_survives_chunk_boundaries(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = Path(tmp_dir) / "release.txt"
+            input_path.write_text(v4_text() + "tail without marker\n", encoding="utf-8")
+            original = build_binidx.READ_BUFFER_BYTES
+            try:
+                build_binidx.READ_BUFFER_BYTES = 5
+                small = list(build_binidx.iter_text_documents(input_path, hashlib.sha256()))
+            finally:
+                build_binidx.READ_BUFFER_BYTES = original
+            whole = list(build_binidx.iter_text_documents(input_path, hashlib.sha256()))
+
+            self.assertEqual(small, whole)
+            self.assertEqual(len(whole), len(SAMPLES) + 1)
+            self.assertEqual(whole[-1], "tail without marker\n")
+
+    def test_cli_writes_json2binidx_style_prefix(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = Path(tmp_dir) / "rows.jsonl"
+            input_path.write_text(json.dumps({"text": "def f"}) + "\n{\"user_prompt\": \"x\"}\n", encoding="utf-8")
+            cmd = [
+                sys.executable,
+                str(SCRIPT_PATH),
+                "--input",
+                str(input_path),
+                "--output-prefix",
+                str(Path(tmp_dir) / "data"),
+                "--tokenizer-vocab",
+                str(FIXTURE_VOCAB),
+                "--workers",
+                "1",
+            ]
+            result = subprocess.run(cmd, cwd=ROOT_DIR, text=True, capture_output=True, check=False)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn("rows.jsonl:2: row has no string `text` field", result.stderr)
+
+            input_path.write_text(json.dumps({"text": "def f"}) + "\n", encoding="utf-8")
+            result = subprocess.run(cmd, cwd=ROOT_DIR, text=True, capture_output=True, check=False)
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            self.assertIn(f"data_prefix={Path(tmp_dir).resolve() / 'data_text_document'}", result.stdout)
+            self.assertTrue((Path(tmp_dir) / "data_text_document.idx").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
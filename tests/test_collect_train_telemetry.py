@@ -0,0 +1,136 @@
+import json
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from scripts import collect_train_telemetry
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPT_PATH = ROOT_DIR / "scripts" / "collect_train_telemetry.py"
+FIXTURES = ROOT_DIR / "tests" / "fixtures"
+CONSOLE_LOG = FIXTURES / "rwkv_peft_console.log"
+TRAIN_LOG = FIXTURES / "rwkv_peft_train_log.txt"
+MODEL_7B = ROOT_DIR / "configs" / "model" / "rwkv7-7.2b.env"
+SAFE_16GB = ROOT_DIR / "configs" / "profile" / "qlora-nf4-identity-v4-safe-16gb.env"
+
+
+class CollectTrainTelemetryTests(unittest.TestCase):
+    def test_progress_and_epoch_lines_are_parsed(self):
+        step = collect_train_telemetry.parse_progress_line(
+            "Epoch 3:  42%|████▏     | 21/50 [01:03<01:27,  3.00s/it, v_num=0, REAL it/s=0.333, Kt/s=1.37, lr=1e-05, loss=1.870]"
+        )
+        self.assertEqual((step["epoch"], step["step"], step["total_steps"]), (3, 21, 50))
+        self.assertEqual((step["it_s"], step["kt_s"], step["lr"], step["loss"]), (0.333, 1.37, 1e-05, 1.87))
+        self.assertAlmostEqual(step["step_time_s"], 3.003, places=3)
+
+        # Without the RWKV-PEFT postfix the tqdm rate is the fallback.
+        bare = collect_train_telemetry.parse_progress_line("Epoch 0:  10%|█         | 5/50 [00:10<01:30,  2.00it/s]")
+        self.assertEqual(bare["step_time_s"], 0.5)
+        self.assertIsNone(collect_train_telemetry.parse_progress_line("GPU available: True (cuda), used: True"))
+
+        epoch = collect_train_telemetry.parse_train_log_line("7 1.234567 3.4368 0.00002000 2026-10-01 12:00:00.123456 7")
+        self.assertEqual(epoch["epoch"], 7)
+        self.assertEqual(epoch["loss"], 1.234567)
+        self.assertIsNone(collect_train_telemetry.parse_train_log_line("NEW RUN 2026-10-01-12-00-00"))
+
+    def test_recorded_logs_produce_summary_stalls_and_checkpoint_losses(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            run_dir = Path(tmp) / "run"
+            run_dir.mkdir()
+            (run_dir / "rwkv-1.pth").write_bytes(b"")
+            collector = collect_train_telemetry.TelemetryCollector(run_dir, devices=1)
+            data = CONSOLE_LOG.read_bytes()
+            # Chunk boundaries split `\r` refreshes and multi-byte progress bar glyphs.
+            for offset in range(0, len(data), 7):
+                collector.feed_console(data[offset : offset + 7])
+            collector.feed_console(b"", final=True)
+            for line in TRAIN_LOG.read_text(encoding="utf-8").splitlines():
+                collector.feed_train_log_line(line)
+            summary = collector.write_summary()
+            collector.close()
+
+            metrics = [
+                json.loads(line)
+                for line in (run_dir / "telemetry" / "metrics.jsonl").read_text(encoding="utf-8").splitlines()
+            ]
+            written = json.loads((run_dir / "telemetry" / "summary.json").read_text(encoding="utf-8"))
+
+        self.assertEqual(summary["steps"], 16)
+        self.assertEqual(summary["status"], "recorded")
+        self.assertEqual(summary["stalls"]["count"], 1)
+        self.assertEqual(summary["stalls"]["events"][0]["step"], 6)
+        self.assertEqual(summary["kt_s"]["p50"], 2.05)
+        self.assertEqual(summary["tokens_per_sec"], 2050.0)
+        self.assertEqual(summary["loss"]["first"], 2.85)
+        self.assertEqual(summary["loss"]["min"], summary["loss"]["last"])
+        self.assertEqual([epoch["epoch"] for epoch in summary["epochs"]], [0, 1])
+        self.assertEqual(
+            summary["checkpoints"],
+            [{"epoch": 1, "loss": 2.2125, "checkpoint": str(run_dir / "rwkv-1.pth")}],
+        )
+        self.assertIsNone(summary["peak_memory_gb"])
+        self.assertEqual(written, summary)
+        self.assertEqual([record["kind"] for record in metrics].count("step"), 16)
+        self.assertEqual([record["kind"] for record in metrics].count("epoch"), 2)
+
+    def test_wrapped_command_is_echoed_and_records_observation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            run_dir = Path(tmp) / "run"
+            trainer = Path(tmp) / "fake_train.py"
+            trainer.write_text(
+                textwrap.dedent(
+                    f"""\
+                    import shutil
+                    import sys
+
+                    sys.stderr.buffer.write(open({str(CONSOLE_LOG)!r}, "rb").read())
+                    shutil.copy({str(TRAIN_LOG)!r}, {str(run_dir / "train_log.txt")!r})
+                    print("trainer done")
+                    sys.exit(5)
+                    """
+                ),
+                encoding="utf-8",
+            )
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    str(SCRIPT_PATH),
+                    "--run-dir",
+                    str(run_dir),
+                    "--devices",
+                    "2",
+                    "--model-config",
+                    str(MODEL_7B),
+                    "--profile-config",
+                    str(SAFE_16GB),
+                    "--no-gpu-sampling",
+                    "--poll-seconds",
+                    "0.05",
+                    "--",
+                    sys.executable,
+                    str(trainer),
+                ],
+                capture_output=True,
+                check=False,
+            )
+            summary = json.loads((run_dir / "telemetry" / "summary.json").read_text(encoding="utf-8"))
+            observation = json.loads((run_dir / "resource_observation.json").read_text(encoding="utf-8"))
+            console = (run_dir / "telemetry" / "console.log").read_bytes()
+
+        self.assertEqual(result.returncode, 5, result.stderr)
+        self.assertIn(b"trainer done", result.stdout)
+        self.assertIn(b"Epoch 1:", console)
+        self.assertEqual(summary["status"], "failed")
+        self.assertEqual(summary["exit_code"], 5)
+        self.assertEqual(len(summary["epochs"]), 2)
+        self.assertEqual(observation["devices"], 2)
+        self.assertEqual(observation["tokens_per_sec"], 1025.0)
+        self.assertEqual(observation["env"]["QUANT"], "nf4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import build_dataset_v0_report, dataset_lifecycle
+
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def canonical_rows() -> dict[str, list[dict]]:
+    def row(prompt: str, response: str, **metadata: str) -> dict:
+        base = {
+            "source": "unit-test",
+            "license": "internal",
+            "origin_ref": "local://unit",
+            "contour": "core",
+            "segment": "coding_general",
+            "split": "train",
+        }
+        base.update(metadata)
+        return dataset_lifecycle.build_canonical_row(prompt, response, base)
+
+    return {
+        "train": [
+            row("Напиши функцию расчета скидки.", "def discount(order):\n    return 0", category="code_generation"),
+            row(
+                "Рефакторни процедуру проведения.",
+                "Процедура ОбработкаПроведения()\nКонецПроцедуры",
+                segment="onec_bsl",
+                license="unknown",
+                category="refactoring",
+            ),
+        ],
+        "eval": [
+            row(
+                "Составь запрос к регистру остатков.",
+                "ВЫБРАТЬ Остаток ИЗ РегистрНакопления.Остатки",
+                contour="extended",
+                source="unit-eval",
+                split="eval",
+                category="onec_query",
+            ),
+        ],
+    }
+
+
+class ColumnarSummaryTests(unittest.TestCase):
+    def test_column_summaries_match_row_summaries(self):
+        rows_by_split = canonical_rows()
+        columns_by_split = {
+            split_name: dataset_lifecycle.metadata_columns(rows) for split_name, rows in rows_by_split.items()
+        }
+        merged = dataset_lifecycle.merge_metadata_columns(columns_by_split)
+
+        self.assertEqual(
+            dataset_lifecycle.build_source_summary_from_columns(merged),
+            dataset_lifecycle.build_source_summary(rows_by_split),
+        )
+        self.assertEqual(
+            dataset_lifecycle.build_license_summary_from_columns(merged),
+            dataset_lifecycle.build_license_summary(rows_by_split),
+        )
+        self.assertEqual(dataset_lifecycle.build_license_summary(rows_by_split)["missing_license_rows"], 1)
+
+    def test_report_composition_from_columns(self):
+        rows_by_split = canonical_rows()
+        columns_by_split = {
+            split_name: dataset_lifecycle.metadata_columns(rows) for split_name, rows in rows_by_split.items()
+        }
+        summary = build_dataset_v0_report.build_summary({"dataset_name": "unit"}, {}, columns_by_split)
+
+        self.assertEqual(summary["dataset"]["composition_source"], "columnar")
+        self.assertEqual(summary["dataset"]["rows_total"], 3)
+        self.assertEqual(summary["dataset"]["splits"], {"eval": 1, "train": 2})
+        self.assertEqual(summary["dataset"]["segments"], {"coding_general": 2, "onec_bsl": 1})
+        self.assertEqual(summary["dataset"]["split_categories"]["eval"], {"onec_query": 1})
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow not installed")
+class ColumnarReleaseArtifactTests(unittest.TestCase):
+    def test_companion_round_trip_with_projected_reads(self):
+        from scripts import columnar_release
+
+        rows_by_split = canonical_rows()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            splits = {}
+            for split_name, rows in rows_by_split.items():
+                jsonl_path = root / f"{split_name}.jsonl"
+                dataset_lifecycle.write_canonical_rows(jsonl_path, rows)
+                columnar = columnar_release.write_columnar_companion(jsonl_path, rows)
+                self.assertEqual(Path(columnar["path"]), jsonl_path.with_suffix(".parquet"))
+                self.assertEqual(columnar["sha256"], dataset_lifecycle.sha256_file(Path(columnar["path"])))
+                self.assertEqual(columnar["rows_total"], len(rows))
+                splits[split_name] = {"artifact": {"columnar": columnar}}
+
+            columns_by_split = columnar_release.load_release_metadata_columns({"splits": splits})
+            for split_name, rows in rows_by_split.items():
+                self.assertEqual(columns_by_split[split_name], dataset_lifecycle.metadata_columns(rows))
+
+            projected = columnar_release.read_split_columns(root / "train.parquet", ("category",))
+            self.assertEqual(list(projected), ["category"])
+
+            Path(splits["eval"]["artifact"]["columnar"]["path"]).write_bytes(b"tampered")
+            with self.assertRaisesRegex(ValueError, "columnar_artifact_checksum_mismatch"):
+                columnar_release.load_release_metadata_columns({"splits": splits})
+
+    def test_missing_columnar_artifact_is_reported(self):
+        from scripts import columnar_release
+
+        manifest = {"splits": {"train": {"artifact": {"path": "train.jsonl"}}}}
+        with self.assertRaisesRegex(ValueError, r"missing_columnar_artifact\[train\]"):
+            columnar_release.load_release_metadata_columns(manifest)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import estimate_train_resources, profile_env
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPT_PATH = ROOT_DIR / "scripts" / "estimate_train_resources.py"
+MODEL_7B = ROOT_DIR / "configs" / "model" / "rwkv7-7.2b.env"
+SAFE_16GB = ROOT_DIR / "configs" / "profile" / "qlora-nf4-identity-v4-safe-16gb.env"
+LORA_BF16 = ROOT_DIR / "configs" / "profile" / "lora-bf16.env"
+
+
+class EstimateTrainResourcesTests(unittest.TestCase):
+    def test_safe_16gb_profile_fits_and_bf16_lora_does_not(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            safe = estimate_train_resources.estimate(MODEL_7B, SAFE_16GB, gpu_memory_gb=16, runs_dir=Path(tmp))
+            bf16 = estimate_train_resources.estimate(MODEL_7B, LORA_BF16, gpu_memory_gb=16, runs_dir=Path(tmp))
+
+        self.assertEqual(safe["verdict"], "fits")
+        self.assertIsNone(safe["suggested_overrides"])
+        self.assertEqual(safe["calibration"]["observations"], 0)
+        self.assertEqual(bf16["verdict"], "exceeds")
+        self.assertGreater(bf16["memory_breakdown_gb"]["weights"], safe["memory_breakdown_gb"]["weights"] * 2)
+
+    def test_gradient_checkpointing_and_smaller_batches_are_suggested(self):
+        env = profile_env.load_train_env(MODEL_7B, SAFE_16GB)
+        env.update({"MICRO_BSZ": "8", "GRAD_CP": "0", "ACCUMULATE_GRAD_BATCHES": "2"})
+        predicted = estimate_train_resources.predict_resources(env)
+        checkpointed = estimate_train_resources.predict_resources({**env, "GRAD_CP": "1"})
+        self.assertLess(checkpointed["memory_gb"]["activations"], predicted["memory_gb"]["activations"])
+        self.assertLess(checkpointed["tokens_per_sec_per_device"], predicted["tokens_per_sec_per_device"])
+
+        budget = 16 * estimate_train_resources.DEFAULT_HEADROOM
+        self.assertGreater(predicted["peak_memory_gb"], budget)
+        suggestion = estimate_train_resources.suggest_adjustments(env, 1, budget, 1.0, 30.0)
+        self.assertIsNotNone(suggestion)
+        self.assertEqual(suggestion["GRAD_CP"], "1")
+        fitted = estimate_train_resources.predict_resources({**env, **suggestion})
+        self.assertLessEqual(fitted["peak_memory_gb"], budget)
+        if "MICRO_BSZ" in suggestion:
+            # Tokens per optimizer step are preserved by raising gradient accumulation.
+            self.assertEqual(int(suggestion["MICRO_BSZ"]) * int(suggestion["ACCUMULATE_GRAD_BATCHES"]), 16)
+
+    def test_observed_runs_calibrate_memory_and_throughput(self):
+        env = profile_env.load_train_env(MODEL_7B, SAFE_16GB)
+        predicted = estimate_train_resources.predict_resources(env)
+        with tempfile.TemporaryDirectory() as tmp:
+            run_dir = Path(tmp) / "run-a"
+            run_dir.mkdir()
+            observation = {
+                "env": env,
+                "devices": 1,
+                "peak_memory_gb": predicted["peak_memory_gb"] * 1.5,
+                "tokens_per_sec": predicted["tokens_per_sec_per_device"] / 2,
+            }
+            (run_dir / estimate_train_resources.OBSERVATION_NAME).write_text(json.dumps(observation), encoding="utf-8")
+            (Path(tmp) / "run-b").mkdir()
+            (Path(tmp) / "run-b" / estimate_train_resources.OBSERVATION_NAME).write_text("{broken", encoding="utf-8")
+
+            report = estimate_train_resources.estimate(MODEL_7B, SAFE_16GB, runs_dir=Path(tmp))
+
+        self.assertEqual(report["calibration"]["observations"], 1)
+        self.assertEqual(report["calibration"]["memory_scale"], 1.5)
+        self.assertEqual(report["calibration"]["throughput_scale"], 0.5)
+        self.assertAlmostEqual(report["peak_memory_gb"], predicted["peak_memory_gb"] * 1.5, places=1)
+        self.assertNotIn("verdict", report)
+
+    def test_check_mode_refuses_configuration_over_budget(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = [sys.executable, str(SCRIPT_PATH), "--model", str(MODEL_7B), "--runs-dir", tmp, "--check"]
+            refused = subprocess.run(
+                base + ["--profile", str(LORA_BF16), "--gpu-memory-gb", "16"],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            accepted = subprocess.run(
+                base + ["--profile", str(SAFE_16GB), "--gpu-memory-gb", "16", "--set", "MICRO_BSZ=1"],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+
+        self.assertEqual(refused.returncode, 3, refused.stderr)
+        self.assertIn("resource_preflight_refused", refused.stderr)
+        self.assertEqual(json.loads(refused.stdout)["verdict"], "exceeds")
+        self.assertEqual(accepted.returncode, 0, accepted.stderr)
+        self.assertEqual(json.loads(accepted.stdout)["verdict"], "fits")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from scripts import eval_scheduler
+
+
+class EvalSchedulerTests(unittest.TestCase):
+    def test_length_bucket_is_the_next_power_of_two(self):
+        self.assertEqual(eval_scheduler.length_bucket(1), eval_scheduler.MIN_BUCKET_TOKENS)
+        self.assertEqual(eval_scheduler.length_bucket(16), 16)
+        self.assertEqual(eval_scheduler.length_bucket(17), 32)
+        self.assertEqual(eval_scheduler.length_bucket(700), 1024)
+
+    def test_short_rows_never_share_a_batch_with_long_ones(self):
+        lengths = [10, 600, 12, 11, 550]
+        batches = eval_scheduler.plan_batches(lengths, max_batch_tokens=1200)
+
+        self.assertEqual(
+            [(batch["bucket"], batch["indices"]) for batch in batches],
+            [(16, [0, 3, 2]), (1024, [4, 1])],
+        )
+
+    def test_batches_respect_token_and_row_budgets(self):
+        lengths = [10, 11, 12, 13]
+        by_tokens = eval_scheduler.plan_batches(lengths, max_batch_tokens=30)
+        by_rows = eval_scheduler.plan_batches(lengths, max_batch_tokens=1000, max_batch_rows=3)
+        oversized = eval_scheduler.plan_batches([5000], max_batch_tokens=100)
+
+        self.assertEqual([batch["indices"] for batch in by_tokens], [[0, 1], [2, 3]])
+        self.assertEqual([batch["indices"] for batch in by_rows], [[0, 1, 2], [3]])
+        self.assertEqual([batch["indices"] for batch in oversized], [[0]])
+        with self.assertRaisesRegex(ValueError, "scheduler_invalid_budget"):
+            eval_scheduler.plan_batches(lengths, max_batch_tokens=0)
+
+    def test_keys_split_groups_of_the_same_length(self):
+        batches = eval_scheduler.plan_batches([10, 10, 10], max_batch_tokens=1000, keys=[16, 128, 16])
+
+        self.assertEqual(sorted((batch["key"], batch["indices"]) for batch in batches), [(16, [0, 2]), (128, [1])])
+
+    def test_results_come_back_in_row_order_with_bucket_throughput(self):
+        items = ["short-a", "long", "short-b"]
+        lengths = [10, 100, 12]
+        ticks = iter([0.0, 1.0, 1.0, 3.0])
+        calls = []
+
+        def generate_batch(batch_items, key):
+            calls.append(batch_items)
+            return [{"item": item, "tokens_generated": 5} for item in batch_items]
+
+        batches = eval_scheduler.plan_batches(lengths, max_batch_tokens=1000)
+        results, stats = eval_scheduler.run_batches(items, lengths, batches, generate_batch, clock=lambda: next(ticks))
+
+        self.assertEqual(calls, [["short-a", "short-b"], ["long"]])
+        self.assertEqual([result["item"] for result in results], items)
+        self.assertEqual(stats["16"], {
+            "batches": 1, "rows": 2, "prompt_tokens": 22, "generated_tokens": 10, "seconds": 1.0, "tok_s": 32.0,
+        })
+        self.assertEqual(stats["128"]["tok_s"], 52.5)
+
+        merged = eval_scheduler.merge_bucket_stats({}, stats)
+        eval_scheduler.merge_bucket_stats(merged, stats)
+        self.assertEqual(merged["16"]["rows"], 4)
+        self.assertEqual(merged["16"]["tok_s"], 32.0)
+
+    def test_short_batches_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, "scheduler_batch_size_mismatch"):
+            eval_scheduler.run_batches(["a", "b"], [1, 1], [{"key": None, "bucket": 16, "indices": [0, 1]}], lambda items, key: [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from scripts import infer_albatross
+
+
+class ScriptedModel:
+    """Emits a fixed token stream per sample; token ids index into `VOCAB`."""
+
+    VOCAB = {0: "", 1: "Да", 2: ".", 3: "\n", 4: "User", 5: ":", 6: " ещё"}
+
+    def __init__(self, streams):
+        self.streams = streams
+        self.steps = 0
+
+    def sample(self, out):
+        return [[stream[self.steps]] for stream in self.streams]
+
+    def forward(self, next_tokens):
+        self.steps += 1
+        return None
+
+    def decode(self, tokens):
+        return "".join(self.VOCAB[token] for token in tokens)
+
+
+class DecodeWithStopsTests(unittest.TestCase):
+    def run_decode(self, streams, max_tokens, stop_tokens=(), stop_sequences=()):
+        model = ScriptedModel(streams)
+        generated, reasons = infer_albatross.decode_with_stops(
+            None, model.sample, model.forward, model.decode, len(streams), max_tokens, stop_tokens, stop_sequences
+        )
+        return model, generated, reasons
+
+    def test_stops_each_sample_independently_and_ends_when_all_stopped(self):
+        model, generated, reasons = self.run_decode(
+            [[1, 2, 0, 6, 6, 6], [1, 2, 3, 4, 5, 6]],
+            max_tokens=6,
+            stop_tokens=[0],
+            stop_sequences=["\nUser:"],
+        )
+
+        self.assertEqual(generated, [[1, 2], [1, 2, 3, 4, 5]])
+        self.assertEqual(reasons, ["stop_token", "stop_sequence"])
+        self.assertEqual(model.steps, 4)
+        completion = infer_albatross.truncate_at_stop(model.decode(generated[1]), ["\nUser:"])
+        self.assertEqual(completion, "Да.")
+
+    def test_without_stops_decodes_the_full_budget(self):
+        model, generated, reasons = self.run_decode([[1, 2, 0, 6]], max_tokens=4)
+
+        self.assertEqual(generated, [[1, 2, 0, 6]])
+        self.assertEqual(reasons, ["length"])
+        self.assertEqual(model.steps, 4)
+
+    def test_truncate_at_stop_cuts_at_the_earliest_stop(self):
+        text = "ответ<|endoftext|>мусор\nUser: x"
+        self.assertEqual(infer_albatross.truncate_at_stop(text, ["\nUser:", "<|endoftext|>"]), "ответ")
+        self.assertEqual(infer_albatross.truncate_at_stop(text, []), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import inference_backends
+from scripts.inference_backends import GenerationParams, MockBackend
+
+
+class MockBackendTests(unittest.TestCase):
+    def test_answers_from_the_table_cut_at_stops_and_token_budget(self):
+        backend = MockBackend({"q1": "Ок.\nUser: ещё", "q2": "abcdefgh"})
+
+        samples = backend.generate_batch(["q1", "q2", "unknown"], GenerationParams(1, ["\nUser:"]))
+
+        self.assertEqual(
+            samples,
+            [
+                {"completion": "Ок", "tokens_generated": 1},
+                {"completion": "abcd", "tokens_generated": 1},
+                {"completion": "unkn", "tokens_generated": 1},
+            ],
+        )
+
+    def test_fail_rate_is_deterministic_per_prompt(self):
+        prompts = [f"prompt {i}" for i in range(400)]
+        table = {prompt: "ok" for prompt in prompts}
+        first = MockBackend(table, fail_rate=0.25, seed=7).generate_batch(prompts, GenerationParams(64))
+        second = MockBackend(table, fail_rate=0.25, seed=7).generate_batch(prompts, GenerationParams(64))
+        failures = sum(sample["completion"] == inference_backends.MOCK_WRONG_ANSWER for sample in first)
+
+        self.assertEqual(first, second)
+        self.assertTrue(60 < failures < 140, failures)
+        with self.assertRaisesRegex(ValueError, "mock_backend_invalid_fail_rate"):
+            MockBackend(fail_rate=2)
+
+    def test_latency_models_sequential_prefill_and_lockstep_decode(self):
+        slept = []
+        backend = MockBackend(
+            {"aa": "xyz" * 4, "bbbbbbbb": "x"},
+            prefill_ms_per_token=10,
+            decode_ms_per_token=100,
+            sleep=slept.append,
+        )
+
+        backend.generate_batch(["aa", "bbbbbbbb"], GenerationParams(16))
+
+        # (1 + 2) prompt tokens x 10 ms + the longest completion (3 tokens) x 100 ms.
+        self.assertEqual(slept, [0.33])
+        self.assertEqual(backend.calls, 1)
+        self.assertAlmostEqual(backend.simulated_seconds, 0.33)
+
+    def test_fingerprint_tracks_the_answers(self):
+        self.assertEqual(MockBackend({"q": "a"}).fingerprint, MockBackend({"q": "a"}).fingerprint)
+        self.assertNotEqual(MockBackend({"q": "a"}).fingerprint, MockBackend({"q": "b"}).fingerprint)
+        self.assertNotEqual(MockBackend({"q": "a"}).fingerprint, MockBackend({"q": "a"}, fail_rate=0.5).fingerprint)
+
+
+    def test_adapters_change_which_prompts_fail(self):
+        prompts = [f"prompt {i}" for i in range(200)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [Path(tmp_dir) / f"run-{name}" / "rwkv-0.pth" for name in "ab"]
+            for path in paths:
+                path.parent.mkdir()
+                path.write_bytes(path.parent.name.encode("utf-8"))
+            backend = MockBackend(fail_rate=0.5)
+            base = [backend.fails(prompt) for prompt in prompts]
+            activated = backend.use_adapter(paths[0])
+            with_a = [backend.fails(prompt) for prompt in prompts]
+            fingerprint_a = backend.fingerprint
+            backend.use_adapter(paths[1])
+
+        self.assertEqual(activated["name"], "run-a/rwkv-0")
+        self.assertNotEqual(with_a, base)
+        self.assertNotEqual(backend.fingerprint, fingerprint_a)
+        self.assertTrue(backend.fingerprint.startswith(backend.base_fingerprint + "+lora:"))
+
+    def test_subprocess_backend_passes_the_adapter_to_the_script(self):
+        backend = inference_backends.SubprocessBackend(Path("infer.py"), Path("base.pth"))
+        activated = backend.use_adapter(Path("runs/run-a/rwkv-2.pth"), 32)
+
+        self.assertEqual(activated["name"], "run-a/rwkv-2")
+        self.assertEqual(backend.adapter_args, ["--lora-adapter", "runs/run-a/rwkv-2.pth", "--lora-alpha", "32"])
+
+    def test_backend_without_generate_batch_fails_at_construction(self):
+        class Incomplete(inference_backends.InferenceBackend):
+            name = "incomplete"
+
+        with self.assertRaisesRegex(TypeError, "generate_batch"):
+            Incomplete()
+
+class CompletionSampleTests(unittest.TestCase):
+    def test_rejects_samples_without_completion(self):
+        with self.assertRaisesRegex(ValueError, "inference_output_missing_completion"):
+            inference_backends.completion_sample({"text": "x"}, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import importlib.util
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import inspect_binidx, profile_env
+from scripts.binidx import BinidxWriter
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPT_PATH = ROOT_DIR / "scripts" / "inspect_binidx.py"
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+DOC_SIZES = [3, 20, 20, 40, 100, 700]
+
+
+def write_dataset(prefix: Path, sizes=DOC_SIZES) -> None:
+    writer = BinidxWriter(prefix)
+    for size in sizes:
+        writer.add_document([7] * (size - 1) + [0])
+    writer.finalize()
+
+
+def write_envs(root: Path) -> tuple[Path, Path]:
+    model = root / "model.env"
+    model.write_text("MODEL_TAG=test\nCTX_LEN=128\nN_LAYER=2\n", encoding="utf-8")
+    profile = root / "profile.env"
+    profile.write_text(
+        "PEFT_CONFIG='{\"r\":16,\"lora_alpha\":32}'\nMICRO_BSZ=2\nEPOCH_STEPS=3  # steps\nEPOCH_COUNT=2\n",
+        encoding="utf-8",
+    )
+    return model, profile
+
+
+class InspectBinidxTests(unittest.TestCase):
+    def inspect(self, prefix: Path, root: Path, use_numpy: bool) -> dict:
+        model, profile = write_envs(root)
+        return inspect_binidx.inspect_binidx(prefix, [profile], model, devices=1, use_numpy=use_numpy)
+
+    def check_report(self, report: dict) -> None:
+        self.assertEqual(report["status"], "PASS", msg=report["issues"])
+        self.assertEqual(report["documents"], len(DOC_SIZES))
+        self.assertEqual(report["tokens_total"], sum(DOC_SIZES))
+        self.assertEqual(report["eod_terminated_documents"], len(DOC_SIZES))
+        self.assertEqual(report["length"]["max"], 700)
+        self.assertEqual(report["length"]["p50"], 20)
+        self.assertEqual(sum(bucket["documents"] for bucket in report["histogram"]), len(DOC_SIZES))
+        self.assertEqual(report["histogram"][0], {"le": 16, "documents": 1})
+        coverage = report["profiles"][0]
+        self.assertEqual(coverage["tokens_per_epoch"], 3 * 2 * 128)
+        self.assertEqual(coverage["data_passes"], round(2 * 768 / sum(DOC_SIZES), 4))
+        self.assertEqual(coverage["documents_over_ctx_len"], 1)
+
+    def test_stdlib_engine_reports_stats_and_coverage(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = Path(tmp_dir) / "data_text_document"
+            write_dataset(prefix)
+            report = self.inspect(prefix, Path(tmp_dir), use_numpy=False)
+            self.assertEqual(report["engine"], "stdlib")
+            self.check_report(report)
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+    def test_numpy_engine_matches_stdlib(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = Path(tmp_dir) / "data_text_document"
+            write_dataset(prefix)
+            fast = self.inspect(prefix, Path(tmp_dir), use_numpy=True)
+            slow = self.inspect(prefix, Path(tmp_dir), use_numpy=False)
+            self.assertEqual(fast["engine"], "numpy")
+            self.check_report(fast)
+            fast.pop("engine")
+            slow.pop("engine")
+            self.assertEqual(fast, slow)
+
+    def test_truncated_bin_and_missing_eod_fail(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = Path(tmp_dir) / "data_text_document"
+            write_dataset(prefix)
+            bin_path = Path(f"{prefix}.bin")
+            payload = bin_path.read_bytes()
+            bin_path.write_bytes(payload[:-2])
+            report = self.inspect(prefix, Path(tmp_dir), use_numpy=False)
+            self.assertEqual((report["status"], report["issues"]), ("FAIL", ["binidx_bin_size_mismatch"]))
+
+            bin_path.write_bytes(payload[:-2] + b"\x05\x00")
+            report = self.inspect(prefix, Path(tmp_dir), use_numpy=False)
+            self.assertEqual(report["issues"], ["binidx_missing_eod"])
+            self.assertEqual(report["eod_terminated_documents"], len(DOC_SIZES) - 1)
+
+    def test_cli_exit_code_and_index_corruption(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = Path(tmp_dir) / "data_text_document"
+            write_dataset(prefix)
+            model, profile = write_envs(Path(tmp_dir))
+            cmd = [
+                sys.executable,
+                str(SCRIPT_PATH),
+                "--data-prefix",
+                str(prefix),
+                "--profile",
+                str(profile),
+                "--model-config",
+                str(model),
+            ]
+            result = subprocess.run(cmd, cwd=ROOT_DIR, text=True, capture_output=True, check=False)
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            self.assertIn('"status": "PASS"', result.stdout)
+
+            idx_path = Path(f"{prefix}.idx")
+            idx_path.write_bytes(idx_path.read_bytes()[:-8])
+            result = subprocess.run(cmd, cwd=ROOT_DIR, text=True, capture_output=True, check=False)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn("binidx_index_size_mismatch", result.stderr)
+
+    def test_profile_env_matches_repo_configs(self):
+        env = profile_env.load_train_env(
+            ROOT_DIR / "configs" / "model" / "rwkv7-0.4b.env",
+            ROOT_DIR / "configs" / "profile" / "qlora-nf4-identity-v4-safe-16gb.env",
+        )
+        self.assertEqual(env["CTX_LEN"], "1024")
+        self.assertEqual(env["EPOCH_STEPS"], "96")
+        self.assertEqual(env["PEFT_CONFIG"], '{"r":16,"lora_alpha":32,"lora_dropout":0.05}')
+        model, profile = profile_env.wrapper_configs(ROOT_DIR / "scripts" / "train_qlora_nf4_identity_safe.sh")
+        self.assertEqual((model.name, profile.name), ("rwkv7-7.2b.env", "qlora-nf4-identity-safe.env"))
+
+
+if __name__ == "__main__":
+    unittest.main()
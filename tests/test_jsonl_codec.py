@@ -0,0 +1,61 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import jsonl_codec
+
+
+class JsonlCodecTests(unittest.TestCase):
+    def tearDown(self) -> None:
+        jsonl_codec.configure_codec()
+
+    def test_encode_matches_stdlib_dumps_byte_for_byte(self):
+        payloads = [
+            {"text": "User: кто ты?\nAssistant: Я RWKV-7.", "metadata": {"split": "train"}},
+            {"value": 1.0, "big": 2**70, "nan": float("nan"), "escape": "tab\t\"quote\"   \x00"},
+            ["список", None, True, 0.1 + 0.2],
+        ]
+        for payload in payloads:
+            self.assertEqual(jsonl_codec.encode_json(payload), json.dumps(payload, ensure_ascii=False))
+
+    def test_every_available_codec_decodes_like_stdlib(self):
+        lines = [
+            b'{"text": "\\u041f\\u0440\\u0438\\u0432\\u0435\\u0442", "n": 1.5}',
+            '{"user_prompt": "Объясни", "assistant_response": "ok"}'.encode("utf-8"),
+            b'{"big": 123456789012345678901234567890, "nan": NaN}',
+        ]
+        for codec in jsonl_codec.available_codecs():
+            jsonl_codec.configure_codec(codec)
+            for line in lines:
+                decoded = jsonl_codec.decode_json(line)
+                expected = json.loads(line)
+                self.assertEqual(json.dumps(decoded, sort_keys=True), json.dumps(expected, sort_keys=True), msg=codec)
+
+    def test_invalid_json_raises_stdlib_decode_error_for_every_codec(self):
+        for codec in jsonl_codec.available_codecs():
+            jsonl_codec.configure_codec(codec)
+            with self.assertRaises(json.JSONDecodeError):
+                jsonl_codec.decode_json(b'{"text": ')
+
+    def test_unknown_codec_is_rejected(self):
+        with self.assertRaises(ValueError):
+            jsonl_codec.configure_codec("yaml")
+
+    def test_write_then_iter_round_trip_skips_blank_lines(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "nested" / "rows.jsonl"
+            rows = [{"text": f"строка {index}"} for index in range(3)]
+            jsonl_codec.write_jsonl(path, rows)
+            expected = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            self.assertEqual(path.read_text(encoding="utf-8"), expected)
+
+            with path.open("a", encoding="utf-8") as handle:
+                handle.write("\n   \n" + json.dumps({"text": "tail"}) + "\n")
+            parsed = list(jsonl_codec.iter_jsonl(path))
+            self.assertEqual([line_number for line_number, _ in parsed], [1, 2, 3, 6])
+            self.assertEqual(parsed[-1][1], {"text": "tail"})
+
+
+if __name__ == "__main__":
+    unittest.main()
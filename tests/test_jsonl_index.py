@@ -0,0 +1,79 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import jsonl_codec
+from scripts.jsonl_index import JsonlLineIndex, sidecar_path_for
+
+
+class JsonlLineIndexTests(unittest.TestCase):
+    def write_rows(self, path: Path, count: int) -> list[dict]:
+        rows = [{"text": f"строка {index}", "pad": "x" * (index % 7)} for index in range(count)]
+        with path.open("w", encoding="utf-8", newline="") as handle:
+            for index, row in enumerate(rows):
+                if index % 5 == 0:
+                    handle.write("\n  \n")
+                line_end = "\r\n" if index % 3 == 0 else "\n"
+                handle.write("  " + json.dumps(row, ensure_ascii=False) + line_end)
+        return rows
+
+    def test_index_matches_sequential_reader(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rows.jsonl"
+            self.write_rows(path, 40)
+            expected = list(jsonl_codec.iter_jsonl_lines(path))
+
+            with JsonlLineIndex.open(path) as index:
+                self.assertEqual(len(index), len(expected))
+                self.assertEqual(list(index.iter_lines(range(len(index)))), expected)
+
+    def test_sidecar_is_reused_and_invalidated_on_change(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rows.jsonl"
+            self.write_rows(path, 10)
+
+            first = JsonlLineIndex.open(path)
+            self.assertFalse(first.from_sidecar)
+            self.assertTrue(sidecar_path_for(path).is_file())
+            cached = JsonlLineIndex.open(path)
+            self.assertTrue(cached.from_sidecar)
+            self.assertEqual(cached.sha256, first.sha256)
+
+            stat = path.stat()
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+            touched = JsonlLineIndex.open(path)
+            self.assertTrue(touched.from_sidecar)
+
+            self.write_rows(path, 11)
+            rebuilt = JsonlLineIndex.open(path)
+            self.assertFalse(rebuilt.from_sidecar)
+            self.assertEqual(len(rebuilt), 11)
+
+    def test_sample_matches_list_sampling_and_reads_only_selected_bytes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rows.jsonl"
+            rows = self.write_rows(path, 500)
+
+            with JsonlLineIndex.open(path) as index:
+                ordinals = index.sample(random.Random(42), 100)
+                sampled = [row for _, row in index.iter_rows(ordinals)]
+                read_share = index.bytes_materialized / path.stat().st_size
+
+            self.assertEqual(sampled, random.Random(42).sample(rows, 100))
+            self.assertLess(read_share, 0.3)
+
+    def test_stale_index_refuses_to_read(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rows.jsonl"
+            self.write_rows(path, 5)
+            index = JsonlLineIndex.open(path, use_sidecar=False)
+            self.write_rows(path, 6)
+            with self.assertRaisesRegex(ValueError, "jsonl_index_stale"):
+                index.read_line(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import importlib.util
+import json
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import lora_adapters, weights_cache
+
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+def to_model(base):
+    """Albatross-like `model.z`: transposed projections, flattened r_k, fp16, a derived emb."""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    weights = {key: value.astype(np.float16) for key, value in base.items()}
+    weights["blocks.0.att.receptance.weight"] = np.ascontiguousarray(base["blocks.0.att.receptance.weight"].T).astype(np.float16)
+    weights["blocks.0.att.r_k"] = base["blocks.0.att.r_k"].reshape(-1).astype(np.float16)
+    weights["emb.weight"] = (base["emb.weight"] * 2).astype(np.float16)
+    return weights
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+class AdapterSwitcherTests(unittest.TestCase):
+    def setUp(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        rng = np.random.default_rng(1)
+        self.base = {
+            "emb.weight": rng.standard_normal((6, 4)).astype(np.float32),
+            "blocks.0.att.receptance.weight": rng.standard_normal((4, 4)).astype(np.float32),
+            "blocks.0.ln1.weight": np.ones(4, dtype=np.float32),
+            "blocks.0.att.r_k": rng.standard_normal((2, 2)).astype(np.float32),
+        }
+        self.weights = to_model(self.base)
+        self.original = {key: value.copy() for key, value in self.weights.items()}
+        self.cleared = 0
+
+        def adapter(name, seed, **extra):
+            rng = np.random.default_rng(seed)
+            tensors = {
+                "blocks.0.att.receptance.lora_A": rng.standard_normal((2, 4)).astype(np.float32),
+                "blocks.0.att.receptance.lora_B": rng.standard_normal((4, 2)).astype(np.float32),
+                **extra,
+            }
+            return lora_adapters.LoraAdapter(name, f"{name}.pth", name, 4.0, 2, tensors)
+
+        self.a = adapter("a", 2, **{"blocks.0.ln1.weight": np.full(4, 3.0, dtype=np.float32)})
+        self.b = adapter("b", 3, **{"blocks.0.att.r_k": np.ones((2, 2), dtype=np.float32)})
+        self.switcher = lora_adapters.AdapterSwitcher(self.weights, self.base, on_change=self.count_clear)
+        self.switcher.add(self.a)
+        self.switcher.add(self.b)
+
+    def count_clear(self):
+        self.cleared += 1
+
+    def assert_weights(self, expected):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        for key, value in expected.items():
+            np.testing.assert_array_equal(self.weights[key], value, err_msg=key)
+
+    def test_activate_matches_the_merged_checkpoint(self):
+        stats = self.switcher.activate("a")
+
+        self.assertEqual((stats["adapter"], stats["keys"]), ("a", 2))
+        self.assert_weights(to_model(weights_cache.merge_lora(self.base, self.a.tensors, 4.0)))
+        self.assertEqual(self.cleared, 1)
+        self.assertEqual(self.switcher.activate("a")["keys"], 0)
+        self.assertEqual(self.cleared, 1)
+
+    def test_swaps_restore_the_base_exactly(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        self.switcher.activate("a")
+        first = {key: value.copy() for key, value in self.weights.items()}
+        self.switcher.activate("b")
+        self.assert_weights(to_model(weights_cache.merge_lora(self.base, self.b.tensors, 4.0)))
+        # ln1 was only touched by "a" and is back to the base value.
+        np.testing.assert_array_equal(self.weights["blocks.0.ln1.weight"], self.original["blocks.0.ln1.weight"])
+
+        self.switcher.activate("a")
+        self.assert_weights(first)
+        self.switcher.activate(None)
+        self.assert_weights(self.original)
+        self.assertEqual((self.switcher.swaps, self.cleared), (4, 4))
+
+    def test_keys_the_model_derives_are_refused_before_any_write(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        derived = lora_adapters.LoraAdapter("emb", "emb.pth", "e", 4.0, 2, {**self.a.tensors, "emb.weight": np.zeros((6, 4))})
+        with self.assertRaisesRegex(ValueError, "lora_hot_swap_unsupported_key: .*emb.weight"):
+            self.switcher.add(derived)
+        with self.assertRaisesRegex(ValueError, "lora_adapter_not_loaded"):
+            self.switcher.activate("emb")
+        self.assert_weights(self.original)
+
+    def test_load_adapter_reads_alpha_and_rank_from_the_run(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run_dir = Path(tmp_dir) / "run-a"
+            run_dir.mkdir()
+            path = run_dir / "rwkv-1.pth"
+            path.write_bytes(pickle.dumps(self.a.tensors))
+            (run_dir / "resource_observation.json").write_text(
+                json.dumps({"env": {"PEFT_CONFIG": '{"r":2,"lora_alpha":16}'}}), encoding="utf-8"
+            )
+
+            adapter = lora_adapters.load_adapter(path, load_checkpoint=lambda p: pickle.loads(p.read_bytes()))
+
+        self.assertEqual(adapter.name, "run-a/rwkv-1")
+        self.assertEqual((adapter.lora_alpha, adapter.lora_r), (16.0, 2))
+        self.assertEqual(len(adapter.sha256), 64)
+
+
+if __name__ == "__main__":
+    unittest.main()
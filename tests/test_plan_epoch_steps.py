@@ -0,0 +1,102 @@
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import plan_epoch_steps, profile_env
+from scripts.binidx import BinidxWriter
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPT_PATH = ROOT_DIR / "scripts" / "plan_epoch_steps.py"
+MODEL_7B = ROOT_DIR / "configs" / "model" / "rwkv7-7.2b.env"
+SAFE_16GB = ROOT_DIR / "configs" / "profile" / "qlora-nf4-identity-v4-safe-16gb.env"
+
+
+def write_dataset(prefix: Path, documents: int, size: int) -> None:
+    writer = BinidxWriter(prefix)
+    for _ in range(documents):
+        writer.add_document([5] * (size - 1) + [0])
+    writer.finalize()
+
+
+class PlanEpochStepsTests(unittest.TestCase):
+    def test_epoch_steps_cover_target_passes_in_whole_optimizer_steps(self):
+        env = {"CTX_LEN": "1024", "MICRO_BSZ": "1", "EPOCH_COUNT": "2", "ACCUMULATE_GRAD_BATCHES": "16", "EPOCH_STEPS": "96"}
+        plan = plan_epoch_steps.plan_epoch_steps(1_000_000, env, target_passes=1.0)
+
+        # ceil(1e6 / (2 * 1024)) = 489 -> next multiple of 16
+        self.assertEqual(plan["resolved"], {"EPOCH_STEPS": "496", "ACCUMULATE_GRAD_BATCHES": "16"})
+        self.assertEqual(plan["optimizer_steps_per_epoch"], 31)
+        self.assertGreaterEqual(plan["data_passes"], 1.0)
+        self.assertEqual(plan["previous"]["data_passes"], round(96 * 2 * 1024 / 1_000_000, 4))
+
+        retuned = plan_epoch_steps.plan_epoch_steps(1_000_000, env, devices=2, tokens_per_optimizer_step=8192)
+        self.assertEqual(retuned["resolved"]["ACCUMULATE_GRAD_BATCHES"], "4")
+        self.assertEqual(retuned["tokens_per_optimizer_step"], 8192)
+
+    def test_vram_checks_reject_unsafe_16gb_settings(self):
+        env = profile_env.load_train_env(MODEL_7B, SAFE_16GB)
+        self.assertEqual(plan_epoch_steps.check_vram_profile(env, 16), [])
+
+        unsafe = {**env, "MICRO_BSZ": "2", "GRAD_CP": "0", "QUANT": "none"}
+        violations = plan_epoch_steps.check_vram_profile(unsafe, 16)
+        self.assertEqual(len(violations), 3)
+        self.assertIn("MICRO_BSZ=2 exceeds 1", violations[0])
+        self.assertIn("QUANT=none", violations[-1])
+
+    def test_resolved_profile_is_sourceable_by_train_sh(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = Path(tmp_dir) / "data_text_document"
+            write_dataset(prefix, documents=300, size=500)
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    str(SCRIPT_PATH),
+                    "--data-prefix",
+                    str(prefix),
+                    "--model-config",
+                    str(MODEL_7B),
+                    "--profile",
+                    str(SAFE_16GB),
+                    "--run-name",
+                    "plan-test",
+                    "--runs-dir",
+                    tmp_dir,
+                    "--target-passes",
+                    "2",
+                ],
+                cwd=ROOT_DIR,
+                text=True,
+                capture_output=True,
+                check=False,
+            )
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            resolved = Path(tmp_dir) / "plan-test" / "resolved_profile.env"
+            self.assertIn(f"resolved_profile={resolved}", result.stdout)
+
+            sourced = subprocess.run(
+                ["bash", "-c", 'set -eu; source "$1"; echo "$EPOCH_STEPS|$ACCUMULATE_GRAD_BATCHES|$PEFT_CONFIG"', "_", str(resolved)],
+                text=True,
+                capture_output=True,
+                check=True,
+            )
+            # 2 * 150000 / 1024 = 293 -> next multiple of 16
+            self.assertEqual(sourced.stdout.strip(), '304|16|{"r":16,"lora_alpha":32,"lora_dropout":0.05}')
+            self.assertEqual(profile_env.load_env_file(resolved)["QUANT"], "nf4")
+            self.assertTrue((Path(tmp_dir) / "plan-test" / "epoch_plan.json").is_file())
+
+    def test_vram_violation_blocks_resolution(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = Path(tmp_dir) / "data_text_document"
+            write_dataset(prefix, documents=10, size=100)
+            profile = Path(tmp_dir) / "custom-16gb.env"
+            profile.write_text(SAFE_16GB.read_text(encoding="utf-8").replace("MICRO_BSZ=1", "MICRO_BSZ=4"), encoding="utf-8")
+            with self.assertRaisesRegex(ValueError, "epoch_plan_vram_constraints_failed: MICRO_BSZ=4"):
+                plan_epoch_steps.resolve_profile(prefix, MODEL_7B, profile, Path(tmp_dir) / "run")
+            self.assertFalse((Path(tmp_dir) / "run" / "resolved_profile.env").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import plan_sequence_packing
+from scripts.binidx import BinidxWriter, read_binidx_index, read_document
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPT_PATH = ROOT_DIR / "scripts" / "plan_sequence_packing.py"
+
+
+def write_dataset(prefix: Path, sizes: list[int]) -> None:
+    writer = BinidxWriter(prefix)
+    for doc_id, size in enumerate(sizes):
+        writer.add_document([doc_id + 1] * (size - 1) + [0])
+    writer.finalize()
+
+
+class SequencePackingTests(unittest.TestCase):
+    def test_best_fit_decreasing_is_complete_bounded_and_seeded(self):
+        sizes = [6, 4, 5, 5, 3, 7, 12]
+        bins = plan_sequence_packing.best_fit_decreasing(sizes, capacity=10, seed=1)
+
+        self.assertEqual(sorted(doc for packed in bins for doc in packed), list(range(len(sizes))))
+        self.assertEqual(len(bins), 4)  # [12], [7, 3], [6, 4], [5, 5]
+        for packed in bins:
+            self.assertTrue(sum(sizes[doc] for doc in packed) <= 10 or len(packed) == 1)
+        self.assertEqual(bins, plan_sequence_packing.best_fit_decreasing(sizes, capacity=10, seed=1))
+
+    def test_short_rows_pack_with_little_padding(self):
+        rng = random.Random(3)
+        sizes = [rng.randint(40, 260) for _ in range(2000)]
+        bins = plan_sequence_packing.best_fit_decreasing(sizes, capacity=1024)
+        report = plan_sequence_packing.packing_report(sizes, bins, 1024)
+
+        self.assertGreaterEqual(report["documents_per_sequence"], 5)
+        self.assertGreater(report["efficiency"]["packed"], 0.97)
+        self.assertLess(report["efficiency"]["unpacked"], 0.2)
+        self.assertLess(report["padding_tokens"]["packed"], report["padding_tokens"]["unpacked"])
+        self.assertNotIn("steps_per_data_pass", report)
+
+    def test_cli_writes_packed_binidx_with_every_document(self):
+        sizes = [5, 9, 3, 7, 2, 8, 30]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = Path(tmp_dir) / "rows_text_document"
+            packed_prefix = Path(tmp_dir) / "packed_text_document"
+            write_dataset(prefix, sizes)
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    str(SCRIPT_PATH),
+                    "--data-prefix",
+                    str(prefix),
+                    "--ctx-len",
+                    "16",
+                    "--output-prefix",
+                    str(packed_prefix),
+                ],
+                cwd=ROOT_DIR,
+                text=True,
+                capture_output=True,
+                check=False,
+            )
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            report = json.loads(result.stdout)
+
+            index = read_binidx_index(Path(f"{packed_prefix}.idx"))
+            self.assertEqual(report["sequences"], len(index.sizes))
+            self.assertEqual(report["oversize_documents"], 1)
+            self.assertEqual(sum(index.sizes), sum(sizes))
+            documents = []
+            for sequence in range(len(index.sizes)):
+                tokens = read_document(Path(f"{packed_prefix}.bin"), index, sequence)
+                self.assertEqual(tokens[-1], 0)
+                self.assertTrue(len(tokens) <= 16 or len(set(tokens[:-1])) == 1)
+                documents.extend(token for token in tokens if token)
+            self.assertEqual(sorted(set(documents)), list(range(1, len(sizes) + 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,6 +7,8 @@ import textwrap
 import unittest
 from pathlib import Path
 
+from scripts import produce_eval_artifacts
+
 
 class ProduceEvalArtifactsTests(unittest.TestCase):
     def setUp(self) -> None:
@@ -22,6 +24,30 @@ class ProduceEvalArtifactsTests(unittest.TestCase):
                 }
                 handle.write(json.dumps(payload, ensure_ascii=False) + "\n")
 
+    def write_eval_suites(self, domain_eval: Path, retention_eval: Path) -> None:
+        self.write_chat_jsonl(
+            domain_eval,
+            [
+                (
+                    "дай практический алгоритм: прочитать регистр накопления в 1С.",
+                    "В задаче 'прочитать регистр накопления' зафиксируй предусловия, затем используй типизированные проверки до обращения к полям. Для 'регистр накопления' используй минимальный набор измерений в отборе.",
+                ),
+                (
+                    "Рефакторни длинную процедуру проведения документа.",
+                    "Раздели побочные эффекты и расчёт по отдельным функциям.",
+                ),
+            ],
+        )
+        self.write_chat_jsonl(
+            retention_eval,
+            [
+                (
+                    "как лучше разделить тесты для CLI-утилиты?",
+                    "Когда нужно 'разделить тесты для CLI-утилиты', начни с чёткого критерия успеха, затем отдели быстрые unit от медленных интеграционных. Для случая 'для CLI-утилиты' проверь коды выхода и текст ошибок.",
+                ),
+            ],
+        )
+
     def write_stub_inference_script(self, path: Path) -> None:
         path.write_text(
             textwrap.dedent(
@@ -33,29 +59,28 @@ class ProduceEvalArtifactsTests(unittest.TestCase):
 
                 parser = argparse.ArgumentParser()
                 parser.add_argument("--model", required=True)
-                parser.add_argument("--prompt", required=True)
+                parser.add_argument("--prompt", default="")
+                parser.add_argument("--prompts-jsonl", default="")
+                parser.add_argument("--max-batch-tokens", type=int, default=0)
                 parser.add_argument("--output-json", required=True)
                 parser.add_argument("--tokens", type=int, default=0)
+                parser.add_argument("--stop", action="append", default=[])
                 args = parser.parse_args()
 
-                prompt = args.prompt
-                if "Рефакторни длинную процедуру" in prompt:
-                    completion = "Неверный ответ"
-                elif "как лучше разделить тесты" in prompt:
-                    completion = "Когда нужно 'разделить тесты для CLI-утилиты', начни с чёткого критерия успеха, затем отдели быстрые unit от медленных интеграционных. Для случая 'для CLI-утилиты' проверь коды выхода и текст ошибок."
-                else:
-                    completion = "В задаче 'прочитать регистр накопления' зафиксируй предусловия, затем используй типизированные проверки до обращения к полям. Для 'регистр накопления' используй минимальный набор измерений в отборе."
+                def complete(prompt):
+                    if "Рефакторни длинную процедуру" in prompt:
+                        completion = "Неверный ответ"
+                    elif "как лучше разделить тесты" in prompt:
+                        completion = "Когда нужно 'разделить тесты для CLI-утилиты', начни с чёткого критерия успеха, затем отдели быстрые unit от медленных интеграционных. Для случая 'для CLI-утилиты' проверь коды выхода и текст ошибок."
+                    else:
+                        completion = "В задаче 'прочитать регистр накопления' зафиксируй предусловия, затем используй типизированные проверки до обращения к полям. Для 'регистр накопления' используй минимальный набор измерений в отборе."
+                    return {"prompt": prompt, "samples": [{"index": 0, "completion": completion, "tokens_generated": args.tokens}]}
 
-                payload = {
-                    "model": args.model,
-                    "prompt": prompt,
-                    "samples": [
-                        {
-                            "index": 0,
-                            "completion": completion,
-                        }
-                    ],
-                }
+                if args.prompts_jsonl:
+                    lines = Path(args.prompts_jsonl).read_text(encoding="utf-8").splitlines()
+                    payload = {"model": args.model, "results": [complete(json.loads(line)["prompt"]) for line in lines]}
+                else:
+                    payload = {"model": args.model, **complete(args.prompt)}
                 Path(args.output_json).write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\\n", encoding="utf-8")
                 """
             ),
@@ -79,28 +104,7 @@ class ProduceEvalArtifactsTests(unittest.TestCase):
             hard_cases_output = root / "hard_cases.json"
             inference_script = root / "stub_infer.py"
 
-            self.write_chat_jsonl(
-                domain_eval,
-                [
-                    (
-                        "дай практический алгоритм: прочитать регистр накопления в 1С.",
-                        "В задаче 'прочитать регистр накопления' зафиксируй предусловия, затем используй типизированные проверки до обращения к полям. Для 'регистр накопления' используй минимальный набор измерений в отборе.",
-                    ),
-                    (
-                        "Рефакторни длинную процедуру проведения документа.",
-                        "Раздели побочные эффекты и расчёт по отдельным функциям.",
-                    ),
-                ],
-            )
-            self.write_chat_jsonl(
-                retention_eval,
-                [
-                    (
-                        "как лучше разделить тесты для CLI-утилиты?",
-                        "Когда нужно 'разделить тесты для CLI-утилиты', начни с чёткого критерия успеха, затем отдели быстрые unit от медленных интеграционных. Для случая 'для CLI-утилиты' проверь коды выхода и текст ошибок.",
-                    ),
-                ],
-            )
+            self.write_eval_suites(domain_eval, retention_eval)
             self.write_stub_inference_script(inference_script)
 
             result = subprocess.run(
@@ -153,5 +157,385 @@ class ProduceEvalArtifactsTests(unittest.TestCase):
                 run_dir.rmdir()
 
 
+    def run_producer(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["python", str(self.script), *args],
+            cwd=self.repo_root,
+            text=True,
+            capture_output=True,
+            check=False,
+            env={**os.environ, "USE_WORKSPACE_ENV": "0"},
+        )
+
+    def test_suite_shards_merge_into_the_same_artifacts_as_a_single_run(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            run_dir = root / "run"
+            run_dir.mkdir()
+            model_path = root / "rwkv-0.pth"
+            model_path.write_text("stub", encoding="utf-8")
+            domain_eval = root / "domain_eval.jsonl"
+            retention_eval = root / "retention_eval.jsonl"
+            inference_script = root / "stub_infer.py"
+            self.write_eval_suites(domain_eval, retention_eval)
+            self.write_stub_inference_script(inference_script)
+            common = ["--run-name", "unit-shards", "--run-dir", str(run_dir), "--model", str(model_path)]
+            common += ["--inference-script", str(inference_script), "--tokens", "32"]
+
+            single = self.run_producer(
+                *common,
+                "--domain-eval-jsonl",
+                str(domain_eval),
+                "--retention-eval-jsonl",
+                str(retention_eval),
+                "--domain-output",
+                str(root / "single" / "domain.json"),
+                "--retention-output",
+                str(root / "single" / "retention.json"),
+                "--hard-cases-output",
+                str(root / "single" / "hard_cases.json"),
+            )
+            self.assertEqual(single.returncode, 0, msg=single.stderr)
+
+            partials = []
+            for suite, path, count in (("domain_eval", domain_eval, 2), ("retention_eval", retention_eval, 1)):
+                for index in range(count):
+                    partial = root / "shards" / f"{suite}-{index}.json"
+                    result = self.run_producer(
+                        *common,
+                        "--suite",
+                        suite,
+                        "--eval-jsonl",
+                        str(path),
+                        "--shard-index",
+                        str(index),
+                        "--shard-count",
+                        str(count),
+                        "--partial-output",
+                        str(partial),
+                    )
+                    self.assertEqual(result.returncode, 0, msg=result.stderr)
+                    partials.append(str(partial))
+            self.assertEqual(json.loads(Path(partials[1]).read_text(encoding="utf-8"))["hard_cases"][0]["row_index"], 1)
+
+            merged_outputs = [
+                "--domain-output",
+                str(root / "merged" / "domain.json"),
+                "--retention-output",
+                str(root / "merged" / "retention.json"),
+                "--hard-cases-output",
+                str(root / "merged" / "hard_cases.json"),
+            ]
+            merged = self.run_producer("--run-name", "unit-shards", "--merge-partials", *partials, *merged_outputs)
+            incomplete = self.run_producer("--run-name", "unit-shards", "--merge-partials", *partials[1:], *merged_outputs)
+
+            self.assertEqual(merged.returncode, 0, msg=merged.stderr)
+            for name in ("domain.json", "retention.json", "hard_cases.json"):
+                self.assertEqual(
+                    (root / "merged" / name).read_text(encoding="utf-8"),
+                    (root / "single" / name).read_text(encoding="utf-8"),
+                )
+            self.assertNotEqual(incomplete.returncode, 0)
+            self.assertIn("eval_partial_missing_shards: domain_eval", incomplete.stderr)
+
+
+    def test_restart_reuses_checkpointed_rows_for_the_same_model(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            run_dir = root / "run"
+            run_dir.mkdir()
+            model_path = root / "rwkv-0.pth"
+            model_path.write_text("stub", encoding="utf-8")
+            domain_eval = root / "domain_eval.jsonl"
+            retention_eval = root / "retention_eval.jsonl"
+            inference_script = root / "stub_infer.py"
+            broken_script = root / "broken_infer.py"
+            self.write_eval_suites(domain_eval, retention_eval)
+            self.write_stub_inference_script(inference_script)
+            broken_script.write_text("import sys\nsys.exit('inference unavailable')\n", encoding="utf-8")
+            partial = root / "shards" / "domain_eval-0-of-1.json"
+
+            def run_shard(script: Path) -> subprocess.CompletedProcess:
+                return self.run_producer(
+                    "--run-name",
+                    "unit-resume",
+                    "--run-dir",
+                    str(run_dir),
+                    "--model",
+                    str(model_path),
+                    "--suite",
+                    "domain_eval",
+                    "--eval-jsonl",
+                    str(domain_eval),
+                    "--shard",
+                    "0/1",
+                    "--partial-output",
+                    str(partial),
+                    "--inference-script",
+                    str(script),
+                )
+
+            first = run_shard(inference_script)
+            self.assertEqual(first.returncode, 0, msg=first.stderr)
+            expected = json.loads(partial.read_text(encoding="utf-8"))
+            self.assertEqual(expected.pop("decode")["rows_decoded"], 2)
+            checkpoint = root / "shards" / "domain_eval.eval_rows.jsonl"
+            records = [json.loads(line) for line in checkpoint.read_text(encoding="utf-8").splitlines()]
+            self.assertEqual([record["passed"] for record in records], [True, False])
+
+            # A torn trailing line (crash mid-append) is ignored; every scored row is reused.
+            with checkpoint.open("a", encoding="utf-8") as handle:
+                handle.write('{"key": "trunc')
+            partial.unlink()
+            resumed = run_shard(broken_script)
+            self.assertEqual(resumed.returncode, 0, msg=resumed.stderr)
+            resumed_partial = json.loads(partial.read_text(encoding="utf-8"))
+            self.assertEqual(resumed_partial.pop("decode")["rows_reused"], 2)
+            self.assertEqual(resumed_partial, expected)
+            self.assertEqual(len(checkpoint.read_text(encoding="utf-8").splitlines()), 3)
+
+            model_path.write_text("other weights", encoding="utf-8")
+            changed_model = run_shard(broken_script)
+            self.assertNotEqual(changed_model.returncode, 0)
+            self.assertIn("inference unavailable", changed_model.stderr)
+
+
+    def test_batched_rows_score_like_one_call_per_row(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            model_path = root / "rwkv-0.pth"
+            model_path.write_text("stub", encoding="utf-8")
+            domain_eval = root / "domain_eval.jsonl"
+            retention_eval = root / "retention_eval.jsonl"
+            inference_script = root / "stub_infer.py"
+            self.write_eval_suites(domain_eval, retention_eval)
+            self.write_stub_inference_script(inference_script)
+
+            def run(name: str, *extra: str) -> tuple[dict, str]:
+                out = root / name
+                result = self.run_producer(
+                    "--run-name",
+                    "unit-batch",
+                    "--run-dir",
+                    str(root),
+                    "--model",
+                    str(model_path),
+                    "--domain-eval-jsonl",
+                    str(domain_eval),
+                    "--retention-eval-jsonl",
+                    str(retention_eval),
+                    "--domain-output",
+                    str(out / "domain.json"),
+                    "--retention-output",
+                    str(out / "retention.json"),
+                    "--hard-cases-output",
+                    str(out / "hard_cases.json"),
+                    "--inference-script",
+                    str(inference_script),
+                    "--no-checkpoint",
+                    *extra,
+                )
+                self.assertEqual(result.returncode, 0, msg=result.stderr)
+                artifacts = {path.name: json.loads(path.read_text(encoding="utf-8")) for path in out.glob("*.json")}
+                return artifacts, result.stdout
+
+            per_row, _ = run("per_row")
+            batched, stdout = run("batched", "--max-batch-tokens", "4096")
+
+            self.assertEqual(batched, per_row)
+            decode_line = next(line for line in stdout.splitlines() if line.startswith("decode: "))
+            buckets = json.loads(decode_line[len("decode: "):])["buckets"]
+            self.assertEqual(sum(bucket["rows"] for bucket in buckets.values()), 3)
+
+    def test_mock_backend_dry_run_needs_no_model_or_inference_script(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            domain_eval = root / "domain_eval.jsonl"
+            retention_eval = root / "retention_eval.jsonl"
+            self.write_eval_suites(domain_eval, retention_eval)
+
+            def run(name: str, *extra: str) -> dict:
+                out = root / name
+                result = self.run_producer(
+                    "--run-name",
+                    "unit-mock",
+                    "--run-dir",
+                    str(root),
+                    "--backend",
+                    "mock",
+                    "--mock-oracle",
+                    "--domain-eval-jsonl",
+                    str(domain_eval),
+                    "--retention-eval-jsonl",
+                    str(retention_eval),
+                    "--domain-output",
+                    str(out / "domain.json"),
+                    "--retention-output",
+                    str(out / "retention.json"),
+                    "--hard-cases-output",
+                    str(out / "hard_cases.json"),
+                    "--checkpoint-dir",
+                    str(out),
+                    *extra,
+                )
+                self.assertEqual(result.returncode, 0, msg=result.stderr)
+                return {path.name: json.loads(path.read_text(encoding="utf-8")) for path in out.glob("*.json")}
+
+            oracle = run("oracle", "--max-batch-tokens", "4096")
+            broken = run("broken", "--mock-fail-rate", "1")
+
+            self.assertEqual(oracle["hard_cases.json"], [])
+            self.assertEqual({item["verdict"] for item in oracle["domain.json"].values()}, {"PASS"})
+            self.assertEqual(len(broken["hard_cases.json"]), 3)
+            self.assertEqual({item["verdict"] for item in broken["retention.json"].values()}, {"FAIL"})
+
+    def test_adapter_sweep_scores_every_adapter_in_one_process(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            domain_eval = root / "domain_eval.jsonl"
+            retention_eval = root / "retention_eval.jsonl"
+            self.write_eval_suites(domain_eval, retention_eval)
+            adapters = []
+            for name in ("run-a", "run-b"):
+                path = root / name / "rwkv-0.pth"
+                path.parent.mkdir()
+                path.write_bytes(name.encode("utf-8"))
+                adapters += ["--lora-adapter", str(path)]
+            sweep_dir = root / "sweep"
+
+            def sweep() -> subprocess.CompletedProcess:
+                result = self.run_producer(
+                    "--run-name",
+                    "unit-sweep",
+                    "--run-dir",
+                    str(root),
+                    "--backend",
+                    "mock",
+                    "--mock-oracle",
+                    "--mock-fail-rate",
+                    "0.5",
+                    "--domain-eval-jsonl",
+                    str(domain_eval),
+                    "--retention-eval-jsonl",
+                    str(retention_eval),
+                    "--sweep-output-dir",
+                    str(sweep_dir),
+                    *adapters,
+                )
+                self.assertEqual(result.returncode, 0, msg=result.stderr)
+                return result
+
+            sweep()
+            summary = json.loads((sweep_dir / "sweep.json").read_text(encoding="utf-8"))
+            self.assertEqual([entry["adapter"]["name"] for entry in summary["adapters"]], ["run-a/rwkv-0", "run-b/rwkv-0"])
+            self.assertEqual(sorted(summary["ranking"]), ["run-a/rwkv-0", "run-b/rwkv-0"])
+            self.assertEqual(summary["decode"]["rows_reused"], 0)
+            for entry in summary["adapters"]:
+                domain = json.loads(Path(entry["outputs"]["domain_output"]).read_text(encoding="utf-8"))
+                failures = sum(item["failures_total"] for item in domain.values())
+                self.assertEqual(entry["domain_eval"]["failures_total"], failures)
+                self.assertTrue((sweep_dir / entry["adapter"]["name"].replace("/", "__") / "hard_cases.json").is_file())
+
+            # Row checkpoints are keyed by base + adapter: a rerun reuses every row.
+            sweep()
+            rerun = json.loads((sweep_dir / "sweep.json").read_text(encoding="utf-8"))
+            self.assertEqual(rerun["decode"]["rows_decoded"], 0)
+            self.assertEqual(
+                [entry["domain_eval"] for entry in rerun["adapters"]],
+                [entry["domain_eval"] for entry in summary["adapters"]],
+            )
+
+    def test_several_adapters_need_a_sweep_output_dir(self):
+        result = self.run_producer(
+            "--run-name",
+            "unit-sweep",
+            "--backend",
+            "mock",
+            "--lora-adapter",
+            "a.pth",
+            "--lora-adapter",
+            "b.pth",
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("--sweep-output-dir", result.stderr)
+
+    def test_category_budgets_follow_the_longest_expected_answer(self):
+        rows = [
+            {"assistant_response": "Да.", "metadata": {"eval_category": "identity"}},
+            {"assistant_response": "Нет", "metadata": {"eval_category": "identity"}},
+            {"assistant_response": "x" * 200, "metadata": {"eval_category": "code"}},
+        ]
+        utf8_bytes = lambda text: len(text.encode("utf-8"))
+
+        budgets = produce_eval_artifacts.category_token_budgets(rows, "domain_eval", 128, 1.25, utf8_bytes)
+        unlimited = produce_eval_artifacts.category_token_budgets(rows, "domain_eval", 128, 0, utf8_bytes)
+
+        # "Нет" is 6 UTF-8 bytes: ceil(6 * 1.25) + 8 margin.
+        self.assertEqual(budgets, {"identity": 16, "code": 128})
+        self.assertEqual(unlimited, {"identity": 128, "code": 128})
+
+    def test_completions_are_cut_at_stop_sequences_and_budgets_recorded(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            model_path = root / "rwkv-0.pth"
+            model_path.write_text("stub", encoding="utf-8")
+            retention_eval = root / "retention_eval.jsonl"
+            self.write_chat_jsonl(retention_eval, [("кто ты?", "Ок.")])
+            inference_script = root / "chatty_infer.py"
+            inference_script.write_text(
+                textwrap.dedent(
+                    """\
+                    import argparse
+                    import json
+                    from pathlib import Path
+
+                    parser = argparse.ArgumentParser()
+                    for name in ("--model", "--prompt", "--output-json"):
+                        parser.add_argument(name, required=True)
+                    parser.add_argument("--tokens", type=int, default=0)
+                    parser.add_argument("--stop", action="append", default=[])
+                    args = parser.parse_args()
+                    # Ignores --stop and keeps talking past the answer.
+                    sample = {"index": 0, "completion": "Ок.\\n\\nUser: а ещё?", "tokens_generated": args.tokens}
+                    Path(args.output_json).write_text(json.dumps({"samples": [sample]}), encoding="utf-8")
+                    """
+                ),
+                encoding="utf-8",
+            )
+
+            def run_shard(*extra: str) -> dict:
+                partial = root / "partial.json"
+                result = self.run_producer(
+                    "--run-name",
+                    "unit-stop",
+                    "--run-dir",
+                    str(root),
+                    "--model",
+                    str(model_path),
+                    "--suite",
+                    "retention_eval",
+                    "--eval-jsonl",
+                    str(retention_eval),
+                    "--partial-output",
+                    str(partial),
+                    "--inference-script",
+                    str(inference_script),
+                    "--no-checkpoint",
+                    *extra,
+                )
+                self.assertEqual(result.returncode, 0, msg=result.stderr)
+                return json.loads(partial.read_text(encoding="utf-8"))
+
+            stopped = run_shard()
+            unstopped = run_shard("--no-stop", "--budget-factor", "0")
+
+            self.assertEqual(stopped["categories"]["ru_general"]["failures_total"], 0)
+            # "Ок." is at most 5 tokens, so the budget is far below the 128-token cap.
+            self.assertLessEqual(stopped["decode"]["tokens_budget"], 15)
+            self.assertEqual(stopped["decode"]["tokens_generated"], stopped["decode"]["tokens_budget"])
+            self.assertEqual(unstopped["categories"]["ru_general"]["failures_total"], 1)
+            self.assertEqual(unstopped["decode"]["tokens_budget"], 128)
+
+
 if __name__ == "__main__":
     unittest.main()
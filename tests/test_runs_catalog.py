@@ -0,0 +1,173 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import runs_catalog
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPT_PATH = ROOT_DIR / "scripts" / "runs_catalog.py"
+
+
+def write_json(path: Path, payload: dict, mtime: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def write_run(runs_dir: Path, name: str, profile: str, tokens_per_sec: float, syntax_failures: int, mtime: int) -> Path:
+    run_dir = runs_dir / name
+    write_json(
+        run_dir / "resource_observation.json",
+        {
+            "model_config": "configs/model/rwkv7-7.2b.env",
+            "profile_config": f"configs/profile/{profile}.env",
+            "env": {"MODEL_TAG": "rwkv7-7.2b", "QUANT": "nf4", "PEFT": "lora", "CTX_LEN": "1024", "MICRO_BSZ": "1"},
+            "devices": 1,
+            "peak_memory_gb": 12.0,
+            "tokens_per_sec": tokens_per_sec,
+        },
+        mtime,
+    )
+    write_json(
+        run_dir / "telemetry" / "summary.json",
+        {
+            "status": "complete",
+            "devices": 1,
+            "tokens_per_sec": tokens_per_sec,
+            "step_time_s": {"p50": 4096 / tokens_per_sec},
+            "stalls": {"count": 0},
+            "loss": {"last": 1.5},
+            "peak_memory_gb": 12.0,
+        },
+        mtime,
+    )
+    categories = {
+        "syntax": {"verdict": "PASS", "samples_total": 10, "failures_total": syntax_failures},
+        "identity": {"verdict": "PASS", "samples_total": 4, "failures_total": 0, "score": 0.9},
+    }
+    write_json(
+        run_dir / "eval_summary.json",
+        {
+            "run_name": name,
+            "domain_eval": {"verdict": "PASS", "categories": categories},
+            "retention_eval": {"verdict": "PASS", "categories": {"general": {"verdict": "PASS", "samples_total": 5}}},
+            "overall_verdict": "PASS",
+        },
+        mtime,
+    )
+    write_json(run_dir / "gates" / "eval_gate.json", {"gate": "eval_gate", "verdict": "PASS"}, mtime)
+    return run_dir
+
+
+class RunsCatalogTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.runs_dir = root / "runs"
+        self.audit_dir = root / "audit"
+        self.db = root / "catalog.sqlite"
+        write_run(self.runs_dir, "run-a", "qlora-nf4", 2000.0, 1, 1_700_000_000)
+        write_run(self.runs_dir, "run-b", "qlora-nf4-identity-v4", 1500.0, 4, 1_700_100_000)
+        (self.runs_dir / "empty").mkdir()
+        # DAG run with started_at, and a legacy one that only names the run dir in train_adapter details.
+        for task, started, finished in (
+            ("prepare_dataset", "2026-01-01T00:00:00Z", "2026-01-01T00:01:00Z"),
+            ("train_adapter", "2026-01-01T00:01:00Z", "2026-01-01T01:01:00Z"),
+        ):
+            write_json(
+                self.audit_dir / "manual-a" / f"{task}-attempt-1.json",
+                {"task_id": task, "status": "validated", "attempt": 1, "run_name": "run-a", "started_at": started, "timestamp": finished, "details": {}},
+                1_700_000_000,
+            )
+        for task, finished, details in (
+            ("prepare_dataset", "2026-01-02T00:01:00Z", {"bin_sha256": "ab" * 32}),
+            ("train_adapter", "2026-01-02T02:01:00Z", {"run_dir": str(self.runs_dir / "run-b")}),
+        ):
+            write_json(
+                self.audit_dir / "legacy-b" / f"{task}-attempt-1.json",
+                {"task_id": task, "status": "validated", "attempt": 1, "timestamp": finished, "details": details},
+                1_700_100_000,
+            )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def index(self):
+        return runs_catalog.index_catalog(self.db, self.runs_dir, self.audit_dir)
+
+    def test_index_is_incremental_by_mtime(self):
+        self.assertEqual(self.index(), {"runs_indexed": 2, "runs_unchanged": 0, "runs_removed": 0, "dag_runs_indexed": 2, "dag_runs_unchanged": 0})
+        self.assertEqual(self.index(), {"runs_indexed": 0, "runs_unchanged": 2, "runs_removed": 0, "dag_runs_indexed": 0, "dag_runs_unchanged": 2})
+
+        write_json(self.runs_dir / "run-b" / "gates" / "dataset_quality_gate.json", {"gate": "dataset_quality_gate", "verdict": "FAIL"}, 1_700_200_000)
+        self.assertEqual(self.index()["runs_indexed"], 1)
+        runs = {run["run_name"]: run for run in runs_catalog.load_catalog(self.db)}
+        self.assertEqual(runs["run-b"]["gates"], {"dataset_quality_gate": "FAIL", "eval_gate": "PASS"})
+
+    def test_catalog_records_training_eval_and_task_wall_time(self):
+        self.index()
+        runs = runs_catalog.load_catalog(self.db)
+
+        self.assertEqual([run["run_name"] for run in runs], ["run-a", "run-b"])
+        run_a, run_b = runs
+        self.assertEqual((run_a["model"], run_a["profile"], run_a["quant"]), ("rwkv7-7.2b", "qlora-nf4", "nf4"))
+        self.assertEqual(run_a["tokens_per_sec"], 2000.0)
+        self.assertEqual(run_a["scores"]["domain_eval/syntax"], 0.9)
+        self.assertEqual(run_a["scores"]["domain_eval/identity"], 0.9)
+        self.assertEqual(run_a["scores"]["retention_eval/general"], 1.0)
+        self.assertEqual(run_a["task_seconds"], {"prepare_dataset": 60.0, "train_adapter": 3600.0})
+        # Legacy audits: no started_at, so wall time is the gap since the previous task.
+        self.assertEqual(run_b["task_seconds"], {"train_adapter": 7200.0})
+        self.assertEqual(run_b["dataset_sha256"], "ab" * 32)
+
+    def test_regressions_flag_throughput_score_and_wall_time(self):
+        self.index()
+        regressions = runs_catalog.find_regressions(runs_catalog.load_catalog(self.db))
+
+        metrics = {item["metric"]: item for item in regressions}
+        self.assertEqual(set(metrics), {"tokens_per_sec", "score:domain_eval/syntax", "wall_seconds:train_adapter"})
+        self.assertEqual(metrics["tokens_per_sec"]["change"], -0.25)
+        self.assertEqual(metrics["tokens_per_sec"]["baseline_profile"], "qlora-nf4")
+        self.assertEqual(metrics["score:domain_eval/syntax"]["value"], 0.6)
+
+        relaxed = runs_catalog.find_regressions(
+            runs_catalog.load_catalog(self.db),
+            {"max_throughput_drop": 0.3, "max_score_drop": 0.5, "max_wall_increase": 2.0},
+        )
+        self.assertEqual(relaxed, [])
+
+    def test_cli_renders_reports_and_fails_on_regression(self):
+        base = [
+            sys.executable,
+            str(SCRIPT_PATH),
+            "report",
+            "--db",
+            str(self.db),
+            "--runs-dir",
+            str(self.runs_dir),
+            "--audit-dir",
+            str(self.audit_dir),
+        ]
+        markdown = subprocess.run(base, capture_output=True, text=True, check=False)
+        html_path = Path(self.tmp.name) / "report" / "runs.html"
+        strict = subprocess.run(
+            base + ["--format", "html", "--output", str(html_path), "--fail-on-regression"],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+        self.assertEqual(markdown.returncode, 0, markdown.stderr)
+        self.assertIn("## Regressions", markdown.stdout)
+        self.assertIn("| run-b | run-a | qlora-nf4-identity-v4 (qlora-nf4) | tokens_per_sec |", markdown.stdout)
+        self.assertEqual(strict.returncode, 1, strict.stderr)
+        self.assertIn("<td>score:domain_eval/syntax</td>", html_path.read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    unittest.main()
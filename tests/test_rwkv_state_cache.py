@@ -0,0 +1,119 @@
+import importlib.util
+import unittest
+
+from scripts import rwkv_state_cache
+
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+class ToyRecurrentModel:
+    """Order-sensitive recurrence with an in-place state, like RWKV `forward_batch`."""
+
+    def __init__(self):
+        self.tokens_forwarded = 0
+
+    def zero_state(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        return [np.zeros(4, dtype=np.float64)]
+
+    def forward(self, token_lists, state):
+        for token in token_lists[0]:
+            state[0] *= 0.5
+            state[0] += token
+        self.tokens_forwarded += len(token_lists[0])
+        return state[0] * 2
+
+
+def prefill(cache, model, tokens):
+    return rwkv_state_cache.prefill_with_cache(cache, tokens, model.zero_state, model.forward)
+
+
+class PrefixStateCacheTests(unittest.TestCase):
+    @unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+    def test_resumes_from_deepest_prefix_with_identical_results(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        cache = rwkv_state_cache.PrefixStateCache(max_bytes=1 << 20, block_tokens=4)
+        model = ToyRecurrentModel()
+        shared = list(range(1, 11))
+
+        first_out, _, first_reused = prefill(cache, model, shared + [20, 21])
+        out, state, reused = prefill(cache, model, shared + [30])
+        reference_out, reference_state, _ = prefill(None, ToyRecurrentModel(), shared + [30])
+
+        self.assertEqual(first_reused, 0)
+        # Snapshots at 4, 8 and the prompt end; the deepest shared one is at 8 tokens.
+        self.assertEqual(reused, 8)
+        self.assertEqual(model.tokens_forwarded, 12 + 3)
+        np.testing.assert_allclose(out, reference_out)
+        np.testing.assert_allclose(state[0], reference_state[0])
+
+        again_out, _, again_reused = prefill(cache, model, shared + [20, 21])
+        self.assertEqual(again_reused, 12)
+        np.testing.assert_allclose(again_out, first_out)
+        self.assertEqual(model.tokens_forwarded, 15)
+
+        stats = cache.stats()
+        self.assertEqual((stats["lookups"], stats["hits"]), (3, 2))
+        self.assertEqual(stats["prefill_tokens"], 12 + 11 + 12)
+        self.assertEqual(stats["saved_prefill_tokens"], 20)
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+    def test_caller_state_is_private(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        cache = rwkv_state_cache.PrefixStateCache(max_bytes=1 << 20, block_tokens=2)
+        model = ToyRecurrentModel()
+        _, state, _ = prefill(cache, model, [1, 2, 3])
+        state[0] += 100  # decoding advances the returned state in place
+        out, _, reused = prefill(cache, model, [1, 2, 3])
+        reference_out, _, _ = prefill(None, ToyRecurrentModel(), [1, 2, 3])
+        self.assertEqual(reused, 3)
+        np.testing.assert_allclose(out, reference_out)
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+    def test_lru_eviction_keeps_total_bytes_under_budget(self):
+        # One entry is a 4-float state plus 4-float logits: 64 bytes.
+        cache = rwkv_state_cache.PrefixStateCache(max_bytes=128, block_tokens=100)
+        model = ToyRecurrentModel()
+        prefill(cache, model, [1, 2])
+        prefill(cache, model, [3, 4])
+        prefill(cache, model, [1, 2])  # refresh [1, 2]
+        prefill(cache, model, [5, 6])  # evicts [3, 4]
+
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.bytes, 128)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.lookup([3, 4])[0], 0)
+        self.assertEqual(cache.lookup([1, 2, 9])[0], 2)
+
+    def test_snapshot_depths_are_block_aligned(self):
+        cache = rwkv_state_cache.PrefixStateCache(block_tokens=4)
+        self.assertEqual(cache.snapshot_depths(0, 10), [4, 8, 10])
+        self.assertEqual(cache.snapshot_depths(8, 10), [10])
+        self.assertEqual(cache.snapshot_depths(10, 10), [])
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+    def test_rows_are_joined_along_each_tensor_batch_axis(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        def zero_state(bsz):
+            # Albatross-like layout: layer-major token-shift state, per-row head state, shared scalar.
+            return [np.zeros((2, bsz, 3)), np.zeros((bsz, 4)), 7]
+
+        axes = rwkv_state_cache.state_batch_axes(zero_state)
+        rows = [zero_state(1), zero_state(1)]
+        rows[1][0] += 1
+        joined = rwkv_state_cache.concat_states(rows, np.concatenate, axes)
+
+        self.assertEqual(axes, [1, 0, None])
+        self.assertEqual(joined[0].shape, (2, 2, 3))
+        self.assertEqual(joined[0][:, 1].tolist(), np.ones((2, 3)).tolist())
+        self.assertEqual(joined[1].shape, (2, 4))
+        self.assertEqual(joined[2], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
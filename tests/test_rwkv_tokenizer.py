@@ -0,0 +1,77 @@
+import sys
+import tempfile
+import types
+import unittest
+from array import array
+from pathlib import Path
+from unittest import mock
+
+from scripts import rwkv_tokenizer
+
+
+FIXTURE_VOCAB = Path(__file__).resolve().parent / "fixtures" / "rwkv_vocab_test.txt"
+
+
+class RwkvTokenizerTests(unittest.TestCase):
+    def test_greedy_longest_match_and_round_trip(self):
+        tokenizer = rwkv_tokenizer.RwkvTokenizer(FIXTURE_VOCAB)
+        text = "Instruction: Напиши функцию\n\nResponse: def f():\n    return 1\n<|endoftext|>\n"
+
+        tokens = tokenizer.encode(text)
+
+        self.assertEqual(tokenizer.decode(tokens), text)
+        self.assertEqual(tokenizer.count(text), len(tokens))
+        self.assertEqual(tokens[0], 257)
+        self.assertEqual(tokens[-2:], [268, 11])
+        self.assertEqual(tokenizer.encode("    "), [264])
+        self.assertEqual(tokenizer.encode("     "), [264, 33])
+        self.assertLess(len(tokens), len(text.encode("utf-8")))
+
+    def test_vocab_length_mismatch_is_rejected(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vocab = Path(tmp_dir) / "vocab.txt"
+            vocab.write_text("1 'ab' 3\n", encoding="utf-8")
+            with self.assertRaisesRegex(ValueError, "token length mismatch"):
+                rwkv_tokenizer.RwkvTokenizer(vocab)
+
+    def test_unknown_byte_fails_closed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vocab = Path(tmp_dir) / "vocab.txt"
+            vocab.write_text("1 'a' 1\n", encoding="utf-8")
+            tokenizer = rwkv_tokenizer.RwkvTokenizer(vocab)
+            with self.assertRaisesRegex(ValueError, "tokenizer_unknown_byte"):
+                tokenizer.encode("ab")
+
+    def test_token_count_sidecar_is_keyed_by_data_and_vocab(self):
+        tokenizer = rwkv_tokenizer.RwkvTokenizer(FIXTURE_VOCAB)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data = Path(tmp_dir) / "rows.jsonl"
+            data.write_text("{}\n", encoding="utf-8")
+            data_sha = "ab" * 32
+
+            self.assertIsNone(rwkv_tokenizer.load_token_counts(data, data_sha, tokenizer.fingerprint))
+            self.assertTrue(rwkv_tokenizer.save_token_counts(data, data_sha, tokenizer.fingerprint, array("I", [3, 5, 8])))
+            self.assertEqual(list(rwkv_tokenizer.load_token_counts(data, data_sha, tokenizer.fingerprint)), [3, 5, 8])
+            self.assertIsNone(rwkv_tokenizer.load_token_counts(data, "cd" * 32, tokenizer.fingerprint))
+            self.assertIsNone(rwkv_tokenizer.load_token_counts(data, data_sha, "00" * 32))
+
+    def test_count_uses_the_native_tokenizer_only_when_it_matches_the_vocab(self):
+        reference = rwkv_tokenizer.RwkvTokenizer(FIXTURE_VOCAB)
+        text = "Instruction: Напиши функцию\n\nResponse: def f():\n    return 1\n"
+
+        def native_module(encode):
+            return types.SimpleNamespace(RWKVTokenizer=lambda: types.SimpleNamespace(encode=encode))
+
+        for encode, backend in ((reference.encode, "pyrwkv_tokenizer"), (lambda value: [1] * len(value), "python")):
+            with self.subTest(backend=backend), mock.patch.dict(sys.modules, {"pyrwkv_tokenizer": native_module(encode)}):
+                tokenizer = rwkv_tokenizer.RwkvTokenizer(FIXTURE_VOCAB)
+                self.assertEqual(tokenizer.count(text), len(reference.encode(text)))
+                self.assertEqual(tokenizer.count_backend, backend)
+
+    def test_missing_vocab_reports_actionable_error(self):
+        with self.assertRaisesRegex(ValueError, "tokenizer_vocab_not_found"):
+            rwkv_tokenizer.resolve_vocab_path("/nonexistent/rwkv_vocab_v20230424.txt")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import hashlib
+import importlib.util
+import random
+import unittest
+
+from scripts.segment_interleave import SegmentOrderDigest, round_robin_interleave, weighted_interleave
+
+
+SEGMENT_ORDER = ("onec_bsl", "coding_general", "ru_identity")
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+def legacy_interleave(segment_samples: dict[str, list], rng: random.Random) -> list:
+    buckets = {name: list(rows) for name, rows in segment_samples.items()}
+    for rows in buckets.values():
+        rng.shuffle(rows)
+    mixed = []
+    while any(buckets.values()):
+        active = [name for name in SEGMENT_ORDER if buckets[name]]
+        rng.shuffle(active)
+        for name in active:
+            mixed.append(buckets[name].pop())
+    return mixed
+
+
+class SegmentInterleaveTests(unittest.TestCase):
+    def test_round_robin_matches_legacy_order_and_rng_state(self):
+        for sizes in ((50, 30, 20), (1, 1, 1), (7, 0, 3), (0, 0, 0), (13, 13, 2)):
+            items = {
+                name: [(name, index) for index in range(size)] for name, size in zip(SEGMENT_ORDER, sizes)
+            }
+            legacy_rng = random.Random(42)
+            fast_rng = random.Random(42)
+            self.assertEqual(
+                round_robin_interleave(items, SEGMENT_ORDER, fast_rng),
+                legacy_interleave(items, legacy_rng),
+                msg=str(sizes),
+            )
+            self.assertEqual(fast_rng.random(), legacy_rng.random())
+
+    def test_order_digest_matches_joined_order(self):
+        order = ["onec_bsl", "onec_bsl", "coding_general", "ru_identity", "onec_bsl"] * 5
+        digest = SegmentOrderDigest(preview_size=4).extend(order)
+        self.assertEqual(digest.hexdigest(), hashlib.sha256("\n".join(order).encode("utf-8")).hexdigest())
+        self.assertEqual(digest.preview, order[:4])
+        self.assertEqual(digest.switches, sum(1 for left, right in zip(order, order[1:]) if left != right))
+        self.assertEqual(digest.total, len(order))
+        self.assertEqual(SegmentOrderDigest().hexdigest(), hashlib.sha256(b"").hexdigest())
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+    def test_weighted_interleave_spreads_segments_by_share(self):
+        selected = {"onec_bsl": list(range(500)), "coding_general": list(range(300)), "ru_identity": list(range(200))}
+        names, ordinals = weighted_interleave(selected, SEGMENT_ORDER, seed=7)
+
+        self.assertEqual((names, ordinals), weighted_interleave(selected, SEGMENT_ORDER, seed=7))
+        for name, values in selected.items():
+            self.assertEqual(sorted(ordinal for segment, ordinal in zip(names, ordinals) if segment == name), values)
+        for window_start in range(0, 1000, 100):
+            window = names[window_start : window_start + 100]
+            self.assertLessEqual(abs(window.count("onec_bsl") - 50), 3)
+            self.assertLessEqual(abs(window.count("ru_identity") - 20), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+import asyncio
+import importlib.util
+import json
+import unittest
+
+from scripts import serve_rwkv
+
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+class AlphabetSlotModel:
+    """Tiny CPU slot model: after letter `c` it strongly predicts the next letter, after `z` EOD.
+
+    Token ids: 0 is EOD, 1..26 are `a`..`z`, 27 is a space. Like Albatross, a step forwards
+    every row (unlisted ones get EOD); `history[slot]` is the token stream the row's state saw.
+    """
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.history = [[] for _ in range(slots)]
+        self.steps = []
+        self.prefills = []
+
+    def encode(self, text):
+        return [ord(char) - 96 if "a" <= char <= "z" else 27 for char in text]
+
+    def decode(self, tokens):
+        return "".join(chr(token + 96) if 1 <= token <= 26 else " " for token in tokens)
+
+    def logits(self, token):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        row = np.zeros(28)
+        row[token + 1 if 1 <= token < 26 else 0] = 20.0
+        return row
+
+    def prefill(self, slot, tokens):
+        self.prefills.append((slot, list(tokens)))
+        self.history[slot] = list(tokens)
+        return self.logits(tokens[-1])
+
+    def step(self, tokens):
+        self.steps.append(sorted(tokens))
+        for slot in range(self.slots):
+            self.history[slot].append(tokens.get(slot, 0))
+        return {slot: self.logits(self.history[slot][-1]) for slot in tokens}
+
+
+async def collect(generation):
+    text = []
+    while True:
+        event = await generation.events.get()
+        text.append(event.get("text", ""))
+        if "finish_reason" in event:
+            return "".join(text), event["finish_reason"]
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+class EngineTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.model = AlphabetSlotModel(slots=2)
+        self.engine = serve_rwkv.ContinuousBatchingEngine(self.model, max_queue=3)
+        self.engine.start()
+
+    async def asyncTearDown(self):
+        await self.engine.close()
+
+    def submit(self, prompt, **body):
+        params = serve_rwkv.SamplingParams.from_request({"temperature": 0, **body})
+        return self.engine.submit(self.model.encode(prompt), params)
+
+    async def test_finish_reasons_follow_per_request_params(self):
+        results = await asyncio.gather(
+            collect(self.submit("x")),
+            collect(self.submit("a", max_tokens=3)),
+            collect(self.submit("a", stop=["def"])),
+        )
+
+        self.assertEqual(results, [("yz", "stop"), ("bcd", "length"), ("bc", "stop")])
+        self.assertEqual(self.engine.finished_total, {"stop": 2, "length": 1})
+
+    async def test_new_request_joins_a_running_batch(self):
+        long_request = self.submit("a", max_tokens=20)
+        for _ in range(3):
+            await long_request.events.get()
+
+        short_text = await collect(self.submit("m", max_tokens=2))
+
+        self.assertEqual(short_text, ("no", "length"))
+        # The joining row decodes from the prompt state, not from "prompt + EOD".
+        self.assertEqual(self.model.history[1][:2], self.model.encode("mn"))
+        self.assertIsNone(long_request.finish_reason)
+        self.assertIn([0, 1], self.model.steps)
+        self.assertEqual((await collect(long_request))[1], "length")
+
+    async def test_queue_overflow_and_cancelled_requests_free_their_slot(self):
+        running = [self.submit("a", max_tokens=20), self.submit("a", max_tokens=20)]
+        await asyncio.gather(*(generation.events.get() for generation in running))
+        for _ in range(3):
+            self.submit("a")
+        with self.assertRaisesRegex(ValueError, "serve_queue_full"):
+            self.submit("a")
+
+        for generation in running:
+            self.engine.cancel(generation)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(self.engine.finished_total["cancelled"], 2)
+        self.assertEqual(len(self.engine.waiting), 0)
+
+    async def test_stop_sequence_prefixes_are_not_streamed_early(self):
+        text, reason = await collect(self.submit("a", stop=["efx"], max_tokens=6))
+
+        self.assertEqual((text, reason), ("bcdefg", "length"))
+        self.assertEqual(serve_rwkv.stop_holdback("bcdef", ["efx"]), 2)
+        self.assertEqual(serve_rwkv.stop_holdback("bcdeg", ["efx"]), 0)
+
+
+class SamplingTests(unittest.TestCase):
+    @unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+    def test_top_k_and_top_p_restrict_the_candidates(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        logits = np.log(np.array([0.5, 0.3, 0.15, 0.05]))
+        rng = np.random.default_rng(0)
+        top_k = serve_rwkv.SamplingParams(temperature=1.0, top_k=2)
+        top_p = serve_rwkv.SamplingParams(temperature=1.0, top_p=0.7)
+
+        self.assertEqual({serve_rwkv.sample_token(logits, top_k, rng) for _ in range(200)}, {0, 1})
+        self.assertEqual({serve_rwkv.sample_token(logits, top_p, rng) for _ in range(200)}, {0, 1})
+        self.assertEqual(serve_rwkv.sample_token(logits, serve_rwkv.SamplingParams(temperature=0), rng), 0)
+
+    def test_invalid_params_are_rejected(self):
+        for body in ({"max_tokens": 0}, {"temperature": -1}, {"top_p": 0}, {"stop": [1]}, {"max_tokens": 1.5}):
+            with self.assertRaisesRegex(ValueError, "serve_invalid_request"):
+                serve_rwkv.SamplingParams.from_request(body)
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+class HttpTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = serve_rwkv.ContinuousBatchingEngine(AlphabetSlotModel(slots=2))
+        self.engine.start()
+        handler = serve_rwkv.CompletionServer(self.engine, "alphabet")
+        self.server = await asyncio.start_server(handler.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await self.engine.close()
+
+    async def request(self, method, path, payload=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        raw = await reader.read()
+        writer.close()
+        head, _, body = raw.partition(b"\r\n\r\n")
+        return int(head.split()[1]), body.decode("utf-8")
+
+    async def test_completion_chat_stream_and_metrics(self):
+        status, body = await self.request("POST", "/v1/completions", {"prompt": "a", "max_tokens": 3, "temperature": 0})
+        completion = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual(completion["choices"][0]["text"], "bcd")
+        self.assertEqual(completion["usage"], {"prompt_tokens": 1, "completion_tokens": 3, "total_tokens": 4})
+
+        status, body = await self.request(
+            "POST",
+            "/v1/chat/completions",
+            {"messages": [{"role": "user", "content": "w"}], "temperature": 0, "stream": True},
+        )
+        events = [line[len("data: "):] for line in body.split("\n\n") if line.startswith("data: ")]
+        chunks = [json.loads(event) for event in events[:-1]]
+        self.assertEqual(status, 200)
+        self.assertEqual(events[-1], "[DONE]")
+        # "...Assistant:" ends with a colon (a space token), so the alphabet restarts from EOD.
+        self.assertEqual(chunks[0]["choices"][0]["delta"], {"role": "assistant"})
+        self.assertEqual(chunks[-1]["choices"][0]["finish_reason"], "stop")
+        self.assertEqual(chunks[0]["object"], "chat.completion.chunk")
+
+        status, body = await self.request("POST", "/v1/completions", {"prompt": "x", "temperature": 0, "stream": True})
+        chunks = [json.loads(line[len("data: "):]) for line in body.split("\n\n")[:-2]]
+        self.assertEqual([chunk["choices"][0]["text"] for chunk in chunks], ["y", "z", ""])
+
+        status, metrics = await self.request("GET", "/metrics")
+        self.assertEqual(status, 200)
+        self.assertIn("rwkv_queue_depth 0", metrics)
+        self.assertIn("rwkv_requests_total 3", metrics)
+        self.assertIn("rwkv_time_to_first_token_seconds_count 3", metrics)
+        self.assertIn('rwkv_time_to_first_token_seconds{quantile="0.5"}', metrics)
+        self.assertIn("rwkv_generation_tokens_per_second", metrics)
+
+    async def test_errors_are_openai_shaped(self):
+        status, body = await self.request("POST", "/v1/completions", {"prompt": "a", "top_p": 2})
+        self.assertEqual(status, 400)
+        self.assertIn("serve_invalid_request", json.loads(body)["error"]["message"])
+        status, _ = await self.request("GET", "/v1/nope")
+        self.assertEqual(status, 404)
+        status, _ = await self.request("GET", "/v1/completions")
+        self.assertEqual(status, 405)
+
+
+if __name__ == "__main__":
+    unittest.main()
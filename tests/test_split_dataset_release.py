@@ -1,3 +1,4 @@
+import importlib.util
 import json
 import subprocess
 import tempfile
@@ -41,7 +42,7 @@ class SplitDatasetReleaseTests(unittest.TestCase):
             for row in rows:
                 handle.write(json.dumps(row, ensure_ascii=False) + "\n")
 
-    def run_splitter(self, workdir: Path, rows: list[dict]) -> subprocess.CompletedProcess[str]:
+    def run_splitter(self, workdir: Path, rows: list[dict], *extra_args: str) -> subprocess.CompletedProcess[str]:
         input_path = workdir / "input.jsonl"
         self.write_jsonl(input_path, rows)
         command = [
@@ -67,6 +68,7 @@ class SplitDatasetReleaseTests(unittest.TestCase):
             "repo_id",
             "--time-key",
             "commit_timestamp",
+            *extra_args,
         ]
         return subprocess.run(command, cwd=self.repo_root, check=False, text=True, capture_output=True)
 
@@ -138,6 +140,24 @@ class SplitDatasetReleaseTests(unittest.TestCase):
             self.assertNotEqual(result.returncode, 0)
             self.assertIn("missing_time_metadata", result.stderr)
 
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is not None, "pyarrow installed")
+    def test_splitter_columnar_fails_closed_without_pyarrow(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            row = self.canonical_row(
+                "Напиши функцию расчета скидки v1.",
+                "def discount_v1(order):\n    return 0",
+                category="code_generation",
+                repo_id="repo-a",
+                commit_timestamp=100,
+            )
+
+            result = self.run_splitter(root, [row], "--columnar")
+
+            self.assertEqual(result.returncode, 1)
+            self.assertIn("columnar_release_requires_pyarrow", result.stderr)
+            self.assertFalse((root / "manifest.json").exists())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,149 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from scripts import step_cache
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPT_PATH = ROOT_DIR / "scripts" / "step_cache.py"
+
+
+class StepCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.cache = step_cache.StepCache(self.root / "cache")
+        self.input_path = self.root / "input.jsonl"
+        self.input_path.write_text('{"text": "a"}\n', encoding="utf-8")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fingerprint_tracks_file_content_values_and_missing_files(self):
+        step = self.cache.fingerprint("prepare_dataset", {"backend": "native"}, {"input": self.input_path, "vocab": None})
+        same = step_cache.StepCache(self.root / "cache").fingerprint(
+            "prepare_dataset", {"backend": "native"}, {"vocab": None, "input": str(self.input_path)}
+        )
+        self.assertEqual(step["fingerprint"], same["fingerprint"])
+        self.assertIsNone(step["inputs"]["files"]["vocab"])
+
+        other_values = self.cache.fingerprint("prepare_dataset", {"backend": "json2binidx"}, {"input": self.input_path})
+        self.assertNotEqual(other_values["fingerprint"], step["fingerprint"])
+
+        self.input_path.write_text('{"text": "b"}\n', encoding="utf-8")
+        changed = step_cache.StepCache(self.root / "cache").fingerprint(
+            "prepare_dataset", {"backend": "native"}, {"input": self.input_path, "vocab": None}
+        )
+        self.assertNotEqual(changed["fingerprint"], step["fingerprint"])
+
+    def test_editing_an_imported_module_misses_the_cache(self):
+        scripts = self.root / "scripts"
+        scripts.mkdir()
+        (scripts / "entry.py").write_text("import json\nfrom helper import run\n", encoding="utf-8")
+        (scripts / "helper.py").write_text("def run():\n    import deep\n", encoding="utf-8")
+        (scripts / "deep.py").write_text("BUDGET = 1\n", encoding="utf-8")
+        (scripts / "unused.py").write_text("", encoding="utf-8")
+
+        files = step_cache.module_files(scripts / "entry.py", scripts / "wrapper.sh")
+        self.assertEqual(list(files), ["deep.py", "entry.py", "helper.py"])
+        step = self.cache.fingerprint("eval", {}, files)
+        self.cache.store("eval", step, {"out.json": self.input_path})
+
+        (scripts / "deep.py").write_text("BUDGET = 2\n", encoding="utf-8")
+        changed = step_cache.StepCache(self.root / "cache").fingerprint("eval", {}, step_cache.module_files(scripts / "entry.py"))
+        self.assertNotEqual(changed["fingerprint"], step["fingerprint"])
+        self.assertIsNone(self.cache.lookup("eval", changed["fingerprint"]))
+
+    def test_source_revision_tracks_head_and_uncommitted_edits(self):
+        checkout = self.root / "RWKV-PEFT"
+        checkout.mkdir()
+        git = ["git", "-C", str(checkout), "-c", "user.name=t", "-c", "user.email=t@example.com"]
+        (checkout / "train.py").write_text("LR = 1\n", encoding="utf-8")
+        self.assertIsNone(step_cache.source_revision(checkout))
+        for command in (["init", "-q"], ["add", "train.py"], ["commit", "-q", "-m", "init"]):
+            subprocess.run(git + command, check=True, capture_output=True)
+
+        clean = step_cache.source_revision(checkout)
+        self.assertRegex(clean, r"^[0-9a-f]{40}$")
+        (checkout / "train.py").write_text("LR = 2\n", encoding="utf-8")
+        self.assertTrue(step_cache.source_revision(checkout).startswith(f"{clean}+"))
+        (checkout / "src").mkdir()
+        self.assertIsNone(step_cache.source_revision(checkout / "src"))
+
+    def test_file_digests_are_memoised_by_size_and_mtime(self):
+        self.cache.fingerprint("train_adapter", {}, {"model": self.input_path})
+        digests = json.loads((self.root / "cache" / "digests.json").read_text(encoding="utf-8"))
+        self.assertIn(str(self.input_path.resolve()), digests)
+
+        fresh = step_cache.StepCache(self.root / "cache")
+        with mock.patch.object(step_cache.hashlib, "sha256", wraps=step_cache.hashlib.sha256) as sha256:
+            fresh.file_digest(self.input_path)
+        sha256.assert_not_called()
+
+    def test_store_lookup_restore_and_invalidate(self):
+        step = self.cache.fingerprint("produce_eval_artifacts", {}, {"input": self.input_path})
+        output = self.root / "out" / "domain.json"
+        output.parent.mkdir()
+        output.write_text("{}", encoding="utf-8")
+        self.assertIsNone(self.cache.lookup("produce_eval_artifacts", step["fingerprint"]))
+
+        self.cache.store("produce_eval_artifacts", step, {"domain.json": output, "nested/hard.json": output}, run_name="run-a")
+        entry = self.cache.lookup("produce_eval_artifacts", step["fingerprint"])
+        self.assertEqual(entry["run_name"], "run-a")
+        self.assertEqual(sorted(entry["files"]), ["domain.json", "nested/hard.json"])
+
+        target = self.root / "restored"
+        modes = self.cache.restore(entry, lambda key: target / key)
+        self.assertEqual(modes, {"domain.json": "copy", "nested/hard.json": "copy"})
+        self.assertEqual((target / "nested" / "hard.json").read_text(encoding="utf-8"), "{}")
+
+        # An entry whose files went missing is not reused.
+        os.remove(Path(entry["path"]) / "files" / "domain.json")
+        self.assertIsNone(self.cache.lookup("produce_eval_artifacts", step["fingerprint"]))
+        self.cache.store("produce_eval_artifacts", step, {"domain.json": output}, run_name="run-b")
+        self.assertEqual(self.cache.lookup("produce_eval_artifacts", step["fingerprint"])["run_name"], "run-b")
+
+        self.assertEqual(len(self.cache.invalidate("produce_eval_artifacts", step["fingerprint"][:12])), 1)
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_large_outputs_are_linked_and_detached_before_rebuild(self):
+        step = self.cache.fingerprint("train_adapter", {}, {"input": self.input_path})
+        checkpoint = self.root / "run" / "rwkv-0.pth"
+        checkpoint.parent.mkdir()
+        checkpoint.write_bytes(b"w" * 64)
+        with mock.patch.object(step_cache, "LINK_MIN_BYTES", 32):
+            entry = self.cache.store("train_adapter", step, {"rwkv-0.pth": checkpoint})
+        self.assertEqual(entry["store_modes"], {"rwkv-0.pth": "link"})
+        self.assertEqual(checkpoint.stat().st_nlink, 2)
+
+        self.assertEqual(step_cache.detach_links([checkpoint, self.input_path]), 1)
+        self.assertFalse(checkpoint.exists())
+        cached = Path(entry["path"]) / "files" / "rwkv-0.pth"
+        self.assertEqual(cached.read_bytes(), b"w" * 64)
+
+    def test_cli_lists_and_requires_a_filter_to_invalidate(self):
+        step = self.cache.fingerprint("train_adapter", {}, {"input": self.input_path})
+        self.cache.store("train_adapter", step, {"input.jsonl": self.input_path}, run_name="run-a")
+        base = [sys.executable, str(SCRIPT_PATH)]
+        cache_dir = ["--cache-dir", str(self.root / "cache")]
+
+        listed = subprocess.run(base + ["list"] + cache_dir, capture_output=True, text=True, check=False)
+        refused = subprocess.run(base + ["invalidate"] + cache_dir, capture_output=True, text=True, check=False)
+        dropped = subprocess.run(
+            base + ["invalidate", "--task", "train_adapter"] + cache_dir, capture_output=True, text=True, check=False
+        )
+
+        self.assertEqual(json.loads(listed.stdout)[0]["run_name"], "run-a")
+        self.assertEqual(refused.returncode, 1)
+        self.assertEqual(len(json.loads(dropped.stdout)["removed"]), 1)
+        self.assertEqual(self.cache.entries(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
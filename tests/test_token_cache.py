@@ -0,0 +1,85 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import build_binidx, rwkv_tokenizer
+from scripts.token_cache import TokenCache, document_digest
+
+
+FIXTURE_VOCAB = Path(__file__).resolve().parent / "fixtures" / "rwkv_vocab_test.txt"
+
+
+def write_rows(path: Path, texts: list[str]) -> None:
+    path.write_text("".join(json.dumps({"text": text}, ensure_ascii=False) + "\n" for text in texts), encoding="utf-8")
+
+
+class TokenCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.fingerprint = rwkv_tokenizer.RwkvTokenizer(FIXTURE_VOCAB).fingerprint
+
+    def test_incremental_build_reuses_cached_documents_byte_identically(self):
+        v2 = [f"Напиши функцию {index}" for index in range(40)]
+        v3 = v2[:38] + ["Процедура новая", "return 2"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            cache_dir = root / "cache"
+            write_rows(root / "v2.jsonl", v2)
+            write_rows(root / "v3.jsonl", v3)
+
+            first = build_binidx.build_binidx(
+                root / "v2.jsonl", root / "v2_text_document", FIXTURE_VOCAB, token_cache_dir=cache_dir
+            )
+            second = build_binidx.build_binidx(
+                root / "v3.jsonl", root / "v3_text_document", FIXTURE_VOCAB, workers=2, token_cache_dir=cache_dir
+            )
+            uncached = build_binidx.build_binidx(root / "v3.jsonl", root / "plain_text_document", FIXTURE_VOCAB)
+
+            self.assertEqual((first["token_cache"]["hits"], first["token_cache"]["misses"]), (0, 40))
+            self.assertEqual((second["token_cache"]["hits"], second["token_cache"]["misses"]), (38, 2))
+            self.assertEqual(second["bin"]["sha256"], uncached["bin"]["sha256"])
+            self.assertEqual(second["idx"]["sha256"], uncached["idx"]["sha256"])
+            self.assertEqual(second["token_cache"]["entries"], 42)
+
+    def test_gc_keeps_referenced_entries_and_honours_size_limit(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with TokenCache.open(Path(tmp_dir), self.fingerprint) as cache:
+                for index in range(6):
+                    cache.put(document_digest(f"doc{index}"), bytes([index, 0]) * 50)
+                cache.write_refs("old", [document_digest(f"doc{index}") for index in range(3)])
+                cache.write_refs("new", [document_digest(f"doc{index}") for index in range(2, 5)])
+
+                report = cache.gc()
+                self.assertEqual((report["entries_before"], report["entries_after"]), (6, 5))
+                self.assertIsNone(cache.get(document_digest("doc5")))
+                self.assertEqual(cache.get(document_digest("doc4")), bytes([4, 0]) * 50)
+
+                # Only the newest refs fit into 400 bytes; the older build loses its GC root.
+                limited = cache.gc(max_bytes=400)
+                self.assertEqual(limited["dropped_refs"], ["old.refs"])
+                self.assertEqual(limited["entries_after"], 3)
+
+            with TokenCache.open(Path(tmp_dir), self.fingerprint) as reopened:
+                self.assertEqual(reopened.get(document_digest("doc2")), bytes([2, 0]) * 50)
+                self.assertIsNone(reopened.get(document_digest("doc0")))
+
+    def test_torn_index_tail_and_epoch_mismatch_are_recovered(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with TokenCache.open(Path(tmp_dir), self.fingerprint) as cache:
+                cache.put(document_digest("a"), b"\x01\x00\x00\x00")
+                index_path = cache.index_path
+                tokens_path = cache.tokens_path
+            with index_path.open("ab") as handle:
+                handle.write(b"\xff" * 7)
+            with TokenCache.open(Path(tmp_dir), self.fingerprint) as cache:
+                self.assertEqual(cache.get(document_digest("a")), b"\x01\x00\x00\x00")
+
+            payload = bytearray(tokens_path.read_bytes())
+            payload[50] ^= 0xFF
+            tokens_path.write_bytes(bytes(payload))
+            with TokenCache.open(Path(tmp_dir), self.fingerprint) as cache:
+                self.assertEqual(cache.entries, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
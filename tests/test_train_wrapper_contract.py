@@ -124,6 +124,9 @@ class TrainWrapperContractTests(unittest.TestCase):
         payload = json.loads(invocation.read_text(encoding="utf-8"))
         self.assertIn("--load_model", payload["args"])
 
+        summary = json.loads((run_dir / "telemetry" / "summary.json").read_text(encoding="utf-8"))
+        self.assertEqual(summary["status"], "complete")
+
         # Cleanup test artifact in repository run dir.
         if run_dir.exists():
             shutil.rmtree(run_dir)
@@ -0,0 +1,180 @@
+import importlib.util
+import json
+import pickle
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from scripts import weights_cache
+
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+def pickle_loader(calls):
+    def load(path):
+        calls.append(Path(path).name)
+        return pickle.loads(Path(path).read_bytes())
+
+    return load
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy not installed")
+class WeightsCacheTests(unittest.TestCase):
+    def setUp(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        rng = np.random.default_rng(0)
+        self.base = {
+            "emb.weight": rng.standard_normal((6, 4)).astype(np.float32),
+            "blocks.0.att.receptance.weight": rng.standard_normal((4, 4)).astype(np.float32),
+            "blocks.0.ln1.weight": np.ones(4, dtype=np.float32),
+            "blocks.0.att.r_k": np.arange(4, dtype=np.int64).reshape(2, 2),
+        }
+        self.adapter = {
+            "blocks.0.att.receptance.lora_A": rng.standard_normal((2, 4)).astype(np.float32),
+            "blocks.0.att.receptance.lora_B": rng.standard_normal((4, 2)).astype(np.float32),
+            "blocks.0.ln1.weight": np.full(4, 2.0, dtype=np.float32),
+        }
+        self.checkpoint = self.root / "models" / "base.pth"
+        self.checkpoint.parent.mkdir()
+        self.checkpoint.write_bytes(pickle.dumps(self.base))
+        self.run_dir = self.root / "runs" / "run-a"
+        self.run_dir.mkdir(parents=True)
+        self.adapter_path = self.run_dir / "rwkv-0.pth"
+        self.adapter_path.write_bytes(pickle.dumps(self.adapter))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def prepare(self, calls, **kwargs):
+        return weights_cache.prepare_weights(
+            self.checkpoint, load_checkpoint=pickle_loader(calls), framework="numpy", log=lambda _: None, **kwargs
+        )
+
+    def test_safetensors_round_trip_maps_tensors_from_the_file(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        path = self.root / "t.safetensors"
+        tensors = {**self.base, "mask": np.array([True, False]), "empty": np.zeros((0, 3), dtype=np.float32)}
+        weights_cache.write_safetensors(path, tensors, {"source_sha256": "abc"})
+
+        (length,) = struct.unpack("<Q", path.read_bytes()[:8])
+        self.assertEqual((8 + length) % 8, 0)
+        loaded, metadata = weights_cache.load_safetensors(path, framework="numpy")
+        self.assertEqual(metadata, {"source_sha256": "abc"})
+        self.assertEqual(list(loaded), list(tensors))
+        for name, value in tensors.items():
+            self.assertEqual(loaded[name].dtype, value.dtype)
+            np.testing.assert_array_equal(loaded[name], value)
+        # A view of the mapping, not a copy.
+        self.assertIsNotNone(loaded["emb.weight"].base)
+
+        header, _ = weights_cache.read_safetensors_header(path)
+        self.assertEqual(header["blocks.0.att.r_k"]["dtype"], "I64")
+        self.assertEqual(header["emb.weight"]["shape"], [6, 4])
+
+    def test_merge_lora_applies_scaled_delta_and_overrides(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        merged = weights_cache.merge_lora(self.base, self.adapter, lora_alpha=4)
+        key = "blocks.0.att.receptance.weight"
+        expected = self.base[key] + (self.adapter["blocks.0.att.receptance.lora_B"] @ self.adapter["blocks.0.att.receptance.lora_A"]) * 2
+        np.testing.assert_allclose(merged[key], expected, rtol=1e-6)
+        np.testing.assert_array_equal(merged["blocks.0.ln1.weight"], self.adapter["blocks.0.ln1.weight"])
+        self.assertIs(merged["emb.weight"], self.base["emb.weight"])
+        self.assertNotIn("blocks.0.att.receptance.lora_A", merged)
+
+        with self.assertRaisesRegex(ValueError, "lora_adapter_mismatch"):
+            weights_cache.merge_lora(self.base, {"x.lora_A": np.ones((2, 4)), "x.lora_B": np.ones((4, 2))}, 4)
+        with self.assertRaisesRegex(ValueError, "lora_adapter_invalid"):
+            weights_cache.merge_lora(self.base, {"blocks.0.ln1.weight": np.ones(4)}, 4)
+
+    def test_conversion_is_keyed_by_checkpoint_sha_and_reused(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        calls = []
+        first = self.prepare(calls)
+        self.assertTrue(first["converted"])
+        self.assertEqual(Path(first["path"]).parent, self.checkpoint.parent)
+        self.assertIn(first["checkpoint_sha256"][:16], Path(first["path"]).name)
+        self.assertEqual(calls, ["base.pth"])
+        loaded, metadata = weights_cache.load_safetensors(Path(first["path"]), framework="numpy")
+        self.assertEqual(metadata["source_sha256"], first["checkpoint_sha256"])
+        np.testing.assert_array_equal(loaded["emb.weight"], self.base["emb.weight"])
+
+        again = self.prepare(calls)
+        self.assertFalse(again["converted"])
+        self.assertEqual(again["path"], first["path"])
+        self.assertEqual(calls, ["base.pth"])
+
+        self.base["emb.weight"] += 1
+        self.checkpoint.write_bytes(pickle.dumps(self.base))
+        changed = self.prepare(calls)
+        self.assertTrue(changed["converted"])
+        self.assertNotEqual(changed["path"], first["path"])
+
+    def test_merged_weights_are_cached_per_adapter(self):
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        (self.run_dir / "train_log.txt").write_text(
+            "NEW RUN\n" + repr({"peft": "lora", "peft_config": json.dumps({"r": 2, "lora_alpha": 4})}) + "\n",
+            encoding="utf-8",
+        )
+        calls = []
+        cache_dir = self.root / "cache"
+        merged = self.prepare(calls, cache_dir=cache_dir, lora_adapter=self.adapter_path)
+        self.assertTrue(merged["converted"] and merged["merged"])
+        self.assertEqual((merged["lora_alpha"], merged["lora_r"]), (4.0, 2))
+        self.assertEqual(Path(merged["path"]).parent, cache_dir.resolve())
+        self.assertIn("-a4-r2", Path(merged["path"]).name)
+        loaded, metadata = weights_cache.load_safetensors(Path(merged["path"]), framework="numpy")
+        self.assertEqual(metadata["adapter_sha256"], merged["adapter_sha256"])
+        expected = weights_cache.merge_lora(self.base, self.adapter, 4)
+        for name, value in expected.items():
+            np.testing.assert_allclose(loaded[name], value, rtol=1e-6)
+
+        calls.clear()
+        again = self.prepare(calls, cache_dir=cache_dir, lora_adapter=self.adapter_path)
+        self.assertFalse(again["converted"] or again["merged"])
+        self.assertEqual(again["path"], merged["path"])
+
+        other_alpha = self.prepare(calls, cache_dir=cache_dir, lora_adapter=self.adapter_path, lora_alpha=8)
+        self.assertTrue(other_alpha["merged"])
+        self.assertNotEqual(other_alpha["path"], merged["path"])
+
+    def test_lora_alpha_is_required_without_run_config(self):
+        with self.assertRaisesRegex(ValueError, "lora_alpha_unknown"):
+            self.prepare([], lora_adapter=self.adapter_path)
+        (self.run_dir / "resource_observation.json").write_text(
+            json.dumps({"env": {"PEFT_CONFIG": '{"r":2,"lora_alpha":32}'}}), encoding="utf-8"
+        )
+        self.assertEqual(weights_cache.lora_alpha_from_run(self.run_dir), 32.0)
+
+    def test_redirect_torch_load_serves_state_dict_for_the_checkpoint_only(self):
+        class Tensor:
+            def __init__(self, device="cpu"):
+                self.device = device
+
+            def to(self, device):
+                return Tensor(device)
+
+        fake_torch = SimpleNamespace(load=lambda path, map_location=None: ("real", path))
+        state_dict = {"emb.weight": Tensor()}
+        with weights_cache.redirect_torch_load(fake_torch, self.checkpoint, state_dict):
+            served = fake_torch.load(str(self.checkpoint), map_location="cuda")
+            other = fake_torch.load("other.pth")
+        self.assertEqual(served["emb.weight"].device, "cuda")
+        self.assertEqual(other, ("real", "other.pth"))
+        self.assertEqual(fake_torch.load("x"), ("real", "x"))
+
+    def test_peak_rss_is_reported(self):
+        self.assertGreater(weights_cache.peak_rss_mb(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()